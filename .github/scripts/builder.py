@@ -11,9 +11,8 @@ import tempfile
 import random
 import string
 import datetime
-import filecmp
 from pathlib import Path
-from typing import List, Tuple, Dict, Set
+from typing import List, Tuple, Dict, Set, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -35,11 +34,22 @@ try:
     
     from modules.vps.ssh_client import SSHClient
     from modules.vps.rsync_client import RsyncClient
+    from modules.vps.ssh_connection import SSHConnectionManager
+    from modules.vps.remote_inventory import RemoteInventory
+    from modules.vps.remote_state_manifest import RemoteStateManifest, local_file_stats
+    from modules.vps.streaming_uploader import StreamingUploader
     
-    from modules.repo.manifest_factory import ManifestFactory
+    from modules.repo.manifest_index import ManifestIndex
+    from modules.scm.aur_mirror_cache import AURMirrorCache, MIRROR_DIRNAME as AUR_MIRROR_DIRNAME
+    from modules.scm.aur_rpc_client import AURRPCClient
+    from modules.common.srcinfo import configure_srcinfo_cache, get_srcinfo_cache
+    from modules.common.hash_cache import configure_hash_cache, get_hash_cache
     from modules.repo.smart_cleanup import SmartCleanup
     from modules.repo.cleanup_manager import CleanupManager
+    from modules.repo.cleanup_planner import CleanupPolicy
     from modules.repo.database_manager import DatabaseManager
+    from modules.repo.metadata_sidecar import SIDECAR_DIRNAME, configure_sidecar_store, get_sidecar_store, sidecar_name
+    from modules.repo.native_repo_db import NativeRepoDbGenerator
     from modules.repo.version_tracker import VersionTracker
     
     from modules.build.package_builder import create_package_builder
@@ -103,6 +113,24 @@ class PackageBuilderOrchestrator:
         self.built_packages = []
         self.skipped_packages = []
         self.desired_inventory = set()
+        self.manifest_index = None  # NEW: single-pass manifest shared by phases II, IV and V
+        
+        # NEW: remote state manifest (one small download instead of a directory scan)
+        import config
+        self.use_state_manifest = getattr(config, 'ENABLE_REMOTE_STATE_MANIFEST', True)
+        self.vps_inventory = None            # phase I view of remote_dir (manifest or listing)
+        self.remote_state_source = None      # 'manifest' or 'scan' once phase I ran
+        self.remote_state_manifest = None    # manifest fetched in phase I (digests are reused)
+        self.state_manifest_current = False  # remote manifest matches the live directory
+        
+        # NEW: package metadata sidecars (database/cleanup/version index without the binaries)
+        self.package_mirror_enabled = getattr(config, 'ENABLE_PACKAGE_MIRROR', True)
+        self.remote_sidecars_enabled = getattr(config, 'REMOTE_METADATA_SIDECARS', False)
+        self.remote_sidecars = {}            # remote package filename -> PackageMetadata (valid sidecars)
+        
+        # NEW: streaming publish (packages go to staging while later packages build)
+        self.streaming_publish = getattr(config, 'ENABLE_STREAMING_PUBLISH', True)
+        self.streaming_uploader = None
         
         # GATE STATE TRACKING
         self.gate_state = {
@@ -127,12 +155,15 @@ class PackageBuilderOrchestrator:
     def _init_modules(self):
         """Initialize all required modules"""
         # VPS modules
+        # NEW: one multiplexed SSH connection shared by every ssh/rsync/scp call
+        self.ssh_connection = SSHConnectionManager(self.vps_user, self.vps_host, self.ssh_options)
         vps_config = {
             'vps_user': self.vps_user,
             'vps_host': self.vps_host,
             'remote_dir': self.remote_dir,
             'ssh_options': self.ssh_options,
             'repo_name': self.repo_name,
+            'connection': self.ssh_connection,
         }
         self.ssh_client = SSHClient(vps_config)
         self.ssh_client.setup_ssh_config(self.ssh_key)
@@ -147,8 +178,11 @@ class PackageBuilderOrchestrator:
             'mirror_temp_dir': self.mirror_temp_dir,
             'vps_user': self.vps_user,
             'vps_host': self.vps_host,
+            'ssh_options': self.ssh_options,
+            'connection': self.ssh_connection,
         }
         self.cleanup_manager = CleanupManager(repo_config)
+        self.cleanup_manager.set_inventory_provider(self.ssh_client)
         self.database_manager = DatabaseManager(repo_config)
         self.version_tracker = VersionTracker(repo_config)
         
@@ -189,6 +223,17 @@ class PackageBuilderOrchestrator:
         # Initialize HokibotRunner
         self.hokibot_runner = HokibotRunner(debug_mode=self.debug_mode)
         
+        # NEW: shared file digest cache (upload diff, state manifest, integrity checks)
+        import config
+        configure_hash_cache(
+            self.aur_build_dir / getattr(config, 'HASH_CACHE_FILENAME', '.hash_cache.json'),
+            workers=getattr(config, 'HASH_WORKERS', None)
+        )
+        # NEW: per-package metadata sidecars in the runner cache
+        configure_sidecar_store(
+            self.aur_build_dir / SIDECAR_DIRNAME if getattr(config, 'ENABLE_METADATA_SIDECARS', True) else None
+        )
+        
         logger.info("All modules initialized successfully")
     
     def _ensure_output_directory(self):
@@ -316,69 +361,229 @@ class PackageBuilderOrchestrator:
             logger.warning("SSH connection test failed")
         
         self.ssh_client.ensure_remote_directory()
-        
-        remote_packages = self.ssh_client.list_remote_packages()
-        self.vps_packages = remote_packages
-        
-        remote_signatures = self._get_vps_signatures()
-        self.vps_files = self.vps_packages + remote_signatures
-        
-        logger.info(f"Found {len(self.vps_packages)} package files and {len(remote_signatures)} signatures on VPS")
-        
-        self.version_tracker.build_remote_version_index(self.vps_packages)
+        # NEW: versioned snapshots behind an atomic symlink (opt-in, see ENABLE_SNAPSHOT_PUBLISH)
+        self.ssh_client.ensure_snapshot_layout()
+        
+        # NEW: the state manifest of the last publish stands in for the listing when it is fresh
+        if self.use_state_manifest:
+            self.remote_state_manifest = self.ssh_client.fetch_state_manifest()
+        if self.remote_state_manifest is not None:
+            self.state_manifest_current = True
+            self._load_vps_state(self.remote_state_manifest.to_inventory(self.remote_dir), "manifest")
+        else:
+            # One listing (type/size/mtime) shared by every later consumer until a mutation
+            self._load_vps_state(self.ssh_client.get_inventory(), "scan")
         
         if not self._run_post_repo_enable_pacman_sy():
             logger.warning("Post-repo-enable pacman -Sy was blocked or failed")
         
-        self.package_builder.set_vps_files(self.vps_files)
-        
-        if self.vps_packages:
+        mirror_list = self._packages_to_mirror()
+        if mirror_list:
             logger.info("Mirroring remote packages locally (package files only)...")
             success = self.rsync_client.mirror_remote_packages(
                 self.mirror_temp_dir,
                 self.output_dir,
-                self.vps_packages
+                mirror_list,
+                self.vps_inventory.sizes() if self.vps_inventory is not None else None
             )
+            if not success and self.remote_state_source == "manifest":
+                # The manifest named a file that is gone: rescan and retry once
+                logger.warning("STATE_MANIFEST_STALE=1 reason=mirror_failed fallback=scan")
+                self.remote_state_manifest = None
+                self.state_manifest_current = False
+                self._load_vps_state(self.ssh_client.get_inventory(), "scan")
+                mirror_list = self._packages_to_mirror()
+                success = not mirror_list or self.rsync_client.mirror_remote_packages(
+                    self.mirror_temp_dir,
+                    self.output_dir,
+                    mirror_list,
+                    self.vps_inventory.sizes() if self.vps_inventory is not None else None
+                )
             if not success:
                 logger.warning("Failed to mirror remote packages")
                 return False
         
+        # Remote packages that were not mirrored take part through their sidecars
+        mirrored = set(mirror_list)
+        self.cleanup_manager.set_sidecar_packages(
+            {name: meta for name, meta in self.remote_sidecars.items() if name not in mirrored}
+        )
+        
         return True
     
-    def _get_vps_signatures(self) -> List[str]:
-        """Get signature files from VPS for completeness check"""
-        logger.info("Fetching VPS signature file list...")
+    def _packages_to_mirror(self) -> List[str]:
+        """
+        Remote packages whose binaries are needed locally: all of them with the
+        package mirror enabled, otherwise only those without a valid sidecar.
+        """
+        if self.package_mirror_enabled:
+            return list(self.vps_packages)
+        mirror_list = [name for name in self.vps_packages if name not in self.remote_sidecars]
+        logger.info(
+            f"PACKAGE_MIRROR=sidecar remote_packages={len(self.vps_packages)} "
+            f"from_sidecars={len(self.vps_packages) - len(mirror_list)} download={len(mirror_list)}"
+        )
+        return mirror_list
+    
+    def _resolve_remote_sidecars(self, inventory):
+        """
+        Collect valid metadata sidecars of the remote packages: from the runner
+        cache, then (if enabled) from the VPS for the ones still missing.
+        """
+        self.remote_sidecars = {}
+        store = get_sidecar_store()
+        if not store.enabled or not self.vps_packages:
+            return
+        sizes = inventory.sizes() if inventory else {}
+        digests = self.remote_state_manifest.digests() if self.remote_state_manifest else {}
+        
+        def load(names):
+            missing = []
+            for name in names:
+                meta = store.load(name, sizes.get(name), digests.get(name))
+                if meta is not None:
+                    self.remote_sidecars[name] = meta
+                else:
+                    missing.append(name)
+            return missing
+        
+        missing = load(self.vps_packages)
+        cached = len(self.remote_sidecars)
+        if missing and self.remote_sidecars_enabled:
+            self.rsync_client.fetch_sidecars([sidecar_name(n) for n in missing], store.cache_dir, SIDECAR_DIRNAME)
+            missing = load(missing)
+        logger.info(
+            f"SIDECAR_REMOTE_COVERAGE packages={len(self.vps_packages)} cached={cached} "
+            f"fetched={len(self.remote_sidecars) - cached} missing={len(missing)}"
+        )
+    
+    def _refresh_sidecars(self):
+        """
+        Make sure every package in output_dir has a sidecar (only new packages are
+        read) and drop sidecars of packages that are neither local nor remote.
         
-        ssh_key_path = "/home/builder/.ssh/id_ed25519"
-        if not os.path.exists(ssh_key_path):
-            logger.warning(f"SSH key not found")
-            return []
+        Reading a package decompresses all of it, so packages are only read when
+        a consumer needs their sidecars: the native DB generator, sidecar-only
+        mode (ENABLE_PACKAGE_MIRROR = False) or REMOTE_METADATA_SIDECARS.
+        """
+        store = get_sidecar_store()
+        if not store.enabled:
+            return
+        local = sorted(p for p in self.output_dir.glob("*.pkg.tar.*") if not p.name.endswith('.sig'))
+        import config
+        needed = (getattr(config, 'DB_GENERATOR', 'repo-add') == "native"
+                  or not self.package_mirror_enabled or self.remote_sidecars_enabled)
+        if needed:
+            _, failed = NativeRepoDbGenerator(getattr(config, 'DB_GENERATOR_WORKERS', None)).collect(local)
+            if failed:
+                logger.warning(f"SIDECAR_REFRESH failed={len(failed)} sample={failed[:5]}")
+        else:
+            logger.info("SIDECAR_REFRESH skipped=1 reason=no_consumer")
+        store.prune({p.name for p in local} | set(self.vps_packages))
+    
+    def _load_vps_state(self, inventory, source: str):
+        """
+        Derive the phase I VPS state (package list, version index) from a remote view.
         
-        ssh_cmd = [
-            "ssh",
-            f"{self.vps_user}@{self.vps_host}",
-            rf'find "{self.remote_dir}" -maxdepth 1 \( -type f -o -type l \) -name "*.sig" -printf "%f\\n" 2>/dev/null || echo "NO_FILES"'
-        ]
+        Args:
+            inventory: RemoteInventory from a listing or the state manifest (None = listing failed)
+            source: 'manifest' or 'scan'
+        """
+        self.vps_inventory = inventory
+        self.remote_state_source = source
         
-        try:
-            result = subprocess.run(
-                ssh_cmd,
-                capture_output=True,
-                text=True,
-                check=False
+        self.vps_packages = inventory.packages() if inventory else []
+        remote_signatures = inventory.signatures() if inventory else []
+        self.vps_files = self.vps_packages + remote_signatures
+        
+        logger.info(f"Found {len(self.vps_packages)} package files and {len(remote_signatures)} signatures on VPS")
+        logger.info(f"REMOTE_STATE_SOURCE={source}")
+        
+        self._resolve_remote_sidecars(inventory)
+        self.version_tracker.build_remote_version_index(
+            self.vps_files, inventory.sizes() if inventory else None, source=source,
+            metadata=self.remote_sidecars)
+        self.package_builder.set_vps_files(self.vps_files)
+    
+    def _build_state_manifest(self, published_files: List[Path],
+                              inventory: Optional[RemoteInventory] = None) -> Optional[RemoteStateManifest]:
+        """
+        Manifest of remote_dir as it will be after promoting published_files.
+        
+        Args:
+            published_files: Files being promoted
+            inventory: View of remote_dir before promotion (default: the phase I view)
+        
+        Returns:
+            RemoteStateManifest, or None when disabled or the phase I view is unknown
+        """
+        inventory = inventory if inventory is not None else self.vps_inventory
+        if not self.use_state_manifest or inventory is None:
+            return None
+        remote_files = {entry.name: (entry.size, entry.mtime) for entry in inventory if entry.is_file}
+        remote_files.update(local_file_stats(published_files))
+        return RemoteStateManifest.build(
+            self.repo_name, remote_files, self.output_dir,
+            previous=self.remote_state_manifest, run_id=self.current_run_id
+        )
+    
+    def _repromote_after_live_change(self, published_files: List[Path]) -> Tuple[bool, Optional[RemoteStateManifest]]:
+        """
+        Re-validate a promotion that found the live database changed under the
+        lock (another run published while this one waited). The promotion is
+        retried against the new live state only if that state has no package
+        this run's database leaves out and still has every package the
+        database lists without uploading it; otherwise it is abandoned and the
+        staging directory kept.
+        
+        Returns:
+            (promotion succeeded, state manifest written with it)
+        """
+        inventory = self.ssh_client.get_inventory(refresh=True)
+        if inventory is None:
+            logger.error("PROMOTE_REVALIDATE_FAIL reason=listing_failed")
+            return False, None
+        live = set(inventory.packages())
+        planned = set(self.vps_inventory.packages()) if self.vps_inventory is not None else set()
+        described = {p.name for p in self.output_dir.glob("*.pkg.tar.*") if not p.name.endswith('.sig')}
+        described.update(self.cleanup_manager.sidecar_packages)
+        uploaded = {p.name for p in published_files}
+        added = sorted(live - planned - described)
+        vanished = sorted(name for name in described if name not in uploaded and name not in live)
+        if added or vanished:
+            logger.error(
+                f"PROMOTE_SUPERSEDED added={len(added)} vanished={len(vanished)} "
+                f"sample={(added + vanished)[:5]} (staging kept, the next run publishes on top)"
             )
-            
-            if result.returncode == 0:
-                files = [f.strip() for f in result.stdout.split('\n') if f.strip() and f.strip() != 'NO_FILES']
-                logger.info(f"Found {len(files)} signature files on remote server")
-                return files
-            else:
-                logger.warning(f"SSH find for signatures returned error")
-                return []
-                
-        except Exception as e:
-            logger.warning(f"SSH command for signatures failed: {e}")
-            return []
+            return False, None
+        
+        logger.info(f"PROMOTE_REVALIDATE_OK live={len(live)} planned={len(planned)} retry=1")
+        self.ssh_client.observe_live_inventory(inventory, force=True)
+        state_manifest = self._build_state_manifest(published_files, inventory)
+        return self.ssh_client.promote_staging(self.current_run_id, state_manifest), state_manifest
+    
+    def _seal_state_manifest(self):
+        """
+        Re-write the remote state manifest from a fresh listing when the live
+        directory no longer matches it (deletions, failed promotion, first run).
+        """
+        if not self.use_state_manifest or self.remote_state_source is None:
+            return
+        if self.state_manifest_current and not self.cleanup_manager.state_manifest_dropped:
+            logger.info("STATE_MANIFEST_SEAL=skip reason=current")
+            return
+        inventory = self.ssh_client.get_inventory()
+        if inventory is None:
+            logger.warning("STATE_MANIFEST_SEAL=fail reason=listing_failed")
+            return
+        remote_files = {entry.name: (entry.size, entry.mtime) for entry in inventory if entry.is_file}
+        manifest = RemoteStateManifest.build(
+            self.repo_name, remote_files, self.output_dir,
+            previous=self.remote_state_manifest, run_id=self.current_run_id
+        )
+        if self.ssh_client.write_state_manifest(manifest):
+            self.state_manifest_current = True
+            self.cleanup_manager.state_manifest_dropped = False
     
     def get_package_lists(self) -> Tuple[List[str], List[str]]:
         """Get package lists from packages.py"""
@@ -403,22 +608,36 @@ class PackageBuilderOrchestrator:
         
         local_packages, aur_packages = self.get_package_lists()
         
-        package_sources = []
-        
+        local_dirs = []
         for pkg in local_packages:
             pkg_dir = self.repo_root / pkg
             if pkg_dir.exists():
-                package_sources.append(str(pkg_dir))
+                local_dirs.append(pkg_dir)
             else:
                 logger.warning(f"Local package directory not found: {pkg}")
         
-        for pkg in aur_packages:
-            package_sources.append(pkg)
-        
-        logger.info(f"Processing {len(package_sources)} package sources...")
-        self.allowlist = ManifestFactory.build_allowlist(package_sources)
+        # Fetch and parse every source exactly once; phases IV and V query this index
+        logger.info(f"Processing {len(local_dirs) + len(aur_packages)} package sources...")
+        import config
+        configure_srcinfo_cache(self.aur_build_dir / getattr(config, 'SRCINFO_CACHE_DIRNAME', '.srcinfo_cache'))
+        mirror_cache = None
+        rpc_client = None
+        if getattr(config, 'ENABLE_AUR_MIRROR_CACHE', True):
+            mirror_cache = AURMirrorCache(self.aur_build_dir / AUR_MIRROR_DIRNAME)
+            if getattr(config, 'ENABLE_AUR_RPC_AUDIT', True):
+                rpc_client = AURRPCClient(cache_file=self.aur_build_dir / ".aur_rpc_cache.json")
+        self.manifest_index = ManifestIndex(
+            self.aur_build_dir, mirror_cache=mirror_cache, rpc_client=rpc_client
+        ).build(local_dirs, aur_packages)
+        
+        for entry in self.manifest_index.entries():
+            if entry.pkg_names:
+                logger.debug(f"Added to desired inventory from {entry.name}: {entry.pkg_names}")
+            else:
+                logger.warning(f"No pkgname found in {entry.name} ({entry.error})")
         
-        self.desired_inventory = self._build_desired_inventory(package_sources)
+        self.allowlist = self.manifest_index.all_pkgnames()
+        self.desired_inventory = set(self.allowlist)
         logger.info(f"Desired inventory package names: {len(self.desired_inventory)}")
         if self.desired_inventory:
             first_ten = list(self.desired_inventory)[:10]
@@ -428,26 +647,6 @@ class PackageBuilderOrchestrator:
         
         return len(self.allowlist) > 0
     
-    def _build_desired_inventory(self, package_sources: List[str]) -> Set[str]:
-        """Build desired inventory set from all PKGBUILDs."""
-        desired_inventory = set()
-        
-        for source in package_sources:
-            pkgbuild_content = ManifestFactory.get_pkgbuild(source)
-            
-            if pkgbuild_content:
-                pkg_names = ManifestFactory.extract_pkgnames(pkgbuild_content)
-                
-                if pkg_names:
-                    desired_inventory.update(pkg_names)
-                    logger.debug(f"Added to desired inventory from {source}: {pkg_names}")
-                else:
-                    logger.warning(f"No pkgname found in {source}")
-            else:
-                logger.warning(f"Could not load PKGBUILD from {source}")
-        
-        return desired_inventory
-    
     def phase_iv_version_audit_and_build(self) -> Tuple[List[str], List[str]]:
         """Phase IV: Version Audit & Build"""
         logger.info("PHASE IV: Version Audit & Build")
@@ -474,6 +673,10 @@ class PackageBuilderOrchestrator:
             aur_packages_with_versions.append((pkg_name, remote_version))
         
         self.version_tracker.set_desired_inventory(self.desired_inventory)
+        self.package_builder.set_manifest_index(self.manifest_index)
+        
+        if self.streaming_publish:
+            self._start_streaming_publish()
         
         built_packages, skipped_packages, failed_packages = (
             self.package_builder.batch_audit_and_build(
@@ -483,6 +686,8 @@ class PackageBuilderOrchestrator:
             )
         )
         
+        get_srcinfo_cache().log_stats()
+        
         self.built_packages = built_packages
         self.skipped_packages = skipped_packages
         self.gate_state['packages_built'] = len(built_packages)
@@ -500,24 +705,84 @@ class PackageBuilderOrchestrator:
         
         return built_packages, skipped_packages
     
+    def _start_streaming_publish(self):
+        """
+        Create this run's staging directory now and start the background uploader
+        that receives every package as soon as it is built and signed.
+        """
+        run_id = self._generate_run_id()
+        if not self.ssh_client.ensure_staging_dir(run_id):
+            logger.warning("STREAMING_PUBLISH=0 reason=staging_dir_failed (phase V uploads everything)")
+            return
+        self.current_run_id = run_id
+        staging_path = f"{self.remote_dir}/.staging/{run_id}"
+        import config
+        self.streaming_uploader = StreamingUploader(
+            lambda paths: self.rsync_client.upload_files(paths, self.output_dir, remote_path=staging_path),
+            retries=getattr(config, 'STREAMING_UPLOAD_RETRIES', 3),
+            backoff=getattr(config, 'STREAMING_UPLOAD_BACKOFF', 10)
+        )
+        self.streaming_uploader.start()
+        self.package_builder.set_publish_hook(self._stream_built_files)
+    
+    def _stream_built_files(self, built_files: List[str]):
+        """Publish hook: queue built packages and their signatures for upload."""
+        if self.streaming_uploader is None:
+            return
+        paths = []
+        for name in built_files:
+            pkg_path = self.output_dir / name
+            paths.append(str(pkg_path))
+            sig_path = self.output_dir / f"{name}.sig"
+            if sig_path.exists():
+                paths.append(str(sig_path))
+        self.streaming_uploader.submit(paths)
+    
+    def _finish_streaming_publish(self, abort: bool = False):
+        """
+        Wait for the background uploader (or stop it) and detach it from the builder.
+        
+        Returns:
+            StreamingUploadResult, or None when streaming publish was not running
+        """
+        if self.streaming_uploader is None:
+            return None
+        self.package_builder.set_publish_hook(None)
+        result = self.streaming_uploader.finish(abort=abort, timeout=60 if abort else None)
+        self.streaming_uploader = None
+        return result
+    
     def _filter_upload_files(self, files: List[Path]) -> List[Path]:
         """
         Filter files to upload by comparing against local mirror of VPS state.
         Only files that are NEW or MODIFIED (compared to mirror) are returned.
         Database and signature files are always included.
         
+        FIX: packages are compared by SHA-256 from the shared hash cache instead of
+        filecmp: the remote digest comes from the state manifest when it has one
+        (only the local file is read), else from the package's metadata sidecar,
+        otherwise from the mirror copy; unchanged files are not re-read at all
+        and a size mismatch needs no hashing.
+        
         Args:
             files: List of Path objects from output_dir
             
         Returns:
             Filtered list of Path objects to upload
         """
-        if not self.mirror_temp_dir.exists():
+        hash_cache = get_hash_cache()
+        remote_digests = {name: meta.sha256sum for name, meta in self.remote_sidecars.items()}
+        if self.remote_state_manifest:
+            remote_digests.update(self.remote_state_manifest.digests())
+        
+        if not self.mirror_temp_dir.exists() and not remote_digests:
             logger.warning("Mirror temp directory does not exist, uploading all files")
             return files
+        remote_sizes = self.vps_inventory.sizes() if self.vps_inventory is not None else {}
         
         filtered = []
         skipped_count = 0
+        compare = []  # (local path, mirror path or None) needing a digest comparison
         
         for file_path in files:
             file_name = file_path.name
@@ -531,20 +796,43 @@ class PackageBuilderOrchestrator:
                 logger.debug(f"UPLOAD_INCLUDE (db/sig): {file_name}")
                 continue
             
-            # Package file: compare with mirror
-            if mirror_path.exists():
-                # Use filecmp for reliable byte-for-byte comparison
-                if filecmp.cmp(file_path, mirror_path, shallow=False):
-                    logger.info(f"UPLOAD_SKIP (identical to mirror): {file_name}")
-                    skipped_count += 1
+            # Package file: compare with the remote digest, else with the mirror
+            if file_name in remote_digests:
+                if remote_sizes.get(file_name) not in (None, file_path.stat().st_size):
+                    logger.info(f"UPLOAD_INCLUDE (modified, size): {file_name}")
+                    filtered.append(file_path)
                 else:
-                    logger.info(f"UPLOAD_INCLUDE (modified): {file_name}")
+                    compare.append((file_path, None))
+            elif mirror_path.exists():
+                if mirror_path.stat().st_size != file_path.stat().st_size:
+                    logger.info(f"UPLOAD_INCLUDE (modified, size): {file_name}")
                     filtered.append(file_path)
+                else:
+                    compare.append((file_path, mirror_path))
             else:
                 logger.info(f"UPLOAD_INCLUDE (new): {file_name}")
                 filtered.append(file_path)
         
+        # One parallel pass over every file that still needs a digest
+        digests = hash_cache.digests(
+            [str(p) for p, _ in compare] + [str(m) for _, m in compare if m is not None]
+        )
+        for file_path, mirror_path in compare:
+            file_name = file_path.name
+            local_digest = digests.get(str(file_path))
+            if mirror_path is None:
+                remote_digest, source = remote_digests[file_name], "remote digest"
+            else:
+                remote_digest, source = digests.get(str(mirror_path)), "mirror"
+            if local_digest is not None and local_digest == remote_digest:
+                logger.info(f"UPLOAD_SKIP (identical to {source}): {file_name}")
+                skipped_count += 1
+            else:
+                logger.info(f"UPLOAD_INCLUDE (modified): {file_name}")
+                filtered.append(file_path)
+        
         logger.info(f"Upload filtering complete: {len(filtered)} files to upload, {skipped_count} skipped (already on VPS)")
+        hash_cache.log_stats()
         return filtered
     
     def phase_v_sign_and_update(self) -> bool:
@@ -574,7 +862,7 @@ class PackageBuilderOrchestrator:
         # ------------------------------------------------------------
         
         local_packages = list(self.output_dir.glob("*.pkg.tar.*"))
-        if not local_packages:
+        if not local_packages and not self.cleanup_manager.sidecar_packages:
             logger.info("No packages to process")
             return True
         
@@ -584,13 +872,15 @@ class PackageBuilderOrchestrator:
         # Step 2: Authoritative cleanup before database generation
         logger.info("Executing authoritative cleanup before database generation...")
         self.cleanup_manager.revalidate_output_dir_before_database(self.allowlist)
+        self._refresh_sidecars()
         
         # Step 3: Generate repository database
         logger.info("Generating repository database...")
-        db_success = self.database_manager.generate_full_database(
+        db_success = self.database_manager.generate_database(
             self.repo_name,
             self.output_dir,
-            self.cleanup_manager
+            self.cleanup_manager,
+            inventory=self.vps_inventory
         )
         self.gate_state['database_success'] = db_success
         
@@ -621,18 +911,26 @@ class PackageBuilderOrchestrator:
             self._run_safe_operations_only()
             return False
         
+        # NEW: packages streamed during the build are already in staging (database went on meanwhile)
+        streamed = self._finish_streaming_publish()
+        
         # 5b: Filter files to upload (only new/modified compared to mirror)
         files_to_upload = self._filter_upload_files(files_to_upload)
         if not files_to_upload:
             logger.info("No new or modified files to upload after diffing against mirror")
+            if streamed is not None:
+                # Nothing to publish: drop the streaming staging directory (its files match the VPS)
+                self._cleanup_staging_dir()
+                self.current_run_id = None
             self.gate_state['upload_success'] = True
             self.gate_state['up3_success'] = True
             self.gate_state['promotion_success'] = True
             self._run_safe_operations_only()
             return True
         
-        # 5c: Generate unique run ID and staging path
-        self.current_run_id = self._generate_run_id()
+        # 5c: Generate unique run ID and staging path (streaming publish already has one)
+        if not self.current_run_id:
+            self.current_run_id = self._generate_run_id()
         staging_path = f"{self.remote_dir}/.staging/{self.current_run_id}"
         logger.info(f"STAGING_RUN_ID={self.current_run_id} path={staging_path}")
         
@@ -643,13 +941,26 @@ class PackageBuilderOrchestrator:
             self._run_safe_operations_only()
             return False
         
-        # 5e: Upload filtered files to staging directory
-        upload_success = self.rsync_client.upload_files(
-            [str(f) for f in files_to_upload],
-            self.output_dir,
-            self.cleanup_manager,
-            remote_path=staging_path
-        )
+        # 5e: Upload filtered files to staging directory (minus what was streamed and is unchanged)
+        pending_upload = files_to_upload
+        upload_success = True
+        if streamed is not None:
+            pending_upload = [f for f in files_to_upload if not streamed.is_current(f)]
+            final_names = {f.name for f in files_to_upload}
+            extras = sorted(name for name in streamed.staged if name not in final_names)
+            logger.info(
+                f"STREAMING_PUBLISH_REUSED={len(files_to_upload) - len(pending_upload)} "
+                f"remaining={len(pending_upload)} discard={len(extras)}"
+            )
+            # Streamed files that are not part of the final publish must not be promoted
+            upload_success = self.ssh_client.remove_staged_files(self.current_run_id, extras)
+        if upload_success and pending_upload:
+            upload_success = self.rsync_client.upload_files(
+                [str(f) for f in pending_upload],
+                self.output_dir,
+                self.cleanup_manager,
+                remote_path=staging_path
+            )
         
         # 5f: PRE‑PROMOTE VERIFICATION (P0)
         promotion_success = False
@@ -668,11 +979,22 @@ class PackageBuilderOrchestrator:
             
             # 5g: Promote staging to live (with remote lock)
             logger.info(f"Promoting staging -> live...")
-            promotion_success = self.ssh_client.promote_staging(self.current_run_id)
+            state_manifest = self._build_state_manifest(files_to_upload)
+            promotion_success = self.ssh_client.promote_staging(self.current_run_id, state_manifest)
+            if not promotion_success and self.ssh_client.last_promote_status == 'live_changed':
+                # NEW: another run published while this one waited for the lock
+                promotion_success, state_manifest = self._repromote_after_live_change(files_to_upload)
             self.gate_state['promotion_success'] = promotion_success
+            self.state_manifest_current = promotion_success and state_manifest is not None
             
             if not promotion_success:
                 logger.error(f"Staging promotion FAILED. Staging directory left at {staging_path} for debugging.")
+            elif self.remote_sidecars_enabled and get_sidecar_store().enabled:
+                # NEW: publish the sidecars of the promoted packages (best effort)
+                self.rsync_client.push_sidecars(
+                    [sidecar_name(f.name) for f in files_to_upload if '.pkg.tar.' in f.name and not f.name.endswith('.sig')],
+                    get_sidecar_store().cache_dir, SIDECAR_DIRNAME
+                )
         else:
             logger.error("Upload to staging failed. Promotion aborted.")
         
@@ -705,82 +1027,17 @@ class PackageBuilderOrchestrator:
         else:
             logger.warning("Skipping permission normalization due to upload/promotion failure")
         
-        # 5k: EXTRAS CLASSIFICATION (P0) - Log detailed summary of remote files not expected
-        # Get current remote files list after promotion (or after upload if promotion failed)
-        remote_files_after = self.ssh_client.list_remote_files(self.remote_dir)
-        expected_basenames = {f.name for f in files_to_upload}
-        extra_files = [f for f in remote_files_after if f not in expected_basenames]
-        
-        if extra_files:
-            logger.info(f"EXTRAS_CLASSIFICATION: found {len(extra_files)} extra files on VPS")
-            # Classify extras
-            db_artifacts = []
-            meta_files = []
-            pkg_artifacts = []
-            unknown = []
-            
-            repo_prefix = self.repo_name
-            for fname in extra_files:
-                if fname.startswith(f"{repo_prefix}.db") or fname.startswith(f"{repo_prefix}.files"):
-                    db_artifacts.append(fname)
-                elif fname.endswith(('.pub', '.key')):
-                    meta_files.append(fname)
-                elif fname.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                    pkg_artifacts.append(fname)
-                else:
-                    unknown.append(fname)
-            
-            # Log counts and samples
-            logger.info(f"EXTRAS_CATEGORIES: DB/FILES={len(db_artifacts)}, METADATA={len(meta_files)}, PACKAGES={len(pkg_artifacts)}, UNKNOWN={len(unknown)}")
-            if db_artifacts:
-                logger.info(f"EXTRAS_DB_SAMPLE: {db_artifacts[:5]}")
-            if meta_files:
-                logger.info(f"EXTRAS_METADATA_SAMPLE: {meta_files[:5]}")
-            if pkg_artifacts:
-                logger.info(f"EXTRAS_PKG_SAMPLE: {pkg_artifacts[:5]}")
-            if unknown:
-                logger.info(f"EXTRAS_UNKNOWN_SAMPLE: {unknown[:5]}")
-        else:
-            logger.info("EXTRAS_CLASSIFICATION: no extra files found on VPS")
-        
-        # 5l: VPS HYGIENE (if enabled)
-        try:
-            import config
-            if getattr(config, 'ENABLE_VPS_HYGIENE', False):
-                logger.info("VPS_HYGIENE: starting safe VPS cleanup...")
-                dry_run = getattr(config, 'VPS_HYGIENE_DRY_RUN', True)
-                keep_latest = getattr(config, 'KEEP_LATEST_VERSIONS', 1)
-                keep_meta = getattr(config, 'KEEP_VPS_EXTRA_METADATA', True)
-                # New safety flag
-                enable_orphan_sig_delete = getattr(config, 'ENABLE_VPS_ORPHAN_SIG_DELETE', False)
-                
-                self.cleanup_manager.run_vps_hygiene(
-                    remote_dir=self.remote_dir,
-                    repo_name=self.repo_name,
-                    desired_inventory=self.desired_inventory,
-                    keep_latest_versions=keep_latest,
-                    dry_run=dry_run,
-                    keep_extra_metadata=keep_meta,
-                    enable_orphan_sig_delete=enable_orphan_sig_delete   # NEW
-                )
-            else:
-                logger.info("VPS_HYGIENE: disabled by config")
-        except Exception as e:
-            logger.warning(f"VPS_HYGIENE: exception during cleanup (non-fatal): {e}")
-        
-        # Step 6: VPS orphan signature sweep (ALWAYS RUN - SAFE)
-        logger.info("Running VPS orphan signature sweep (safe operation)...")
-        package_count, signature_count, orphaned_count = self.cleanup_manager.cleanup_vps_orphaned_signatures()
-        logger.info(f"VPS orphan sweep complete: {package_count} packages, {signature_count} signatures, deleted {orphaned_count} orphans")
-        
-        # Step 7: Evaluate gates and conditionally run VPS version prune
+        # 5k: ONE-PASS REMOTE CLEANUP - extras classification, hygiene, orphan signatures and
+        # (when all gates pass) the strict version prune, planned on one listing and deleted at once
         version_prune_allowed = self._evaluate_gates()
-        
         if version_prune_allowed:
-            logger.info("All gates passed - running STRICT VPS version prune...")
-            self.cleanup_manager.version_prune_vps(self.version_tracker, self.desired_inventory)
+            logger.info("All gates passed - STRICT VPS version prune is part of the cleanup plan")
         else:
-            logger.info("Gates blocked VPS version prune")
+            logger.info("Gates blocked VPS version prune (planned candidates are only reported)")
+        self._run_remote_cleanup(
+            prune_versions=version_prune_allowed,
+            published={f.name for f in files_to_upload}
+        )
         
         # Step 8: Run Hokibot action (non-blocking)
         if self.build_tracker.hokibot_data:
@@ -799,8 +1056,36 @@ class PackageBuilderOrchestrator:
     def _run_safe_operations_only(self):
         """Run only safe operations when gates block destructive cleanup."""
         logger.info("Running safe operations only (orphan signature sweep)...")
-        package_count, signature_count, orphaned_count = self.cleanup_manager.cleanup_vps_orphaned_signatures()
-        logger.info(f"Safe operations complete: {package_count} packages, {signature_count} signatures, deleted {orphaned_count} orphans")
+        self._run_remote_cleanup(prune_versions=False, hygiene=False)
+    
+    def _run_remote_cleanup(self, prune_versions: bool, hygiene: Optional[bool] = None,
+                            published: Optional[Set[str]] = None):
+        """
+        Plan and execute the remote cleanup once (see CleanupManager.run_remote_cleanup).
+        
+        Args:
+            prune_versions: Whether the strict version prune may delete
+            hygiene: Override ENABLE_VPS_HYGIENE (None = config)
+            published: Basenames published this run
+        """
+        import config
+        policy = CleanupPolicy.from_config(prune_versions=prune_versions, hygiene=hygiene)
+        try:
+            plan = self.cleanup_manager.run_remote_cleanup(
+                policy,
+                desired_inventory=self.desired_inventory,
+                version_tracker=self.version_tracker,
+                published=published,
+                report_path=self.aur_build_dir / getattr(config, 'CLEANUP_REPORT_FILENAME', 'cleanup_report.json')
+            )
+        except Exception as e:
+            logger.warning(f"REMOTE_CLEANUP: exception during cleanup (non-fatal): {e}")
+            return
+        if plan is not None:
+            logger.info(
+                f"REMOTE_CLEANUP_DONE delete={len(plan.deletions)} blocked={len(plan.blocked)} "
+                f"deleted={plan.result['deleted']} failed={len(plan.result['failed'])}"
+            )
     
     def _cleanup_staging_dir(self):
         """Fail-safe cleanup of the staging directory for this run if it still exists."""
@@ -810,9 +1095,8 @@ class PackageBuilderOrchestrator:
             if not self.gate_state.get('promotion_success', False):
                 staging_path = f"{self.remote_dir}/.staging/{self.current_run_id}"
                 rm_cmd = f"rm -rf {staging_path}"
-                ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", rm_cmd]
                 try:
-                    subprocess.run(ssh_cmd, capture_output=True, timeout=30, check=False)
+                    self.ssh_connection.run_ssh(rm_cmd, "cleanup_staging_dir", timeout=30)
                     logger.info(f"Staging directory {self.current_run_id} removed during cleanup.")
                 except Exception as e:
                     logger.warning(f"Could not remove staging directory {self.current_run_id}: {e}")
@@ -838,7 +1122,7 @@ class PackageBuilderOrchestrator:
             built_packages, skipped_packages = self.phase_iv_version_audit_and_build()
             
             # Phase V: Sign and Update (with staging publish)
-            if built_packages or list(self.output_dir.glob("*.pkg.tar.*")):
+            if built_packages or list(self.output_dir.glob("*.pkg.tar.*")) or self.cleanup_manager.sidecar_packages:
                 if not self.phase_v_sign_and_update():
                     logger.error("Phase V failed or gates blocked operations")
                     return 1
@@ -883,8 +1167,23 @@ class PackageBuilderOrchestrator:
             # Cleanup GPG
             if hasattr(self, 'gpg_handler'):
                 self.gpg_handler.cleanup()
+            # Stop a still-running streaming upload before its staging directory is removed
+            self._finish_streaming_publish(abort=True)
             # Fail-safe staging cleanup
             self._cleanup_staging_dir()
+            # Leave a state manifest that matches the live directory for the next run
+            try:
+                self._seal_state_manifest()
+            except Exception as e:
+                logger.warning(f"STATE_MANIFEST_SEAL=fail error={e}")
+            # Persist file digests for the next run
+            get_hash_cache().log_stats()
+            get_hash_cache().save()
+            get_sidecar_store().log_stats()
+            # Remote call summary and shared SSH connection teardown
+            if hasattr(self, 'ssh_connection'):
+                self.ssh_connection.log_stats()
+                self.ssh_connection.close()
 
 
 def main():
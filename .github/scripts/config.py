@@ -21,6 +21,22 @@ SSH_OPTIONS = [
     "-o", "BatchMode=yes"
 ]
 
+# SSH connection multiplexing
+# One ControlMaster connection to the VPS is opened per run and shared by every
+# ssh/rsync/scp call (ControlPath in a private temp dir). The master exits
+# SSH_CONTROL_PERSIST seconds after its last client or when the run ends.
+# False = a separate SSH handshake per remote call.
+ENABLE_SSH_MULTIPLEXING = True
+SSH_CONTROL_PERSIST = 600
+
+# Remote state manifest
+# Publishing writes <repo>.state.json next to the repository database (filename,
+# size, mtime, sha256, version, signature presence), atomically at the end of
+# staging promotion and again after any VPS deletion. Phase I downloads it
+# instead of listing the directory; a missing or stale manifest (database
+# size/mtime mismatch) falls back to the listing.
+ENABLE_REMOTE_STATE_MANIFEST = True
+
 # Build timeouts (seconds)
 MAKEPKG_TIMEOUT = {
     "default": 7200,        # 1 hour for normal packages
@@ -45,6 +61,71 @@ REQUIRED_BUILD_TOOLS = [
 
 # Temporary directories (runtime-required, /tmp is POSIX invariant)
 MIRROR_TEMP_DIR = "/tmp/repo_mirror"
+# How mirrored packages are placed into the output directory:
+# "auto" = reflink (copy-on-write clone) -> hardlink -> copy, whichever the
+# filesystems support first; "reflink"/"hardlink" = that method, else copy;
+# "copy" = always a full copy. Rebuilt packages replace hardlinks, never write through them.
+MIRROR_MATERIALIZE_MODE = "auto"
+
+# Mirror download: missing packages are fetched by MIRROR_DOWNLOAD_STREAMS concurrent
+# rsync processes with size-balanced file lists (no -z, packages are compressed).
+# Files that did not arrive (missing or wrong size) are retried up to
+# MIRROR_DOWNLOAD_RETRIES more rounds before the mirror sync fails.
+MIRROR_DOWNLOAD_STREAMS = 4
+MIRROR_DOWNLOAD_RETRIES = 2
+
+# Repository database updates
+# "incremental" = download the published <repo>.db.tar.gz/.files.tar.gz and apply
+# repo-remove/repo-add for the packages that changed; "full" = repo-add over every
+# local package. A full rebuild also runs every DB_FULL_REBUILD_EVERY-th workflow run
+# (GITHUB_RUN_NUMBER, 0 = never), on demand (FORCE_FULL_DB_REBUILD=1), when the
+# published database is missing, and whenever the incremental result does not list
+# exactly the local package set.
+DB_UPDATE_MODE = "incremental"
+DB_FULL_REBUILD_EVERY = 20
+# Database generator: "repo-add" (pacman's script) or "native" (in-process, reads every
+# package once across DB_GENERATOR_WORKERS processes, checksums in the same pass, and
+# writes the same desc/files entries). Keep "repo-add" until
+# `python -m modules.repo.native_repo_db <pkgdir>` reports no differing members and
+# pacman accepts the result on the runner.
+DB_GENERATOR = "repo-add"
+DB_GENERATOR_WORKERS = None  # None = CPU count (max 8)
+# Package metadata sidecars: .PKGINFO, file list, size and checksums of every package,
+# kept as build_aur/.pkgmeta/<package>.json (cached with build_aur). With
+# ENABLE_PACKAGE_MIRROR = False only remote packages without a valid sidecar are
+# downloaded; database generation (native generator), pre-database cleanup, the remote
+# version index and the upload diff use the sidecars of the rest.
+# REMOTE_METADATA_SIDECARS also publishes sidecars to <REMOTE_DIR>/.pkgmeta/ (and removes
+# them with their packages), so a cold runner cache does not download every package.
+ENABLE_METADATA_SIDECARS = True
+ENABLE_PACKAGE_MIRROR = True
+REMOTE_METADATA_SIDECARS = False
+# Streaming publish: each package is uploaded to the run's staging directory by a
+# background thread as soon as it is built and signed, while later packages build.
+# Phase V then uploads only the database and anything not streamed (or changed since).
+# A failed batch is retried STREAMING_UPLOAD_RETRIES times, waiting
+# STREAMING_UPLOAD_BACKOFF seconds (doubling) in between; what still fails is
+# uploaded by phase V as before.
+ENABLE_STREAMING_PUBLISH = True
+STREAMING_UPLOAD_RETRIES = 3
+STREAMING_UPLOAD_BACKOFF = 10
+# Snapshot publish: REMOTE_DIR becomes a symlink to REMOTE_DIR.snapshots/<run_id>.
+# Each publish hardlinks the live snapshot into a new directory, adds the staged
+# files and goes live with one atomic symlink rename; the SNAPSHOT_KEEP previous
+# snapshots stay for instant rollback
+# (python -m modules.vps.snapshot_publish list | rollback [SNAPSHOT_ID]).
+# Requires a writable parent of REMOTE_DIR and a web server that follows symlinks.
+ENABLE_SNAPSHOT_PUBLISH = False
+SNAPSHOT_KEEP = 3
+# Promotion lock: a lease (owner run_id + expiry) in REMOTE_DIR/.staging/.promote.lock.
+# A run finding it held waits up to PROMOTE_LOCK_WAIT seconds, retrying after
+# PROMOTE_LOCK_BACKOFF seconds (doubling, at most 2 minutes); a lease older than
+# PROMOTE_LOCK_LEASE seconds is left by a crashed runner and is stolen.
+# Under the lock the live database must still be the one seen in phase I;
+# otherwise the new live state is re-validated before promoting again.
+PROMOTE_LOCK_LEASE = 300
+PROMOTE_LOCK_WAIT = 1800
+PROMOTE_LOCK_BACKOFF = 15
 SYNC_CLONE_DIR = "/tmp/repo-builder-gitclone"  # FIX: generic, no repo name
 
 # AUR configuration
@@ -56,6 +137,47 @@ AUR_URLS = [
 # Build directory names
 AUR_BUILD_DIR = "build_aur"
 
+# Persistent AUR mirror cache
+# Keep a bare git mirror of every AUR package in AUR_BUILD_DIR/.mirrors (cached by
+# the workflow) and update it with `git fetch` instead of cloning each run. Build
+# checkouts are worktrees of the mirror; packages whose HEAD did not move reuse the
+# manifest parsed on a previous run. False = fresh shallow clone every run.
+ENABLE_AUR_MIRROR_CACHE = True
+
+# Parsed .SRCINFO cache (AUR_BUILD_DIR/<name>), keyed by the SHA-256 of PKGBUILD plus
+# auxiliary files. makepkg --printsrcinfo only runs for PKGBUILDs not seen before.
+SRCINFO_CACHE_DIRNAME = ".srcinfo_cache"
+
+# File digest cache (AUR_BUILD_DIR/<name>): SHA-256 keyed by path, size, mtime_ns and
+# inode, so unchanged packages are never re-read. Serves the upload diff and the remote
+# state manifest. Cache misses are hashed by HASH_WORKERS threads (None = CPU count, max 8).
+HASH_CACHE_FILENAME = ".hash_cache.json"
+HASH_WORKERS = None
+
+# Batched AUR RPC metadata
+# One multi-info request (per AUR_RPC_BATCH_SIZE names) fetches the AUR version of
+# every AUR package. A package whose AUR version equals the manifest recorded in the
+# mirror cache is neither fetched nor checked out; it is only cloned if the audit
+# decides to build it. VCS packages (-git, -svn, ...) always take the checkout path.
+# AUR_RPC_URL may point at a local stand-in server; results are cached for
+# AUR_RPC_CACHE_TTL seconds in AUR_BUILD_DIR/.aur_rpc_cache.json.
+ENABLE_AUR_RPC_AUDIT = True
+AUR_RPC_URL = "https://aur.archlinux.org/rpc/v5/info"
+AUR_RPC_CACHE_TTL = 900
+AUR_RPC_BATCH_SIZE = 100
+
+# Parallel build scheduling
+# Number of packages built concurrently. Packages only wait for other listed
+# packages they depend on (.SRCINFO depends/makedepends/checkdepends).
+# 1 = strictly serial builds with per-package dependency sessions.
+# >1 = one shared dependency session for the whole batch (cleaned up at the end);
+#      packages touching CONFLICT_REMOVE_ALLOWLIST still build alone.
+BUILD_MAX_WORKERS = 1
+
+# Number of packages audited concurrently before any build starts
+# (AUR clone, .SRCINFO parse, vercmp, git ls-remote for VCS packages).
+AUDIT_MAX_WORKERS = 8
+
 # GitHub repository for synchronization (fork‑safe, fallback to env)
 GITHUB_REPO = os.getenv("GITHUB_REPOSITORY", "")  # FIX: no hardcoded owner/repo
 
@@ -113,3 +235,11 @@ KEEP_VPS_EXTRA_METADATA = True
 # are allowed when dry_run=False. Old‑version pruning remains dry‑run only
 # regardless of this flag.
 ENABLE_VPS_ORPHAN_SIG_DELETE = True
+
+# Phase V plans orphan signatures, hygiene and the strict version prune on one
+# listing (modules/repo/cleanup_planner.py) and deletes in one round trip.
+# VPS_HYGIENE_DRY_RUN and ENABLE_VPS_ORPHAN_SIG_DELETE apply to the orphan
+# signature rule of that plan as well; the version prune follows the phase V gates.
+# The plan (reason code per file, blocked candidates, result) is written to
+# AUR_BUILD_DIR/CLEANUP_REPORT_FILENAME; the log carries CLEANUP_REPORT_SUMMARY counts.
+CLEANUP_REPORT_FILENAME = "cleanup_report.json"
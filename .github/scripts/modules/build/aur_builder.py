@@ -9,7 +9,7 @@ from typing import List, Optional
 
 import config
 from modules.common.shell_executor import ShellExecutor
-from modules.common.dependency_installer import DependencyInstaller
+from modules.common.dependency_installer import DependencyInstaller, PACMAN_LOCK
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +17,12 @@ logger = logging.getLogger(__name__)
 class AURBuilder:
     """Handles AUR package building and dependency resolution"""
     
-    def __init__(self, debug_mode: bool = False):
+    def __init__(self, debug_mode: bool = False, dependency_installer: Optional[DependencyInstaller] = None):
         self.debug_mode = debug_mode
         self._pacman_initialized = False
         self.shell_executor = ShellExecutor(debug_mode=debug_mode)
-        self.dependency_installer = DependencyInstaller(self.shell_executor, debug_mode)
+        # NEW: may be shared with LocalBuilder so both see the same dependency session
+        self.dependency_installer = dependency_installer or DependencyInstaller(self.shell_executor, debug_mode)
     
     def _initialize_pacman_database(self) -> bool:
         """
@@ -85,18 +86,19 @@ class AURBuilder:
         if runtime_depends:
             logger.info(f"Runtime depends: {runtime_depends} (will be installed)")
         
-        # REQUIRED PRECONDITION: Initialize pacman database FIRST
-        if not self._initialize_pacman_database():
-            logger.error("❌ Failed to initialize pacman database")
-            # Try to continue anyway, as yay might work
-        
-        # CRITICAL FIX: Update pacman-key database first
-        print("🔄 Updating pacman-key database...")
-        cmd = "sudo pacman-key --updatedb"
-        logger.info("SHELL_EXECUTOR_USED=1")
-        result = self.shell_executor.run_command(cmd, log_cmd=True, check=False, timeout=300)
-        if result.returncode != 0:
-            logger.warning(f"⚠️ pacman-key --updatedb warning: {result.stderr[:200]}")
+        with PACMAN_LOCK:
+            # REQUIRED PRECONDITION: Initialize pacman database FIRST
+            if not self._initialize_pacman_database():
+                logger.error("❌ Failed to initialize pacman database")
+                # Try to continue anyway, as yay might work
+            
+            # CRITICAL FIX: Update pacman-key database first
+            print("🔄 Updating pacman-key database...")
+            cmd = "sudo pacman-key --updatedb"
+            logger.info("SHELL_EXECUTOR_USED=1")
+            result = self.shell_executor.run_command(cmd, log_cmd=True, check=False, timeout=300)
+            if result.returncode != 0:
+                logger.warning(f"⚠️ pacman-key --updatedb warning: {result.stderr[:200]}")
         
         # Install build dependencies with AUR fallback enabled
         return self.dependency_installer.install_packages(
@@ -0,0 +1,101 @@
+"""
+Build Plan Module - Result of the audit stage (what to build and why)
+
+The audit stage evaluates every package before any build starts and records
+one PackageAudit per package. The build stage then only executes the entries
+whose decision requires a build.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Audit decisions
+DECISION_BUILD = "BUILD"   # Source is newer than remote (or not on remote yet)
+DECISION_FORCE = "FORCE"   # Rebuild required although versions match (incomplete remote, forced check)
+DECISION_SKIP = "SKIP"     # Remote is up to date
+DECISION_ERROR = "ERROR"   # Audit itself failed (clone, .SRCINFO parse)
+
+
+@dataclass
+class PackageAudit:
+    """Audit outcome for one PKGBUILD (local directory or AUR package)"""
+    name: str
+    kind: str  # "local" or "aur"
+    source_dir: Optional[Path]
+    remote_version: Optional[str]
+    decision: str = DECISION_ERROR
+    reason: str = ""
+    pkgver: Optional[str] = None
+    pkgrel: Optional[str] = None
+    epoch: Optional[str] = None
+    source_version: Optional[str] = None
+    pkg_names: List[str] = field(default_factory=list)
+    makedepends: List[str] = field(default_factory=list)
+    checkdepends: List[str] = field(default_factory=list)
+    runtime_depends: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def needs_build(self) -> bool:
+        """True if the build stage has to run this package."""
+        return self.decision in (DECISION_BUILD, DECISION_FORCE)
+
+    @property
+    def depends(self) -> List[str]:
+        """All dependency entries relevant for scheduling."""
+        return self.makedepends + self.checkdepends + self.runtime_depends
+
+    @property
+    def metadata(self) -> Dict[str, object]:
+        """Version metadata in the shape returned by audit_and_build_* methods."""
+        return {
+            "pkgver": self.pkgver,
+            "pkgrel": self.pkgrel,
+            "epoch": self.epoch,
+            "pkgnames": self.pkg_names
+        }
+
+
+@dataclass
+class BuildPlan:
+    """Ordered collection of package audits"""
+    audits: List[PackageAudit] = field(default_factory=list)
+    duration: float = 0.0
+
+    def to_build(self) -> List[PackageAudit]:
+        """Audits whose decision is BUILD or FORCE."""
+        return [a for a in self.audits if a.needs_build]
+
+    def skipped(self) -> List[PackageAudit]:
+        """Audits whose decision is SKIP."""
+        return [a for a in self.audits if a.decision == DECISION_SKIP]
+
+    def errors(self) -> List[PackageAudit]:
+        """Audits that failed."""
+        return [a for a in self.audits if a.decision == DECISION_ERROR]
+
+    def summary(self) -> Dict[str, int]:
+        """Count of audits per decision."""
+        counts = {DECISION_BUILD: 0, DECISION_FORCE: 0, DECISION_SKIP: 0, DECISION_ERROR: 0}
+        for audit in self.audits:
+            counts[audit.decision] = counts.get(audit.decision, 0) + 1
+        return counts
+
+    def log(self):
+        """Log one grep-friendly line per package plus a summary line."""
+        for audit in self.audits:
+            logger.info(
+                f"BUILD_PLAN pkg={audit.name} kind={audit.kind} decision={audit.decision} "
+                f"reason={audit.reason} source_ver={audit.source_version or 'NONE'} "
+                f"remote_ver={audit.remote_version or 'NONE'}"
+            )
+        counts = self.summary()
+        logger.info(
+            f"BUILD_PLAN_SUMMARY total={len(self.audits)} build={counts[DECISION_BUILD]} "
+            f"force={counts[DECISION_FORCE]} skip={counts[DECISION_SKIP]} "
+            f"error={counts[DECISION_ERROR]} audit_time={self.duration:.1f}s"
+        )
@@ -0,0 +1,223 @@
+"""
+Build Scheduler Module - Dependency-aware parallel execution of package builds
+
+Packages are scheduled as nodes of a dependency graph built from the
+.SRCINFO depends/makedepends/checkdepends of every listed package. Only
+dependencies that are satisfied by another listed package create an edge;
+everything else (official repos, AUR packages we don't build) is ignored.
+Independent nodes run concurrently on a bounded worker pool. Exclusive nodes
+(e.g. builds whose dependencies may have pacman remove a conflicting
+package) run alone: the pool drains before they start and nothing else
+starts while they run.
+"""
+
+import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Version constraint / description suffix of a dependency entry, e.g. "lua>=5.3" or "foo: desc"
+_DEP_SUFFIX_RE = re.compile(r'[<>=:].*$')
+
+
+def normalize_dependency_name(dep: str) -> str:
+    """
+    Strip version constraints from a dependency entry.
+
+    Args:
+        dep: Dependency string as found in .SRCINFO (e.g. "lua-lgi-git>=0.9")
+
+    Returns:
+        Bare package name (e.g. "lua-lgi-git")
+    """
+    return _DEP_SUFFIX_RE.sub('', dep.strip())
+
+
+@dataclass
+class BuildNode:
+    """A single schedulable build (one PKGBUILD, possibly producing split packages)"""
+    name: str
+    provides: Set[str] = field(default_factory=set)
+    depends: Set[str] = field(default_factory=set)
+    payload: Any = None
+    order: int = 0
+    exclusive: bool = False
+
+
+@dataclass
+class NodeResult:
+    """Outcome of running a node's task"""
+    name: str
+    ok: bool
+    value: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    failed_dependencies: List[str] = field(default_factory=list)
+
+
+class BuildScheduler:
+    """
+    Runs build nodes in dependency order on a worker pool.
+
+    A node becomes ready once every in-repo dependency has finished. A failed
+    dependency does not block its dependents: they are released like any other
+    finished node (the dependency may still be satisfied from the mirror or the
+    AUR), and the failure is recorded on the dependent's result.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        """
+        Initialize BuildScheduler.
+
+        Args:
+            max_workers: Maximum number of concurrently running nodes (>= 1)
+        """
+        self.max_workers = max(1, int(max_workers or 1))
+        self._nodes: Dict[str, BuildNode] = {}
+
+    def add_node(self, name: str, provides: Optional[List[str]] = None,
+                 depends: Optional[List[str]] = None, payload: Any = None,
+                 exclusive: bool = False) -> BuildNode:
+        """
+        Register a node.
+
+        Args:
+            name: Unique node name (PKGBUILD / AUR package name)
+            provides: Package names produced by the node (pkgname entries)
+            depends: Raw dependency entries (version constraints are stripped)
+            payload: Opaque value handed to the task function
+            exclusive: Run with no other node running concurrently
+
+        Returns:
+            The created BuildNode
+        """
+        if name in self._nodes:
+            logger.warning(f"SCHED_DUPLICATE_NODE name={name} (keeping first)")
+            return self._nodes[name]
+
+        node = BuildNode(
+            name=name,
+            provides={name, *(provides or [])},
+            depends={normalize_dependency_name(d) for d in (depends or []) if d and d.strip()},
+            payload=payload,
+            order=len(self._nodes),
+            exclusive=exclusive
+        )
+        self._nodes[name] = node
+        return node
+
+    def resolve_edges(self) -> Dict[str, Set[str]]:
+        """
+        Map every node to the set of other nodes it depends on.
+
+        Returns:
+            Dict of node name -> set of in-repo dependency node names
+        """
+        provider_of: Dict[str, str] = {}
+        for node in sorted(self._nodes.values(), key=lambda n: n.order):
+            for provided in node.provides:
+                provider_of.setdefault(provided, node.name)
+
+        edges: Dict[str, Set[str]] = {}
+        for node in self._nodes.values():
+            edges[node.name] = {
+                provider_of[dep] for dep in node.depends
+                if dep in provider_of and provider_of[dep] != node.name
+            }
+        return edges
+
+    def run(self, task: Callable[[BuildNode], Any],
+            is_success: Optional[Callable[[Any], bool]] = None) -> Dict[str, NodeResult]:
+        """
+        Execute all nodes.
+
+        Args:
+            task: Callable invoked with the BuildNode; its return value is stored in the result
+            is_success: Optional predicate on the task return value (default: always True
+                        unless the task raised)
+
+        Returns:
+            Dict of node name -> NodeResult for every registered node, in declaration order
+        """
+        edges = self.resolve_edges()
+        dependents: Dict[str, Set[str]] = {name: set() for name in self._nodes}
+        for name, deps in edges.items():
+            for dep in deps:
+                dependents[dep].add(name)
+
+        edge_count = sum(len(d) for d in edges.values())
+        logger.info(f"SCHED_GRAPH nodes={len(self._nodes)} edges={edge_count} workers={self.max_workers}")
+        for name in sorted(edges, key=lambda n: self._nodes[n].order):
+            if edges[name]:
+                logger.info(f"SCHED_EDGE pkg={name} after={','.join(sorted(edges[name]))}")
+
+        pending: Dict[str, Set[str]] = {name: set(deps) for name, deps in edges.items()}
+        results: Dict[str, NodeResult] = {}
+        failed: Set[str] = set()
+
+        def _ready() -> List[str]:
+            names = [n for n, deps in pending.items() if not deps]
+            return sorted(names, key=lambda n: self._nodes[n].order)
+
+        def _execute(node: BuildNode) -> NodeResult:
+            start = time.monotonic()
+            try:
+                value = task(node)
+                ok = is_success(value) if is_success else True
+                return NodeResult(name=node.name, ok=ok, value=value,
+                                  duration=time.monotonic() - start)
+            except Exception as e:
+                logger.error(f"SCHED_TASK_EXCEPTION pkg={node.name} error={e}")
+                return NodeResult(name=node.name, ok=False, error=str(e),
+                                  duration=time.monotonic() - start)
+
+        run_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="build") as pool:
+            running = {}
+            while pending or running:
+                ready = _ready()
+                if not ready and not running and pending:
+                    # Dependency cycle: release the earliest declared node to make progress
+                    victim = min(pending, key=lambda n: self._nodes[n].order)
+                    logger.warning(f"SCHED_CYCLE_BREAK pkg={victim} waiting_on={','.join(sorted(pending[victim]))}")
+                    pending[victim] = set()
+                    ready = [victim]
+
+                for name in ready:
+                    if len(running) >= self.max_workers:
+                        break
+                    if any(self._nodes[n].exclusive for n in running.values()):
+                        break
+                    if self._nodes[name].exclusive and running:
+                        # Drain the pool; later nodes wait so the exclusive one cannot starve
+                        break
+                    del pending[name]
+                    logger.info(f"SCHED_START pkg={name} running={len(running) + 1}"
+                                + (" exclusive=1" if self._nodes[name].exclusive else ""))
+                    running[pool.submit(_execute, self._nodes[name])] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    result.failed_dependencies = sorted(edges[name] & failed)
+                    results[name] = result
+                    if not result.ok:
+                        failed.add(name)
+                    logger.info(f"SCHED_DONE pkg={name} ok={int(result.ok)} duration={result.duration:.1f}s")
+                    for dependent in dependents[name]:
+                        if dependent in pending:
+                            pending[dependent].discard(name)
+                            if not result.ok:
+                                logger.warning(f"SCHED_DEP_FAILED pkg={dependent} dependency={name} (continuing)")
+
+        logger.info(f"SCHED_COMPLETE nodes={len(results)} failed={len(failed)} elapsed={time.monotonic() - run_start:.1f}s")
+        # Report in declaration order, independent of completion order
+        return {name: results[name] for name in self._nodes if name in results}
@@ -3,12 +3,19 @@ import subprocess
 import shutil
 import tempfile
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Set
 import logging
 import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
 
 # Import required modules
-from modules.repo.manifest_factory import ManifestFactory
+from modules.repo.remote_version_index import RemotePackageFile, RemoteVersionIndex
+from modules.common.srcinfo import get_srcinfo_cache
+from modules.common.materialize import detach
 from modules.gpg.gpg_handler import GPGHandler
 from modules.build.version_manager import VersionManager
 from modules.build.local_builder import LocalBuilder
@@ -16,6 +23,10 @@ from modules.build.aur_builder import AURBuilder
 from modules.scm.git_client import GitClient
 from modules.common.shell_executor import ShellExecutor
 from modules.build.artifact_manager import ArtifactManager
+from modules.build.build_scheduler import BuildScheduler, normalize_dependency_name
+from modules.build.build_plan import (
+    BuildPlan, PackageAudit, DECISION_BUILD, DECISION_FORCE, DECISION_SKIP, DECISION_ERROR
+)
 
 logger = logging.getLogger(__name__)
 
@@ -61,12 +72,19 @@ class PackageBuilder:
         self.version_tracker = version_tracker  # Store version tracker
         self.debug_mode = debug_mode
         self.vps_files = vps_files or []  # NEW: Store VPS file inventory
+        self._vps_inventory = self._index_vps_files(self.vps_files)  # NEW: (pkgname, version) -> remote file
         self.build_tracker = build_tracker  # NEW: Store build tracker
         self._recently_built_files: List[str] = []  # NEW: Track files built in current session
+        self._shared_dep_session = False  # NEW: True while parallel batch owns one dependency session
+        self._sign_lock = threading.Lock()  # NEW: Serialize signing between build workers
+        self.manifest_index = None  # NEW: Shared ManifestIndex from Phase II (optional)
+        self.publish_hook = None  # NEW: Called with the built files once they are signed (streaming publish)
         
         # Initialize modular components
         self.local_builder = LocalBuilder(debug_mode=debug_mode)
-        self.aur_builder = AURBuilder(debug_mode=debug_mode)
+        # One dependency installer (and session) for local and AUR builds
+        self.aur_builder = AURBuilder(debug_mode=debug_mode,
+                                      dependency_installer=self.local_builder.dependency_installer)
         self.git_client = GitClient(repo_url=None)
         self.shell_executor = ShellExecutor(debug_mode=debug_mode)
         self.artifact_manager = ArtifactManager()
@@ -77,8 +95,36 @@ class PackageBuilder:
     def set_vps_files(self, vps_files: List[str]):
         """Set VPS file inventory for completeness check."""
         self.vps_files = vps_files or []
+        self._vps_inventory = self._index_vps_files(self.vps_files)
         count = len(self.vps_files)
-        logger.info(f"VPS_FILES_SET=1 count={count}")
+        logger.info(f"VPS_FILES_SET=1 count={count} indexed_versions={len(self._vps_inventory)}")
+    
+    @staticmethod
+    def _index_vps_files(vps_files: List[str]) -> Dict[Tuple[str, str], RemotePackageFile]:
+        """
+        Index the VPS inventory by (pkgname, [epoch:]pkgver-pkgrel) for completeness checks.
+        When several files share a key (other arch/compression), a signed one wins.
+        """
+        inventory: Dict[Tuple[str, str], RemotePackageFile] = {}
+        for entry in RemoteVersionIndex(vps_files).files():
+            key = (entry.name, entry.version)
+            current = inventory.get(key)
+            if current is None or (entry.has_signature and not current.has_signature):
+                inventory[key] = entry
+        return inventory
+    
+    def set_publish_hook(self, hook):
+        """
+        Hand every finished package to hook(built_files) right after signing
+        (basenames in output_dir), e.g. to upload it while later packages build.
+        """
+        self.publish_hook = hook
+    
+    def set_manifest_index(self, manifest_index):
+        """Use the Phase II ManifestIndex for checkouts, versions and dependencies."""
+        self.manifest_index = manifest_index
+        count = len(manifest_index.entries()) if manifest_index else 0
+        logger.info(f"MANIFEST_INDEX_SET=1 entries={count}")
     
     def _ensure_output_directory(self):
         """
@@ -136,370 +182,358 @@ class PackageBuilder:
         Returns:
             Tuple of (built: bool, built_version: str, metadata: dict, artifact_versions: dict)
         """
-        logger.info(f"🔍 Auditing local package: {pkg_dir.name}")
+        audit = self.audit_local_package(pkg_dir, remote_version, skip_check)
+        return self._run_audit(audit)
+    
+    def audit_and_build_aur(
+        self,
+        aur_package_name: str,
+        remote_version: Optional[str],
+        aur_build_dir: Path,
+        skip_check: bool = False,
+        source_dir: Optional[Path] = None
+    ) -> Tuple[bool, Optional[str], Optional[Dict[str, str]], Optional[Dict[str, str]]]:
+        """
+        Audit and build AUR package.
+        Implements per-package dependency session and cleanup.
         
-        # Step 1: Extract version from PKGBUILD
+        Args:
+            aur_package_name: AUR package name
+            remote_version: Current version on mirror (None if not exists)
+            aur_build_dir: Directory for AUR builds
+            skip_check: Skip version check and force build (for testing)
+            source_dir: Already cloned AUR checkout (skips the clone; caller owns cleanup)
+            
+        Returns:
+            Tuple of (built: bool, built_version: str, metadata: dict, artifact_versions: dict)
+        """
+        temp_dir = None
         try:
-            pkgver, pkgrel, epoch = self.version_manager.extract_version_from_srcinfo(pkg_dir)
-            source_version = self.version_manager.get_full_version_string(pkgver, pkgrel, epoch)
+            if source_dir is None:
+                temp_dir = tempfile.mkdtemp(prefix=f"aur_{aur_package_name}_")
+                source_dir = Path(temp_dir)
+                if not self._prepare_aur_source(aur_package_name, source_dir):
+                    return False, None, None, None
             
-            logger.info(f"📦 PKGBUILD source version: {source_version}")
-            logger.info(f"📦 Remote version: {remote_version or 'Not found'}")
+            audit = self.audit_aur_package(aur_package_name, remote_version, source_dir, skip_check)
+            return self._run_audit(audit)
         except Exception as e:
-            logger.error(f"❌ Failed to extract version from {pkg_dir}: {e}")
+            logger.error(f"❌ Error building AUR package {aur_package_name}: {e}")
             return False, None, None, None
+        finally:
+            # Cleanup temporary directory
+            if temp_dir and Path(temp_dir).exists():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _run_audit(
+        self,
+        audit: PackageAudit
+    ) -> Tuple[bool, Optional[str], Optional[Dict[str, str]], Optional[Dict[str, str]]]:
+        """
+        Execute an audit decision: build it, or report the skip/error in audit_and_build_* shape.
         
-        # Step 2: Extract all package names from PKGBUILD
-        pkg_names = self._extract_package_names(pkg_dir)
-        
-        # Step 3: Version comparison (skip if forced)
-        if not skip_check and remote_version:
-            should_build = self.version_manager.compare_versions(
-                remote_version, pkgver, pkgrel, epoch, pkg_dir  # Pass pkg_dir for VCS detection
-            )
-            logger.info(f"BUILD_DECISION: pkg={pkg_dir.name} source_ver={source_version} remote_ver={remote_version or 'NONE'} decision={'BUILD' if should_build else 'SKIP'}")
-            if not should_build:
-                # NEW: Only check completeness if versions are equal (not when remote is newer)
-                # Get full remote version string for comparison
-                remote_full_version = remote_version
-                source_full_version = source_version
-                
-                # Compare versions directly to determine if they're equal
-                if remote_full_version == source_full_version:
-                    # Versions are equal, check completeness
-                    is_complete = self._check_split_package_completeness(pkg_dir.name, pkg_names, pkgver, pkgrel, epoch)
-                    if is_complete:
-                        logger.info(f"✅ {pkg_dir.name}: Up to date ({remote_version}) and all split artifacts present")
-                        # Register skipped package for ALL pkgname entries
-                        self.version_tracker.register_split_packages(pkg_names, remote_version, is_built=False)
-                        return False, source_version, {
-                            "pkgver": pkgver,
-                            "pkgrel": pkgrel,
-                            "epoch": epoch,
-                            "pkgnames": pkg_names
-                        }, None
-                    else:
-                        # Incomplete on VPS - force build
-                        logger.info(f"🔄 {pkg_dir.name}: Version matches but VPS is incomplete - FORCING BUILD")
-                else:
-                    # Remote version is newer than source - skip without completeness check
-                    logger.info(f"⏭️ {pkg_dir.name}: Remote version {remote_version} is newer than source {source_version}; skipping (compare_versions already checked VCS upstream)")
-                    # Register skipped package for ALL pkgname entries
-                    self.version_tracker.register_split_packages(pkg_names, remote_version, is_built=False)
-                    return False, source_version, {
-                        "pkgver": pkgver,
-                        "pkgrel": pkgrel,
-                        "epoch": epoch,
-                        "pkgnames": pkg_names
-                    }, None
-        
-        # --- We have decided to build ---
-        
-        # Get dependency installer from local builder
-        dep_installer = self.local_builder.dependency_installer
-        
-        # Extract dependencies (makedepends, checkdepends, runtime_depends)
-        makedepends, checkdepends, runtime_depends = dep_installer.extract_dependencies(pkg_dir)
-        
-        # Log runtime depends - they may be installed depending on config
-        if runtime_depends:
-            logger.info(f"📦 Runtime depends (will be installed if config flag is True): {runtime_depends}")
-        
-        # Start dependency session for this package
-        dep_installer.begin_session(pkg_dir.name)
-        try:
-            # Step 4: Install build dependencies (with configurable runtime deps)
-            logger.info(f"🔧 Installing dependencies for {pkg_dir.name}...")
-            if not self.local_builder.install_build_dependencies(
-                str(pkg_dir),
-                makedepends,
-                checkdepends,
-                runtime_depends
-            ):
-                logger.error(f"❌ Failed to install dependencies for {pkg_dir.name}")
-                return False, source_version, None, None
+        Args:
+            audit: PackageAudit from audit_local_package / audit_aur_package
             
-            # Step 5: Build package
-            logger.info(f"🔨 Building {pkg_dir.name} ({source_version})...")
-            logger.info("LOCAL_BUILDER_USED=1")
-            built_files, build_output = self._build_local_package(pkg_dir, source_version)
+        Returns:
+            Tuple of (built: bool, built_version: str, metadata: dict, artifact_versions: dict)
+        """
+        if audit.decision == DECISION_ERROR:
+            return False, None, None, None
+        if audit.decision == DECISION_SKIP:
+            return False, audit.source_version, audit.metadata, None
+        return self.build_planned_package(audit)
+    
+    def audit_local_package(
+        self,
+        pkg_dir: Path,
+        remote_version: Optional[str],
+        skip_check: bool = False
+    ) -> PackageAudit:
+        """
+        Audit local package without building it.
+        
+        Args:
+            pkg_dir: Path to local package directory
+            remote_version: Current version on mirror (None if not exists)
+            skip_check: Skip version check and force build (for testing)
             
-            if built_files:
-                # Step 6: Extract ACTUAL artifact versions from built files
-                # NEW: Prefer built_files-based helper first
-                artifact_versions = self.version_manager.extract_artifact_versions_from_files(built_files, pkg_names)
-                
-                # Fallback to output_dir scan if built_files didn't yield versions
-                if not artifact_versions:
-                    artifact_versions = self.version_manager.extract_artifact_versions(self.output_dir, pkg_names)
-                    
-                    # Additional fallback: try to extract from makepkg output if artifact parsing fails
-                    if not artifact_versions and build_output:
-                        artifact_version = self.version_manager.get_artifact_version_from_makepkg(build_output)
-                        if artifact_version:
-                            for pkg_name in pkg_names:
-                                artifact_versions[pkg_name] = artifact_version
-                
-                # Step 7: Determine which version to use (artifact truth vs PKGBUILD)
-                actual_version = None
-                if artifact_versions:
-                    # Use artifact version for the main package
-                    main_pkg = pkg_dir.name
-                    if main_pkg in artifact_versions:
-                        actual_version = artifact_versions[main_pkg]
-                        logger.info(f"[VERSION_TRUTH] PKGBUILD: {source_version}, Artifact: {actual_version}")
-                        
-                        # For VCS packages, update the source version with artifact truth
-                        if actual_version != source_version:
-                            logger.info(f"[VERSION_TRUTH] Using artifact version for VCS package: {actual_version}")
-                            # Parse the artifact version to update pkgver/pkgrel/epoch
-                            if ':' in actual_version:
-                                epoch_part, rest = actual_version.split(':', 1)
-                                if '-' in rest:
-                                    pkgver_actual, pkgrel_actual = rest.split('-', 1)
-                                else:
-                                    pkgver_actual = rest
-                                    pkgrel_actual = "1"
-                            else:
-                                epoch_part = "0"
-                                if '-' in actual_version:
-                                    pkgver_actual, pkgrel_actual = actual_version.split('-', 1)
-                                else:
-                                    pkgver_actual = actual_version
-                                    pkgrel_actual = "1"
-                            
-                            # Update metadata with artifact truth
-                            pkgver = pkgver_actual
-                            pkgrel = pkgrel_actual
-                            epoch = epoch_part if epoch_part != "0" else epoch
-                            source_version = actual_version
-                
-                # Use PKGBUILD version if no artifact version found
-                if not actual_version:
-                    actual_version = source_version
-                    logger.info(f"[VERSION_TRUTH] Using PKGBUILD version (no artifact found): {actual_version}")
-                
-                # Step 8: Sign ALL built package files (including split packages)
-                self._sign_built_packages(built_files, actual_version)
-                
-                # NEW: Register target version for ALL pkgname entries using ACTUAL version
-                self.version_tracker.register_split_packages(pkg_names, actual_version, is_built=True)
-                
-                # NEW: Record hokibot data for local package with ACTUAL version
-                if self.build_tracker:
-                    self.build_tracker.add_hokibot_data(
-                        pkg_name=pkg_dir.name,
-                        pkgver=pkgver,
-                        pkgrel=pkgrel,
-                        epoch=epoch,
-                        old_version=remote_version,
-                        new_version=actual_version
-                    )
-                
-                # Log version truth chain
-                logger.info(f"[VERSION_TRUTH_CHAIN] Package: {pkg_dir.name}")
-                logger.info(f"[VERSION_TRUTH_CHAIN] PKGBUILD/.SRCINFO: {source_version}")
-                logger.info(f"[VERSION_TRUTH_CHAIN] Artifact-derived: {actual_version}")
-                logger.info(f"[VERSION_TRUTH_CHAIN] Registered for prune/hokibot: {actual_version}")
-                
-                return True, actual_version, {
-                    "pkgver": pkgver,
-                    "pkgrel": pkgrel,
-                    "epoch": epoch,
-                    "pkgnames": pkg_names
-                }, artifact_versions
-            
-            return False, source_version, None, None
-        finally:
-            # Always clean up dependencies added during this session
-            dep_installer.end_session()
+        Returns:
+            PackageAudit with decision and reason
+        """
+        logger.info(f"🔍 Auditing local package: {pkg_dir.name}")
+        audit = PackageAudit(name=pkg_dir.name, kind="local", source_dir=pkg_dir, remote_version=remote_version)
+        return self._audit_source(audit, skip_check)
     
-    def audit_and_build_aur(
+    def audit_aur_package(
         self,
         aur_package_name: str,
         remote_version: Optional[str],
-        aur_build_dir: Path,
+        source_dir: Path,
         skip_check: bool = False
-    ) -> Tuple[bool, Optional[str], Optional[Dict[str, str]], Optional[Dict[str, str]]]:
+    ) -> PackageAudit:
         """
-        Audit and build AUR package.
-        Implements per-package dependency session and cleanup.
+        Audit an already cloned AUR package without building it.
         
         Args:
             aur_package_name: AUR package name
             remote_version: Current version on mirror (None if not exists)
-            aur_build_dir: Directory for AUR builds
+            source_dir: Directory containing the AUR checkout
             skip_check: Skip version check and force build (for testing)
             
         Returns:
-            Tuple of (built: bool, built_version: str, metadata: dict, artifact_versions: dict)
+            PackageAudit with decision and reason
         """
         logger.info(f"🔍 Auditing AUR package: {aur_package_name}")
+        audit = PackageAudit(name=aur_package_name, kind="aur", source_dir=source_dir, remote_version=remote_version)
+        return self._audit_source(audit, skip_check)
+    
+    def _audit_source(self, audit: PackageAudit, skip_check: bool) -> PackageAudit:
+        """
+        Version audit shared by local and AUR packages.
+        Registers skipped packages with the version tracker.
         
-        # Step 1: Clone AUR package
-        temp_dir = None
-        try:
-            temp_dir = tempfile.mkdtemp(prefix=f"aur_{aur_package_name}_")
-            temp_path = Path(temp_dir)
+        Args:
+            audit: PackageAudit with name/kind/source_dir/remote_version filled in
+            skip_check: Skip version check and force build
             
-            # Clone AUR package using GitClient
-            logger.info("GIT_CLIENT_USED=1")
-            clone_success = self._clone_aur_package(aur_package_name, temp_path)
-            if not clone_success:
-                logger.error(f"❌ Failed to clone AUR package: {aur_package_name}")
-                return False, None, None, None
+        Returns:
+            The same PackageAudit, with decision/reason/version fields populated
+        """
+        start = time.monotonic()
+        pkg_dir = audit.source_dir
+        remote_version = audit.remote_version
+        label = "AUR PKGBUILD" if audit.kind == "aur" else "PKGBUILD"
+        
+        try:
+            # Prefer the shared manifest (parsed once in Phase II) when it covers this checkout
+            entry = self.manifest_index.load_srcinfo(audit.name) if self.manifest_index else None
+            if entry is not None and (entry.source_dir != pkg_dir or not entry.pkgver or not entry.pkgrel):
+                entry = None
             
-            # Step 2: Extract version from PKGBUILD
-            pkgver, pkgrel, epoch = self.version_manager.extract_version_from_srcinfo(temp_path)
-            source_version = self.version_manager.get_full_version_string(pkgver, pkgrel, epoch)
+            # Step 1: Extract version from PKGBUILD
+            try:
+                if entry is not None:
+                    pkgver, pkgrel, epoch = entry.pkgver, entry.pkgrel, entry.epoch
+                else:
+                    pkgver, pkgrel, epoch = self.version_manager.extract_version_from_srcinfo(pkg_dir)
+                source_version = self.version_manager.get_full_version_string(pkgver, pkgrel, epoch)
+                
+                logger.info(f"📦 {label} source version: {source_version}")
+                logger.info(f"📦 Remote version: {remote_version or 'Not found'}")
+            except Exception as e:
+                logger.error(f"❌ Failed to extract version from {pkg_dir}: {e}")
+                audit.decision, audit.reason = DECISION_ERROR, "version_extract_failed"
+                return audit
             
-            logger.info(f"📦 AUR PKGBUILD source version: {source_version}")
-            logger.info(f"📦 Remote version: {remote_version or 'Not found'}")
+            audit.pkgver, audit.pkgrel, audit.epoch = pkgver, pkgrel, epoch
+            audit.source_version = source_version
             
-            # Step 3: Extract all package names from PKGBUILD
-            pkg_names = self._extract_package_names(temp_path)
+            # Step 2: Extract all package names from PKGBUILD
+            if entry is not None and entry.pkg_names:
+                audit.pkg_names = list(entry.pkg_names)
+            else:
+                audit.pkg_names = self._extract_package_names(pkg_dir)
             
-            # Step 4: Version comparison (skip if forced)
-            if not skip_check and remote_version:
+            # Step 3: Version comparison (skip if forced)
+            if skip_check:
+                audit.decision, audit.reason = DECISION_FORCE, "skip_check"
+            elif not remote_version:
+                audit.decision, audit.reason = DECISION_BUILD, "not_on_remote"
+            else:
                 should_build = self.version_manager.compare_versions(
-                    remote_version, pkgver, pkgrel, epoch, temp_path  # Pass temp_path for VCS detection
+                    remote_version, pkgver, pkgrel, epoch, pkg_dir  # Pass pkg_dir for VCS detection
                 )
-                logger.info(f"BUILD_DECISION: pkg={aur_package_name} source_ver={source_version} remote_ver={remote_version or 'NONE'} decision={'BUILD' if should_build else 'SKIP'}")
-                if not should_build:
-                    # NEW: Only check completeness if versions are equal (not when remote is newer)
-                    # Get full remote version string for comparison
-                    remote_full_version = remote_version
-                    source_full_version = source_version
-                    
-                    # Compare versions directly to determine if they're equal
-                    if remote_full_version == source_full_version:
-                        # Versions are equal, check completeness
-                        is_complete = self._check_split_package_completeness(aur_package_name, pkg_names, pkgver, pkgrel, epoch)
-                        if is_complete:
-                            logger.info(f"✅ {aur_package_name}: Up to date ({remote_version}) and all split artifacts present")
-                            # Register skipped package for ALL pkgname entries
-                            self.version_tracker.register_split_packages(pkg_names, remote_version, is_built=False)
-                            return False, source_version, {
-                                "pkgver": pkgver,
-                                "pkgrel": pkgrel,
-                                "epoch": epoch,
-                                "pkgnames": pkg_names
-                            }, None
-                        else:
-                            # Incomplete on VPS - force build
-                            logger.info(f"🔄 {aur_package_name}: Version matches but VPS is incomplete - FORCING BUILD")
+                logger.info(f"BUILD_DECISION: pkg={audit.name} source_ver={source_version} remote_ver={remote_version or 'NONE'} decision={'BUILD' if should_build else 'SKIP'}")
+                if should_build:
+                    audit.decision, audit.reason = DECISION_BUILD, "source_newer"
+                # NEW: Only check completeness if versions are equal (not when remote is newer)
+                elif remote_version == source_version:
+                    # Versions are equal, check completeness
+                    is_complete = self._check_split_package_completeness(audit.name, audit.pkg_names, pkgver, pkgrel, epoch)
+                    if is_complete:
+                        logger.info(f"✅ {audit.name}: Up to date ({remote_version}) and all split artifacts present")
+                        audit.decision, audit.reason = DECISION_SKIP, "up_to_date"
                     else:
-                        # Remote version is newer than source - skip without completeness check
-                        logger.info(f"⏭️ {aur_package_name}: Remote version {remote_version} is newer than source {source_version}; skipping (compare_versions already checked VCS upstream)")
-                        # Register skipped package for ALL pkgname entries
-                        self.version_tracker.register_split_packages(pkg_names, remote_version, is_built=False)
-                        return False, source_version, {
-                            "pkgver": pkgver,
-                            "pkgrel": pkgrel,
-                            "epoch": epoch,
-                            "pkgnames": pkg_names
-                        }, None
-            
-            # --- We have decided to build ---
-            
-            # Get dependency installer from aur builder
-            dep_installer = self.aur_builder.dependency_installer
-            
-            # Start dependency session for this package
-            dep_installer.begin_session(aur_package_name)
-            try:
+                        # Incomplete on VPS - force build
+                        logger.info(f"🔄 {audit.name}: Version matches but VPS is incomplete - FORCING BUILD")
+                        audit.decision, audit.reason = DECISION_FORCE, "remote_incomplete"
+                else:
+                    # Remote version is newer than source - skip without completeness check
+                    logger.info(f"⏭️ {audit.name}: Remote version {remote_version} is newer than source {source_version}; skipping (compare_versions already checked VCS upstream)")
+                    audit.decision, audit.reason = DECISION_SKIP, "remote_newer"
+            
+            if audit.decision == DECISION_SKIP:
+                # Register skipped package for ALL pkgname entries
+                self.version_tracker.register_split_packages(audit.pkg_names, remote_version, is_built=False)
+            elif entry is not None:
+                # Dependencies are needed for scheduling and for the build itself
+                audit.makedepends = list(entry.makedepends)
+                audit.checkdepends = list(entry.checkdepends)
+                audit.runtime_depends = list(entry.depends)
+            else:
+                dep_installer = self.local_builder.dependency_installer
+                audit.makedepends, audit.checkdepends, audit.runtime_depends = dep_installer.extract_dependencies(pkg_dir)
+            
+            return audit
+        except Exception as e:
+            logger.error(f"❌ Audit failed for {audit.name}: {e}")
+            audit.decision, audit.reason = DECISION_ERROR, "audit_exception"
+            return audit
+        finally:
+            audit.duration = time.monotonic() - start
+    
+    def build_planned_package(
+        self,
+        audit: PackageAudit
+    ) -> Tuple[bool, Optional[str], Optional[Dict[str, str]], Optional[Dict[str, str]]]:
+        """
+        Build a package the audit stage decided to build (BUILD or FORCE).
+        Implements per-package dependency session and cleanup.
+        
+        Args:
+            audit: PackageAudit with needs_build == True
+            
+        Returns:
+            Tuple of (built: bool, built_version: str, metadata: dict, artifact_versions: dict)
+        """
+        pkg_dir = audit.source_dir
+        pkg_names = audit.pkg_names
+        pkgver, pkgrel, epoch = audit.pkgver, audit.pkgrel, audit.epoch
+        source_version = audit.source_version
+        remote_version = audit.remote_version
+        is_aur = audit.kind == "aur"
+        
+        # --- We have decided to build ---
+        
+        # Get dependency installer from the matching builder
+        dep_installer = self.aur_builder.dependency_installer if is_aur else self.local_builder.dependency_installer
+        
+        # Log runtime depends - they may be installed depending on config
+        if audit.runtime_depends and not is_aur:
+            logger.info(f"📦 Runtime depends (will be installed if config flag is True): {audit.runtime_depends}")
+        
+        # Start dependency session for this package
+        self._begin_dep_session(dep_installer, audit.name)
+        try:
+            if is_aur:
                 # Step 5: Build package (dependencies are installed inside build_aur_package)
-                logger.info(f"🔨 Building AUR {aur_package_name} ({source_version})...")
+                logger.info(f"🔨 Building AUR {audit.name} ({source_version})...")
                 logger.info("AUR_BUILDER_USED=1")
-                built_files, build_output = self._build_aur_package(temp_path, aur_package_name, source_version)
+                built_files, build_output = self._build_aur_package(pkg_dir, audit.name, source_version)
+            else:
+                # Step 4: Install build dependencies (with configurable runtime deps)
+                logger.info(f"🔧 Installing dependencies for {audit.name}...")
+                if not self.local_builder.install_build_dependencies(
+                    str(pkg_dir),
+                    audit.makedepends,
+                    audit.checkdepends,
+                    audit.runtime_depends
+                ):
+                    logger.error(f"❌ Failed to install dependencies for {audit.name}")
+                    return False, source_version, None, None
                 
-                if built_files:
-                    # Step 6: Extract ACTUAL artifact versions from built files
-                    # NEW: Prefer built_files-based helper first
-                    artifact_versions = self.version_manager.extract_artifact_versions_from_files(built_files, pkg_names)
+                # Step 5: Build package
+                logger.info(f"🔨 Building {audit.name} ({source_version})...")
+                logger.info("LOCAL_BUILDER_USED=1")
+                built_files, build_output = self._build_local_package(pkg_dir, source_version)
+            
+            if not built_files:
+                return False, source_version, None, None
+            
+            # Step 6: Extract ACTUAL artifact versions from built files
+            # NEW: Prefer built_files-based helper first
+            artifact_versions = self.version_manager.extract_artifact_versions_from_files(built_files, pkg_names)
+            
+            # Fallback to output_dir scan if built_files didn't yield versions
+            if not artifact_versions:
+                artifact_versions = self.version_manager.extract_artifact_versions(self.output_dir, pkg_names)
+                
+                # Additional fallback: try to extract from makepkg output if artifact parsing fails
+                if not artifact_versions and build_output:
+                    artifact_version = self.version_manager.get_artifact_version_from_makepkg(build_output)
+                    if artifact_version:
+                        for pkg_name in pkg_names:
+                            artifact_versions[pkg_name] = artifact_version
+            
+            # Step 7: Determine which version to use (artifact truth vs PKGBUILD)
+            actual_version = None
+            if artifact_versions:
+                # Use artifact version for the main package
+                if audit.name in artifact_versions:
+                    actual_version = artifact_versions[audit.name]
+                    logger.info(f"[VERSION_TRUTH] PKGBUILD: {source_version}, Artifact: {actual_version}")
                     
-                    # Fallback to output_dir scan if built_files didn't yield versions
-                    if not artifact_versions:
-                        artifact_versions = self.version_manager.extract_artifact_versions(self.output_dir, pkg_names)
+                    # For VCS packages, update the source version with artifact truth
+                    if actual_version != source_version:
+                        logger.info(f"[VERSION_TRUTH] Using artifact version for VCS package: {actual_version}")
+                        # Parse the artifact version to update pkgver/pkgrel/epoch
+                        if ':' in actual_version:
+                            epoch_part, rest = actual_version.split(':', 1)
+                            if '-' in rest:
+                                pkgver_actual, pkgrel_actual = rest.split('-', 1)
+                            else:
+                                pkgver_actual = rest
+                                pkgrel_actual = "1"
+                        else:
+                            epoch_part = "0"
+                            if '-' in actual_version:
+                                pkgver_actual, pkgrel_actual = actual_version.split('-', 1)
+                            else:
+                                pkgver_actual = actual_version
+                                pkgrel_actual = "1"
                         
-                        # Additional fallback: try to extract from makepkg output if artifact parsing fails
-                        if not artifact_versions and build_output:
-                            artifact_version = self.version_manager.get_artifact_version_from_makepkg(build_output)
-                            if artifact_version:
-                                for pkg_name in pkg_names:
-                                    artifact_versions[pkg_name] = artifact_version
-                    
-                    # Step 7: Determine which version to use (artifact truth vs PKGBUILD)
-                    actual_version = None
-                    if artifact_versions:
-                        # Use artifact version for the main package
-                        if aur_package_name in artifact_versions:
-                            actual_version = artifact_versions[aur_package_name]
-                            logger.info(f"[VERSION_TRUTH] PKGBUILD: {source_version}, Artifact: {actual_version}")
-                            
-                            # For VCS packages, update the source version with artifact truth
-                            if actual_version != source_version:
-                                logger.info(f"[VERSION_TRUTH] Using artifact version for VCS package: {actual_version}")
-                                # Parse the artifact version to update pkgver/pkgrel/epoch
-                                if ':' in actual_version:
-                                    epoch_part, rest = actual_version.split(':', 1)
-                                    if '-' in rest:
-                                        pkgver_actual, pkgrel_actual = rest.split('-', 1)
-                                    else:
-                                        pkgver_actual = rest
-                                        pkgrel_actual = "1"
-                                else:
-                                    epoch_part = "0"
-                                    if '-' in actual_version:
-                                        pkgver_actual, pkgrel_actual = actual_version.split('-', 1)
-                                    else:
-                                        pkgver_actual = actual_version
-                                        pkgrel_actual = "1"
-                                
-                                # Update metadata with artifact truth
-                                pkgver = pkgver_actual
-                                pkgrel = pkgrel_actual
-                                epoch = epoch_part if epoch_part != "0" else epoch
-                                source_version = actual_version
-                    
-                    # Use PKGBUILD version if no artifact version found
-                    if not actual_version:
-                        actual_version = source_version
-                        logger.info(f"[VERSION_TRUTH] Using PKGBUILD version (no artifact found): {actual_version}")
-                    
-                    # Step 8: Sign ALL built package files (including split packages)
-                    self._sign_built_packages(built_files, actual_version)
-                    
-                    # NEW: Register target version for ALL pkgname entries using ACTUAL version
-                    self.version_tracker.register_split_packages(pkg_names, actual_version, is_built=True)
-                    
-                    # Note: AUR packages do NOT record hokibot data per requirements
-                    
-                    # Log version truth chain
-                    logger.info(f"[VERSION_TRUTH_CHAIN] Package: {aur_package_name}")
-                    logger.info(f"[VERSION_TRUTH_CHAIN] PKGBUILD/.SRCINFO: {source_version}")
-                    logger.info(f"[VERSION_TRUTH_CHAIN] Artifact-derived: {actual_version}")
-                    logger.info(f"[VERSION_TRUTH_CHAIN] Registered for prune/hokibot: {actual_version}")
-                    
-                    return True, actual_version, {
-                        "pkgver": pkgver,
-                        "pkgrel": pkgrel,
-                        "epoch": epoch,
-                        "pkgnames": pkg_names
-                    }, artifact_versions
-                
-                return False, source_version, None, None
-            finally:
-                # Always clean up dependencies added during this session
-                dep_installer.end_session()
+                        # Update metadata with artifact truth
+                        pkgver = pkgver_actual
+                        pkgrel = pkgrel_actual
+                        epoch = epoch_part if epoch_part != "0" else epoch
+                        source_version = actual_version
             
-        except Exception as e:
-            logger.error(f"❌ Error building AUR package {aur_package_name}: {e}")
-            return False, None, None, None
+            # Use PKGBUILD version if no artifact version found
+            if not actual_version:
+                actual_version = source_version
+                logger.info(f"[VERSION_TRUTH] Using PKGBUILD version (no artifact found): {actual_version}")
+            
+            # Step 8: Sign ALL built package files (including split packages)
+            self._sign_built_packages(built_files, actual_version)
+            
+            # NEW: streaming publish - the uploader queues and returns immediately
+            if self.publish_hook is not None:
+                try:
+                    self.publish_hook(built_files)
+                except Exception as e:
+                    logger.warning(f"Publish hook failed for {audit.name} (phase V uploads it): {e}")
+            
+            # NEW: Register target version for ALL pkgname entries using ACTUAL version
+            self.version_tracker.register_split_packages(pkg_names, actual_version, is_built=True)
+            
+            # NEW: Record hokibot data for local package with ACTUAL version
+            # Note: AUR packages do NOT record hokibot data per requirements
+            if self.build_tracker and not is_aur:
+                self.build_tracker.add_hokibot_data(
+                    pkg_name=audit.name,
+                    pkgver=pkgver,
+                    pkgrel=pkgrel,
+                    epoch=epoch,
+                    old_version=remote_version,
+                    new_version=actual_version
+                )
+            
+            # Log version truth chain
+            logger.info(f"[VERSION_TRUTH_CHAIN] Package: {audit.name}")
+            logger.info(f"[VERSION_TRUTH_CHAIN] PKGBUILD/.SRCINFO: {source_version}")
+            logger.info(f"[VERSION_TRUTH_CHAIN] Artifact-derived: {actual_version}")
+            logger.info(f"[VERSION_TRUTH_CHAIN] Registered for prune/hokibot: {actual_version}")
+            
+            return True, actual_version, {
+                "pkgver": pkgver,
+                "pkgrel": pkgrel,
+                "epoch": epoch,
+                "pkgnames": pkg_names
+            }, artifact_versions
         finally:
-            # Cleanup temporary directory
-            if temp_dir and Path(temp_dir).exists():
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            # Always clean up dependencies added during this session
+            self._end_dep_session(dep_installer)
     
     def _check_split_package_completeness(self, pkgbuild_name: str, pkg_names: List[str], pkgver: str, pkgrel: str, epoch: Optional[str]) -> bool:
         """
@@ -531,20 +565,12 @@ class PackageBuilder:
             # Build base pattern with correct version formatting
             base_pattern = f"{pkg_name}-{version_segment}"
             
-            # Check for package files (any architecture, any compression)
-            package_found = False
-            for vps_file in self.vps_files:
-                # Check if file starts with base_pattern and has package extension
-                if vps_file.startswith(base_pattern) and (vps_file.endswith('.pkg.tar.zst') or vps_file.endswith('.pkg.tar.xz')):
-                    package_found = True
-                    # Check for corresponding signature
-                    sig_file = vps_file + '.sig'
-                    if sig_file not in self.vps_files:
-                        missing_artifacts.append(f"{vps_file}.sig")
-                    break
-            
-            if not package_found:
+            # Check for package files (any architecture, any compression) and their signature
+            entry = self._vps_inventory.get((pkg_name, version_segment))
+            if entry is None:
                 missing_artifacts.append(f"{base_pattern}-*.pkg.tar.*")
+            elif not entry.has_signature:
+                missing_artifacts.append(f"{entry.filename}.sig")
         
         if missing_artifacts:
             example = missing_artifacts[0] if missing_artifacts else "unknown"
@@ -554,6 +580,19 @@ class PackageBuilder:
         logger.info(f"SKIP OK (complete VPS): {pkgbuild_name} all split artifacts present")
         return True
     
+    def _begin_dep_session(self, dep_installer, pkg_name: str):
+        """Start a per-package dependency session unless a batch-wide session is active."""
+        if self._shared_dep_session:
+            logger.info(f"DEP_SESSION_SHARED=1 pkg={pkg_name}")
+            return
+        dep_installer.begin_session(pkg_name)
+    
+    def _end_dep_session(self, dep_installer):
+        """End the per-package dependency session unless a batch-wide session is active."""
+        if self._shared_dep_session:
+            return
+        dep_installer.end_session()
+    
     def _extract_package_names(self, pkg_dir: Path) -> List[str]:
         """
         Extract all package names from PKGBUILD.
@@ -565,9 +604,9 @@ class PackageBuilder:
             List of package names (single or multiple for split packages)
         """
         try:
-            pkgbuild_content = ManifestFactory.get_pkgbuild(str(pkg_dir))
-            if pkgbuild_content:
-                pkg_names = ManifestFactory.extract_pkgnames(pkgbuild_content)
+            info = get_srcinfo_cache().peek(pkg_dir)
+            if info is not None:
+                pkg_names = [name for name in info.pkgnames if name]
                 if pkg_names:
                     return pkg_names
         except Exception as e:
@@ -580,6 +619,15 @@ class PackageBuilder:
         """Clone AUR package from Arch Linux AUR using GitClient."""
         logger.info(f"📥 Cloning {pkg_name} from AUR")
         
+        # NEW: Prefer the persistent mirror cache shared with the manifest index
+        mirror_cache = getattr(self.manifest_index, 'mirror_cache', None)
+        if mirror_cache is not None:
+            if mirror_cache.sync(pkg_name).ok and mirror_cache.checkout(pkg_name, target_dir):
+                logger.info(f"✅ Checked out {pkg_name} from mirror cache")
+                return True
+            logger.warning(f"⚠️ Mirror cache checkout failed for {pkg_name}, falling back to clone")
+            shutil.rmtree(target_dir, ignore_errors=True)
+        
         # Try different AUR URLs
         aur_urls = [
             f"https://aur.archlinux.org/{pkg_name}.git",
@@ -588,9 +636,8 @@ class PackageBuilder:
         
         for aur_url in aur_urls:
             try:
-                # Use GitClient to clone
-                self.git_client.repo_url = aur_url
-                if self.git_client.clone_repository(str(target_dir), depth=1):
+                # Use GitClient to clone (URL passed per call: workers share the client)
+                if self.git_client.clone_repository(str(target_dir), depth=1, repo_url=aur_url):
                     logger.info(f"✅ Successfully cloned {pkg_name}")
                     return True
                 else:
@@ -694,6 +741,8 @@ class PackageBuilder:
                 
             dest = self.output_dir / pkg_file.name
             try:
+                # A mirrored package may be a hard link to the mirror copy: never write through it
+                detach(dest)
                 shutil.move(str(pkg_file), str(dest))
                 logger.info(f"   Moved: {pkg_file.name}")
                 moved_files.append(pkg_file.name)
@@ -716,6 +765,12 @@ class PackageBuilder:
             logger.info(f"Package signing disabled, skipping signing for version {version}")
             return
         
+        # Parallel workers scan output_dir for unsigned files below; sign one batch at a time
+        with self._sign_lock:
+            self._sign_built_packages_locked(built_files, version)
+    
+    def _sign_built_packages_locked(self, built_files: List[str], version: str):
+        """Sign built packages (caller holds _sign_lock)."""
         logger.info(f"🔐 Signing ALL built packages for version {version}...")
         
         # Build version string for filename matching (epoch:version -> epoch-version)
@@ -776,13 +831,9 @@ class PackageBuilder:
             Dictionary with package metadata or None
         """
         try:
-            # Use ManifestFactory to get pkgname values
-            pkgbuild_content = ManifestFactory.get_pkgbuild(str(pkg_dir))
-            if not pkgbuild_content:
-                return None
-            
-            # Extract pkgname(s)
-            pkg_names = ManifestFactory.extract_pkgnames(pkgbuild_content)
+            # Extract pkgname(s) from the shared parser cache
+            info = get_srcinfo_cache().peek(pkg_dir)
+            pkg_names = [name for name in info.pkgnames if name] if info else []
             if not pkg_names:
                 return None
             
@@ -806,15 +857,24 @@ class PackageBuilder:
         self,
         local_packages: List[Tuple[Path, Optional[str]]],
         aur_packages: List[Tuple[str, Optional[str]]],
-        aur_build_dir: Optional[Path] = None
+        aur_build_dir: Optional[Path] = None,
+        max_workers: Optional[int] = None
     ) -> Tuple[List[str], List[str], List[str]]:
         """
         Batch audit and build multiple packages.
         
+        Runs in two stages:
+        1. Audit: every package is evaluated concurrently (AUR clone, .SRCINFO,
+           vercmp, VCS upstream check) into a BuildPlan of BUILD/FORCE/SKIP/ERROR.
+        2. Build: only BUILD/FORCE entries are scheduled on a dependency graph
+           derived from .SRCINFO (depends/makedepends/checkdepends); a package
+           waits only for the planned packages it depends on.
+        
         Args:
             local_packages: List of (pkg_dir, remote_version) tuples
             aur_packages: List of (aur_name, remote_version) tuples
             aur_build_dir: Directory for AUR builds (creates temp if None)
+            max_workers: Concurrent builds (defaults to config.BUILD_MAX_WORKERS)
             
         Returns:
             Tuple of (built_packages, skipped_packages, failed_packages)
@@ -823,61 +883,160 @@ class PackageBuilder:
         skipped_packages = []
         failed_packages = []
         
+        if max_workers is None:
+            max_workers = getattr(config, 'BUILD_MAX_WORKERS', 1)
+        
         # Create AUR build directory if needed
-        if aur_build_dir is None:
+        temporary_build_dir = aur_build_dir is None
+        if temporary_build_dir:
             aur_build_dir = Path(tempfile.mkdtemp(prefix="aur_build_"))
         aur_build_dir.mkdir(exist_ok=True, parents=True)
         
-        # Process local packages
-        logger.info(f"📦 Auditing {len(local_packages)} local packages...")
-        for pkg_dir, remote_version in local_packages:
-            try:
-                built, version, metadata, artifact_versions = self.audit_and_build_local(
-                    pkg_dir, remote_version
-                )
-                
-                if built:
-                    built_packages.append(f"{pkg_dir.name} ({version})")
-                    # Note: Target versions are now registered in audit_and_build_local
-                elif version:
-                    skipped_packages.append(f"{pkg_dir.name} ({version})")
-                    # Note: Skipped packages are now registered in audit_and_build_local
-                else:
-                    failed_packages.append(pkg_dir.name)
-                    
-            except Exception as e:
-                logger.error(f"❌ Error processing local package {pkg_dir.name}: {e}")
-                failed_packages.append(pkg_dir.name)
+        # Stage 1: audit everything before any build starts
+        plan = self.audit_packages(local_packages, aur_packages, aur_build_dir)
         
-        # Process AUR packages
-        logger.info(f"📦 Auditing {len(aur_packages)} AUR packages...")
-        for aur_name, remote_version in aur_packages:
-            try:
-                built, version, metadata, artifact_versions = self.audit_and_build_aur(
-                    aur_name, remote_version, aur_build_dir
-                )
-                
-                if built:
-                    built_packages.append(f"{aur_name} ({version})")
-                    # Note: Target versions are now registered in audit_and_build_aur
-                elif version:
-                    skipped_packages.append(f"{aur_name} ({version})")
-                    # Note: Skipped packages are now registered in audit_and_build_aur
-                else:
-                    failed_packages.append(aur_name)
-                    
-            except Exception as e:
-                logger.error(f"❌ Error processing AUR package {aur_name}: {e}")
-                failed_packages.append(aur_name)
+        for audit in plan.errors():
+            failed_packages.append(audit.name)
+        for audit in plan.skipped():
+            skipped_packages.append(f"{audit.name} ({audit.source_version})")
+            # Note: Skipped packages are registered during the audit
+        
+        # Stage 2: build only what the plan requires
+        scheduler = BuildScheduler(max_workers=max_workers)
+        conflict_pkgs = self._conflict_packages()
+        for audit in plan.to_build():
+            # Conflict resolution may pacman -R a package another worker just installed
+            touched = {normalize_dependency_name(d) for d in audit.depends} | set(audit.pkg_names)
+            exclusive = bool(conflict_pkgs & touched)
+            scheduler.add_node(audit.name, provides=audit.pkg_names, depends=audit.depends, payload=audit,
+                               exclusive=exclusive)
         
-        # Cleanup temporary AUR build directory
+        # Parallel builds cannot diff pacman state per package (other workers install
+        # concurrently), so the whole batch shares one dependency session instead.
+        batch_dep_installer = self.local_builder.dependency_installer
+        parallel = scheduler.max_workers > 1 and len(plan.to_build()) > 1
+        if parallel:
+            batch_dep_installer.begin_session("batch")
+            self._shared_dep_session = True
         try:
-            if aur_build_dir.exists():
+            results = scheduler.run(
+                lambda node: self.build_planned_package(node.payload),
+                is_success=lambda value: bool(value[1])
+            )
+        finally:
+            if parallel:
+                self._shared_dep_session = False
+                batch_dep_installer.end_session()
+        
+        for name, result in results.items():
+            if not result.ok or result.value is None:
+                failed_packages.append(name)
+                continue
+            built, version, metadata, artifact_versions = result.value
+            if built:
+                built_packages.append(f"{name} ({version})")
+                # Note: Target versions are registered in build_planned_package
+            else:
+                # Build produced nothing; keep the historical "reported as skipped" behaviour
+                skipped_packages.append(f"{name} ({version})")
+        
+        # Cleanup AUR checkouts (hidden entries - mirror and RPC caches - are kept for the next run)
+        try:
+            if temporary_build_dir:
                 shutil.rmtree(aur_build_dir, ignore_errors=True)
+            elif aur_build_dir.exists():
+                for child in aur_build_dir.iterdir():
+                    if child.name.startswith('.'):
+                        continue
+                    if child.is_dir():
+                        shutil.rmtree(child, ignore_errors=True)
+                    else:
+                        child.unlink()
         except Exception:
             pass
         
         return built_packages, skipped_packages, failed_packages
+    
+    @staticmethod
+    def _conflict_packages() -> Set[str]:
+        """Package names on either side of CONFLICT_REMOVE_ALLOWLIST."""
+        names: Set[str] = set()
+        for pkg, conflicts in getattr(config, 'CONFLICT_REMOVE_ALLOWLIST', {}).items():
+            names.add(pkg)
+            names.update(conflicts)
+        return names
+    
+    def audit_packages(
+        self,
+        local_packages: List[Tuple[Path, Optional[str]]],
+        aur_packages: List[Tuple[str, Optional[str]]],
+        aur_build_dir: Path,
+        max_workers: Optional[int] = None
+    ) -> BuildPlan:
+        """
+        Audit all packages concurrently and return the complete build plan.
+        AUR packages are cloned into aur_build_dir/<name> as part of their audit.
+        
+        Args:
+            local_packages: List of (pkg_dir, remote_version) tuples
+            aur_packages: List of (aur_name, remote_version) tuples
+            aur_build_dir: Directory for AUR checkouts
+            max_workers: Concurrent audits (defaults to config.AUDIT_MAX_WORKERS)
+            
+        Returns:
+            BuildPlan with one PackageAudit per package, in input order (local first)
+        """
+        if max_workers is None:
+            max_workers = getattr(config, 'AUDIT_MAX_WORKERS', 8)
+        max_workers = max(1, int(max_workers))
+        
+        def _audit_aur(aur_name: str, remote_version: Optional[str]) -> PackageAudit:
+            source_dir = aur_build_dir / aur_name
+            # Reuse the checkout the manifest stage already made
+            entry = self.manifest_index.get(aur_name) if self.manifest_index else None
+            if entry is not None and entry.source_dir == source_dir and (source_dir / "PKGBUILD").exists():
+                logger.info(f"AUR_CHECKOUT_REUSED=1 pkg={aur_name}")
+                return self.audit_aur_package(aur_name, remote_version, source_dir)
+            # AUR RPC confirmed the cached manifest: decide first, clone only to build
+            if entry is not None and entry.deferred_checkout:
+                logger.info(f"🔍 Auditing AUR package: {aur_name} (no checkout)")
+                audit = self._audit_source(
+                    PackageAudit(name=aur_name, kind="aur", source_dir=None, remote_version=remote_version),
+                    skip_check=False
+                )
+                logger.info(f"AUR_AUDIT_NO_CHECKOUT pkg={aur_name} decision={audit.decision} reason={audit.reason}")
+                if audit.decision == DECISION_SKIP:
+                    return audit
+            if source_dir.exists():
+                shutil.rmtree(source_dir, ignore_errors=True)
+            if not self._prepare_aur_source(aur_name, source_dir):
+                return PackageAudit(name=aur_name, kind="aur", source_dir=None, remote_version=remote_version,
+                                    decision=DECISION_ERROR, reason="clone_failed")
+            return self.audit_aur_package(aur_name, remote_version, source_dir)
+        
+        logger.info(f"📦 Auditing {len(local_packages)} local and {len(aur_packages)} AUR packages (workers={max_workers})...")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audit") as pool:
+            futures = [
+                pool.submit(self.audit_local_package, pkg_dir, remote_version)
+                for pkg_dir, remote_version in local_packages
+            ] + [
+                pool.submit(_audit_aur, aur_name, remote_version)
+                for aur_name, remote_version in aur_packages
+            ]
+            audits = [future.result() for future in futures]
+        
+        plan = BuildPlan(audits=audits, duration=time.monotonic() - start)
+        plan.log()
+        return plan
+    
+    def _prepare_aur_source(self, aur_package_name: str, target_dir: Path) -> bool:
+        """Clone an AUR package into target_dir, logging failures."""
+        logger.info("GIT_CLIENT_USED=1")
+        if not self._clone_aur_package(aur_package_name, target_dir):
+            logger.error(f"❌ Failed to clone AUR package: {aur_package_name}")
+            return False
+        return True
 
 
 # Helper function for easy integration
@@ -10,6 +10,10 @@ from typing import Tuple, Optional, List, Dict
 import re
 import urllib.parse
 
+from modules.common.package_filename import parse_package_filename
+from modules.common.vercmp import vercmp
+from modules.common.srcinfo import load_srcinfo, parse_srcinfo
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,71 +21,20 @@ class VersionManager:
     """Handles package version extraction, comparison, and management"""
     
     def extract_version_from_srcinfo(self, pkg_dir: Path) -> Tuple[str, str, Optional[str]]:
-        """Extract pkgver, pkgrel, and epoch from .SRCINFO or makepkg --printsrcinfo output"""
-        srcinfo_path = pkg_dir / ".SRCINFO"
-        
-        # First try to read existing .SRCINFO
-        if srcinfo_path.exists():
-            try:
-                with open(srcinfo_path, 'r') as f:
-                    srcinfo_content = f.read()
-                return self._parse_srcinfo_content(srcinfo_content)
-            except Exception as e:
-                logger.warning(f"Failed to parse existing .SRCINFO: {e}")
-        
-        # Generate .SRCINFO using makepkg --printsrcinfo
-        try:
-            result = subprocess.run(
-                ['makepkg', '--printsrcinfo'],
-                cwd=pkg_dir,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            if result.returncode == 0 and result.stdout:
-                # Also write to .SRCINFO for future use
-                with open(srcinfo_path, 'w') as f:
-                    f.write(result.stdout)
-                return self._parse_srcinfo_content(result.stdout)
-            else:
-                logger.warning(f"makepkg --printsrcinfo failed: {result.stderr}")
-                raise RuntimeError(f"Failed to generate .SRCINFO: {result.stderr}")
-                
-        except Exception as e:
-            logger.error(f"Error running makepkg --printsrcinfo: {e}")
-            raise
+        """Extract pkgver, pkgrel, and epoch from .SRCINFO (cached; makepkg --printsrcinfo on a miss)"""
+        info = load_srcinfo(pkg_dir)
+        if info is None:
+            raise RuntimeError(f"Failed to generate .SRCINFO for {pkg_dir}")
+        if not info.pkgver or not info.pkgrel:
+            raise ValueError("Could not extract pkgver and pkgrel from .SRCINFO")
+        return info.pkgver, info.pkgrel, info.epoch
     
     def _parse_srcinfo_content(self, srcinfo_content: str) -> Tuple[str, str, Optional[str]]:
         """Parse SRCINFO content to extract version information"""
-        pkgver = None
-        pkgrel = None
-        epoch = None
-        
-        lines = srcinfo_content.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Handle key-value pairs
-            if '=' in line:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-                
-                if key == 'pkgver':
-                    pkgver = value
-                elif key == 'pkgrel':
-                    pkgrel = value
-                elif key == 'epoch':
-                    epoch = value
-        
-        if not pkgver or not pkgrel:
+        info = parse_srcinfo(srcinfo_content)
+        if not info.pkgver or not info.pkgrel:
             raise ValueError("Could not extract pkgver and pkgrel from .SRCINFO")
-        
-        return pkgver, pkgrel, epoch
+        return info.pkgver, info.pkgrel, info.epoch
     
     def get_full_version_string(self, pkgver: str, pkgrel: str, epoch: Optional[str]) -> str:
         """Construct full version string from components"""
@@ -139,10 +92,10 @@ class VersionManager:
                 if built_file.endswith('.sig'):
                     continue
                 
-                # Parse version from filename
-                match = re.match(rf'^{re.escape(pkg_name)}-(.+?)-(?:x86_64|any|i686|aarch64|armv7h|armv6h)\.pkg\.tar\.(?:zst|xz)$', built_file)
-                if match:
-                    version = match.group(1)
+                # Parse version from filename (exact name match, split siblings are skipped)
+                record = parse_package_filename(built_file)
+                if record and record.name == pkg_name:
+                    version = record.version
                     artifact_versions[pkg_name] = version
                     logger.info(f"ARTIFACT_FROM_BUILT_FILES pkg={pkg_name} ver={version}")
                     break  # Found a version for this package
@@ -173,13 +126,12 @@ class VersionManager:
                 if artifact.name.endswith('.sig'):
                     continue
                 
-                # Parse version from filename
-                match = re.match(rf'^{re.escape(pkg_name)}-(.+?)-(?:x86_64|any|i686|aarch64|armv7h|armv6h)\.pkg\.tar\.(?:zst|xz)$', artifact.name)
-                if match:
-                    version = match.group(1)
-                    candidates.append((artifact, version))
-                else:
+                # Parse version from filename; the glob also matches split siblings (foo-docs)
+                record = parse_package_filename(artifact.name)
+                if record is None:
                     bad_candidates += 1
+                elif record.name == pkg_name:
+                    candidates.append((artifact, record.version))
             
             # Log bad candidates if any
             if bad_candidates > 0:
@@ -205,7 +157,7 @@ class VersionManager:
     
     def _version_cmp(self, v1: str, v2: str) -> int:
         """
-        Compare two version strings using vercmp.
+        Compare two version strings using the in-process vercmp port.
         Returns negative if v1 < v2, zero if v1 == v2, positive if v1 > v2.
         
         Args:
@@ -215,20 +167,7 @@ class VersionManager:
         Returns:
             Comparison result
         """
-        try:
-            result = subprocess.run(
-                ['vercmp', v1, v2],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if result.returncode == 0:
-                return int(result.stdout.strip())
-        except Exception as e:
-            logger.warning(f"vercmp failed: {e}")
-        
-        # Fallback: simple string comparison
-        return 1 if v1 > v2 else -1 if v1 < v2 else 0
+        return vercmp(v1, v2)
     
     def get_artifact_version_from_makepkg(self, makepkg_output: str) -> Optional[str]:
         """
@@ -245,13 +184,10 @@ class VersionManager:
         for line in lines:
             if '==> Finished making:' in line or '==> Finished creating package' in line:
                 # Extract package filename and parse version
-                match = re.search(r'([a-zA-Z0-9_.-]+-([0-9]+:)?[a-zA-Z0-9_.+-]+-(?:x86_64|any|i686|aarch64|armv7h|armv6h)\.pkg\.tar\.(?:zst|xz))', line)
-                if match:
-                    filename = match.group(1)
-                    # Parse version from filename
-                    name_version = filename.rsplit('-', 3)[0]  # Remove architecture and extension
-                    version_part = name_version.split('-', 1)[1] if '-' in name_version else name_version
-                    return version_part
+                for token in line.split():
+                    record = parse_package_filename(token.strip('\'"()'))
+                    if record:
+                        return record.version
         
         return None
     
@@ -1002,75 +938,67 @@ class VersionManager:
         logger.info(f"[VERSION_COMPARE] PKGBUILD source: {source_version} (norm={norm_source})")
         logger.info(f"[VERSION_COMPARE] Remote version: {remote_version} (norm={norm_remote})")
         
-        # Use vercmp for proper version comparison
+        # Use in-process vercmp (libalpm semantics) for proper version comparison
         try:
-            result = subprocess.run(['vercmp', norm_source, norm_remote], 
-                                  capture_output=True, text=True, check=False)
-            if result.returncode == 0:
-                cmp_result = int(result.stdout.strip())
-                
-                if cmp_result > 0:
-                    logger.info(f"[VERSION_COMPARE] Result: BUILD (new version is newer)")
-                    return True
-                elif cmp_result == 0:
-                    logger.info(f"[VERSION_COMPARE] Result: SKIP (versions identical)")
-                    
-                    # Check for VCS upstream change for identical versions
-                    if pkg_dir:
-                        is_vcs, vcs_reason = self.detect_vcs_package(pkg_dir)
-                        logger.info(f"VCS_DETECTED={1 if is_vcs else 0} pkg={pkg_dir.name} reason={vcs_reason}")
-                        
-                        if is_vcs:
-                            should_build, upstream_reason = self._check_vcs_upstream_for_identical_versions(pkg_dir, pkgver, remote_version)
-                            if should_build:
-                                logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS upstream changed: {upstream_reason})")
-                                return True
-                    
-                    return False
-                else:
-                    logger.info(f"[VERSION_COMPARE] Result: SKIP (remote version is newer)")
-                    
-                    # Check if this is a VCS package with placeholder version
-                    if pkg_dir:
-                        is_vcs, vcs_reason = self.detect_vcs_package(pkg_dir)
-                        is_placeholder = self.detect_placeholder_version(pkgver, pkgrel, epoch)
-                        
-                        if is_vcs and is_placeholder:
-                            logger.info(f"VCS_DETECTED=1 pkg={pkg_dir.name} reason={vcs_reason}")
-                            logger.info(f"VCS_PLACEHOLDER=1 pkg={pkg_dir.name} source_version={source_version}")
-                            logger.info(f"VCS_PLACEHOLDER_OVERRIDE=1 pkg={pkg_dir.name} source={source_version} remote={remote_version}")
-                            logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS package with placeholder version)")
-                            return True
-                        
-                        # NEW: Also check VCS upstream for non-placeholder VCS packages
-                        # where remote is newer (e.g., Hokibot bumped but upstream changed again).
-                        # IMPORTANT: In this branch the local PKGBUILD pkgver is STALE relative
-                        # to remote, so its embedded hash would spuriously differ from upstream
-                        # HEAD and cause unnecessary rebuilds. Instead, extract pkgver from the
-                        # remote version and pass THAT, so the hash compared against upstream is
-                        # the one embedded in the remote package. Only BUILD if live upstream
-                        # HEAD is genuinely newer than the remote's embedded hash.
-                        if is_vcs:
-                            remote_pkgver = remote_version
-                            if ':' in remote_pkgver:
-                                remote_pkgver = remote_pkgver.split(':', 1)[1]
-                            if '-' in remote_pkgver:
-                                remote_pkgver = remote_pkgver.rsplit('-', 1)[0]
-                            logger.info(f"VCS_UPSTREAM_CHECK_REMOTE_NEWER pkg={pkg_dir.name} local_pkgver={pkgver} remote_pkgver={remote_pkgver}")
-                            should_build, upstream_reason = self._check_vcs_upstream_for_identical_versions(pkg_dir, remote_pkgver, remote_version)
-                            if should_build:
-                                logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS upstream changed even though remote is newer: {upstream_reason})")
-                                return True
-                    
-                    return False
-            else:
-                # Fallback to simple comparison if vercmp fails
-                logger.warning("vercmp failed, using fallback comparison")
-                return self._fallback_version_comparison(remote_version, pkgver, pkgrel, epoch, pkg_dir)
-                
+            cmp_result = vercmp(norm_source, norm_remote)
         except Exception as e:
             logger.warning(f"vercmp comparison failed: {e}, using fallback")
             return self._fallback_version_comparison(remote_version, pkgver, pkgrel, epoch, pkg_dir)
+        
+        if cmp_result > 0:
+            logger.info(f"[VERSION_COMPARE] Result: BUILD (new version is newer)")
+            return True
+        elif cmp_result == 0:
+            logger.info(f"[VERSION_COMPARE] Result: SKIP (versions identical)")
+            
+            # Check for VCS upstream change for identical versions
+            if pkg_dir:
+                is_vcs, vcs_reason = self.detect_vcs_package(pkg_dir)
+                logger.info(f"VCS_DETECTED={1 if is_vcs else 0} pkg={pkg_dir.name} reason={vcs_reason}")
+                
+                if is_vcs:
+                    should_build, upstream_reason = self._check_vcs_upstream_for_identical_versions(pkg_dir, pkgver, remote_version)
+                    if should_build:
+                        logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS upstream changed: {upstream_reason})")
+                        return True
+            
+            return False
+        else:
+            logger.info(f"[VERSION_COMPARE] Result: SKIP (remote version is newer)")
+            
+            # Check if this is a VCS package with placeholder version
+            if pkg_dir:
+                is_vcs, vcs_reason = self.detect_vcs_package(pkg_dir)
+                is_placeholder = self.detect_placeholder_version(pkgver, pkgrel, epoch)
+                
+                if is_vcs and is_placeholder:
+                    logger.info(f"VCS_DETECTED=1 pkg={pkg_dir.name} reason={vcs_reason}")
+                    logger.info(f"VCS_PLACEHOLDER=1 pkg={pkg_dir.name} source_version={source_version}")
+                    logger.info(f"VCS_PLACEHOLDER_OVERRIDE=1 pkg={pkg_dir.name} source={source_version} remote={remote_version}")
+                    logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS package with placeholder version)")
+                    return True
+                
+                # NEW: Also check VCS upstream for non-placeholder VCS packages
+                # where remote is newer (e.g., Hokibot bumped but upstream changed again).
+                # IMPORTANT: In this branch the local PKGBUILD pkgver is STALE relative
+                # to remote, so its embedded hash would spuriously differ from upstream
+                # HEAD and cause unnecessary rebuilds. Instead, extract pkgver from the
+                # remote version and pass THAT, so the hash compared against upstream is
+                # the one embedded in the remote package. Only BUILD if live upstream
+                # HEAD is genuinely newer than the remote's embedded hash.
+                if is_vcs:
+                    remote_pkgver = remote_version
+                    if ':' in remote_pkgver:
+                        remote_pkgver = remote_pkgver.split(':', 1)[1]
+                    if '-' in remote_pkgver:
+                        remote_pkgver = remote_pkgver.rsplit('-', 1)[0]
+                    logger.info(f"VCS_UPSTREAM_CHECK_REMOTE_NEWER pkg={pkg_dir.name} local_pkgver={pkgver} remote_pkgver={remote_pkgver}")
+                    should_build, upstream_reason = self._check_vcs_upstream_for_identical_versions(pkg_dir, remote_pkgver, remote_version)
+                    if should_build:
+                        logger.info(f"[VERSION_COMPARE] Override: BUILD (VCS upstream changed even though remote is newer: {upstream_reason})")
+                        return True
+            
+            return False
     
     def _fallback_version_comparison(self, remote_version: str, pkgver: str, pkgrel: str, epoch: Optional[str], pkg_dir: Optional[Path] = None) -> bool:
         """Fallback version comparison when vercmp is not available"""
@@ -6,13 +6,19 @@ Now with per-package session tracking + conflict resolution.
 import re
 import time
 import logging
+import threading
 from typing import List, Tuple, Optional, Dict, Set
 from pathlib import Path
 
 import config  # for INSTALL_RUNTIME_DEPS_IN_CI and CONFLICT_REMOVE_ALLOWLIST
+from modules.common.srcinfo import load_srcinfo
 
 logger = logging.getLogger(__name__)
 
+# pacman holds a single database lock; serialize all mutating pacman/yay calls
+# across build workers (see modules/build/build_scheduler.py)
+PACMAN_LOCK = threading.RLock()
+
 
 class DependencyInstaller:
     """CI-safe dependency installer with pacman -> yay fallback and session cleanup"""
@@ -92,9 +98,10 @@ class DependencyInstaller:
             for i in range(0, len(pkgs_list), batch_size):
                 batch = pkgs_list[i:i+batch_size]
                 cmd = f"sudo LC_ALL=C pacman -R --noconfirm " + " ".join(batch)
-                result = self.shell_executor.run_command(
-                    cmd, log_cmd=True, check=False, timeout=300
-                )
+                with PACMAN_LOCK:
+                    result = self.shell_executor.run_command(
+                        cmd, log_cmd=True, check=False, timeout=300
+                    )
                 if result.returncode != 0:
                     logger.error(f"DEP_SESSION_REMOVE_FAIL=1 pkg={pkg_name} batch={len(batch)}")
                     success = False
@@ -221,6 +228,7 @@ class DependencyInstaller:
         """
         Install packages with pacman -> yay fallback.
         Handles conflict resolution automatically.
+        Serialized through PACMAN_LOCK so parallel build workers never race on the pacman db.
         
         Args:
             packages: List of package names to install
@@ -230,6 +238,11 @@ class DependencyInstaller:
         Returns:
             True if installation successful, False otherwise
         """
+        with PACMAN_LOCK:
+            return self._install_packages(packages, allow_aur, mode)
+    
+    def _install_packages(self, packages: List[str], allow_aur: bool, mode: str) -> bool:
+        """Install packages (caller holds PACMAN_LOCK)."""
         if not packages:
             return True
         
@@ -321,66 +334,12 @@ class DependencyInstaller:
             pkg_dir: Path to package directory
             
         Returns:
-            Tuple of (makedepends, checkdepends, depends)
+            Tuple of (makedepends, checkdepends, depends); depends is the union over
+            split packages, per-arch entries for the build architecture are included
         """
-        srcinfo_path = pkg_dir / ".SRCINFO"
-        srcinfo_content = None
-        
-        # First try to read existing .SRCINFO
-        if srcinfo_path.exists():
-            try:
-                with open(srcinfo_path, 'r') as f:
-                    srcinfo_content = f.read()
-            except Exception as e:
-                logger.warning(f"Failed to read existing .SRCINFO: {e}")
-        
-        # Generate .SRCINFO if not available
-        if not srcinfo_content:
-            try:
-                result = self.shell_executor.run_command(
-                    'makepkg --printsrcinfo',
-                    cwd=pkg_dir,
-                    capture=True,
-                    check=False,
-                    timeout=60
-                )
-                
-                if result.returncode == 0 and result.stdout:
-                    srcinfo_content = result.stdout
-                    # Also write to .SRCINFO for future use
-                    with open(srcinfo_path, 'w') as f:
-                        f.write(srcinfo_content)
-                else:
-                    logger.warning(f"makepkg --printsrcinfo failed: {result.stderr}")
-                    return [], [], []
-            except Exception as e:
-                logger.warning(f"Error running makepkg --printsrcinfo: {e}")
-                return [], [], []
-        
-        # Parse dependencies from SRCINFO content
-        lines = srcinfo_content.strip().split('\n')
-        
-        makedepends = []
-        checkdepends = []
-        depends = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Look for dependency fields
-            if '=' in line:
-                key, value = line.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-                
-                # Extract all types of dependencies
-                if key == 'makedepends':
-                    makedepends.append(value)
-                elif key == 'checkdepends':
-                    checkdepends.append(value)
-                elif key == 'depends':
-                    depends.append(value)
-        
-        return makedepends, checkdepends, depends
\ No newline at end of file
+        info = load_srcinfo(pkg_dir)
+        if info is None:
+            logger.warning(f"Could not read .SRCINFO for {pkg_dir}")
+            return [], [], []
+        
+        return info.makedepends(), info.checkdepends(), info.depends()
\ No newline at end of file
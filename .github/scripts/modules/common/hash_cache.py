@@ -0,0 +1,343 @@
+"""
+Hash Cache Module - Persistent SHA-256 digests of local files
+
+Digests are keyed by (path, size, mtime_ns, inode): a file that was not
+rewritten since it was last hashed is never read again, within a run or
+across runs (the cache file lives in AUR_BUILD_DIR, which the workflow
+caches). Cache misses are hashed in parallel threads; each file is mapped
+with mmap and fed to hashlib in large slices, which releases the GIL, so
+several multi-GB packages hash concurrently at disk speed.
+
+SHA-256 is used throughout: it is what the remote state manifest records,
+and OpenSSL's implementation is hardware-accelerated on the runners.
+
+Benchmark (run from .github/scripts):
+    python -m modules.common.hash_cache [DIR]
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+
+# Bytes passed to hashlib per update() call (large slices keep the GIL released)
+HASH_SLICE_BYTES = 8 * 1024 * 1024
+
+# Files below this size are read() instead of mapped
+MMAP_MIN_BYTES = 1024 * 1024
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# (size, mtime_ns, inode)
+FileKey = Tuple[int, int, int]
+
+PathLike = Union[str, Path]
+
+
+def file_key(path: PathLike) -> Optional[FileKey]:
+    """Cache key of a file, or None if it is not a readable regular file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def sha256_file(path: PathLike) -> str:
+    """Hex SHA-256 of a file (mmap for large files, uncached)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            digest.update(f.read())
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, HASH_SLICE_BYTES):
+                        digest.update(view[offset:offset + HASH_SLICE_BYTES])
+                finally:
+                    view.release()
+    return digest.hexdigest()
+
+
+class HashCache:
+    """
+    Memory + disk cache of file digests keyed by path and stat identity.
+    """
+
+    def __init__(self, cache_file: Optional[PathLike] = None, workers: int = DEFAULT_WORKERS):
+        """
+        Initialize HashCache.
+
+        Args:
+            cache_file: JSON file persisting the cache (None = memory only)
+            workers: Threads used to hash cache misses
+        """
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.workers = max(1, int(workers))
+        self._entries: Dict[str, Tuple[FileKey, str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self.stats = {"hits": 0, "misses": 0, "bytes_hashed": 0, "failed": 0}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.cache_file is None or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("format") != CACHE_FORMAT_VERSION:
+                return
+            for path, (size, mtime_ns, inode, digest) in data.get("files", {}).items():
+                self._entries[path] = ((int(size), int(mtime_ns), int(inode)), digest)
+            logger.info(f"HASH_CACHE_LOADED entries={len(self._entries)} file={self.cache_file}")
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"HASH_CACHE_UNREADABLE file={self.cache_file} error={e}")
+
+    def save(self):
+        """Write the cache to disk (entries of deleted files are dropped)."""
+        if self.cache_file is None or not self._dirty:
+            return
+        with self._lock:
+            files = {
+                path: [key[0], key[1], key[2], digest]
+                for path, (key, digest) in self._entries.items()
+                if os.path.exists(path)
+            }
+            self._dirty = False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".hash_cache.", dir=str(self.cache_file.parent))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"format": CACHE_FORMAT_VERSION, "files": files}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_file)
+            logger.info(f"HASH_CACHE_SAVED entries={len(files)} file={self.cache_file}")
+        except OSError as e:
+            logger.warning(f"HASH_CACHE_WRITE_FAIL file={self.cache_file} error={e}")
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _lookup(self, path: str, key: FileKey) -> Optional[str]:
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == key:
+                self.stats["hits"] += 1
+                return cached[1]
+        return None
+
+    def _compute(self, path: str, key: FileKey) -> Optional[str]:
+        try:
+            digest = sha256_file(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"HASH_FAIL file={path} error={e}")
+            with self._lock:
+                self.stats["failed"] += 1
+            return None
+        # A file rewritten while it was hashed must not be cached under its old key
+        if file_key(path) != key:
+            logger.debug(f"HASH_CACHE_RACE file={path}")
+            return digest
+        with self._lock:
+            self._entries[path] = (key, digest)
+            self._dirty = True
+            self.stats["misses"] += 1
+            self.stats["bytes_hashed"] += key[0]
+        return digest
+
+    def digest(self, path: PathLike) -> Optional[str]:
+        """
+        SHA-256 of one file.
+
+        Args:
+            path: Local file
+
+        Returns:
+            Hex digest, or None if the file is missing or unreadable
+        """
+        self._load()
+        path = os.path.abspath(path)
+        key = file_key(path)
+        if key is None:
+            return None
+        cached = self._lookup(path, key)
+        return cached if cached is not None else self._compute(path, key)
+
+    def digests(self, paths: Iterable[PathLike]) -> Dict[str, Optional[str]]:
+        """
+        SHA-256 of many files; cache misses are hashed in parallel.
+
+        Args:
+            paths: Local files
+
+        Returns:
+            Dict of path (as given) -> hex digest or None
+        """
+        self._load()
+        results: Dict[str, Optional[str]] = {}
+        pending: List[Tuple[str, str, FileKey]] = []
+        for given in paths:
+            given = str(given)
+            path = os.path.abspath(given)
+            key = file_key(path)
+            if key is None:
+                results[given] = None
+                continue
+            cached = self._lookup(path, key)
+            if cached is not None:
+                results[given] = cached
+            else:
+                pending.append((given, path, key))
+
+        if pending:
+            # Largest first: the longest hashes start immediately
+            pending.sort(key=lambda item: item[2][0], reverse=True)
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                computed = pool.map(lambda item: self._compute(item[1], item[2]), pending)
+                for (given, _, _), digest in zip(pending, computed):
+                    results[given] = digest
+        return results
+
+    def record(self, path: PathLike, key: FileKey, digest: str):
+        """
+        Store a digest computed elsewhere (e.g. in the read pass of another tool).
+
+        Args:
+            path: Local file
+            key: file_key() observed before the file was read
+            digest: Hex SHA-256
+        """
+        self._load()
+        path = os.path.abspath(path)
+        if file_key(path) != key:
+            return
+        with self._lock:
+            self._entries[path] = (key, digest)
+            self._dirty = True
+
+    def same_content(self, a: PathLike, b: PathLike) -> bool:
+        """True if both files exist with identical digests (sizes are compared first)."""
+        key_a, key_b = file_key(a), file_key(b)
+        if key_a is None or key_b is None or key_a[0] != key_b[0]:
+            return False
+        digests = self.digests([a, b])
+        digest_a = digests.get(str(a))
+        return digest_a is not None and digest_a == digests.get(str(b))
+
+    def log_stats(self):
+        """Log hit/miss counters."""
+        s = self.stats
+        logger.info(
+            f"HASH_CACHE_STATS hits={s['hits']} misses={s['misses']} "
+            f"bytes_hashed={s['bytes_hashed']} failed={s['failed']} workers={self.workers}"
+        )
+
+
+_default_cache = HashCache()
+
+
+def get_hash_cache() -> HashCache:
+    """Process-wide HashCache shared by all modules."""
+    return _default_cache
+
+
+def configure_hash_cache(cache_file: Optional[PathLike], workers: Optional[int] = None):
+    """Enable the on-disk layer of the shared cache (and optionally resize its pool)."""
+    _default_cache.cache_file = Path(cache_file) if cache_file else None
+    _default_cache._loaded = False
+    if workers is not None:
+        _default_cache.workers = max(1, int(workers))
+    logger.info(f"HASH_CACHE_FILE={cache_file or 'NONE'} workers={_default_cache.workers}")
+
+
+# ----------------------------------------------------------------------
+# Benchmark: cold (hash everything) vs warm (stat only) vs filecmp
+# ----------------------------------------------------------------------
+
+def _main(argv: List[str]) -> int:
+    import filecmp
+    import shutil
+
+    logging.basicConfig(level=logging.WARNING)
+    tmp_root = None
+    if argv:
+        root = Path(argv[0])
+    else:
+        tmp_root = tempfile.mkdtemp(prefix="hashcache-bench-")
+        root = Path(tmp_root)
+        block = os.urandom(1024 * 1024)
+        for i, size_mb in enumerate((1, 8, 32, 64, 128)):
+            with open(root / f"sample{i}.bin", 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+    try:
+        files = sorted(p for p in root.iterdir() if p.is_file())
+        total = sum(p.stat().st_size for p in files)
+
+        copy_dir = Path(tempfile.mkdtemp(prefix="hashcache-copy-"))
+        copies = []
+        for p in files:
+            copies.append(copy_dir / p.name)
+            shutil.copy2(p, copies[-1])
+
+        start = time.perf_counter()
+        for p, c in zip(files, copies):
+            filecmp.cmp(p, c, shallow=False)
+        t_filecmp = time.perf_counter() - start
+
+        cache = HashCache()
+        start = time.perf_counter()
+        mismatches = sum(0 if cache.same_content(p, c) else 1 for p, c in zip(files, copies))
+        t_cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mismatches += sum(0 if cache.same_content(p, c) else 1 for p, c in zip(files, copies))
+        t_warm = time.perf_counter() - start
+
+        serial = HashCache(workers=1)
+        start = time.perf_counter()
+        serial.digests(files)
+        t_serial = time.perf_counter() - start
+        parallel = HashCache()
+        start = time.perf_counter()
+        parallel.digests(files)
+        t_parallel = time.perf_counter() - start
+
+        shutil.rmtree(copy_dir, ignore_errors=True)
+        mb = total / (1024 * 1024)
+        print(f"files={len(files)} size={mb:.1f}MB mismatches={mismatches}")
+        print(f"filecmp(shallow=False): {t_filecmp:.3f}s")
+        print(f"hash cache cold:        {t_cold:.3f}s")
+        print(f"hash cache warm:        {t_warm * 1000:.2f}ms")
+        print(f"digests serial:         {t_serial:.3f}s ({mb / t_serial if t_serial else 0:.0f}MB/s)")
+        print(f"digests parallel({parallel.workers}):    {t_parallel:.3f}s ({mb / t_parallel if t_parallel else 0:.0f}MB/s)")
+        return 1 if mismatches else 0
+    finally:
+        if tmp_root:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,168 @@
+"""
+Materialize Module - Place a file at a second path without duplicating its data
+
+Mirrored packages are needed both in the VPS mirror and in output_dir.
+Instead of copying every package, each one is placed by the cheapest method
+the filesystems support, in order:
+- reflink: copy-on-write clone (FICLONE; btrfs, XFS, ...), fully independent
+- hardlink: same inode, zero extra bytes (same filesystem only)
+- copy: shutil.copy2
+
+A method that fails with "not supported" / "cross-device" is not retried for
+the rest of the run. Because a hardlinked output file IS the mirror file,
+nothing may write into an existing output_dir package in place: writers call
+detach() first, so a rebuilt package replaces the link instead of
+overwriting the mirror copy.
+"""
+
+import os
+import errno
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: reflink is simply unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+MODES = ("reflink", "hardlink", "copy")
+
+# errno values meaning "this method can not work between these two directories"
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOTTY,
+    errno.EPERM, errno.EMLINK, errno.ENOSYS,
+}
+
+PathLike = Union[str, Path]
+
+
+def _reflink(src: PathLike, dest: PathLike):
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflink not available")
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dest_fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(dest_fd, FICLONE, src_fd)
+        except OSError:
+            os.close(dest_fd)
+            dest_fd = -1
+            os.unlink(dest)
+            raise
+        finally:
+            if dest_fd >= 0:
+                os.close(dest_fd)
+    finally:
+        os.close(src_fd)
+    # Same metadata as copy2 (mtime matters to the hash cache and rsync -a)
+    shutil.copystat(src, dest)
+
+
+def detach(path: PathLike) -> bool:
+    """
+    Remove path before something new is written there, so the write can never
+    go through a hard link into another copy (e.g. the mirror).
+
+    Returns:
+        True if a file was removed
+    """
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class Materializer:
+    """
+    Places files by reflink, hardlink or copy and accounts for the bytes saved.
+    """
+
+    def __init__(self, mode: str = "auto"):
+        """
+        Initialize Materializer.
+
+        Args:
+            mode: 'auto' (reflink -> hardlink -> copy), 'reflink' or 'hardlink'
+                  (each still falling back to copy), or 'copy'
+        """
+        if mode == "auto":
+            self.order: Tuple[str, ...] = MODES
+        elif mode in MODES:
+            self.order = (mode,) if mode == "copy" else (mode, "copy")
+        else:
+            logger.warning(f"MATERIALIZE_MODE_UNKNOWN mode={mode} fallback=auto")
+            self.order = MODES
+        self.mode = mode
+        self._unsupported: Dict[Tuple[int, int, str], int] = {}  # (src dev, dest dev, method) -> errno
+        self.counts = {m: 0 for m in MODES}
+        self.bytes_saved = 0
+        self.bytes_copied = 0
+        self.failed = 0
+
+    def materialize(self, src: PathLike, dest: PathLike) -> Optional[str]:
+        """
+        Create dest as a copy of src (dest must not exist).
+
+        Args:
+            src: Existing file
+            dest: New path
+
+        Returns:
+            Method used ('reflink', 'hardlink', 'copy'), or None on failure
+        """
+        try:
+            size = os.stat(src).st_size
+            devices = (os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dest))).st_dev)
+        except OSError as e:
+            logger.warning(f"MATERIALIZE_FAIL file={os.path.basename(str(dest))} error={e}")
+            self.failed += 1
+            return None
+
+        for method in self.order:
+            if (devices[0], devices[1], method) in self._unsupported:
+                continue
+            try:
+                if method == "reflink":
+                    _reflink(src, dest)
+                elif method == "hardlink":
+                    os.link(src, dest)
+                else:
+                    shutil.copy2(src, dest)
+            except OSError as e:
+                if method != "copy" and e.errno in _UNSUPPORTED_ERRNOS:
+                    self._unsupported[(devices[0], devices[1], method)] = e.errno
+                    logger.info(f"MATERIALIZE_METHOD_UNAVAILABLE method={method} errno={errno.errorcode.get(e.errno, e.errno)}")
+                    continue
+                if method != "copy":
+                    logger.debug(f"MATERIALIZE_RETRY file={os.path.basename(str(dest))} method={method} error={e}")
+                    continue
+                logger.warning(f"MATERIALIZE_FAIL file={os.path.basename(str(dest))} error={e}")
+                self.failed += 1
+                return None
+
+            self.counts[method] += 1
+            if method == "copy":
+                self.bytes_copied += size
+            else:
+                self.bytes_saved += size
+            return method
+
+        self.failed += 1
+        return None
+
+    def log_summary(self, label: str):
+        """Log one MATERIALIZE_SUMMARY line."""
+        used = ','.join(m for m in MODES if self.counts[m]) or 'NONE'
+        logger.info(
+            f"MATERIALIZE_SUMMARY label={label} mode={self.mode} used={used} "
+            f"reflink={self.counts['reflink']} hardlink={self.counts['hardlink']} copy={self.counts['copy']} "
+            f"failed={self.failed} bytes_saved={self.bytes_saved} bytes_copied={self.bytes_copied}"
+        )
@@ -0,0 +1,172 @@
+"""
+Package Filename Module - Canonical parser for pacman package filenames
+
+makepkg names packages "<pkgname>-[<epoch>:]<pkgver>-<pkgrel>-<arch>.pkg.tar[.<ext>]".
+pkgver, pkgrel and arch can never contain '-', so the last three '-' separated
+fields are always version, release and architecture, whatever the pkgname looks
+like (e.g. 'ttf-font-awesome-5-5.15.4-1-any.pkg.tar.zst'). One precompiled
+pattern and an LRU cache make repeated parsing of large listings cheap.
+
+Fuzz and benchmark (run from .github/scripts):
+    python -m modules.common.package_filename [ITERATIONS]
+"""
+
+import re
+import sys
+import time
+import random
+import logging
+import functools
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Size of the memoization cache for parse_package_filename()
+FILENAME_CACHE_SIZE = 65536
+
+# Compression suffixes makepkg can produce (PKGEXT)
+PACKAGE_EXTENSIONS = ("zst", "xz", "gz", "bz2", "lzo", "lrz", "lz4", "lz", "Z")
+
+_FILENAME_RE = re.compile(
+    r'^(?P<name>[^/]+)'
+    r'-(?:(?P<epoch>\d+):)?(?P<pkgver>[^-/:]+)'
+    r'-(?P<pkgrel>[^-/:]+)'
+    r'-(?P<arch>[^-/:.]+)'
+    r'\.pkg\.tar(?P<ext>\.(?:' + '|'.join(PACKAGE_EXTENSIONS) + r'))?$'
+)
+
+
+class PackageFilename(NamedTuple):
+    """Components of a package filename"""
+    name: str
+    epoch: Optional[str]
+    pkgver: str
+    pkgrel: str
+    arch: str
+    ext: str  # compression suffix including the dot (".zst"), "" for plain .pkg.tar
+
+    @property
+    def version(self) -> str:
+        """[epoch:]pkgver-pkgrel, as used in filenames and by vercmp."""
+        if self.epoch:
+            return f"{self.epoch}:{self.pkgver}-{self.pkgrel}"
+        return f"{self.pkgver}-{self.pkgrel}"
+
+    @property
+    def filename(self) -> str:
+        """Reassembled filename."""
+        return f"{self.name}-{self.version}-{self.arch}.pkg.tar{self.ext}"
+
+
+@functools.lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def parse_package_filename(filename: str) -> Optional[PackageFilename]:
+    """
+    Parse a package filename (basename or path; signatures are not packages).
+
+    Args:
+        filename: e.g. 'ttf-font-awesome-5-5.15.4-1-any.pkg.tar.zst'
+
+    Returns:
+        PackageFilename, or None if the name is not a package file
+    """
+    basename = filename.rsplit('/', 1)[-1]
+    match = _FILENAME_RE.match(basename)
+    if not match:
+        return None
+    return PackageFilename(
+        name=match.group('name'),
+        epoch=match.group('epoch'),
+        pkgver=match.group('pkgver'),
+        pkgrel=match.group('pkgrel'),
+        arch=match.group('arch'),
+        ext=match.group('ext') or ""
+    )
+
+
+def is_package_filename(filename: str) -> bool:
+    """True if filename parses as a package file."""
+    return parse_package_filename(filename) is not None
+
+
+# ----------------------------------------------------------------------
+# Fuzz / benchmark
+# ----------------------------------------------------------------------
+
+# (filename, expected (name, version, arch)) - None means "not a package"
+KNOWN_CASES = [
+    ("ttf-font-awesome-5-5.15.4-1-any.pkg.tar.zst", ("ttf-font-awesome-5", "5.15.4-1", "any")),
+    ("qownnotes-26.1.9-1-x86_64.pkg.tar.zst", ("qownnotes", "26.1.9-1", "x86_64")),
+    ("awesome-git-1:r1797.88f5a8a-1-x86_64.pkg.tar.zst", ("awesome-git", "1:r1797.88f5a8a-1", "x86_64")),
+    ("python-foo-2-2:3.0_rc1-2.1-any.pkg.tar.xz", ("python-foo-2", "2:3.0_rc1-2.1", "any")),
+    ("lib32-glibc-2.39+r52-1-x86_64.pkg.tar", ("lib32-glibc", "2.39+r52-1", "x86_64")),
+    ("gtk2-2.24.33-5-x86_64.pkg.tar.zst", ("gtk2", "2.24.33-5", "x86_64")),
+    ("foo-1.0-1-x86_64.pkg.tar.zst.sig", None),
+    ("manjaro-awesome.db.tar.gz", None),
+    ("foo-1.0-x86_64.pkg.tar.zst", None),
+    ("foo-1.0-1-x86_64.tar.zst", None),
+]
+
+_NAME_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789@._+-"
+_VER_CHARS = "abcdefghijklmnopqrstuvwxyzABC0123456789._+~"
+_ARCHES = ("x86_64", "any", "i686", "aarch64", "armv7h", "armv6h", "pentium4")
+
+
+def _random_record(rng: random.Random) -> PackageFilename:
+    name = rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") + ''.join(
+        rng.choice(_NAME_CHARS) for _ in range(rng.randint(0, 24)))
+    if rng.random() < 0.3:
+        # Names ending in "-<digits>" are the classic ambiguity
+        name += f"-{rng.randint(0, 12)}"
+    pkgver = rng.choice("0123456789r") + ''.join(rng.choice(_VER_CHARS) for _ in range(rng.randint(0, 14)))
+    pkgrel = str(rng.randint(1, 20)) + (f".{rng.randint(1, 9)}" if rng.random() < 0.1 else "")
+    epoch = str(rng.randint(1, 9)) if rng.random() < 0.2 else None
+    ext = rng.choice(("", ".zst", ".xz", ".gz"))
+    return PackageFilename(name, epoch, pkgver, pkgrel, rng.choice(_ARCHES), ext)
+
+
+def _main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    iterations = int(argv[1]) if len(argv) > 1 else 100000
+    failures = 0
+
+    # 1. Known edge cases
+    for filename, expected in KNOWN_CASES:
+        record = parse_package_filename(filename)
+        actual = (record.name, record.version, record.arch) if record else None
+        if actual != expected:
+            failures += 1
+            logger.error(f"PKGFILE_KNOWN_MISMATCH file={filename} expected={expected} got={actual}")
+    logger.info(f"PKGFILE_KNOWN_CASES checked={len(KNOWN_CASES)} failures={failures}")
+
+    # 2. Fuzz: round-trip of randomly generated valid records
+    rng = random.Random(0x5EED)
+    records = [_random_record(rng) for _ in range(iterations)]
+    fuzz_failures = 0
+    for record in records:
+        parsed = parse_package_filename(record.filename)
+        if parsed != record:
+            fuzz_failures += 1
+            if fuzz_failures <= 10:
+                logger.error(f"PKGFILE_FUZZ_MISMATCH file={record.filename} expected={record} got={parsed}")
+    logger.info(f"PKGFILE_FUZZ iterations={iterations} failures={fuzz_failures}")
+
+    # 3. Benchmark: cold (cache cleared) vs warm parsing of a corpus that fits the cache
+    filenames = [r.filename for r in records[:FILENAME_CACHE_SIZE]]
+    parse_package_filename.cache_clear()
+    start = time.perf_counter()
+    for filename in filenames:
+        parse_package_filename(filename)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for filename in filenames:
+        parse_package_filename(filename)
+    warm = time.perf_counter() - start
+    logger.info(
+        f"PKGFILE_BENCH files={len(filenames)} cold={cold * 1e6 / len(filenames):.2f}us/file "
+        f"warm={warm * 1e6 / len(filenames):.2f}us/file"
+    )
+    return 1 if (failures or fuzz_failures) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -0,0 +1,833 @@
+"""
+SRCINFO Module - Pure-Python .SRCINFO / PKGBUILD parsing with a content-hash cache
+
+One parser for everything the pipeline needs to know about a PKGBUILD:
+- .SRCINFO with full semantics: pkgbase section, split pkgname sections that
+  override base values (an empty value clears a field), per-arch keys such as
+  depends_x86_64 and source_aarch64.
+- PKGBUILD top-level assignments (scalars, arrays, +=, variable expansion and
+  the common ${var//a/b} / ${var%x} operators) without sourcing it in bash.
+
+SrcInfoCache keys parsed results by the SHA-256 of the PKGBUILD plus its
+auxiliary files and keeps them in memory (each PKGBUILD is parsed once per
+run) and on disk (makepkg --printsrcinfo only runs on a cache miss).
+
+Differential check of the PKGBUILD parser against bash (run from .github/scripts):
+    python -m modules.common.srcinfo [REPO_ROOT]
+"""
+
+import os
+import re
+import sys
+import json
+import fnmatch
+import hashlib
+import logging
+import platform
+import tempfile
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Architecture used to select per-arch keys (depends_<arch>, source_<arch>, ...)
+DEFAULT_ARCH = platform.machine() or "x86_64"
+
+# Source URL prefixes that mark a VCS source
+VCS_SOURCE_PREFIXES = ("git+", "git://", "svn+", "hg+", "bzr+", "fossil+")
+
+# Auxiliary files larger than this are treated as downloaded sources, not inputs
+AUX_FILE_MAX_BYTES = 256 * 1024
+
+CACHE_FORMAT_VERSION = 1
+
+
+# ----------------------------------------------------------------------
+# Parsed representation
+# ----------------------------------------------------------------------
+
+@dataclass
+class SrcInfo:
+    """Parsed .SRCINFO (or PKGBUILD approximation of it)"""
+    pkgbase: str
+    base: Dict[str, List[str]] = field(default_factory=dict)
+    # pkgname -> keys overridden in that pkgname section (in declaration order)
+    packages: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+    origin: str = "srcinfo"  # "srcinfo", "makepkg" or "pkgbuild"
+    content_key: Optional[str] = None
+
+    @property
+    def pkgnames(self) -> List[str]:
+        """Package names produced by this pkgbase."""
+        return list(self.packages) or [self.pkgbase]
+
+    def value(self, key: str) -> Optional[str]:
+        """Last pkgbase value of a key, or None."""
+        values = self.base.get(key)
+        return values[-1] if values else None
+
+    @property
+    def pkgver(self) -> Optional[str]:
+        return self.value("pkgver")
+
+    @property
+    def pkgrel(self) -> Optional[str]:
+        return self.value("pkgrel")
+
+    @property
+    def epoch(self) -> Optional[str]:
+        return self.value("epoch")
+
+    @property
+    def full_version(self) -> Optional[str]:
+        """epoch:pkgver-pkgrel (epoch omitted when unset or 0)."""
+        if not self.pkgver or not self.pkgrel:
+            return None
+        if self.epoch and self.epoch != '0':
+            return f"{self.epoch}:{self.pkgver}-{self.pkgrel}"
+        return f"{self.pkgver}-{self.pkgrel}"
+
+    def _with_arch(self, values_of, key: str, arch: Optional[str]) -> List[str]:
+        arch = arch or DEFAULT_ARCH
+        return list(values_of(key)) + list(values_of(f"{key}_{arch}"))
+
+    def base_field(self, key: str, arch: Optional[str] = None) -> List[str]:
+        """pkgbase values of a key plus its <key>_<arch> variant."""
+        return self._with_arch(lambda k: self.base.get(k, []), key, arch)
+
+    def package_field(self, pkgname: str, key: str, arch: Optional[str] = None) -> List[str]:
+        """Effective values of a key for one split package (override or inherited)."""
+        overrides = self.packages.get(pkgname, {})
+        return self._with_arch(lambda k: overrides[k] if k in overrides else self.base.get(k, []), key, arch)
+
+    def depends(self, arch: Optional[str] = None) -> List[str]:
+        """Union of runtime depends of every produced package."""
+        result: List[str] = []
+        for pkgname in self.pkgnames:
+            result.extend(self.package_field(pkgname, "depends", arch))
+        return list(dict.fromkeys(d for d in result if d))
+
+    def makedepends(self, arch: Optional[str] = None) -> List[str]:
+        return [d for d in self.base_field("makedepends", arch) if d]
+
+    def checkdepends(self, arch: Optional[str] = None) -> List[str]:
+        return [d for d in self.base_field("checkdepends", arch) if d]
+
+    def sources(self, arch: Optional[str] = None) -> List[str]:
+        return [s for s in self.base_field("source", arch) if s]
+
+    def vcs_sources(self, arch: Optional[str] = None) -> List[str]:
+        """Sources whose URL (after an optional name:: prefix) is a VCS URL."""
+        return [s for s in self.sources(arch) if s.split('::', 1)[-1].startswith(VCS_SOURCE_PREFIXES)]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"pkgbase": self.pkgbase, "base": self.base, "packages": self.packages,
+                "origin": self.origin, "content_key": self.content_key}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'SrcInfo':
+        return cls(pkgbase=data["pkgbase"], base=dict(data.get("base") or {}),
+                   packages=dict(data.get("packages") or {}), origin=data.get("origin", "srcinfo"),
+                   content_key=data.get("content_key"))
+
+
+def parse_srcinfo(content: str) -> SrcInfo:
+    """
+    Parse .SRCINFO text.
+
+    Args:
+        content: .SRCINFO content (as written by makepkg --printsrcinfo)
+
+    Returns:
+        SrcInfo with pkgbase values and per-pkgname overrides
+    """
+    info = SrcInfo(pkgbase="")
+    section: Optional[Dict[str, List[str]]] = None
+    section_keys: set = set()
+
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        key, value = key.strip(), value.strip()
+
+        if key == "pkgbase":
+            info.pkgbase = value
+            section, section_keys = info.base, set()
+            continue
+        if key == "pkgname":
+            section, section_keys = info.packages.setdefault(value, {}), set()
+            if not info.pkgbase:
+                info.pkgbase = value
+            continue
+        if section is None:
+            # Values before any header: treat as pkgbase (lenient)
+            section = info.base
+
+        # In a pkgname section the first occurrence replaces the inherited list;
+        # an empty value records an explicit override to "nothing".
+        if key not in section_keys:
+            section[key] = []
+            section_keys.add(key)
+        if value:
+            section[key].append(value)
+
+    return info
+
+
+# ----------------------------------------------------------------------
+# PKGBUILD (bash subset) parser
+# ----------------------------------------------------------------------
+
+_ASSIGN_RE = re.compile(r'^\s*(?:declare\s+(?:-a\s+)?|local\s+)?([A-Za-z_][A-Za-z0-9_]*)(\+?)=(.*)$', re.DOTALL)
+_FUNC_RE = re.compile(r'^\s*(?:function\s+)?([A-Za-z_][\w.-]*)\s*\(\s*\)\s*(\{.*)?$')
+_PARAM_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)(?:\[(@|\*|\d+)\])?(.*)$', re.DOTALL)
+
+
+class _Unresolved(Exception):
+    """Expansion the pure-Python parser does not support (e.g. command substitution)."""
+
+
+def _apply_operator(value: str, op: str, variables: Dict[str, List[str]]) -> str:
+    """Apply a ${name<op>} parameter operator to an already expanded value."""
+    if not op:
+        return value
+    if op.startswith(':-') or op.startswith('-'):
+        default = op[2:] if op.startswith(':-') else op[1:]
+        return value if value else _expand_string(default, variables)
+    if op.startswith(':+') or op.startswith('+'):
+        alt = op[2:] if op.startswith(':+') else op[1:]
+        return _expand_string(alt, variables) if value else ""
+    for prefix, greedy, from_end in (('##', True, False), ('#', False, False), ('%%', True, True), ('%', False, True)):
+        if op.startswith(prefix):
+            pattern = _expand_string(op[len(prefix):], variables)
+            cuts = range(len(value), -1, -1) if greedy != from_end else range(0, len(value) + 1)
+            for cut in cuts:
+                part = value[cut:] if from_end else value[:cut]
+                if fnmatch.fnmatchcase(part, pattern):
+                    return value[:cut] if from_end else value[cut:]
+            return value
+    if op.startswith('/'):
+        replace_all = op.startswith('//')
+        body = op[2:] if replace_all else op[1:]
+        pattern, _, replacement = body.partition('/')
+        pattern = _expand_string(pattern, variables)
+        replacement = _expand_string(replacement, variables)
+        if any(c in pattern for c in '*?['):
+            raise _Unresolved(op)
+        return value.replace(pattern, replacement) if replace_all else value.replace(pattern, replacement, 1)
+    if op in ('^^', ',,', '^', ','):
+        if op == '^^':
+            return value.upper()
+        if op == ',,':
+            return value.lower()
+        return (value[:1].upper() if op == '^' else value[:1].lower()) + value[1:]
+    raise _Unresolved(op)
+
+
+def _expand_param(expr: str, variables: Dict[str, List[str]]) -> List[str]:
+    """Expand the inside of ${...}; returns a list (arrays expand to several words)."""
+    if expr.startswith('#'):
+        name = expr[1:].split('[', 1)[0]
+        return [str(len(variables.get(name, [])) if '[' in expr else len(''.join(variables.get(name, [''])[:1])))]
+    match = _PARAM_RE.match(expr)
+    if not match:
+        raise _Unresolved(expr)
+    name, index, op = match.groups()
+    values = variables.get(name, [])
+    if index in ('@', '*'):
+        return [_apply_operator(v, op, variables) for v in values]
+    position = int(index) if index else 0
+    value = values[position] if position < len(values) else ""
+    return [_apply_operator(value, op, variables)]
+
+
+def _find_closing(text: str, start: int, open_ch: str, close_ch: str) -> int:
+    """Index of the bracket closing the one opened just before start."""
+    depth = 1
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == open_ch:
+            depth += 1
+        elif ch == close_ch:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise _Unresolved("unbalanced")
+
+
+def _expand_string(text: str, variables: Dict[str, List[str]]) -> str:
+    """Expand $var / ${...} inside a double-quoted context."""
+    return ' '.join(_split_words(f'"{text}"', variables)) if text else ""
+
+
+def _split_words(text: str, variables: Dict[str, List[str]]) -> List[str]:
+    """
+    Split a bash word list into expanded words (quotes, escapes, $var, ${...},
+    simple brace lists). Raises _Unresolved on command substitution.
+    """
+    words: List[str] = []
+    current: List[str] = []
+    has_word = False
+    i = 0
+    n = len(text)
+
+    def _flush():
+        nonlocal current, has_word
+        if has_word:
+            words.extend(_brace_expand(''.join(current)))
+        current, has_word = [], False
+
+    while i < n:
+        ch = text[i]
+        if ch in ' \t\n':
+            _flush()
+            i += 1
+        elif ch == '#' and not has_word:
+            while i < n and text[i] != '\n':
+                i += 1
+        elif ch == '\\':
+            if i + 1 < n and text[i + 1] != '\n':
+                current.append('\0' + text[i + 1])
+                has_word = True
+            i += 2
+        elif ch == "'":
+            end = text.find("'", i + 1)
+            if end < 0:
+                raise _Unresolved("unterminated quote")
+            current.extend('\0' + c for c in text[i + 1:end])
+            has_word = True
+            i = end + 1
+        elif ch == '"':
+            i += 1
+            has_word = True
+            while i < n and text[i] != '"':
+                c = text[i]
+                if c == '\\' and i + 1 < n and text[i + 1] in '$`"\\\n':
+                    current.append('\0' + text[i + 1])
+                    i += 2
+                elif c == '$':
+                    expanded, i = _expand_dollar(text, i, variables)
+                    current.extend('\0' + c for c in ' '.join(expanded))
+                elif c == '`':
+                    raise _Unresolved("command substitution")
+                else:
+                    current.append('\0' + c)
+                    i += 1
+            if i >= n:
+                raise _Unresolved("unterminated quote")
+            i += 1
+        elif ch == '$':
+            expanded, i = _expand_dollar(text, i, variables)
+            if expanded:
+                current.append(expanded[0])
+                has_word = True
+                for extra in expanded[1:]:
+                    _flush()
+                    current.append(extra)
+                    has_word = True
+        elif ch == '`':
+            raise _Unresolved("command substitution")
+        else:
+            current.append(ch)
+            has_word = True
+            i += 1
+    _flush()
+    return words
+
+
+def _expand_dollar(text: str, i: int, variables: Dict[str, List[str]]) -> Tuple[List[str], int]:
+    """Expand the $-expression starting at text[i]; returns (words, next index)."""
+    if i + 1 >= len(text):
+        return ['$'], i + 1
+    nxt = text[i + 1]
+    if nxt == '(':
+        raise _Unresolved("command substitution")
+    if nxt == '{':
+        end = _find_closing(text, i + 2, '{', '}')
+        return _expand_param(text[i + 2:end], variables), end + 1
+    match = re.match(r'[A-Za-z_][A-Za-z0-9_]*', text[i + 1:])
+    if not match:
+        return ['$'], i + 1
+    name = match.group(0)
+    values = variables.get(name, [])
+    return [values[0] if values else ""], i + 1 + len(name)
+
+
+def _brace_expand(word: str) -> List[str]:
+    """Expand one unquoted {a,b} list; quoted characters are marked with NUL prefixes."""
+    plain = []
+    depth_start = -1
+    i = 0
+    while i < len(word):
+        if word[i] == '\0':
+            i += 2
+            continue
+        if word[i] == '{' and depth_start < 0:
+            depth_start = i
+        elif word[i] == '}' and depth_start >= 0:
+            inner = word[depth_start + 1:i]
+            if ',' in inner.replace('\0,', ''):
+                prefix, suffix = word[:depth_start], word[i + 1:]
+                parts = re.split(r'(?<!\0),', inner)
+                for part in parts:
+                    plain.extend(_brace_expand(prefix + part + suffix))
+                return plain
+            depth_start = -1
+        i += 1
+    return [word.replace('\0', '')] if '\0' in word else [word]
+
+
+def _statements(text: str) -> List[str]:
+    """Top-level statements of a PKGBUILD, with function bodies removed."""
+    statements: List[str] = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            i += 1
+            continue
+
+        func = _FUNC_RE.match(line)
+        if func:
+            # Skip the function body by brace depth (quoted braces are rare in PKGBUILDs)
+            depth = line.count('{') - line.count('}')
+            i += 1
+            if depth <= 0 and not func.group(2):
+                while i < len(lines) and '{' not in lines[i]:
+                    i += 1
+                if i < len(lines):
+                    depth = lines[i].count('{') - lines[i].count('}')
+                    i += 1
+            while i < len(lines) and depth > 0:
+                depth += lines[i].count('{') - lines[i].count('}')
+                i += 1
+            continue
+
+        # Join continuation lines and multi-line arrays / quotes
+        statement = line
+        i += 1
+        while i < len(lines) and (_open_constructs(statement) or statement.rstrip().endswith('\\')):
+            if statement.rstrip().endswith('\\'):
+                statement = statement.rstrip()[:-1] + ' ' + lines[i]
+            else:
+                statement += '\n' + lines[i]
+            i += 1
+        statements.append(statement)
+    return statements
+
+
+def _open_constructs(text: str) -> bool:
+    """True if text has an unclosed quote or parenthesis (outside quotes/comments)."""
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\' and quote == '"':
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch == '\\':
+            i += 2
+            continue
+        elif ch in ('"', "'"):
+            quote = ch
+        elif ch == '#' and (i == 0 or text[i - 1] in ' \t\n('):
+            while i < len(text) and text[i] != '\n':
+                i += 1
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        i += 1
+    return quote is not None or depth > 0
+
+
+def parse_pkgbuild(content: str) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Evaluate the top-level variable assignments of a PKGBUILD.
+
+    Function bodies are skipped; assignments inside top-level conditionals are
+    applied unconditionally. Unsupported expansions leave the variable unset.
+
+    Args:
+        content: PKGBUILD text
+
+    Returns:
+        Tuple of (variables: name -> list of values, names left unresolved)
+    """
+    variables: Dict[str, List[str]] = {}
+    unresolved: List[str] = []
+
+    for statement in _statements(content):
+        # A line may hold several assignments (e.g. "pkgver=1; pkgrel=2")
+        for part in re.split(r';\s*(?=[A-Za-z_][A-Za-z0-9_]*\+?=)', statement):
+            match = _ASSIGN_RE.match(part)
+            if not match:
+                continue
+            name, append, value = match.groups()
+            value = value.strip()
+            try:
+                if value.startswith('('):
+                    end = value.rfind(')')
+                    words = _split_words(value[1:end] if end > 0 else value[1:], variables)
+                else:
+                    words = _split_words(value, variables)[:1] or [""]
+            except _Unresolved:
+                unresolved.append(name)
+                continue
+            if append:
+                variables[name] = variables.get(name, []) + words
+            else:
+                variables[name] = words
+    return variables, unresolved
+
+
+def srcinfo_from_pkgbuild(content: str) -> SrcInfo:
+    """
+    Approximate .SRCINFO from PKGBUILD top-level variables (no makepkg).
+    Overrides inside package_<name>() functions are not evaluated.
+
+    Args:
+        content: PKGBUILD text
+
+    Returns:
+        SrcInfo with origin "pkgbuild"
+    """
+    variables, _ = parse_pkgbuild(content)
+    pkgnames = [n for n in variables.get("pkgname", []) if n]
+    pkgbase = (variables.get("pkgbase") or pkgnames[:1] or [""])[0]
+    base = {key: [v for v in values if v] for key, values in variables.items()
+            if key not in ("pkgname", "pkgbase") and not key.startswith('_')}
+    return SrcInfo(pkgbase=pkgbase, base=base, packages={name: {} for name in pkgnames}, origin="pkgbuild")
+
+
+# ----------------------------------------------------------------------
+# Content-hash cache
+# ----------------------------------------------------------------------
+
+def content_key(pkg_dir: Path) -> Optional[str]:
+    """
+    SHA-256 over the PKGBUILD and auxiliary files of a package directory.
+
+    Auxiliary files are top-level regular files except dotfiles (.SRCINFO,
+    .git), built packages, logs and anything above AUX_FILE_MAX_BYTES
+    (downloaded sources).
+
+    Args:
+        pkg_dir: Package directory
+
+    Returns:
+        Hex digest, or None if there is no readable PKGBUILD
+    """
+    digest = hashlib.sha256()
+    try:
+        digest.update(b"PKGBUILD\0" + (pkg_dir / "PKGBUILD").read_bytes())
+        for path in sorted(pkg_dir.iterdir()):
+            name = path.name
+            if (name == "PKGBUILD" or name.startswith('.') or '.pkg.tar' in name
+                    or name.endswith('.log') or not path.is_file()):
+                continue
+            if path.stat().st_size > AUX_FILE_MAX_BYTES:
+                continue
+            digest.update(b"\0" + name.encode() + b"\0" + path.read_bytes())
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class SrcInfoCache:
+    """
+    Memory + disk cache of parsed .SRCINFO keyed by content_key().
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        """
+        Initialize SrcInfoCache.
+
+        Args:
+            cache_dir: Directory for <content_key>.json files (None = memory only)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memory: Dict[str, SrcInfo] = {}
+        self._lock = threading.Lock()
+        self._dir_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"memory": 0, "disk": 0, "srcinfo": 0, "makepkg": 0, "pkgbuild": 0, "failed": 0}
+
+    def _dir_lock(self, pkg_dir: Path) -> threading.Lock:
+        with self._lock:
+            return self._dir_locks.setdefault(str(pkg_dir), threading.Lock())
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.stats[kind] += 1
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        return self.cache_dir / f"{key}.json" if self.cache_dir else None
+
+    def _read_disk(self, key: str) -> Optional[SrcInfo]:
+        path = self._disk_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("format") != CACHE_FORMAT_VERSION:
+                return None
+            return SrcInfo.from_dict(data["srcinfo"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"SRCINFO_CACHE_UNREADABLE key={key[:12]} error={e}")
+            return None
+
+    def _write_disk(self, key: str, info: SrcInfo):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".srcinfo.", dir=str(path.parent))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"format": CACHE_FORMAT_VERSION, "srcinfo": info.to_dict()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"SRCINFO_CACHE_WRITE_FAIL key={key[:12]} error={e}")
+
+    def _remember(self, key: str, info: SrcInfo, persist: bool) -> SrcInfo:
+        info.content_key = key
+        with self._lock:
+            self._memory[key] = info
+        if persist:
+            self._write_disk(key, info)
+        return info
+
+    def peek(self, pkg_dir: Path) -> Optional[SrcInfo]:
+        """
+        Parsed metadata without running makepkg: memory, disk, an existing
+        .SRCINFO, or else the pure-Python PKGBUILD approximation (not persisted).
+
+        Args:
+            pkg_dir: Package directory
+
+        Returns:
+            SrcInfo, or None if the PKGBUILD is unreadable
+        """
+        return self._resolve(Path(pkg_dir), allow_makepkg=False)
+
+    def load(self, pkg_dir: Path) -> Optional[SrcInfo]:
+        """
+        Authoritative metadata: memory, disk, an existing .SRCINFO, or
+        makepkg --printsrcinfo (written to .SRCINFO). Falls back to the
+        PKGBUILD approximation only if makepkg fails.
+
+        Args:
+            pkg_dir: Package directory
+
+        Returns:
+            SrcInfo, or None if nothing could be parsed
+        """
+        return self._resolve(Path(pkg_dir), allow_makepkg=True)
+
+    def _resolve(self, pkg_dir: Path, allow_makepkg: bool) -> Optional[SrcInfo]:
+        key = content_key(pkg_dir)
+        if key is None:
+            self._count("failed")
+            return None
+
+        with self._dir_lock(pkg_dir):
+            with self._lock:
+                cached = self._memory.get(key)
+            if cached is not None and (cached.origin != "pkgbuild" or not allow_makepkg):
+                self._count("memory")
+                return cached
+
+            on_disk = self._read_disk(key)
+            if on_disk is not None:
+                self._count("disk")
+                return self._remember(key, on_disk, persist=False)
+
+            srcinfo_path = pkg_dir / ".SRCINFO"
+            if srcinfo_path.exists():
+                try:
+                    info = parse_srcinfo(srcinfo_path.read_text(encoding='utf-8', errors='replace'))
+                    if info.pkgbase:
+                        self._count("srcinfo")
+                        return self._remember(key, info, persist=True)
+                except OSError as e:
+                    logger.warning(f"Failed to read {srcinfo_path}: {e}")
+
+            if allow_makepkg:
+                info = self._run_makepkg(pkg_dir)
+                if info is not None:
+                    self._count("makepkg")
+                    return self._remember(key, info, persist=True)
+
+            if cached is not None:
+                return cached
+            try:
+                info = srcinfo_from_pkgbuild((pkg_dir / "PKGBUILD").read_text(encoding='utf-8', errors='replace'))
+            except OSError:
+                self._count("failed")
+                return None
+            self._count("pkgbuild")
+            return self._remember(key, info, persist=False)
+
+    @staticmethod
+    def _run_makepkg(pkg_dir: Path) -> Optional[SrcInfo]:
+        """Generate .SRCINFO with makepkg --printsrcinfo and save it next to the PKGBUILD."""
+        try:
+            result = subprocess.run(
+                ['makepkg', '--printsrcinfo'],
+                cwd=pkg_dir,
+                capture_output=True,
+                text=True,
+                check=False,
+                timeout=60
+            )
+        except Exception as e:
+            logger.warning(f"makepkg --printsrcinfo failed for {pkg_dir.name}: {e}")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            logger.warning(f"makepkg --printsrcinfo failed for {pkg_dir.name}: {result.stderr[:200]}")
+            return None
+        try:
+            (pkg_dir / ".SRCINFO").write_text(result.stdout)
+        except OSError:
+            pass
+        info = parse_srcinfo(result.stdout)
+        info.origin = "makepkg"
+        return info
+
+    def log_stats(self):
+        """Log hit/miss counters."""
+        s = self.stats
+        logger.info(
+            f"SRCINFO_CACHE_STATS memory={s['memory']} disk={s['disk']} srcinfo={s['srcinfo']} "
+            f"makepkg={s['makepkg']} pkgbuild={s['pkgbuild']} failed={s['failed']}"
+        )
+
+
+_default_cache = SrcInfoCache()
+
+
+def get_srcinfo_cache() -> SrcInfoCache:
+    """Process-wide SrcInfoCache shared by all modules."""
+    return _default_cache
+
+
+def configure_srcinfo_cache(cache_dir: Optional[Path]):
+    """Enable the on-disk layer of the shared cache."""
+    _default_cache.cache_dir = Path(cache_dir) if cache_dir else None
+    logger.info(f"SRCINFO_CACHE_DIR={cache_dir or 'NONE'}")
+
+
+def load_srcinfo(pkg_dir: Path) -> Optional[SrcInfo]:
+    """Shortcut for get_srcinfo_cache().load(pkg_dir)."""
+    return _default_cache.load(pkg_dir)
+
+
+# ----------------------------------------------------------------------
+# Self-check
+# ----------------------------------------------------------------------
+
+_SPLIT_SRCINFO = """pkgbase = demo
+\tpkgver = 1.2
+\tpkgrel = 3
+\tepoch = 1
+\tmakedepends = cmake
+\tmakedepends_x86_64 = nasm
+\tdepends = glibc
+\tsource = git+https://example.org/demo.git
+\tsource_aarch64 = https://example.org/demo-arm.tar.gz
+
+pkgname = demo
+\tdepends = glibc
+\tdepends = zlib
+\tdepends_x86_64 = lib32-glibc
+
+pkgname = demo-docs
+\tdepends =
+"""
+
+_BASH_DUMP = r'''
+source "$1" >/dev/null 2>&1
+for v in pkgname pkgver pkgrel epoch depends makedepends checkdepends; do
+    eval "vals=(\"\${$v[@]}\")"
+    printf '%s' "$v"; for x in "${vals[@]}"; do printf '\x1f%s' "$x"; done; printf '\n'
+done
+'''
+
+
+def _bash_fields(pkgbuild: Path) -> Optional[Dict[str, List[str]]]:
+    try:
+        result = subprocess.run(["bash", "-c", _BASH_DUMP, "_", str(pkgbuild)], capture_output=True,
+                                stdin=subprocess.DEVNULL, text=True, check=False, timeout=10,
+                                cwd=pkgbuild.parent)
+    except subprocess.TimeoutExpired:
+        # Top-level code doing network I/O; not comparable
+        logger.warning(f"SRCINFO_BASH_TIMEOUT pkg={pkgbuild.parent.name}")
+        return None
+    if result.returncode != 0:
+        return None
+    fields = {}
+    for line in result.stdout.splitlines():
+        name, *values = line.split('\x1f')
+        fields[name] = [v for v in values if v]
+    return fields
+
+
+def _main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    repo_root = Path(argv[1]) if len(argv) > 1 else Path(__file__).resolve().parents[4]
+    failures = 0
+
+    # 1. .SRCINFO semantics
+    info = parse_srcinfo(_SPLIT_SRCINFO)
+    checks = [
+        (info.pkgnames, ["demo", "demo-docs"]),
+        (info.full_version, "1:1.2-3"),
+        (info.package_field("demo", "depends", "x86_64"), ["glibc", "zlib", "lib32-glibc"]),
+        (info.package_field("demo-docs", "depends", "x86_64"), []),
+        (info.makedepends("x86_64"), ["cmake", "nasm"]),
+        (info.vcs_sources("x86_64"), ["git+https://example.org/demo.git"]),
+        (info.sources("aarch64"), ["git+https://example.org/demo.git", "https://example.org/demo-arm.tar.gz"]),
+    ]
+    for index, (actual, expected) in enumerate(checks):
+        if actual != expected:
+            failures += 1
+            logger.error(f"SRCINFO_CHECK_FAIL case={index} expected={expected} got={actual}")
+    logger.info(f"SRCINFO_SEMANTICS checked={len(checks)} failures={failures}")
+
+    # 2. PKGBUILD parser vs bash on every PKGBUILD in the repository
+    compared = mismatches = 0
+    for pkgbuild in sorted(repo_root.glob("*/PKGBUILD")):
+        expected = _bash_fields(pkgbuild)
+        if expected is None:
+            continue
+        variables, _ = parse_pkgbuild(pkgbuild.read_text(errors='replace'))
+        compared += 1
+        for name, want in expected.items():
+            got = [v for v in variables.get(name, []) if v]
+            if got != want:
+                mismatches += 1
+                logger.error(f"SRCINFO_PKGBUILD_MISMATCH pkg={pkgbuild.parent.name} var={name} bash={want} python={got}")
+    logger.info(f"SRCINFO_PKGBUILD_DIFFERENTIAL compared={compared} mismatches={mismatches}")
+    return 1 if (failures or mismatches) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
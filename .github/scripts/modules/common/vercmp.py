@@ -0,0 +1,326 @@
+"""
+Vercmp Module - In-process port of pacman's version comparison
+
+Pure-Python implementation of libalpm's alpm_pkg_vercmp() (lib/libalpm/version.c):
+epoch:pkgver-pkgrel split (parseEVR) followed by rpmvercmp() on each part.
+Results are memoized, so sorting many package versions costs no process spawns.
+
+Differential check against the real binary (run from .github/scripts):
+    python -m modules.common.vercmp [REPO_ROOT]
+"""
+
+import re
+import sys
+import shutil
+import logging
+import functools
+import itertools
+import subprocess
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Size of the memoization cache for vercmp()
+VERCMP_CACHE_SIZE = 65536
+
+
+def _isdigit(ch: str) -> bool:
+    return '0' <= ch <= '9'
+
+
+def _isalpha(ch: str) -> bool:
+    return 'a' <= ch <= 'z' or 'A' <= ch <= 'Z'
+
+
+def _isalnum(ch: str) -> bool:
+    return _isdigit(ch) or _isalpha(ch)
+
+
+def rpmvercmp(a: str, b: str) -> int:
+    """
+    Compare two version segments the way rpmvercmp() does.
+
+    Args:
+        a: First segment (epoch, pkgver or pkgrel)
+        b: Second segment
+
+    Returns:
+        -1 if a < b, 0 if equal, 1 if a > b
+    """
+    if a == b:
+        return 0
+
+    len1, len2 = len(a), len(b)
+    one = ptr1 = 0
+    two = ptr2 = 0
+
+    # Loop through each version segment of a and b and compare them
+    while one < len1 and two < len2:
+        while one < len1 and not _isalnum(a[one]):
+            one += 1
+        while two < len2 and not _isalnum(b[two]):
+            two += 1
+
+        # If we ran to the end of either, we are finished with the loop
+        if one >= len1 or two >= len2:
+            break
+
+        # If the separator lengths were different, we are also finished
+        if (one - ptr1) != (two - ptr2):
+            return -1 if (one - ptr1) < (two - ptr2) else 1
+
+        ptr1, ptr2 = one, two
+
+        # Grab first completely alpha or completely numeric segment
+        if _isdigit(a[ptr1]):
+            while ptr1 < len1 and _isdigit(a[ptr1]):
+                ptr1 += 1
+            while ptr2 < len2 and _isdigit(b[ptr2]):
+                ptr2 += 1
+            isnum = True
+        else:
+            while ptr1 < len1 and _isalpha(a[ptr1]):
+                ptr1 += 1
+            while ptr2 < len2 and _isalpha(b[ptr2]):
+                ptr2 += 1
+            isnum = False
+
+        # This cannot happen, as we previously tested to make sure that
+        # the first string has a non-null segment
+        if one == ptr1:
+            return -1
+
+        # Numeric segments are always newer than alpha segments
+        if two == ptr2:
+            return 1 if isnum else -1
+
+        seg1, seg2 = a[one:ptr1], b[two:ptr2]
+        if isnum:
+            # Throw away any leading zeros - it's a number, right?
+            seg1 = seg1.lstrip('0')
+            seg2 = seg2.lstrip('0')
+            # Whichever number has more digits wins
+            if len(seg1) > len(seg2):
+                return 1
+            if len(seg2) > len(seg1):
+                return -1
+
+        # Plain byte-wise comparison (strcmp) of equal-kind segments
+        if seg1 != seg2:
+            return -1 if seg1 < seg2 else 1
+
+        one, two = ptr1, ptr2
+
+    # This catches the case where all segments compared identically
+    # but the segment separating characters were different
+    if one >= len1 and two >= len2:
+        return 0
+
+    # The final showdown: a remaining alpha string never beats an empty string.
+    # - if one is empty and two is not an alpha, two is newer
+    # - if one is an alpha, two is newer
+    # - otherwise one is newer
+    rest1 = a[one] if one < len1 else ''
+    rest2 = b[two] if two < len2 else ''
+    if (not rest1 and not _isalpha(rest2)) or (rest1 and _isalpha(rest1)):
+        return -1
+    return 1
+
+
+def parse_evr(evr: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Split a full version string into (epoch, pkgver, pkgrel) like parseEVR().
+
+    Args:
+        evr: Version string such as "1:2.3-4", "2.3-4" or "2.3"
+
+    Returns:
+        Tuple of (epoch, pkgver, pkgrel); epoch defaults to "0", pkgrel may be None
+    """
+    # Epoch terminator: first non-digit character
+    pos = 0
+    while pos < len(evr) and _isdigit(evr[pos]):
+        pos += 1
+
+    # Release separator is the last '-' after the epoch digits
+    dash = evr.rfind('-', pos)
+
+    if pos < len(evr) and evr[pos] == ':':
+        epoch = evr[:pos] or "0"
+        version_start = pos + 1
+    else:
+        # Different from RPM: always assume 0 epoch
+        epoch = "0"
+        version_start = 0
+
+    if dash != -1:
+        return epoch, evr[version_start:dash], evr[dash + 1:]
+    return epoch, evr[version_start:], None
+
+
+@functools.lru_cache(maxsize=VERCMP_CACHE_SIZE)
+def vercmp(a: Optional[str], b: Optional[str]) -> int:
+    """
+    Compare two package versions exactly like `vercmp a b` / alpm_pkg_vercmp().
+
+    Args:
+        a: First version (epoch:pkgver-pkgrel, epoch and pkgrel optional)
+        b: Second version
+
+    Returns:
+        -1 if a is older than b, 0 if equal, 1 if a is newer
+    """
+    # Ensure our strings are not null
+    if a is None and b is None:
+        return 0
+    if a is None:
+        return -1
+    if b is None:
+        return 1
+
+    # Another quick shortcut- if full version specs are equal
+    if a == b:
+        return 0
+
+    epoch1, ver1, rel1 = parse_evr(a)
+    epoch2, ver2, rel2 = parse_evr(b)
+
+    ret = rpmvercmp(epoch1, epoch2)
+    if ret == 0:
+        ret = rpmvercmp(ver1, ver2)
+        if ret == 0 and rel1 is not None and rel2 is not None:
+            ret = rpmvercmp(rel1, rel2)
+    return ret
+
+
+# Key function for sorted()/max()/min() over version strings
+vercmp_key = functools.cmp_to_key(vercmp)
+
+
+def sort_versions(versions: Iterable[str], newest_first: bool = False) -> List[str]:
+    """
+    Sort version strings with vercmp ordering.
+
+    Args:
+        versions: Version strings
+        newest_first: Sort descending when True
+
+    Returns:
+        Sorted list
+    """
+    return sorted(versions, key=vercmp_key, reverse=newest_first)
+
+
+# ----------------------------------------------------------------------
+# Differential check against the real vercmp binary
+# ----------------------------------------------------------------------
+
+# Cases from pacman's test/util/vercmptest.sh (expected result of vercmp(a, b))
+KNOWN_CASES = [
+    ("1.5.0", "1.5.0", 0), ("1.5.1", "1.5.0", 1), ("1.5.1", "1.5", 1),
+    ("1.5.0-1", "1.5.0-1", 0), ("1.5.0-1", "1.5.0-2", -1), ("1.5.0-1", "1.5.1-1", -1),
+    ("1.5.0-2", "1.5.1-1", -1), ("1.5-1", "1.5.1-1", -1), ("1.5-2", "1.5.1-1", -1),
+    ("1.5-2", "1.5.1-2", -1), ("1.5", "1.5-1", 0), ("1.5-1", "1.5", 0),
+    ("1.1-1", "1.1", 0), ("1.0-1", "1.1", -1), ("1.1-1", "1.0", 1),
+    ("1.5b-1", "1.5-1", -1), ("1.5b", "1.5", -1), ("1.5b-1", "1.5", -1), ("1.5b", "1.5.1", -1),
+    ("1.0a", "1.0alpha", -1), ("1.0alpha", "1.0b", -1), ("1.0b", "1.0beta", -1),
+    ("1.0beta", "1.0rc", -1), ("1.0rc", "1.0", -1),
+    ("1.5.a", "1.5", 1), ("1.5.b", "1.5.a", 1), ("1.5.1", "1.5.b", 1),
+    ("1.5.b-1", "1.5.b", 0), ("1.5-1", "1.5.b", -1),
+    ("2.0", "2_0", 0), ("2.0_a", "2_0.a", 0), ("2.0a", "2.0.a", -1), ("2___a", "2_a", 1),
+    ("0:1.0", "0:1.0", 0), ("0:1.0", "0:1.1", -1), ("1:1.0", "0:1.0", 1),
+    ("1:1.0", "0:1.1", 1), ("1:1.0", "2:1.1", -1), ("1:1.0", "0:1.0-1", 1),
+    ("1:1.0-1", "0:1.1-1", 1), ("0:1.0", "1.0", 0), ("0:1.0", "1.1", -1),
+    ("0:1.1", "1.0", 1), ("1:1.0", "1.0", 1), ("1:1.0", "1.1", 1), ("1:1.1", "1.1", 1),
+]
+
+_PKGBUILD_FIELD_RE = re.compile(r'^\s*(pkgver|pkgrel|epoch)\s*=\s*["\']?([^"\'\s#]+)', re.MULTILINE)
+
+
+def collect_repo_versions(repo_root: Path) -> List[str]:
+    """
+    Collect full version strings from every PKGBUILD/.SRCINFO in the repository.
+
+    Args:
+        repo_root: Repository root directory
+
+    Returns:
+        Sorted list of unique version strings (literal values only, no shell expansion)
+    """
+    versions = set()
+    for name in ("PKGBUILD", ".SRCINFO"):
+        for path in repo_root.glob(f"*/{name}"):
+            try:
+                fields = dict(_PKGBUILD_FIELD_RE.findall(path.read_text(errors='replace')))
+            except OSError:
+                continue
+            pkgver = fields.get("pkgver")
+            if not pkgver or '$' in pkgver:
+                continue
+            pkgrel = fields.get("pkgrel", "1")
+            epoch = fields.get("epoch")
+            versions.add(pkgver)
+            versions.add(f"{pkgver}-{pkgrel}")
+            if epoch and epoch != "0":
+                versions.add(f"{epoch}:{pkgver}-{pkgrel}")
+    return sorted(versions)
+
+
+def run_differential_check(versions: List[str], vercmp_bin: str = "vercmp") -> Tuple[int, List[str]]:
+    """
+    Compare vercmp() with the vercmp binary on all pairs of versions.
+
+    Args:
+        versions: Version corpus
+        vercmp_bin: Path/name of the pacman vercmp binary
+
+    Returns:
+        Tuple of (pairs_checked, mismatch descriptions)
+    """
+    mismatches = []
+    checked = 0
+    for a, b in itertools.combinations(versions, 2):
+        result = subprocess.run([vercmp_bin, a, b], capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            mismatches.append(f"{a} {b}: binary failed: {result.stderr.strip()}")
+            continue
+        expected = int(result.stdout.strip())
+        actual = vercmp(a, b)
+        checked += 1
+        if (expected > 0) - (expected < 0) != actual:
+            mismatches.append(f"{a} {b}: vercmp={expected} python={actual}")
+    return checked, mismatches
+
+
+def _main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    repo_root = Path(argv[1]) if len(argv) > 1 else Path(__file__).resolve().parents[4]
+
+    # 1. Known cases (no binary required)
+    failures = 0
+    for a, b, expected in KNOWN_CASES:
+        for x, y, exp in ((a, b, expected), (b, a, -expected)):
+            actual = vercmp(x, y)
+            if actual != exp:
+                failures += 1
+                logger.error(f"VERCMP_KNOWN_MISMATCH a={x} b={y} expected={exp} got={actual}")
+    logger.info(f"VERCMP_KNOWN_CASES checked={len(KNOWN_CASES) * 2} failures={failures}")
+
+    # 2. Differential check against the real binary on the repo corpus
+    corpus = collect_repo_versions(repo_root)
+    corpus += [v for case in KNOWN_CASES for v in case[:2]]
+    corpus = sorted(set(corpus))
+    if not shutil.which("vercmp"):
+        logger.warning(f"VERCMP_DIFFERENTIAL_SKIPPED=1 reason=binary_not_found corpus={len(corpus)}")
+        return 1 if failures else 0
+
+    checked, mismatches = run_differential_check(corpus)
+    for line in mismatches:
+        logger.error(f"VERCMP_DIFF_MISMATCH {line}")
+    logger.info(f"VERCMP_DIFFERENTIAL corpus={len(corpus)} pairs={checked} mismatches={len(mismatches)}")
+    return 1 if (failures or mismatches) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
@@ -4,19 +4,27 @@ WITH IMPROVED DELETION OBSERVABILITY AND VERSION NORMALIZATION
 
 CRITICAL: Version cleanup logic has been moved to SmartCleanup.
 This module now handles ONLY:
-1. Server cleanup (VPS zombie package removal)
+1. Remote cleanup (orphan signatures, VPS hygiene and version prune in one
+   pass, see modules.repo.cleanup_planner)
 2. Database file maintenance
-3. VPS hygiene (extras classification and safe deletion)
 """
 
 import os
 import subprocess
 import shutil
-import hashlib
+import json
 import logging
 from pathlib import Path
-from typing import List, Optional, Set, Tuple, Dict
-import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from modules.common.package_filename import parse_package_filename
+from modules.common.vercmp import vercmp
+from modules.repo.metadata_sidecar import SIDECAR_DIRNAME, sidecar_name
+from modules.repo.cleanup_planner import CleanupPlan, CleanupPolicy, log_plan, plan_cleanup
+from modules.repo.package_metadata import PackageMetadata
+from modules.vps.remote_delete import RemoteDeletionResult, delete_command, encode_paths, parse_output
+from modules.vps.remote_state_manifest import state_manifest_name
+from modules.vps.ssh_connection import SSHConnectionManager
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +35,8 @@ class CleanupManager:
     
     CRITICAL: Version cleanup is now handled by SmartCleanup.
     This module only handles:
-    1. Server cleanup (removing zombie packages from VPS)
+    1. Remote cleanup (run_remote_cleanup: one plan for every cleanup rule)
     2. Database file maintenance
-    3. VPS hygiene (safe extras removal)
     """
     
     def __init__(self, config: dict):
@@ -44,6 +51,8 @@ class CleanupManager:
                 - mirror_temp_dir: Temporary mirror directory
                 - vps_user: VPS username
                 - vps_host: VPS hostname
+                - ssh_options: SSH options list (optional)
+                - connection: Optional shared SSHConnectionManager
         """
         self.repo_name = config['repo_name']
         self.output_dir = Path(config['output_dir'])
@@ -51,6 +60,35 @@ class CleanupManager:
         self.mirror_temp_dir = Path(config.get('mirror_temp_dir', '/tmp/repo_mirror'))
         self.vps_user = config['vps_user']
         self.vps_host = config['vps_host']
+        self.inventory_provider = None  # NEW: shared remote inventory snapshot (SSHClient)
+        self.state_manifest_dropped = False  # NEW: a deletion removed the remote state manifest
+        # NEW: remote packages represented by metadata sidecars instead of files in output_dir
+        self.sidecar_packages: Dict[str, PackageMetadata] = {}
+        import config as build_config
+        self.remote_sidecars = getattr(build_config, 'REMOTE_METADATA_SIDECARS', False)
+        # NEW: shared multiplexed connection (plain per-call ssh when none is configured)
+        self.connection = config.get('connection') or SSHConnectionManager(
+            self.vps_user, self.vps_host, config.get('ssh_options', []), multiplex=False)
+    
+    def set_inventory_provider(self, provider):
+        """
+        Use a shared remote inventory snapshot instead of listing the VPS per operation.
+        
+        Args:
+            provider: Object with get_inventory() and invalidate_inventory() (SSHClient)
+        """
+        self.inventory_provider = provider
+    
+    def set_sidecar_packages(self, packages: Dict[str, PackageMetadata]):
+        """
+        Remote packages that take part in database generation by their metadata
+        sidecar only (their binaries were not mirrored into output_dir).
+        
+        Args:
+            packages: Package filename -> PackageMetadata
+        """
+        self.sidecar_packages = dict(packages)
+        logger.info(f"SIDECAR_PACKAGES={len(self.sidecar_packages)}")
     
     def revalidate_output_dir_before_database(self, allowlist: Optional[Set[str]] = None):
         """
@@ -83,255 +121,131 @@ class CleanupManager:
         # Step 3: Remove orphaned .sig files
         self._remove_orphaned_signatures()
         
-        logger.info("✅ PRE-DATABASE VALIDATION: Output directory revalidated successfully.")
-    
-    def _normalize_version_for_comparison(self, version_str: str) -> str:
-        """
-        Normalize version string for comparison by ensuring epoch is present.
-        
-        Rules:
-        - If version already contains ':', keep it as is (e.g., "1:r1797.88f5a8a-1")
-        - If version doesn't contain ':', prepend "0:" (e.g., "5.15.4-1" -> "0:5.15.4-1")
-        - Trim whitespace
+        # Step 4: Same rules for the sidecar-only packages (together with output_dir)
+        if self.sidecar_packages:
+            self._revalidate_sidecar_packages(allowlist)
         
-        Args:
-            version_str: Raw version string (may or may not have epoch)
-            
-        Returns:
-            Normalized version string with guaranteed epoch
-        """
-        if not version_str:
-            return version_str
-        
-        # Trim whitespace
-        version_str = version_str.strip()
-        
-        # If already contains ':', return as is (already has epoch)
-        if ':' in version_str:
-            return version_str
-        
-        # No epoch found, prepend "0:"
-        return f"0:{version_str}"
+        logger.info("✅ PRE-DATABASE VALIDATION: Output directory revalidated successfully.")
     
-    def version_prune_vps(self, version_tracker, desired_inventory: Optional[Set[str]] = None):
+    def _revalidate_sidecar_packages(self, allowlist: Optional[Set[str]] = None):
         """
-        🚨 STRICT VPS ZERO-RESIDUE VERSION PRUNE:
-        When a package has a newer target/latest version, any older versions MUST be deleted from VPS.
-        
-        FIXED: Compare NORMALIZED versions (epoch-less target versions treated as epoch 0).
-        
-        NEW: Improved decision logging with normalized versions:
-        VPS_PRUNE_DECISION: pkg=<pkg> file=<basename> vps_ver=<ver> target_ver=<target_or_NONE> 
-                          vps_norm=<norm> target_norm=<norm_or_NONE> desired=<0/1> action=KEEP/DELETE reason=<...>
-        
-        Args:
-            version_tracker: VersionTracker instance with target versions
-            desired_inventory: Set of package names that should exist in repository
+        Apply the output_dir rules to sidecar-only packages: one (newest) version
+        per pkgname across output_dir and sidecars, allowlisted names only.
+        A local file older than a sidecar version is removed, exactly as if the
+        remote file had been mirrored next to it.
         """
-        logger.info("STRICT VPS VERSION PRUNE: Removing old package versions from VPS...")
-        
-        # Get ALL files from VPS (including signatures)
-        vps_files = self._get_vps_file_inventory()
-        if vps_files is None:
-            logger.error("Failed to get VPS file inventory")
-            return
-        
-        if not vps_files:
-            logger.info("No files found on VPS - nothing to prune")
-            return
-        
-        # Separate package files and signature files
-        package_files = []
-        signature_files = []
-        signature_map = {}  # package_filename -> signature_file_path
-        
-        for vps_file in vps_files:
-            filename = Path(vps_file).name
-            if filename.endswith('.sig'):
-                signature_files.append(vps_file)
-                # Map signature to package file
-                pkg_filename = filename[:-4]  # Remove .sig extension
-                signature_map[pkg_filename] = vps_file
-            elif filename.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                package_files.append(vps_file)
-        
-        logger.info(f"Found {len(package_files)} package files and {len(signature_files)} signatures on VPS")
-        
-        # Parse package files and group by pkgname
-        packages_by_name: Dict[str, List[Tuple[str, str, str]]] = {}  # pkgname -> [(file_path, filename, version)]
-        
-        for vps_file in package_files:
-            filename = Path(vps_file).name
-            pkg_name, file_version = version_tracker.parse_package_filename(filename)
-            
-            if not pkg_name or not file_version:
-                # Cannot parse, skip to be safe
-                logger.warning(f"Cannot parse package filename: {filename}, skipping")
+        local_files = {f.name: f for f in self.output_dir.glob("*.pkg.tar.*") if not f.name.endswith('.sig')}
+        candidates: Dict[str, List[Tuple[str, str]]] = {}  # pkgname -> [(version, filename)]
+        for filename in local_files:
+            record = parse_package_filename(filename)
+            if record is not None:
+                candidates.setdefault(record.name, []).append((record.version, filename))
+        
+        kept: Dict[str, PackageMetadata] = {}
+        dropped_allowlist = dropped_old = local_superseded = 0
+        for filename, meta in self.sidecar_packages.items():
+            if filename in local_files:
+                continue  # the binary is local: it is handled as a file
+            if allowlist and meta.name not in allowlist:
+                dropped_allowlist += 1
                 continue
-            
-            if pkg_name not in packages_by_name:
-                packages_by_name[pkg_name] = []
-            
-            packages_by_name[pkg_name].append((vps_file, filename, file_version))
+            candidates.setdefault(meta.name, []).append((meta.version, filename))
+            kept[filename] = meta
         
-        # Determine files to delete based on strict version pruning rules
-        files_to_delete = []
-        deleted_count = 0
-        
-        for pkg_name, packages in packages_by_name.items():
-            target_version = version_tracker.get_target_version(pkg_name)
-            target_norm = self._normalize_version_for_comparison(target_version) if target_version else None
-            is_desired = desired_inventory and pkg_name in desired_inventory
-            
-            # Log prune decision for each file
-            for vps_file, filename, file_version in packages:
-                file_norm = self._normalize_version_for_comparison(file_version)
-                
-                if target_version:
-                    if file_norm == target_norm:
-                        # This matches the target version - keep it
-                        logger.info(f"VPS_PRUNE_DECISION: pkg={pkg_name} file={filename} "
-                                  f"vps_ver={file_version} target_ver={target_version} "
-                                  f"vps_norm={file_norm} target_norm={target_norm} "
-                                  f"desired={1 if is_desired else 0} "
-                                  f"action=KEEP reason=target_version_match_normalized")
-                    else:
-                        # Different version - mark for deletion
-                        logger.info(f"VPS_PRUNE_DECISION: pkg={pkg_name} file={filename} "
-                                  f"vps_ver={file_version} target_ver={target_version} "
-                                  f"vps_norm={file_norm} target_norm={target_norm} "
-                                  f"desired={1 if is_desired else 0} "
-                                  f"action=DELETE reason=old_version_not_target_normalized")
-                        files_to_delete.append(vps_file)
-                        deleted_count += 1
-                        
-                        # Also delete corresponding signature if exists
-                        if filename in signature_map:
-                            files_to_delete.append(signature_map[filename])
-                else:
-                    # No target version registered for this package
-                    if is_desired:
-                        # Package is in desired inventory but no target version - KEEP
-                        logger.info(f"VPS_PRUNE_DECISION: pkg={pkg_name} file={filename} "
-                                  f"vps_ver={file_version} target_ver=NONE "
-                                  f"vps_norm={file_norm} target_norm=NONE "
-                                  f"desired=1 action=KEEP reason=desired_guard_no_target")
-                    else:
-                        # Package not in desired inventory - DELETE
-                        logger.info(f"VPS_PRUNE_DECISION: pkg={pkg_name} file={filename} "
-                                  f"vps_ver={file_version} target_ver=NONE "
-                                  f"vps_norm={file_norm} target_norm=NONE "
-                                  f"desired=0 action=DELETE reason=out_of_policy")
-                        files_to_delete.append(vps_file)
-                        deleted_count += 1
-                        
-                        # Also delete corresponding signature if exists
-                        if filename in signature_map:
-                            files_to_delete.append(signature_map[filename])
-        
-        # Also handle database/signature files - always keep them
-        for vps_file in vps_files:
-            filename = Path(vps_file).name
-            # Database and signature files are handled by signature_map and package deletions
-            # But keep any database files that weren't already processed
-            if (filename.startswith(f"{self.repo_name}.db") or 
-                filename.startswith(f"{self.repo_name}.files")):
-                # Check if it's a .sig file for a database
-                if filename.endswith('.sig'):
-                    # Keep database signature files
+        for pkg_name, versions in candidates.items():
+            if len(versions) <= 1:
+                continue
+            newest_version, newest_file = versions[0]
+            for version, filename in versions[1:]:
+                if vercmp(version, newest_version) > 0:
+                    newest_version, newest_file = version, filename
+            for version, filename in versions:
+                if filename == newest_file:
                     continue
-                else:
-                    # Keep database files
-                    logger.info(f"VPS_PRUNE_DECISION: pkg={self.repo_name} file={filename} vps_ver=db "
-                              f"target_ver=db vps_norm=db target_norm=db desired=1 action=KEEP reason=db")
-        
-        # Execute deletion in batches
-        if not files_to_delete:
-            logger.info("No files to delete in version prune")
-            logger.info(f"VPS_PRUNE_DELETED_COUNT=0")
-            return
-        
-        logger.info(f"STRICT VERSION PRUNE: Deleting {len(files_to_delete)} files ({deleted_count} packages + signatures)")
-        
-        # IMPROVED OBSERVABILITY: Log first 20 basenames
-        logger.info(f"Deleting files (showing first 20):")
-        for i, vps_file in enumerate(files_to_delete[:20]):
-            filename = Path(vps_file).name
-            logger.info(f"  [{i+1}] {filename}")
-        if len(files_to_delete) > 20:
-            logger.info(f"  ... and {len(files_to_delete) - 20} more")
-        
-        # Delete files in batches
-        batch_size = 50
-        actual_deleted = 0
-        
-        for i in range(0, len(files_to_delete), batch_size):
-            batch = files_to_delete[i:i + batch_size]
-            if self._delete_files_remote(batch):
-                actual_deleted += len(batch)
-        
-        logger.info(f"STRICT VERSION PRUNE: Deleted {actual_deleted} files")
-        logger.info(f"VPS_PRUNE_DELETED_COUNT={actual_deleted}")
-        
-        # After deleting packages, clean up any orphaned signatures
-        self._cleanup_orphaned_signatures_vps()
+                if filename in kept:
+                    del kept[filename]
+                    dropped_old += 1
+                elif filename in local_files:
+                    pkg_file = local_files[filename]
+                    try:
+                        pkg_file.unlink()
+                        sig_file = pkg_file.with_suffix(pkg_file.suffix + '.sig')
+                        if sig_file.exists():
+                            sig_file.unlink()
+                        logger.info(f"Removed old version (newer on VPS): {filename}")
+                        local_superseded += 1
+                    except Exception as e:
+                        logger.warning(f"Could not delete {pkg_file}: {e}")
+        
+        logger.info(
+            f"SIDECAR_REVALIDATE kept={len(kept)} dropped_old={dropped_old} "
+            f"dropped_allowlist={dropped_allowlist} local_superseded={local_superseded}"
+        )
+        self.sidecar_packages = kept
     
-    def server_cleanup(self, version_tracker, desired_inventory: Optional[Set[str]] = None):
+    # =========================================================================
+    # ONE-PASS REMOTE CLEANUP - orphan signatures, hygiene and version prune
+    # =========================================================================
+    def run_remote_cleanup(self, policy: CleanupPolicy, desired_inventory: Optional[Set[str]] = None,
+                           version_tracker=None, published: Optional[Set[str]] = None,
+                           report_path: Optional[Path] = None) -> Optional[CleanupPlan]:
         """
-        DEPRECATED: Use version_prune_vps instead.
-        This function is kept for backward compatibility but now calls version_prune_vps.
+        Plan every remote cleanup rule against one VPS listing, delete the
+        executed candidates in one round trip and report the outcome.
         
         Args:
-            version_tracker: VersionTracker instance with target versions
-            desired_inventory: Set of package names that should exist in repository
-        """
-        logger.warning("server_cleanup is deprecated, using version_prune_vps instead")
-        self.version_prune_vps(version_tracker, desired_inventory)
-    
-    def get_vps_files_to_delete(self, version_tracker) -> Tuple[List[str], List[str]]:
-        """
-        Identify files that should be deleted from VPS based on local output_dir state.
+            policy: CleanupPolicy (gates and config safety flags)
+            desired_inventory: Package names that belong in the repository
+            version_tracker: VersionTracker with target versions (None = no targets)
+            published: Basenames published this run (extras summary)
+            report_path: Where to write the JSON report (None = log only)
         
         Returns:
-            Tuple of (files_to_delete, files_to_keep)
+            The executed CleanupPlan, or None if the VPS could not be listed
         """
-        logger.info("Identifying VPS files for deletion based on local state...")
-        
-        # Get current VPS files
-        vps_files = self._get_vps_file_inventory()
-        if not vps_files:
-            logger.info("No VPS files found")
-            return [], []
-        
-        # Get local files from output_dir
-        local_files = set(f.name for f in self.output_dir.glob("*"))
-        
-        # Identify files to delete (on VPS but not locally)
-        files_to_delete = []
-        files_to_keep = []
+        logger.info(f"REMOTE_CLEANUP_START policy={policy.to_dict()}")
+        vps_files = self._get_vps_file_inventory(suffixes=None)
+        if vps_files is None:
+            logger.error("REMOTE_CLEANUP_FAIL reason=listing_failed")
+            return None
         
-        for vps_file in vps_files:
-            filename = Path(vps_file).name
-            
-            # Always keep database and signature files (they'll be regenerated)
-            is_db_or_sig = any(filename.endswith(ext) for ext in [
-                '.db', '.db.tar.gz', '.sig', '.files', '.files.tar.gz'
-            ])
-            
-            if is_db_or_sig:
-                # Database/signature files are handled separately
-                files_to_keep.append(vps_file)
-                continue
-            
-            if filename in local_files:
-                files_to_keep.append(vps_file)
-                logger.debug(f"Keeping {filename} (exists locally)")
-            else:
-                files_to_delete.append(vps_file)
-                logger.info(f"Marking for deletion: {filename} (not in local output)")
-        
-        logger.info(f"VPS cleanup: {len(files_to_keep)} to keep, {len(files_to_delete)} to delete")
-        return files_to_delete, files_to_keep
+        identities = {name: (meta.name, meta.version, meta.arch) for name, meta in self.sidecar_packages.items()}
+        plan = plan_cleanup(
+            vps_files, self.repo_name, policy,
+            desired_inventory=desired_inventory,
+            target_version=version_tracker.get_target_version if version_tracker is not None else None,
+            published=published,
+            identities=identities,
+            protected={state_manifest_name(self.repo_name)}
+        )
+        log_plan(plan)
+        
+        deletions = plan.deletions
+        if deletions:
+            deletion = self._delete_files_remote([c.path for c in deletions])
+            plan.result = {
+                'deleted': len(deletion.deleted),
+                'missing': len(deletion.missing),
+                'failed': [Path(p).name for p in deletion.failed],
+                'error': deletion.error,
+            }
+        else:
+            plan.result = {'deleted': 0, 'missing': 0, 'failed': [], 'error': ''}
+        
+        report = plan.to_dict()
+        # The full report goes to report_path; the log only carries the counts
+        logger.info(
+            f"CLEANUP_REPORT_SUMMARY files={plan.files} planned={len(plan.candidates)} "
+            f"delete={len(deletions)} blocked={len(plan.blocked)} deleted={plan.result['deleted']} "
+            f"missing={plan.result['missing']} failed={len(plan.result['failed'])}"
+        )
+        if report_path is not None:
+            try:
+                Path(report_path).write_text(json.dumps(report, indent=2), encoding='utf-8')
+                logger.info(f"CLEANUP_REPORT_FILE={report_path}")
+            except OSError as e:
+                logger.warning(f"CLEANUP_REPORT_WRITE_FAIL file={report_path} error={e}")
+        return plan
     
     def _remove_orphaned_signatures(self):
         """Remove orphaned .sig files that don't have a corresponding package"""
@@ -355,167 +269,44 @@ class CleanupManager:
         else:
             logger.info("✅ No orphaned signature files found")
     
-    def cleanup_vps_orphaned_signatures(self) -> Tuple[int, int, int]:
-        """
-        🚨 VPS ORPHAN SIGNATURE SWEEP: Delete signature files without corresponding packages on VPS.
-        ALWAYS SAFE TO RUN - NO PACKAGES ARE DELETED
-        
-        Returns:
-            Tuple of (package_count, signature_count, deleted_orphan_count)
-        """
-        # Generate privacy-safe hash for logging
-        remote_dir_hash = hashlib.sha256(self.remote_dir.encode()).hexdigest()[:8]
-        logger.info(f"Starting VPS orphan signature sweep (remote_dir_hash: {remote_dir_hash})...")
-        
-        # Get ALL files from VPS (including signatures)
-        vps_files = self._get_vps_file_inventory()
-        if vps_files is None:
-            logger.error("Failed to get VPS file inventory")
-            return 0, 0, 0
-        
-        if not vps_files:
-            logger.info("No files found on VPS")
-            return 0, 0, 0
-        
-        # Separate package files and signature files
-        package_files = set()
-        signature_files = []
-        
-        for vps_file in vps_files:
-            filename = Path(vps_file).name
-            if filename.endswith('.sig'):
-                signature_files.append(vps_file)
-            elif filename.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                package_files.add(filename)
-        
-        # Log counts (privacy-safe)
-        logger.info(f"Found {len(package_files)} package files and {len(signature_files)} signature files on VPS")
-        
-        # Identify orphaned signatures (signatures without corresponding package)
-        orphaned_signatures = []
-        for sig_file in signature_files:
-            sig_filename = Path(sig_file).name
-            # Corresponding package filename is the signature filename without .sig
-            pkg_filename = sig_filename[:-4]  # Remove .sig extension
-            
-            # Check if this signature is for a package (not database)
-            if pkg_filename.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                if pkg_filename not in package_files:
-                    orphaned_signatures.append(sig_file)
-        
-        if not orphaned_signatures:
-            logger.info("✅ No orphaned signatures found on VPS")
-            return len(package_files), len(signature_files), 0
-        
-        logger.info(f"Found {len(orphaned_signatures)} orphaned signatures to delete")
-        
-        # Delete orphaned signatures in batches
-        batch_size = 50
-        deleted_count = 0
-        deletion_status = 0
-        
-        for i in range(0, len(orphaned_signatures), batch_size):
-            batch = orphaned_signatures[i:i + batch_size]
-            if self._delete_files_remote(batch):
-                deleted_count += len(batch)
-            else:
-                deletion_status = 1  # Mark failure
-        
-        # Log final status (privacy-safe)
-        logger.info(f"VPS orphan sweep complete:")
-        logger.info(f"  remote_dir_hash: {remote_dir_hash}")
-        logger.info(f"  package_files_count: {len(package_files)}")
-        logger.info(f"  signature_files_count: {len(signature_files)}")
-        logger.info(f"  orphaned_signatures_found: {len(orphaned_signatures)}")
-        logger.info(f"  deleted_orphan_signatures_count: {deleted_count}")
-        logger.info(f"  deletion_exit_status: {deletion_status}")
-        
-        if deletion_status == 0:
-            logger.info("✅ VPS orphan signature sweep completed successfully")
-        else:
-            logger.error("❌ VPS orphan signature sweep had failures")
-        
-        return len(package_files), len(signature_files), deleted_count
+    # Files the VPS inventory reports (packages, signatures, database artifacts)
+    INVENTORY_SUFFIXES = ('.pkg.tar.zst', '.pkg.tar.xz', '.sig', '.db', '.db.tar.gz',
+                          '.files', '.files.tar.gz', '.abs.tar.gz')
     
-    def _cleanup_orphaned_signatures_vps(self, vps_files: Optional[List[str]] = None) -> int:
+    def _get_vps_file_inventory(self, suffixes: Optional[Tuple[str, ...]] = INVENTORY_SUFFIXES) -> Optional[List[str]]:
         """
-        Clean up orphaned signature files on VPS (signatures without corresponding packages).
+        Get complete inventory of all files on VPS
         
         Args:
-            vps_files: List of VPS files (if None, will fetch from server)
-        
-        Returns:
-            Number of orphaned signatures deleted
+            suffixes: Only files ending in one of these (None = every regular file)
         """
-        logger.info("🔍 Sweeping for orphaned signatures on VPS...")
-        
-        if vps_files is None:
-            vps_files = self._get_vps_file_inventory()
-            if not vps_files:
-                return 0
-        
-        # Separate package files and signature files
-        package_files = set()
-        signature_files = []
-        
-        for vps_file in vps_files:
-            filename = Path(vps_file).name
-            if filename.endswith('.sig'):
-                signature_files.append(vps_file)
-            elif filename.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                package_files.add(filename)
-        
-        logger.info(f"Found {len(signature_files)} signature files and {len(package_files)} package files on VPS")
-        
-        # Identify orphaned signatures (signatures without corresponding package)
-        orphaned_signatures = []
-        for sig_file in signature_files:
-            sig_filename = Path(sig_file).name
-            # Corresponding package filename is the signature filename without .sig
-            pkg_filename = sig_filename[:-4]  # Remove .sig extension
-            
-            # Check if this signature is for a package (not database)
-            if pkg_filename.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                if pkg_filename not in package_files:
-                    orphaned_signatures.append(sig_file)
-                    logger.info(f"Orphaned signature: {sig_filename} (package {pkg_filename} not found)")
-        
-        if not orphaned_signatures:
-            logger.info("✅ No orphaned signatures found on VPS")
-            return 0
-        
-        logger.info(f"Found {len(orphaned_signatures)} orphaned signatures to delete")
-        
-        # Delete orphaned signatures in batches
-        batch_size = 50
-        deleted_count = 0
-        
-        for i in range(0, len(orphaned_signatures), batch_size):
-            batch = orphaned_signatures[i:i + batch_size]
-            if self._delete_files_remote(batch):
-                deleted_count += len(batch)
-        
-        logger.info(f"✅ Deleted {deleted_count} orphaned signatures from VPS")
-        return deleted_count
-    
-    def _get_vps_file_inventory(self) -> Optional[List[str]]:
-        """Get complete inventory of all files on VPS"""
         logger.info("Getting complete VPS file inventory...")
         
+        if self.inventory_provider is not None:
+            inventory = self.inventory_provider.get_inventory(self.remote_dir)
+            if inventory is None:
+                logger.warning("Could not list VPS files (shared inventory unavailable)")
+                return None
+            vps_files = [
+                f"{inventory.remote_dir}/{entry.name}" for entry in inventory
+                if entry.type == 'f' and (suffixes is None or entry.name.endswith(suffixes))
+            ]
+            logger.info(f"Found {len(vps_files)} files on VPS (snapshot)")
+            return vps_files
+        
+        name_filter = ''
+        if suffixes is not None:
+            name_filter = "\\( " + " -o ".join(f'-name "*{suffix}"' for suffix in suffixes) + " \\)"
         remote_cmd = rf"""
         # Get all package files, signatures, and database files
-        find "{self.remote_dir}" -maxdepth 1 -type f \( -name "*.pkg.tar.zst" -o -name "*.pkg.tar.xz" -o -name "*.sig" -o -name "*.db" -o -name "*.db.tar.gz" -o -name "*.files" -o -name "*.files.tar.gz" -o -name "*.abs.tar.gz" \) 2>/dev/null
+        find "{self.remote_dir}/" -maxdepth 1 -type f {name_filter} 2>/dev/null
         """
         
-        ssh_cmd = [
-            "ssh",
-            f"{self.vps_user}@{self.vps_host}",
-            remote_cmd
-        ]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
         
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "vps_file_inventory",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -542,48 +333,77 @@ class CleanupManager:
             logger.error(f"Error getting VPS file inventory: {e}")
             return None
     
-    def _delete_files_remote(self, files_to_delete: List[str]) -> bool:
-        """Delete files from remote server"""
-        if not files_to_delete:
-            return True
+    def _delete_files_remote(self, files_to_delete: List[str]) -> RemoteDeletionResult:
+        """
+        Delete files from remote server in one SSH round trip.
+        
+        The paths are streamed NUL-delimited over stdin to a single remote
+        process (xargs -0 rm), whatever their count; every path comes back as
+        DELETED, MISSING or FAILED.
         
-        # Quote each filename for safety
-        quoted_files = [f"'{f}'" for f in files_to_delete]
-        files_to_delete_str = ' '.join(quoted_files)
+        Args:
+            files_to_delete: Full remote paths
         
-        delete_cmd = f"rm -fv {files_to_delete_str}"
+        Returns:
+            RemoteDeletionResult (ok when nothing failed)
+        """
+        result = RemoteDeletionResult()
+        if not files_to_delete:
+            return result
+        
+        # NEW: the state manifest would list the deleted files; drop it in the same call
+        # (the orchestrator re-seals it once cleanup is done)
+        cleanup_paths = [f"{self.remote_dir}/{state_manifest_name(self.repo_name)}"]
+        if self.remote_sidecars:
+            # NEW: metadata sidecars of deleted packages go with them
+            cleanup_paths += [
+                f"{self.remote_dir}/{SIDECAR_DIRNAME}/{sidecar_name(f.rsplit('/', 1)[-1])}"
+                for f in files_to_delete if parse_package_filename(f.rsplit('/', 1)[-1])
+            ]
         
         logger.info(f"Executing deletion command for {len(files_to_delete)} files")
         
-        # Execute the deletion command
-        ssh_delete = [
-            "ssh",
-            f"{self.vps_user}@{self.vps_host}",
-            delete_cmd
-        ]
+        # The listing changes whatever the outcome (a failed rm may have removed some files)
+        if self.inventory_provider is not None:
+            self.inventory_provider.invalidate_inventory()
+        self.state_manifest_dropped = True
+        
+        ssh_delete = self.connection.ssh_command(delete_command())
         
         try:
-            result = subprocess.run(
-                ssh_delete,
+            completed = self.connection.run(
+                ssh_delete, "ssh", "delete_files",
+                input=encode_paths(files_to_delete, cleanup_paths),
                 capture_output=True,
-                text=True,
                 check=False,
-                timeout=60
+                timeout=60 + len(files_to_delete) // 100
             )
-            
-            if result.returncode == 0:
-                logger.info(f"Deletion successful for batch of {len(files_to_delete)} files")
-                return True
-            else:
-                logger.error(f"Deletion failed: {result.stderr[:500]}")
-                return False
-                
         except subprocess.TimeoutExpired:
             logger.error("SSH command timed out - aborting cleanup for safety")
-            return False
+            result.error = 'timeout'
+            result.failed = list(files_to_delete)
+            return result
         except Exception as e:
             logger.error(f"Error during deletion: {e}")
-            return False
+            result.error = str(e)[:200]
+            result.failed = list(files_to_delete)
+            return result
+        
+        result = parse_output(completed.stdout, files_to_delete)
+        if completed.returncode != 0 and not result.failed:
+            result.error = completed.stderr.decode('utf-8', errors='replace')[:500] or f"rc={completed.returncode}"
+        
+        logger.info(
+            f"REMOTE_DELETE files={len(files_to_delete)} deleted={len(result.deleted)} "
+            f"missing={len(result.missing)} failed={len(result.failed)} rc={completed.returncode}"
+        )
+        for path in result.failed:
+            logger.error(f"REMOTE_DELETE_FAIL file={Path(path).name}")
+        for path in result.missing:
+            logger.info(f"REMOTE_DELETE_MISSING file={Path(path).name}")
+        if result.error:
+            logger.error(f"Deletion failed: {result.error}")
+        return result
     
     def cleanup_database_files(self):
         """Clean up old database files from output directory"""
@@ -615,216 +435,3 @@ class CleanupManager:
             logger.info(f"Cleaned up {deleted_count} old database files")
         else:
             logger.info("No old database files to clean up")
-    
-    # =========================================================================
-    # VPS HYGIENE (P0) - Safe removal of extra files on VPS
-    # =========================================================================
-    def _parse_package_filename(self, filename: str) -> Tuple[Optional[str], Optional[str]]:
-        """
-        Parse package name and version from a package filename.
-        Works with both .pkg.tar.zst and .pkg.tar.xz.
-        Returns (pkgname, version) where version is pkgver-pkgrel (with possible epoch).
-        """
-        # Remove extensions
-        if filename.endswith('.pkg.tar.zst'):
-            base = filename[:-12]
-        elif filename.endswith('.pkg.tar.xz'):
-            base = filename[:-11]
-        else:
-            return None, None
-        
-        # Remove known architecture suffixes from the end
-        arch_patterns = [r'-x86_64$', r'-any$', r'-i686$', r'-aarch64$', r'-armv7h$', r'-armv6h$']
-        for pattern in arch_patterns:
-            base = re.sub(pattern, '', base)
-        
-        # Split by hyphens
-        parts = base.split('-')
-        if len(parts) < 3:
-            return None, None
-        
-        # Find where version starts: the part before the last three fields (pkgver, pkgrel, arch)
-        # After stripping arch, the last two parts are pkgver and pkgrel.
-        # So pkgname is everything before the last two parts.
-        # But epoch may be present, making pkgver contain ':'.
-        # The last part is pkgrel, the second-last is pkgver.
-        pkgrel = parts[-1]
-        pkgver = parts[-2]
-        # pkgname is everything before that
-        pkgname = '-'.join(parts[:-2])
-        version = f"{pkgver}-{pkgrel}"
-        return pkgname, version
-    
-    def run_vps_hygiene(self, remote_dir: str, repo_name: str, desired_inventory: Set[str],
-                        keep_latest_versions: int = 1, dry_run: bool = True,
-                        keep_extra_metadata: bool = True, enable_orphan_sig_delete: bool = False):
-        """
-        Perform safe VPS hygiene cleanup:
-          - Never delete DB/files artifacts or their signatures.
-          - Remove orphan signatures (.sig whose base file is missing).
-          - For packages in desired_inventory: keep only newest KEEP_LATEST_VERSIONS per pkgname.
-          - For packages NOT in desired_inventory: only log, never delete.
-          - If keep_extra_metadata is True, do not delete *.pub, *.key, etc.
-          - Log all deletion candidates with reason.
-          - 2‑phase safety switch: orphan sig deletion only if enable_orphan_sig_delete is True
-            and dry_run is False. Old‑version pruning remains dry‑run only.
-        
-        Args:
-            remote_dir: Remote directory on VPS.
-            repo_name: Repository name.
-            desired_inventory: Set of valid package names (from PKGBUILD extraction).
-            keep_latest_versions: Number of latest versions to keep per package.
-            dry_run: If True, only log what would be deleted, do not actually delete.
-            keep_extra_metadata: If True, never delete public key/metadata files.
-            enable_orphan_sig_delete: If False, orphan sig deletion is blocked (only logged).
-        """
-        logger.info(f"VPS_HYGIENE: starting (dry_run={dry_run}, keep_latest={keep_latest_versions}, keep_metadata={keep_extra_metadata}, enable_orphan_sig_delete={enable_orphan_sig_delete})")
-        
-        # Get all remote files
-        remote_files = self._get_vps_file_inventory()
-        if remote_files is None:
-            logger.error("VPS_HYGIENE: cannot get remote file list")
-            return
-        if not remote_files:
-            logger.info("VPS_HYGIENE: no files on VPS")
-            return
-        
-        # Prepare structures
-        db_artifacts = set()        # repo_name.db*, repo_name.files* (including .sig)
-        metadata_files = set()       # *.pub, *.key, etc.
-        package_files = []           # list of (full_path, basename, pkgname, version)
-        signature_map = {}           # basename -> full_path for .sig files
-        unknown = set()
-        
-        repo_prefix = repo_name
-        for fpath in remote_files:
-            fname = Path(fpath).name
-            if fname.startswith(f"{repo_prefix}.db") or fname.startswith(f"{repo_prefix}.files"):
-                db_artifacts.add(fpath)
-            elif fname.endswith(('.pub', '.key')):
-                metadata_files.add(fpath)
-            elif fname.endswith('.sig'):
-                signature_map[fname] = fpath
-            elif fname.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                pkgname, version = self._parse_package_filename(fname)
-                if pkgname and version:
-                    package_files.append((fpath, fname, pkgname, version))
-                else:
-                    unknown.add(fpath)
-            else:
-                unknown.add(fpath)
-        
-        # 1. DB artifacts: never delete
-        if db_artifacts:
-            logger.info(f"VPS_HYGIENE: keeping {len(db_artifacts)} database artifacts")
-        
-        # 2. Metadata files: delete only if keep_extra_metadata is False
-        if keep_extra_metadata:
-            if metadata_files:
-                logger.info(f"VPS_HYGIENE: keeping {len(metadata_files)} metadata files (keep_extra_metadata=True)")
-        else:
-            if metadata_files:
-                logger.info(f"VPS_HYGIENE: would delete {len(metadata_files)} metadata files (dry_run={dry_run})")
-                for fpath in metadata_files:
-                    logger.info(f"VPS_HYGIENE_DELETE candidate={Path(fpath).name} reason=metadata_file dry_run={1 if dry_run else 0}")
-                if not dry_run:
-                    self._delete_files_remote(list(metadata_files))
-        
-        # 3. Orphan signatures: collect candidates and log report
-        base_pkg_filenames = {fname for (_, fname, _, _) in package_files}
-        orphan_sigs = []
-        for sig_fname, sig_fpath in signature_map.items():
-            # Signature base is sig_fname without .sig
-            base_fname = sig_fname[:-4]
-            if base_fname not in base_pkg_filenames:
-                orphan_sigs.append(sig_fpath)
-        
-        # Log structured report for orphan signatures
-        if orphan_sigs:
-            orphan_basenames = [Path(f).name for f in orphan_sigs]
-            logger.info(f"ORPHAN_SIG_CANDIDATES count={len(orphan_sigs)} sample={orphan_basenames[:20]}")
-        else:
-            logger.info("ORPHAN_SIG_CANDIDATES count=0 sample=")
-        
-        # 4. Package version pruning for desired inventory only
-        # Group packages by pkgname (only those in desired_inventory)
-        packages_by_name: Dict[str, List[Tuple[str, str, str]]] = {}  # pkgname -> [(full_path, version, basename)]
-        for fpath, fname, pkgname, version in package_files:
-            if pkgname in desired_inventory:
-                if pkgname not in packages_by_name:
-                    packages_by_name[pkgname] = []
-                packages_by_name[pkgname].append((fpath, version, fname))
-            else:
-                # Package not in desired inventory: only log, never delete
-                logger.info(f"VPS_HYGIENE: package {pkgname} not in desired inventory, keeping {fname}")
-        
-        # For each pkgname in desired_inventory, keep only the newest keep_latest_versions
-        old_version_candidates = []   # list of full paths to delete
-        for pkgname, pkg_entries in packages_by_name.items():
-            if len(pkg_entries) <= keep_latest_versions:
-                continue
-            # We'll use vercmp to sort versions descending (newest first)
-            entries_with_version = [(v, fp, fn) for (fp, v, fn) in pkg_entries]
-            # Custom sort with vercmp (descending)
-            import functools
-            def vercmp_key(a, b):
-                # a and b are (version, ...) tuples
-                try:
-                    res = subprocess.run(['vercmp', a[0], b[0]], capture_output=True, text=True, check=False)
-                    if res.returncode == 0:
-                        return int(res.stdout.strip())
-                except:
-                    pass
-                # fallback: string compare
-                return (a[0] > b[0]) - (a[0] < b[0])
-            # Sort descending (newest first)
-            sorted_entries = sorted(entries_with_version, key=functools.cmp_to_key(lambda x,y: -vercmp_key(x,y)))
-            
-            keep = sorted_entries[:keep_latest_versions]
-            delete_candidates = sorted_entries[keep_latest_versions:]
-            
-            for (version, fpath, fname) in delete_candidates:
-                old_version_candidates.append(fpath)
-                # Also add signature if present
-                sig_fname = fname + '.sig'
-                if sig_fname in signature_map:
-                    old_version_candidates.append(signature_map[sig_fname])
-        
-        # Log structured report for old version candidates
-        if old_version_candidates:
-            old_basenames = [Path(f).name for f in old_version_candidates]
-            logger.info(f"OLD_VERSION_CANDIDATES count={len(old_version_candidates)} sample={old_basenames[:20]}")
-        else:
-            logger.info("OLD_VERSION_CANDIDATES count=0 sample=")
-        
-        # 5. Log per‑candidate deletion lines with effective dry_run flag
-        all_candidates = []  # for logging only
-        for fpath in orphan_sigs:
-            effective_dry_run = 1 if (dry_run or not enable_orphan_sig_delete) else 0
-            logger.info(f"VPS_HYGIENE_DELETE candidate={Path(fpath).name} reason=orphan_sig dry_run={effective_dry_run}")
-            all_candidates.append((fpath, effective_dry_run, 'orphan_sig'))
-        for fpath in old_version_candidates:
-            # Old version pruning remains dry‑run only regardless of enable_orphan_sig_delete
-            effective_dry_run = 1 if dry_run else 1   # forced to 1 because we never delete old versions yet
-            logger.info(f"VPS_HYGIENE_DELETE candidate={Path(fpath).name} reason=old_version dry_run={effective_dry_run}")
-            all_candidates.append((fpath, effective_dry_run, 'old_version'))
-        
-        # 6. Execute deletions only for files where effective_dry_run == 0
-        files_to_delete = [fpath for fpath, eff_dry, reason in all_candidates if eff_dry == 0]
-        if files_to_delete:
-            logger.info(f"VPS_HYGIENE: actually deleting {len(files_to_delete)} files (dry_run=False and safety checks passed)")
-            # Delete in batches
-            batch_size = 50
-            for i in range(0, len(files_to_delete), batch_size):
-                batch = files_to_delete[i:i + batch_size]
-                self._delete_files_remote(batch)
-        else:
-            logger.info("VPS_HYGIENE: no files will be deleted (dry_run or safety block)")
-        
-        # 7. Unknown files: log them but do not delete by default
-        if unknown:
-            logger.info(f"VPS_HYGIENE: found {len(unknown)} unknown files (not classified)")
-            for fpath in unknown:
-                logger.info(f"VPS_HYGIENE_UNKNOWN candidate={Path(fpath).name}")
-        
-        logger.info("VPS_HYGIENE: completed")
\ No newline at end of file
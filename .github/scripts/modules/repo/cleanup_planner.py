@@ -0,0 +1,284 @@
+"""
+Cleanup Planner Module - One deletion plan for every remote cleanup rule
+
+Orphan signatures, hygiene (metadata files, stale versions) and the strict
+version prune used to be separate passes, each listing the VPS and parsing
+every filename again. The planner classifies one listing once and applies
+all rules to it, producing a single plan in which every candidate carries a
+reason code and, when it is not executed, what blocked it (a gate, the
+hygiene dry run, the orphan signature safety switch, or a report-only rule).
+
+Signatures of deleted packages are planned together with their packages, so
+executing the plan leaves no orphan behind and no follow-up sweep is needed.
+Planning is linear in the number of listed files.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from modules.repo.remote_version_index import RemoteVersionIndex
+
+logger = logging.getLogger(__name__)
+
+# Reason codes
+ORPHAN_SIG = "orphan_sig"                  # .sig whose package is not on the VPS
+OLD_VERSION = "old_version"                # not the target version (version prune)
+OUT_OF_POLICY = "out_of_policy"            # no target version and not desired (version prune)
+SIGNATURE_OF_DELETED = "signature_of_deleted"
+METADATA_FILE = "metadata_file"            # *.pub / *.key (hygiene, KEEP_VPS_EXTRA_METADATA=False)
+STALE_VERSION = "stale_version"            # older than KEEP_LATEST_VERSIONS (hygiene, report only)
+
+# Why a planned deletion is not executed
+BLOCKED_GATE = "gate"
+BLOCKED_DRY_RUN = "dry_run"
+BLOCKED_ORPHAN_SAFETY = "orphan_sig_safety"
+BLOCKED_REPORT_ONLY = "report_only"
+
+METADATA_SUFFIXES = ('.pub', '.key')
+PACKAGE_SUFFIXES = ('.pkg.tar.zst', '.pkg.tar.xz')
+
+
+def normalize_epoch(version: str) -> str:
+    """Version with an explicit epoch ('1.0-1' -> '0:1.0-1')."""
+    version = (version or '').strip()
+    return version if not version or ':' in version else f"0:{version}"
+
+
+@dataclass
+class CleanupPolicy:
+    """Which rules may delete (see config.py, VPS HYGIENE CONFIGURATION)"""
+    prune_versions: bool = False          # strict version prune (phase V gates passed)
+    hygiene: bool = False                 # ENABLE_VPS_HYGIENE
+    dry_run: bool = True                  # VPS_HYGIENE_DRY_RUN: hygiene and orphan rules only log
+    orphan_sig_delete: bool = False       # ENABLE_VPS_ORPHAN_SIG_DELETE
+    keep_latest_versions: int = 1
+    keep_extra_metadata: bool = True
+
+    @classmethod
+    def from_config(cls, prune_versions: bool, hygiene: Optional[bool] = None) -> 'CleanupPolicy':
+        """
+        Policy from config.py.
+
+        Args:
+            prune_versions: Whether the version prune gate passed
+            hygiene: Override ENABLE_VPS_HYGIENE (e.g. False for safe operations only)
+        """
+        import config
+        return cls(
+            prune_versions=prune_versions,
+            hygiene=getattr(config, 'ENABLE_VPS_HYGIENE', False) if hygiene is None else hygiene,
+            dry_run=getattr(config, 'VPS_HYGIENE_DRY_RUN', True),
+            orphan_sig_delete=getattr(config, 'ENABLE_VPS_ORPHAN_SIG_DELETE', False),
+            keep_latest_versions=getattr(config, 'KEEP_LATEST_VERSIONS', 1),
+            keep_extra_metadata=getattr(config, 'KEEP_VPS_EXTRA_METADATA', True),
+        )
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+@dataclass(frozen=True)
+class PlannedDeletion:
+    """One deletion candidate"""
+    path: str
+    reason: str
+    blocked_by: Optional[str] = None      # None = executed
+    detail: str = ''
+
+    @property
+    def filename(self) -> str:
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def execute(self) -> bool:
+        return self.blocked_by is None
+
+    def to_dict(self) -> dict:
+        record = {'file': self.filename, 'reason': self.reason}
+        if self.blocked_by:
+            record['blocked_by'] = self.blocked_by
+        if self.detail:
+            record['detail'] = self.detail
+        return record
+
+
+@dataclass
+class CleanupPlan:
+    """Outcome of plan_cleanup()"""
+    policy: CleanupPolicy
+    files: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+    extras: Dict[str, int] = field(default_factory=dict)       # categories of files not published this run
+    candidates: Dict[str, PlannedDeletion] = field(default_factory=dict)   # path -> candidate
+    kept: Dict[str, int] = field(default_factory=dict)         # keep reason -> package files
+    result: Optional[dict] = None                              # filled in by the executor
+
+    @property
+    def deletions(self) -> List[PlannedDeletion]:
+        """Candidates that are executed."""
+        return [c for c in self.candidates.values() if c.execute]
+
+    @property
+    def blocked(self) -> List[PlannedDeletion]:
+        """Candidates that are only reported."""
+        return [c for c in self.candidates.values() if not c.execute]
+
+    def add(self, path: str, reason: str, blocked_by: Optional[str] = None, detail: str = ''):
+        """Record a candidate; an executed reason wins over a blocked one for the same file."""
+        existing = self.candidates.get(path)
+        if existing is not None and (existing.execute or blocked_by is not None):
+            return
+        self.candidates[path] = PlannedDeletion(path, reason, blocked_by, detail)
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """reason -> {'delete': n, 'blocked': n}"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for candidate in self.candidates.values():
+            bucket = counts.setdefault(candidate.reason, {'delete': 0, 'blocked': 0})
+            bucket['delete' if candidate.execute else 'blocked'] += 1
+        return counts
+
+    def to_dict(self) -> dict:
+        """Machine-readable report."""
+        return {
+            'policy': self.policy.to_dict(),
+            'files': self.files,
+            'categories': self.categories,
+            'extras': self.extras,
+            'kept': self.kept,
+            'counts': self.counts(),
+            'delete': [c.to_dict() for c in self.deletions],
+            'blocked': [c.to_dict() for c in self.blocked],
+            'result': self.result,
+        }
+
+
+def _category(filename: str, repo_name: str, protected: Set[str]) -> str:
+    if filename in protected or filename.startswith((f"{repo_name}.db", f"{repo_name}.files")):
+        return 'database'
+    if filename.endswith(METADATA_SUFFIXES):
+        return 'metadata'
+    if filename.endswith('.sig'):
+        return 'signature'
+    if filename.endswith(PACKAGE_SUFFIXES):
+        return 'package'
+    return 'unknown'
+
+
+def plan_cleanup(remote_files: Iterable[str], repo_name: str, policy: CleanupPolicy,
+                 desired_inventory: Optional[Set[str]] = None,
+                 target_version: Optional[Callable[[str], Optional[str]]] = None,
+                 published: Optional[Set[str]] = None,
+                 identities: Optional[Dict[str, Tuple[str, str, str]]] = None,
+                 protected: Iterable[str] = ()) -> CleanupPlan:
+    """
+    Compute the deletion plan for one remote listing.
+
+    Args:
+        remote_files: Remote file paths (one listing, taken after promotion)
+        repo_name: Repository name (database artifacts are never candidates)
+        policy: CleanupPolicy
+        desired_inventory: Package names that belong in the repository
+        target_version: pkgname -> version to keep (None = no target)
+        published: Basenames published this run (for the extras summary)
+        identities: basename -> (name, version, arch) from metadata sidecars
+        protected: Further basenames that are never candidates (e.g. the state manifest)
+
+    Returns:
+        CleanupPlan
+    """
+    # Without a desired inventory or target versions only the file-level rules apply
+    check_versions = desired_inventory is not None or target_version is not None
+    desired = desired_inventory or set()
+    published = published or set()
+    protected = set(protected)
+    target_version = target_version or (lambda name: None)
+    plan = CleanupPlan(policy=policy)
+
+    indexed: List[str] = []
+    listed: Set[str] = set()
+    signatures: List[str] = []
+    for path in remote_files:
+        filename = path.rsplit('/', 1)[-1]
+        listed.add(filename)
+        category = _category(filename, repo_name, protected)
+        plan.files += 1
+        plan.categories[category] = plan.categories.get(category, 0) + 1
+        if filename not in published:
+            plan.extras[category] = plan.extras.get(category, 0) + 1
+        if category == 'metadata':
+            if policy.hygiene and not policy.keep_extra_metadata:
+                plan.add(path, METADATA_FILE, BLOCKED_DRY_RUN if policy.dry_run else None)
+        elif category in ('package', 'signature'):
+            # Only package files and their signatures are version-pruned
+            indexed.append(path)
+            if category == 'signature':
+                signatures.append(path)
+
+    index = RemoteVersionIndex(indexed, identities=identities)
+
+    # Orphan signatures (the sweep that used to run up to three times): a package
+    # signature is orphaned when its package file is not listed, whether or not
+    # the package filename parses
+    orphan_block = BLOCKED_DRY_RUN if policy.dry_run else (None if policy.orphan_sig_delete else BLOCKED_ORPHAN_SAFETY)
+    for path in signatures:
+        package_file = path.rsplit('/', 1)[-1][:-4]
+        if package_file.endswith(PACKAGE_SUFFIXES) and package_file not in listed:
+            plan.add(path, ORPHAN_SIG, orphan_block)
+
+    # Strict version prune and hygiene, one walk over the index
+    prune_block = None if policy.prune_versions else BLOCKED_GATE
+    for pkg_name in (index if check_versions else ()):
+        target = target_version(pkg_name)
+        target_norm = normalize_epoch(target) if target else None
+        is_desired = pkg_name in desired
+        stale = {entry.path for entry in index.stale(pkg_name, policy.keep_latest_versions)} if (
+            policy.hygiene and is_desired) else set()
+        for entry in index.versions(pkg_name):
+            reason, detail = None, ''
+            if target_norm is not None and normalize_epoch(entry.version) == target_norm:
+                plan.kept['target_version'] = plan.kept.get('target_version', 0) + 1
+            elif target_norm is not None:
+                reason, detail = OLD_VERSION, f"vps={entry.version} target={target}"
+            elif is_desired:
+                plan.kept['desired_no_target'] = plan.kept.get('desired_no_target', 0) + 1
+            else:
+                reason, detail = OUT_OF_POLICY, f"vps={entry.version} target=NONE"
+            if reason is not None:
+                plan.add(entry.path, reason, prune_block, detail)
+                if entry.has_signature:
+                    plan.add(entry.signature_path, SIGNATURE_OF_DELETED, prune_block, entry.filename)
+            if entry.path in stale:
+                # Old-version hygiene stays report-only (the version prune owns deletions)
+                plan.add(entry.path, STALE_VERSION, BLOCKED_REPORT_ONLY,
+                         f"keep_latest={policy.keep_latest_versions}")
+                if entry.has_signature:
+                    plan.add(entry.signature_path, SIGNATURE_OF_DELETED, BLOCKED_REPORT_ONLY, entry.filename)
+    if index.other_files:
+        plan.kept['unknown'] = len(index.other_files)
+
+    return plan
+
+
+def log_plan(plan: CleanupPlan, limit: int = 200):
+    """One CLEANUP_PLAN line per candidate (up to limit) and a CLEANUP_PLAN_SUMMARY line."""
+    for candidate in list(plan.candidates.values())[:limit]:
+        action = 'DELETE' if candidate.execute else f"BLOCKED({candidate.blocked_by})"
+        logger.info(
+            f"CLEANUP_PLAN action={action} reason={candidate.reason} file={candidate.filename}"
+            + (f" detail={candidate.detail}" if candidate.detail else '')
+        )
+    if len(plan.candidates) > limit:
+        logger.info(f"CLEANUP_PLAN ... and {len(plan.candidates) - limit} more (see report)")
+    counts = ' '.join(f"{reason}={c['delete']}/{c['blocked']}" for reason, c in sorted(plan.counts().items()))
+    logger.info(
+        f"CLEANUP_PLAN_SUMMARY files={plan.files} delete={len(plan.deletions)} blocked={len(plan.blocked)} "
+        f"{counts or 'candidates=0'}"
+    )
+    extras = plan.extras
+    logger.info(
+        f"EXTRAS_CATEGORIES: DB/FILES={extras.get('database', 0)}, METADATA={extras.get('metadata', 0)}, "
+        f"PACKAGES={extras.get('package', 0)}, SIGNATURES={extras.get('signature', 0)}, UNKNOWN={extras.get('unknown', 0)}"
+    )
+
@@ -7,7 +7,14 @@ import subprocess
 import shutil
 import logging
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+from modules.common.hash_cache import get_hash_cache
+from modules.common.package_filename import parse_package_filename
+from modules.repo.native_repo_db import NativeRepoDbGenerator
+from modules.repo.package_metadata import PackageMetadata
+from modules.repo.repo_db import DbEntry, read_db_entries, verify_database
+from modules.vps.ssh_connection import SSHConnectionManager
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +33,242 @@ class DatabaseManager:
                 - remote_dir: Remote directory on VPS
                 - vps_user: VPS username
                 - vps_host: VPS hostname
+                - ssh_options: SSH options list (optional)
+                - connection: Optional shared SSHConnectionManager
         """
         self.repo_name = config['repo_name']
         self.output_dir = Path(config['output_dir'])
         self.remote_dir = config['remote_dir']
         self.vps_user = config['vps_user']
         self.vps_host = config['vps_host']
+        # NEW: shared multiplexed connection (plain per-call ssh when none is configured)
+        self.connection = config.get('connection') or SSHConnectionManager(
+            self.vps_user, self.vps_host, config.get('ssh_options', []), multiplex=False)
+        import config as build_config
+        # NEW: incremental database updates (repo-add/repo-remove on the published database)
+        self.update_mode = getattr(build_config, 'DB_UPDATE_MODE', 'incremental')
+        self.full_rebuild_every = getattr(build_config, 'DB_FULL_REBUILD_EVERY', 20)
+        self.last_update_mode = None
+        # NEW: "native" = in-process parallel generator instead of repo-add/repo-remove
+        self.generator = getattr(build_config, 'DB_GENERATOR', 'repo-add')
+        self.generator_workers = getattr(build_config, 'DB_GENERATOR_WORKERS', None)
+    
+    def generate_database(self, repo_name: str, output_dir: Path, cleanup_manager, inventory=None) -> bool:
+        """
+        Produce the repository database, incrementally when possible.
+        
+        The published database is updated with repo-add/repo-remove for the
+        packages that changed; a full generate_full_database() runs when
+        configured, forced (FORCE_FULL_DB_REBUILD=1), due (every
+        DB_FULL_REBUILD_EVERY-th run), when the published database is missing,
+        or when the incremental result does not match the local package set.
+        
+        Args:
+            repo_name: Repository name
+            output_dir: Local output directory
+            cleanup_manager: CleanupManager (final output_dir validation)
+            inventory: Optional RemoteInventory of remote_dir (database presence)
+        
+        Returns:
+            True if a database was generated
+        """
+        mode, reason = self._choose_update_mode(repo_name, inventory)
+        logger.info(f"DB_UPDATE_MODE={mode} reason={reason}")
+        if mode == "incremental":
+            if self.update_database_incremental(repo_name, output_dir, cleanup_manager):
+                self.last_update_mode = "incremental"
+                return True
+            logger.warning("DB_UPDATE_MODE=full reason=incremental_failed")
+        self.last_update_mode = "full"
+        return self.generate_full_database(repo_name, output_dir, cleanup_manager)
+    
+    def _choose_update_mode(self, repo_name: str, inventory=None) -> Tuple[str, str]:
+        """(mode, reason) for generate_database()."""
+        if self.update_mode != "incremental":
+            return "full", "config"
+        if os.getenv('FORCE_FULL_DB_REBUILD', '').lower() in ('1', 'true', 'yes'):
+            return "full", "forced"
+        run_number = os.getenv('GITHUB_RUN_NUMBER', '')
+        if self.full_rebuild_every and run_number.isdigit() and int(run_number) % int(self.full_rebuild_every) == 0:
+            return "full", f"periodic_every_{self.full_rebuild_every}"
+        if inventory is not None:
+            for name in (f"{repo_name}.db.tar.gz", f"{repo_name}.files.tar.gz"):
+                if name not in inventory:
+                    return "full", "remote_db_missing"
+        return "incremental", "published_db"
+    
+    def update_database_incremental(self, repo_name: str, output_dir: Path, cleanup_manager) -> bool:
+        """
+        Apply only the changes between the published database and output_dir.
+        
+        Downloads <repo>.db.tar.gz and <repo>.files.tar.gz, runs repo-remove for
+        packages no longer present locally and repo-add for new or changed package
+        files (including rebuilds that kept their filename), then checks that the
+        database lists exactly the local package set.
+        
+        Returns:
+            True on success (False = caller falls back to a full rebuild)
+        """
+        # Same final validation as the full path
+        cleanup_manager.revalidate_output_dir_before_database()
+        
+        sidecars = cleanup_manager.sidecar_packages
+        desired = self._desired_entries(self._get_all_local_packages() + list(sidecars))
+        if desired is None:
+            return False
+        
+        db_file = f"{repo_name}.db.tar.gz"
+        files_file = f"{repo_name}.files.tar.gz"
+        for f in [f"{repo_name}.db", f"{repo_name}.files", f"{repo_name}.db.sig", f"{repo_name}.files.sig",
+                  f"{repo_name}.db.tar.gz.sig", f"{repo_name}.files.tar.gz.sig"]:
+            path = output_dir / f
+            if path.exists() or path.is_symlink():
+                path.unlink()
+        
+        self.fetch_existing_database([db_file, files_file])
+        if not (output_dir / db_file).exists() or not (output_dir / files_file).exists():
+            logger.warning("DB_INCREMENTAL_FAIL reason=fetch")
+            return False
+        
+        existing = read_db_entries(output_dir / db_file)
+        if existing is None:
+            return False
+        
+        to_remove = sorted(set(existing) - set(desired))
+        changed = {filename for name, filename in desired.items()
+                   if name not in existing or existing[name].filename != filename}
+        # A rebuild with an unchanged filename (FORCE) still needs a fresh entry
+        rebuilt = self._rebuilt_entries(existing, desired, output_dir, sidecars, changed)
+        to_add = sorted(changed | rebuilt)
+        logger.info(
+            f"DB_INCREMENTAL add={len(to_add)} remove={len(to_remove)} rebuilt={len(rebuilt)} "
+            f"unchanged={len(desired) - len(to_add)} published={len(existing)}"
+        )
+        if to_add:
+            logger.info(f"DB_INCREMENTAL_ADD_SAMPLE: {to_add[:10]}")
+        if to_remove:
+            logger.info(f"DB_INCREMENTAL_REMOVE_SAMPLE: {to_remove[:10]}")
+        
+        if self._generator_for(sidecars) == "native":
+            if (to_add or to_remove) and not NativeRepoDbGenerator(self.generator_workers).update(
+                    repo_name, output_dir, to_add, to_remove, known=sidecars):
+                return False
+        else:
+            if to_remove and not self._run_repo_tool(["repo-remove", db_file] + to_remove, output_dir):
+                return False
+            if to_add and not self._run_repo_tool(["repo-add", db_file] + to_add, output_dir):
+                return False
+        
+        # Both generators maintain the <repo>.db / <repo>.files links; recreate them if nothing changed
+        for link, target in ((f"{repo_name}.db", db_file), (f"{repo_name}.files", files_file)):
+            link_path = output_dir / link
+            if not link_path.exists():
+                os.symlink(target, link_path)
+        
+        # Consistency check: the result must describe exactly the local package set
+        result = read_db_entries(output_dir / db_file)
+        if result is None:
+            return False
+        actual = {name: entry.filename for name, entry in result.items()}
+        if actual != desired:
+            diff = sorted(set(actual.items()) ^ set(desired.items()))
+            logger.error(f"DB_INCREMENTAL_MISMATCH entries={len(actual)} expected={len(desired)} sample={diff[:5]}")
+            return False
+        
+        if not self.verify_database(repo_name, output_dir, sidecars, list(desired.values())):
+            return False
+        
+        logger.info(f"✅ Database updated incrementally ({len(actual)} entries)")
+        return True
+    
+    def _rebuilt_entries(self, existing: Dict[str, DbEntry], desired: Dict[str, str], output_dir: Path,
+                         sidecars: Dict[str, PackageMetadata], changed: Set[str]) -> Set[str]:
+        """
+        Filenames whose published entry no longer matches the package: same
+        %FILENAME% but a different size or digest (local files are compared by
+        size first, digests come from the hash cache).
+        """
+        rebuilt: Set[str] = set()
+        to_hash: Dict[str, Tuple[str, Optional[str]]] = {}  # local path -> (filename, published sha256)
+        for name, filename in desired.items():
+            if filename in changed:
+                continue
+            entry = existing[name]
+            path = output_dir / filename
+            if path.exists():
+                if path.stat().st_size != entry.csize:
+                    rebuilt.add(filename)
+                else:
+                    to_hash[str(path)] = (filename, entry.sha256sum)
+            elif filename in sidecars:
+                meta = sidecars[filename]
+                if (meta.csize, meta.sha256sum) != (entry.csize, entry.sha256sum):
+                    rebuilt.add(filename)
+        if to_hash:
+            digests = get_hash_cache().digests(list(to_hash))
+            rebuilt.update(filename for path, (filename, sha256) in to_hash.items()
+                           if digests.get(path) != sha256)
+        if rebuilt:
+            logger.info(f"DB_INCREMENTAL_REBUILT_SAMPLE: {sorted(rebuilt)[:10]}")
+        return rebuilt
+    
+    def verify_database(self, repo_name: str, output_dir: Path, sidecars: Dict[str, PackageMetadata],
+                        expected: List[str]) -> bool:
+        """
+        Check every entry of <repo>.db.tar.gz against the packages about to be
+        published: %FILENAME% must exist (locally or as a sidecar-only package),
+        %CSIZE% must equal its size and %SHA256SUM% its digest (hash cache), and
+        every expected package must have an entry.
+        
+        Returns:
+            True if the database is consistent (False = do not upload it)
+        """
+        logger.info("🔍 Verifying database entries before upload...")
+        known = {name: (meta.csize, meta.sha256sum) for name, meta in sidecars.items()}
+        result = verify_database(Path(output_dir) / f"{repo_name}.db.tar.gz", Path(output_dir), known, expected)
+        if not result.ok:
+            errors = result.errors or ["database has no entries"]
+            logger.error(
+                f"DB_VERIFY_FAIL entries={result.entries} errors={len(errors)} "
+                f"duration={result.seconds:.2f}s first={errors[0]}"
+            )
+            for error in errors[1:5]:
+                logger.error(f"DB_VERIFY_ERROR {error}")
+            return False
+        logger.info(
+            f"DB_VERIFY_OK entries={result.entries} local={result.local} sidecar={result.known} "
+            f"duration={result.seconds:.2f}s"
+        )
+        return True
+    
+    def _generator_for(self, sidecars: Dict[str, PackageMetadata]) -> str:
+        """Configured generator, or "native" when sidecar-only packages must be included."""
+        if sidecars and self.generator != "native":
+            logger.info(f"DB_GENERATOR=native reason=sidecar_packages count={len(sidecars)}")
+            return "native"
+        return self.generator
+    
+    def _desired_entries(self, package_files: List[str]) -> Optional[Dict[str, str]]:
+        """pkgname -> package filename, or None if a pkgname has several local files."""
+        desired: Dict[str, str] = {}
+        for filename in package_files:
+            record = parse_package_filename(filename)
+            if record is None:
+                continue
+            if record.name in desired:
+                logger.warning(f"DB_INCREMENTAL_FAIL reason=duplicate_pkgname pkg={record.name}")
+                return None
+            desired[record.name] = filename
+        return desired
+    
+    def _run_repo_tool(self, cmd: List[str], cwd: Path) -> bool:
+        """Run repo-add/repo-remove in cwd (argv, no shell)."""
+        logger.info(f"Running {cmd[0]} on {len(cmd) - 2} packages...")
+        result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            logger.error(f"{cmd[0]} failed with exit code {result.returncode}: {result.stderr[:500]}")
+            return False
+        return True
     
     def generate_full_database(self, repo_name: str, output_dir: Path, cleanup_manager) -> bool:
         """
@@ -48,8 +285,11 @@ class DatabaseManager:
         
         # Get all package files from local output directory
         all_packages = self._get_all_local_packages()
+        # NEW: remote packages known only by their metadata sidecar
+        sidecars = cleanup_manager.sidecar_packages
+        generator = self._generator_for(sidecars)
         
-        if not all_packages:
+        if not all_packages and not sidecars:
             logger.info("No packages available for database generation")
             return False
         
@@ -87,26 +327,34 @@ class DatabaseManager:
                     logger.error(f"   ... and {len(missing_packages) - 5} more")
                 return False
             
-            if not valid_packages:
+            if not valid_packages and not sidecars:
                 logger.error("No valid package files found for database generation")
                 return False
             
-            logger.info(f"✅ All {len(valid_packages)} package files verified locally")
+            logger.info(f"✅ All {len(valid_packages)} package files verified locally"
+                        f"{f' (+{len(sidecars)} from sidecars)' if sidecars else ''}")
             
             # Generate database with repo-add using explicit package list (NO shell=True, NO wildcards)
             repo_add_cmd = ["repo-add", db_file] + valid_packages
             
-            logger.info(f"Running repo-add with explicit package list...")
-            logger.info(f"Command: {' '.join(['repo-add', db_file, '...'])}")
-            logger.info(f"Current directory: {os.getcwd()}")
-            
-            result = subprocess.run(
-                repo_add_cmd,
-                shell=False,  # Explicitly use shell=False for safety
-                capture_output=True,
-                text=True,
-                check=False
-            )
+            if generator == "native":
+                # NEW: same entries as repo-add, packages read once in parallel
+                logger.info(f"Running native database generator on {len(valid_packages) + len(sidecars)} packages...")
+                ok = NativeRepoDbGenerator(self.generator_workers).generate(
+                    repo_name, self.output_dir, valid_packages, known=sidecars)
+                result = subprocess.CompletedProcess(repo_add_cmd, 0 if ok else 1, "", "")
+            else:
+                logger.info(f"Running repo-add with explicit package list...")
+                logger.info(f"Command: {' '.join(['repo-add', db_file, '...'])}")
+                logger.info(f"Current directory: {os.getcwd()}")
+                
+                result = subprocess.run(
+                    repo_add_cmd,
+                    shell=False,  # Explicitly use shell=False for safety
+                    capture_output=True,
+                    text=True,
+                    check=False
+                )
             
             if result.returncode == 0:
                 logger.info("✅ Database created successfully")
@@ -117,24 +365,11 @@ class DatabaseManager:
                     size_mb = db_path.stat().st_size / (1024 * 1024)
                     logger.info(f"Database size: {size_mb:.2f} MB")
                     
-                    # CRITICAL: Verify database entries BEFORE upload
-                    logger.info("🔍 Verifying database entries before upload...")
-                    list_cmd = ["tar", "-tzf", db_file]
-                    list_result = subprocess.run(list_cmd, capture_output=True, text=True, check=False)
-                    if list_result.returncode == 0:
-                        db_entries = [line for line in list_result.stdout.split('\n') if line.endswith('/desc')]
-                        logger.info(f"✅ Database contains {len(db_entries)} package entries")
-                        if len(db_entries) == 0:
-                            logger.error("❌❌❌ DATABASE IS EMPTY! This is the root cause of the issue.")
-                            return False
-                        else:
-                            logger.info(f"Sample database entries: {db_entries[:5]}")
-                    else:
-                        logger.warning(f"Could not list database contents: {list_result.stderr}")
-                
-                return True
+                # CRITICAL: Verify database entries BEFORE upload
+                # FIX: in process (tarfile) with a checksum cross-check instead of counting `tar -tzf` lines
+                return self.verify_database(repo_name, self.output_dir, sidecars, valid_packages + list(sidecars))
             else:
-                logger.error(f"repo-add failed with exit code {result.returncode}:")
+                logger.error(f"{generator} failed with exit code {result.returncode}:")
                 if result.stdout:
                     logger.error(f"STDOUT: {result.stdout[:500]}")
                 if result.stderr:
@@ -178,8 +413,13 @@ class DatabaseManager:
         
         return local_filenames
     
-    def check_database_files(self) -> Tuple[List[str], List[str]]:
-        """Check if repository database files exist on server"""
+    def check_database_files(self, inventory=None) -> Tuple[List[str], List[str]]:
+        """
+        Check if repository database files exist on server
+        
+        Args:
+            inventory: Optional RemoteInventory snapshot of remote_dir (no SSH calls when given)
+        """
         print("\n" + "=" * 60)
         print("STEP 2: Checking existing database files on server")
         print("=" * 60)
@@ -195,23 +435,21 @@ class DatabaseManager:
         missing_files = []
         
         for db_file in db_files:
-            remote_cmd = f"test -f {self.remote_dir}/{db_file} && echo 'EXISTS' || echo 'MISSING'"
-            
-            ssh_cmd = [
-                "ssh",
-                f"{self.vps_user}@{self.vps_host}",
-                remote_cmd
-            ]
-            
             try:
-                result = subprocess.run(
-                    ssh_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
+                if inventory is not None:
+                    exists = db_file in inventory
+                else:
+                    remote_cmd = f"test -f {self.remote_dir}/{db_file} && echo 'EXISTS' || echo 'MISSING'"
+                    ssh_cmd = self.connection.ssh_command(remote_cmd)
+                    result = self.connection.run(
+                        ssh_cmd, "ssh", "check_database_files",
+                        capture_output=True,
+                        text=True,
+                        check=False
+                    )
+                    exists = result.returncode == 0 and "EXISTS" in result.stdout
                 
-                if result.returncode == 0 and "EXISTS" in result.stdout:
+                if exists:
                     existing_files.append(db_file)
                     logger.info(f"✅ Database file exists: {db_file}")
                 else:
@@ -244,17 +482,11 @@ class DatabaseManager:
             if local_path.exists():
                 local_path.unlink()
             
-            ssh_cmd = [
-                "scp",
-                "-o", "StrictHostKeyChecking=no",
-                "-o", "ConnectTimeout=30",
-                f"{self.vps_user}@{self.vps_host}:{remote_path}",
-                str(local_path)
-            ]
+            scp_cmd = self.connection.scp_command(remote_path, str(local_path))
             
             try:
-                result = subprocess.run(
-                    ssh_cmd,
+                result = self.connection.run(
+                    scp_cmd, "scp", "fetch_existing_database",
                     capture_output=True,
                     text=True,
                     check=False
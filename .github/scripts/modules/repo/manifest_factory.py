@@ -1,11 +1,11 @@
-import os
-import re
 from pathlib import Path
 from typing import List, Set, Dict, Any, Optional
 import subprocess
 import tempfile
 import shutil
 
+from modules.common.srcinfo import parse_pkgbuild
+
 
 class ManifestFactory:
     """
@@ -98,7 +98,7 @@ class ManifestFactory:
     def extract_pkgnames(pkgbuild_text: str) -> List[str]:
         """
         Parse pkgname values from PKGBUILD text.
-        Handles both single values and arrays.
+        Handles single values, arrays and variable expansion (pure Python, no bash).
         
         Args:
             pkgbuild_text: PKGBUILD content as string
@@ -106,112 +106,14 @@ class ManifestFactory:
         Returns:
             List of package names extracted from PKGBUILD
         """
-        pkg_names = []
-        
-        # Remove comments
-        lines = []
-        for line in pkgbuild_text.split('\n'):
-            line = line.split('#')[0].rstrip()
-            if line:
-                lines.append(line)
-        
-        # Join continuation lines
-        cleaned_text = ''
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line.endswith('\\'):
-                # Continuation line
-                cleaned_text += line.rstrip('\\')
-                i += 1
-                while i < len(lines) and lines[i].endswith('\\'):
-                    cleaned_text += lines[i].rstrip('\\')
-                    i += 1
-                if i < len(lines):
-                    cleaned_text += lines[i]
-            else:
-                cleaned_text += line
-            cleaned_text += '\n'
-            i += 1
-        
-        # Look for pkgname assignments
-        # Pattern for single value: pkgname="value" or pkgname='value' or pkgname=value
-        # Pattern for array: pkgname=("val1" "val2") or pkgname=('val1' 'val2')
-        
-        # Find pkgname assignment
-        pkgname_patterns = [
-            r'pkgname\s*=\s*["\']([^"\']+)["\']',  # Single quoted
-            r'pkgname\s*=\s*\(([^)]+)\)',  # Array
-        ]
-        
-        for pattern in pkgname_patterns:
-            matches = re.findall(pattern, cleaned_text, re.MULTILINE | re.DOTALL)
-            for match in matches:
-                if match.strip():
-                    # Check if it's an array
-                    if '(' not in pattern:  # Single value pattern
-                        pkg_names.append(match.strip())
-                    else:
-                        # Array - split by spaces and clean quotes
-                        items = re.findall(r'["\']([^"\']+)["\']', match)
-                        pkg_names.extend([item.strip() for item in items if item.strip()])
-        
-        # Alternative: Use bash to parse if available (more reliable)
-        if not pkg_names:
-            try:
-                pkg_names = ManifestFactory._parse_with_bash(pkgbuild_text)
-            except Exception:
-                pass
+        variables, _ = parse_pkgbuild(pkgbuild_text)
+        pkg_names = variables.get("pkgname", [])
         
         # Remove duplicates and empty strings
         pkg_names = list(dict.fromkeys([name for name in pkg_names if name]))
         
         return pkg_names
     
-    @staticmethod
-    def _parse_with_bash(pkgbuild_text: str) -> List[str]:
-        """
-        Parse PKGBUILD using bash to extract pkgname values.
-        More reliable for complex PKGBUILDs.
-        """
-        # Create a temporary PKGBUILD file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.PKGBUILD', delete=False) as tmp:
-            tmp.write(pkgbuild_text)
-            tmp_path = tmp.name
-        
-        try:
-            # Use bash to source the PKGBUILD and extract pkgname
-            script = f'''
-            source "{tmp_path}" 2>/dev/null
-            if declare -p pkgname 2>/dev/null | grep -q "declare -a"; then
-                # Array
-                for name in "${{pkgname[@]}}"; do
-                    echo "$name"
-                done
-            else
-                # Single value
-                echo "$pkgname"
-            fi
-            '''
-            
-            result = subprocess.run(
-                ["bash", "-c", script],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                names = [name.strip() for name in result.stdout.strip().split('\n') if name.strip()]
-                return names
-            else:
-                return []
-                
-        finally:
-            # Cleanup
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-    
     @staticmethod
     def build_allowlist(package_sources: List[str]) -> Set[str]:
         """
@@ -0,0 +1,357 @@
+"""
+Manifest Index Module - Single-pass, typed index of every package source
+
+Each listed source (local PKGBUILD directory or AUR package) is fetched and
+parsed exactly once per run. The resulting index answers the questions the
+phases used to recompute independently:
+- Phase II: allowlist / desired inventory (pkgname values)
+- Phase IV: AUR checkout location, versions, dependencies, VCS sources
+- Phase V: allowlist / desired inventory for cleanup and pruning
+
+AUR sources come from the persistent mirror cache (modules.scm.aur_mirror_cache)
+when one is supplied; unchanged packages are restored without re-parsing.
+"""
+
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import config
+from modules.build.version_manager import VersionManager
+from modules.common.srcinfo import SrcInfo, SrcInfoCache, get_srcinfo_cache
+from modules.scm.aur_mirror_cache import AURMirrorCache
+from modules.scm.aur_rpc_client import AURPackageInfo, AURRPCClient, is_vcs_package_name
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ManifestEntry:
+    """Parsed manifest of a single PKGBUILD"""
+    name: str
+    kind: str  # "local" or "aur"
+    source_dir: Optional[Path]
+    pkg_names: List[str] = field(default_factory=list)
+    content_hash: Optional[str] = None
+    error: Optional[str] = None
+    # Filled from .SRCINFO when present, else lazily (see ManifestIndex.load_srcinfo)
+    srcinfo_loaded: bool = False
+    pkgver: Optional[str] = None
+    pkgrel: Optional[str] = None
+    epoch: Optional[str] = None
+    depends: List[str] = field(default_factory=list)
+    makedepends: List[str] = field(default_factory=list)
+    checkdepends: List[str] = field(default_factory=list)
+    vcs_sources: List[str] = field(default_factory=list)
+    # VersionManager.detect_vcs_package() of the checkout (None = not determined)
+    is_vcs: Optional[bool] = None
+    vcs_reason: Optional[str] = None
+    # True when the AUR RPC confirmed the cached manifest, so no checkout was made
+    deferred_checkout: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def full_version(self) -> Optional[str]:
+        """epoch:pkgver-pkgrel (epoch omitted when unset or 0)."""
+        if not self.pkgver or not self.pkgrel:
+            return None
+        if self.epoch and self.epoch != '0':
+            return f"{self.epoch}:{self.pkgver}-{self.pkgrel}"
+        return f"{self.pkgver}-{self.pkgrel}"
+
+
+class ManifestIndex:
+    """
+    In-memory index of package manifests, built once per run and shared by all phases.
+    """
+
+    def __init__(self, aur_checkout_dir: Path, max_workers: Optional[int] = None,
+                 mirror_cache: Optional[AURMirrorCache] = None,
+                 rpc_client: Optional[AURRPCClient] = None,
+                 srcinfo_cache: Optional[SrcInfoCache] = None):
+        """
+        Initialize ManifestIndex.
+
+        Args:
+            aur_checkout_dir: Directory receiving AUR checkouts (one subdirectory per package);
+                              the build stage reuses these instead of cloning again
+            max_workers: Concurrent fetches (defaults to config.AUDIT_MAX_WORKERS)
+            mirror_cache: Persistent AUR mirror cache (None = shallow clone every run)
+            rpc_client: AUR RPC client; with a mirror cache, packages whose AUR version
+                        matches the cached manifest are not fetched or checked out
+            srcinfo_cache: Parser cache (defaults to the process-wide SrcInfoCache)
+        """
+        self.aur_checkout_dir = Path(aur_checkout_dir)
+        self.max_workers = max(1, int(max_workers or getattr(config, 'AUDIT_MAX_WORKERS', 8)))
+        self.mirror_cache = mirror_cache
+        self.rpc_client = rpc_client
+        self.srcinfo_cache = srcinfo_cache or get_srcinfo_cache()
+        self.version_manager = VersionManager()
+        self._entries: Dict[str, ManifestEntry] = {}
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self, local_dirs: List[Path], aur_packages: List[str]) -> 'ManifestIndex':
+        """
+        Fetch and parse every source once.
+
+        Args:
+            local_dirs: Local package directories containing a PKGBUILD
+            aur_packages: AUR package names
+
+        Returns:
+            self (for chaining)
+        """
+        start = time.monotonic()
+        self.aur_checkout_dir.mkdir(parents=True, exist_ok=True)
+
+        rpc_info: Dict[str, AURPackageInfo] = {}
+        if self.rpc_client is not None and self.mirror_cache is not None and aur_packages:
+            rpc_info = self.rpc_client.info(aur_packages)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="manifest") as pool:
+            futures = [pool.submit(self._load_local, Path(d)) for d in local_dirs]
+            futures += [pool.submit(self._load_aur, name, rpc_info.get(name)) for name in aur_packages]
+            entries = [f.result() for f in futures]
+
+        for entry in entries:
+            if entry.name in self._entries:
+                logger.warning(f"MANIFEST_DUPLICATE_SOURCE name={entry.name} (keeping first)")
+                continue
+            self._entries[entry.name] = entry
+            if entry.error:
+                logger.warning(f"MANIFEST_ENTRY_ERROR name={entry.name} kind={entry.kind} error={entry.error}")
+
+        if self.mirror_cache is not None:
+            self.mirror_cache.save_state()
+
+        errors = sum(1 for e in entries if e.error)
+        logger.info(
+            f"MANIFEST_INDEX_BUILT entries={len(self._entries)} local={len(local_dirs)} "
+            f"aur={len(aur_packages)} errors={errors} elapsed={time.monotonic() - start:.1f}s"
+        )
+        return self
+
+    def _load_local(self, pkg_dir: Path) -> ManifestEntry:
+        """Read a local PKGBUILD directory."""
+        entry = ManifestEntry(name=pkg_dir.name, kind="local", source_dir=pkg_dir)
+        self._read_pkgbuild(entry)
+        return entry
+
+    def _load_aur(self, pkg_name: str, rpc_info: Optional[AURPackageInfo] = None) -> ManifestEntry:
+        """Clone an AUR package into the checkout directory and read it."""
+        if self.mirror_cache is not None:
+            return self._load_aur_from_mirror(pkg_name, rpc_info)
+
+        target = self.aur_checkout_dir / pkg_name
+        entry = ManifestEntry(name=pkg_name, kind="aur", source_dir=target)
+        if target.exists():
+            shutil.rmtree(target, ignore_errors=True)
+
+        for url_template in getattr(config, 'AUR_URLS', ["https://aur.archlinux.org/{pkg_name}.git"]):
+            aur_url = url_template.format(pkg_name=pkg_name)
+            try:
+                result = subprocess.run(
+                    ["git", "clone", "--depth", "1", aur_url, str(target)],
+                    capture_output=True,
+                    text=True,
+                    timeout=60
+                )
+                if result.returncode == 0:
+                    break
+                logger.warning(f"MANIFEST_CLONE_FAIL pkg={pkg_name} url={aur_url}: {result.stderr.strip()[:200]}")
+            except subprocess.TimeoutExpired:
+                logger.warning(f"MANIFEST_CLONE_TIMEOUT pkg={pkg_name} url={aur_url}")
+            shutil.rmtree(target, ignore_errors=True)
+        else:
+            entry.source_dir = None
+            entry.error = "clone_failed"
+            return entry
+
+        self._read_pkgbuild(entry)
+        return entry
+
+    def _load_aur_from_mirror(self, pkg_name: str, rpc_info: Optional[AURPackageInfo] = None) -> ManifestEntry:
+        """Fetch an AUR package into its persistent mirror and check out a worktree."""
+        target = self.aur_checkout_dir / pkg_name
+        entry = ManifestEntry(name=pkg_name, kind="aur", source_dir=target)
+
+        # RPC fast path: AUR version unchanged since the manifest was recorded.
+        # The checkout is deferred until the audit decides to build. Only packages
+        # known to be non-VCS qualify: the audit of a VCS package needs the PKGBUILD
+        # for its upstream HEAD check.
+        if rpc_info is not None and not is_vcs_package_name(pkg_name):
+            cached = self.mirror_cache.get_cached_manifest(pkg_name)
+            if cached is not None and self._restore_cached_manifest(entry, cached):
+                if entry.is_vcs is not False:
+                    logger.info(f"MANIFEST_RPC_NEEDS_CHECKOUT pkg={pkg_name} vcs={entry.vcs_reason or 'unknown'}")
+                elif entry.full_version == rpc_info.version:
+                    entry.source_dir = None
+                    entry.deferred_checkout = True
+                    logger.info(f"MANIFEST_RPC_UNCHANGED pkg={pkg_name} version={rpc_info.version}")
+                    return entry
+                else:
+                    logger.info(f"MANIFEST_RPC_CHANGED pkg={pkg_name} cached={entry.full_version} aur={rpc_info.version}")
+                entry = ManifestEntry(name=pkg_name, kind="aur", source_dir=target)
+
+        sync = self.mirror_cache.sync(pkg_name)
+        if not sync.ok or not self.mirror_cache.checkout(pkg_name, target):
+            entry.source_dir = None
+            entry.error = "clone_failed"
+            return entry
+
+        # Fast path: HEAD unchanged since the manifest was recorded
+        cached = self.mirror_cache.get_cached_manifest(pkg_name, sync.head)
+        if cached is not None and self._restore_cached_manifest(entry, cached):
+            logger.info(f"MANIFEST_CACHE_HIT pkg={pkg_name} head={sync.head[:12]}")
+            if entry.is_vcs is None:
+                # Record from before VCS detection was cached
+                self._detect_vcs(entry)
+                self.mirror_cache.store_manifest(pkg_name, sync.head, self._manifest_record(entry))
+            return entry
+
+        self._read_pkgbuild(entry)
+        self._detect_vcs(entry)
+        # AUR repositories always ship .SRCINFO, so _read_pkgbuild already loaded it
+        if not entry.error and entry.srcinfo_loaded:
+            self.mirror_cache.store_manifest(pkg_name, sync.head, self._manifest_record(entry))
+        return entry
+
+    @staticmethod
+    def _manifest_record(entry: ManifestEntry) -> Dict[str, object]:
+        """Serializable subset of an entry for the mirror cache."""
+        return {
+            "pkg_names": entry.pkg_names,
+            "content_hash": entry.content_hash,
+            "pkgver": entry.pkgver,
+            "pkgrel": entry.pkgrel,
+            "epoch": entry.epoch,
+            "depends": entry.depends,
+            "makedepends": entry.makedepends,
+            "checkdepends": entry.checkdepends,
+            "vcs_sources": entry.vcs_sources,
+            "is_vcs": entry.is_vcs,
+            "vcs_reason": entry.vcs_reason,
+        }
+
+    @staticmethod
+    def _restore_cached_manifest(entry: ManifestEntry, record: Dict[str, object]) -> bool:
+        """Populate an entry from a mirror cache record; False if the record is unusable."""
+        if not record.get("pkg_names") or not record.get("pkgver"):
+            return False
+        entry.pkg_names = list(record["pkg_names"])
+        entry.content_hash = record.get("content_hash")
+        entry.pkgver = record.get("pkgver")
+        entry.pkgrel = record.get("pkgrel")
+        entry.epoch = record.get("epoch")
+        entry.depends = list(record.get("depends") or [])
+        entry.makedepends = list(record.get("makedepends") or [])
+        entry.checkdepends = list(record.get("checkdepends") or [])
+        entry.vcs_sources = list(record.get("vcs_sources") or [])
+        entry.is_vcs = record.get("is_vcs")
+        entry.vcs_reason = record.get("vcs_reason")
+        entry.srcinfo_loaded = True
+        return True
+
+    def _detect_vcs(self, entry: ManifestEntry):
+        """VCS status from the PKGBUILD of the checkout (same rule the audit applies)."""
+        if entry.source_dir is None:
+            return
+        entry.is_vcs, entry.vcs_reason = self.version_manager.detect_vcs_package(entry.source_dir)
+        if entry.vcs_reason.startswith(("error", "no_pkgbuild")):
+            entry.is_vcs = None
+
+    def _read_pkgbuild(self, entry: ManifestEntry):
+        """
+        Load pkgname values and content hash for an entry without running makepkg.
+        An existing (or cached) .SRCINFO also fills the version/dependency fields.
+        """
+        info = self.srcinfo_cache.peek(entry.source_dir)
+        if info is None:
+            entry.error = "pkgbuild_unreadable"
+            return
+
+        entry.content_hash = info.content_key
+        entry.pkg_names = [name for name in info.pkgnames if name]
+        if not entry.pkg_names:
+            entry.error = "no_pkgname"
+        if info.origin != "pkgbuild":
+            self._apply_srcinfo(entry, info)
+
+    # ------------------------------------------------------------------
+    # Lazy .SRCINFO data
+    # ------------------------------------------------------------------
+
+    def load_srcinfo(self, name: str) -> Optional[ManifestEntry]:
+        """
+        Ensure version/dependency/VCS fields of an entry are populated.
+        Uses the shared SrcInfoCache (makepkg --printsrcinfo only on a cache miss).
+
+        Args:
+            name: Entry name (local directory name or AUR package name)
+
+        Returns:
+            The entry with srcinfo fields populated, or None if unavailable
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        if entry.srcinfo_loaded:
+            return entry
+        if entry.source_dir is None:
+            return None
+
+        with entry._lock:
+            if entry.srcinfo_loaded:
+                return entry
+            info = self.srcinfo_cache.load(entry.source_dir)
+            if info is None or not info.pkgver:
+                return None
+            self._apply_srcinfo(entry, info)
+        return entry
+
+    @staticmethod
+    def _apply_srcinfo(entry: ManifestEntry, info: SrcInfo):
+        """Populate version/dependency/VCS fields from parsed .SRCINFO."""
+        entry.pkgver = info.pkgver
+        entry.pkgrel = info.pkgrel
+        entry.epoch = info.epoch
+        entry.depends = info.depends()
+        entry.makedepends = info.makedepends()
+        entry.checkdepends = info.checkdepends()
+        entry.vcs_sources = info.vcs_sources()
+        entry.srcinfo_loaded = True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Optional[ManifestEntry]:
+        """Entry by source name (local directory name or AUR package name)."""
+        return self._entries.get(name)
+
+    def entries(self) -> List[ManifestEntry]:
+        """All entries in source order (local first, then AUR)."""
+        return list(self._entries.values())
+
+    def all_pkgnames(self) -> Set[str]:
+        """Union of pkgname values of every source (allowlist / desired inventory)."""
+        names: Set[str] = set()
+        for entry in self._entries.values():
+            names.update(entry.pkg_names)
+        return names
+
+    def source_of(self, pkg_name: str) -> Optional[ManifestEntry]:
+        """Entry whose PKGBUILD produces the given pkgname."""
+        for entry in self._entries.values():
+            if pkg_name in entry.pkg_names:
+                return entry
+        return None
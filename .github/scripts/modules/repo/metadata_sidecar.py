@@ -0,0 +1,192 @@
+"""
+Metadata Sidecar Module - Per-package metadata kept apart from the binaries
+
+A sidecar is a small JSON file with everything the repository database needs
+from one package archive: .PKGINFO, file list, size and checksums
+(package_metadata.PackageMetadata). Sidecars live in the runner cache
+(build_aur/.pkgmeta/<package filename>.json) and optionally on the VPS
+(<remote_dir>/.pkgmeta/), so the database, the pre-database cleanup and the
+remote version index can be produced for packages whose binaries were never
+downloaded.
+
+A sidecar is only trusted for a file of the same name and size, and of the
+same SHA-256 whenever a digest is known (state manifest or hash cache).
+"""
+
+import os
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Optional, Set, Union
+
+from modules.common.hash_cache import get_hash_cache
+from modules.repo.package_metadata import PackageMetadata
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_DIRNAME = ".pkgmeta"
+SIDECAR_SUFFIX = ".json"
+SIDECAR_FORMAT = 1
+
+PathLike = Union[str, Path]
+
+
+def sidecar_name(package_filename: str) -> str:
+    """Sidecar basename of a package file."""
+    return f"{package_filename}{SIDECAR_SUFFIX}"
+
+
+class SidecarStore:
+    """
+    Directory of sidecars keyed by package filename.
+    """
+
+    def __init__(self, cache_dir: Optional[PathLike] = None):
+        """
+        Initialize SidecarStore.
+
+        Args:
+            cache_dir: Sidecar directory (None = disabled: nothing is loaded or saved)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    def path_for(self, package_filename: str) -> Optional[Path]:
+        """Sidecar path of a package file (None when disabled)."""
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / sidecar_name(package_filename)
+
+    def _read(self, package_filename: str) -> Optional[PackageMetadata]:
+        path = self.path_for(package_filename)
+        if path is None or not path.exists():
+            self.misses += 1
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != SIDECAR_FORMAT:
+                raise ValueError(f"format {data.get('format')}")
+            meta = PackageMetadata.from_dict(data['package'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"SIDECAR_INVALID file={package_filename} error={e}")
+            self.rejected += 1
+            return None
+        if meta.filename != package_filename or meta.files is None:
+            self.rejected += 1
+            return None
+        return meta
+
+    def load(self, package_filename: str, size: Optional[int] = None,
+             sha256: Optional[str] = None) -> Optional[PackageMetadata]:
+        """
+        Sidecar of a package known by name (e.g. a remote file).
+
+        Args:
+            package_filename: Package basename
+            size: Expected file size (None = unknown)
+            sha256: Expected digest (None = unknown)
+
+        Returns:
+            PackageMetadata, or None if missing or not matching
+        """
+        meta = self._read(package_filename)
+        if meta is None:
+            return None
+        if (size is not None and meta.csize != size) or (sha256 and meta.sha256sum != sha256):
+            self.rejected += 1
+            return None
+        self.hits += 1
+        return meta
+
+    def load_local(self, path: PathLike) -> Optional[PackageMetadata]:
+        """
+        Sidecar of a local package file, checked against its size and SHA-256
+        (from the hash cache; only computed when name and size already match).
+        """
+        path = Path(path)
+        meta = self._read(path.name)
+        if meta is None:
+            return None
+        try:
+            if meta.csize != path.stat().st_size:
+                self.rejected += 1
+                return None
+        except OSError:
+            self.rejected += 1
+            return None
+        if get_hash_cache().digest(path) != meta.sha256sum:
+            self.rejected += 1
+            return None
+        self.hits += 1
+        return meta
+
+    def save(self, meta: PackageMetadata) -> bool:
+        """Write (or replace) the sidecar of a package atomically."""
+        path = self.path_for(meta.filename)
+        if path is None or meta.files is None:
+            return False
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".sidecar.", dir=str(path.parent))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'format': SIDECAR_FORMAT, 'package': meta.to_dict()}, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"SIDECAR_WRITE_FAIL file={meta.filename} error={e}")
+            return False
+        self.written += 1
+        return True
+
+    def prune(self, keep: Set[str]) -> int:
+        """
+        Delete sidecars of packages that are neither local nor remote any more.
+
+        Args:
+            keep: Package filenames whose sidecars stay
+
+        Returns:
+            Number of sidecars removed
+        """
+        if self.cache_dir is None or not self.cache_dir.exists():
+            return 0
+        removed = 0
+        for path in self.cache_dir.glob(f"*{SIDECAR_SUFFIX}"):
+            if path.name[:-len(SIDECAR_SUFFIX)] not in keep:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"SIDECAR_PRUNE removed={removed} kept={len(keep)}")
+        return removed
+
+    def log_stats(self):
+        """Log one SIDECAR_STATS line."""
+        logger.info(
+            f"SIDECAR_STATS dir={self.cache_dir or 'NONE'} hits={self.hits} misses={self.misses} "
+            f"rejected={self.rejected} written={self.written}"
+        )
+
+
+_default_store = SidecarStore()
+
+
+def get_sidecar_store() -> SidecarStore:
+    """Process-wide SidecarStore shared by all modules (disabled until configured)."""
+    return _default_store
+
+
+def configure_sidecar_store(cache_dir: Optional[PathLike]):
+    """Enable (or disable with None) the shared sidecar store."""
+    _default_store.cache_dir = Path(cache_dir) if cache_dir else None
+    logger.info(f"SIDECAR_DIR={cache_dir or 'NONE'}")
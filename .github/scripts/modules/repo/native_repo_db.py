@@ -0,0 +1,359 @@
+"""
+Native Repo DB Module - Parallel pure-Python replacement for repo-add
+
+repo-add is a bash script that handles packages one at a time and reads
+every archive several times (bsdtar for .PKGINFO, again for the file list,
+md5sum, sha256sum). This generator reads each package exactly once in a
+process pool (package_metadata.read_package_metadata), then writes
+<repo>.db.tar.gz (desc per entry) and <repo>.files.tar.gz (desc + files)
+with the same member names, order and contents as repo-add, plus the
+<repo>.db / <repo>.files symlinks.
+
+Incremental updates reuse the entries of the existing .files database, so
+unchanged packages are not read at all. Valid metadata sidecars (see
+metadata_sidecar) stand in for reading a package, every package that is read
+gets one, and callers may pass metadata of packages that are not on disk.
+
+Benchmark against repo-add and pacman acceptance check (from .github/scripts):
+    python -m modules.repo.native_repo_db PKG_DIR
+"""
+
+import io
+import os
+import sys
+import time
+import tarfile
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from modules.common.hash_cache import file_key, get_hash_cache
+from modules.repo.metadata_sidecar import get_sidecar_store
+from modules.repo.package_metadata import PackageMetadata, read_package_metadata
+from modules.repo.repo_db import read_db_members
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _read_one(args: Tuple[str, bool, bool]):
+    """Process-pool worker: (path, stat key, metadata or None, error)."""
+    path, with_files, include_sig = args
+    key = file_key(path)
+    try:
+        return path, key, read_package_metadata(Path(path), with_files=with_files, include_sig=include_sig), None
+    except Exception as e:  # reported by the parent, never raised across the pool
+        return path, key, None, str(e)[:300]
+
+
+def _sort_key(name: str) -> bytes:
+    return name.encode('utf-8', 'surrogateescape')
+
+
+def _add_text(archive: tarfile.TarFile, name: str, text: str, mtime: int):
+    data = text.encode('utf-8', 'surrogateescape')
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    archive.addfile(info, io.BytesIO(data))
+
+
+def write_database(path: Path, entries: Dict[str, Dict[str, str]], members: Sequence[str]):
+    """
+    Write one sync database atomically (temp file + rename).
+
+    Args:
+        path: <repo>.db.tar.gz or <repo>.files.tar.gz
+        entries: directory -> {member name -> text}
+        members: Member names to include per entry, in order (('desc',) or ('desc', 'files'))
+    """
+    mtime = int(time.time())
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=str(path.parent))
+    os.close(fd)
+    try:
+        with tarfile.open(tmp_path, mode='w:gz', format=tarfile.PAX_FORMAT) as archive:
+            for directory in sorted(entries, key=_sort_key):
+                info = tarfile.TarInfo(directory)
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                info.mtime = mtime
+                archive.addfile(info)
+                for member in members:
+                    text = entries[directory].get(member)
+                    if text is not None:
+                        _add_text(archive, f"{directory}/{member}", text, mtime)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class NativeRepoDbGenerator:
+    """
+    Builds pacman sync databases from package archives without repo-add.
+    """
+
+    def __init__(self, workers: Optional[int] = None, include_sigs: bool = False, with_files: bool = True):
+        """
+        Initialize NativeRepoDbGenerator.
+
+        Args:
+            workers: Processes reading packages (None = CPU count, max 8)
+            include_sigs: Embed .sig files as %PGPSIG% (repo-add --include-sigs)
+            with_files: Also write <repo>.files.tar.gz
+        """
+        self.workers = max(1, int(workers or DEFAULT_WORKERS))
+        self.include_sigs = include_sigs
+        self.with_files = with_files
+        self.last_stats: Dict[str, float] = {}
+
+    def collect(self, package_paths: Sequence[Path]) -> Tuple[Dict[str, PackageMetadata], List[str]]:
+        """
+        Read the metadata of many packages in parallel (valid sidecars are used
+        instead of reading; packages that were read get a sidecar).
+
+        Returns:
+            (filename -> PackageMetadata, failed filenames)
+        """
+        results: Dict[str, PackageMetadata] = {}
+        failed: List[str] = []
+        store = get_sidecar_store()
+        jobs = []
+        for p in package_paths:
+            meta = store.load_local(p) if store.enabled and not self.include_sigs else None
+            if meta is not None:
+                results[meta.filename] = meta
+            else:
+                jobs.append((str(p), store.enabled or self.with_files, self.include_sigs))
+        if not jobs:
+            return results, failed
+        hash_cache = get_hash_cache()
+        # Largest first keeps the pool busy until the end
+        jobs.sort(key=lambda job: -(file_key(job[0]) or (0,))[0])
+        if self.workers == 1 or len(jobs) == 1:
+            outcomes = map(_read_one, jobs)
+            pool = None
+        else:
+            # spawn, not fork: the build may have live threads (e.g. the streaming upload)
+            pool = ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                       mp_context=multiprocessing.get_context("spawn"))
+            outcomes = pool.map(_read_one, jobs)
+        try:
+            for path, key, meta, error in outcomes:
+                if meta is None:
+                    logger.error(f"NATIVE_DB_READ_FAIL file={os.path.basename(path)} error={error}")
+                    failed.append(os.path.basename(path))
+                    continue
+                results[meta.filename] = meta
+                if key is not None:
+                    hash_cache.record(path, key, meta.sha256sum)
+                if store.enabled and meta.pgpsig is None:
+                    store.save(meta)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return results, failed
+
+    def _write(self, repo_name: str, output_dir: Path, entries: Dict[str, Dict[str, str]]):
+        write_database(output_dir / f"{repo_name}.db.tar.gz", entries, ('desc',))
+        links = [(f"{repo_name}.db", f"{repo_name}.db.tar.gz")]
+        if self.with_files:
+            write_database(output_dir / f"{repo_name}.files.tar.gz", entries, ('desc', 'files'))
+            links.append((f"{repo_name}.files", f"{repo_name}.files.tar.gz"))
+        for link, target in links:
+            link_path = output_dir / link
+            if link_path.exists() or link_path.is_symlink():
+                link_path.unlink()
+            os.symlink(target, link_path)
+
+    @staticmethod
+    def _entry(meta: PackageMetadata) -> Dict[str, str]:
+        entry = {'desc': meta.desc_text()}
+        files = meta.files_text()
+        if files is not None:
+            entry['files'] = files
+        return entry
+
+    def generate(self, repo_name: str, output_dir: Path, package_files: Sequence[str],
+                 known: Optional[Dict[str, PackageMetadata]] = None) -> bool:
+        """
+        Full database from package files in output_dir.
+
+        Args:
+            repo_name: Repository name
+            output_dir: Directory with the packages; the databases are written here
+            package_files: Package filenames in output_dir
+            known: Additional packages by metadata only (e.g. sidecars of remote files)
+
+        Returns:
+            True on success
+        """
+        output_dir = Path(output_dir)
+        start = time.monotonic()
+        metas, failed = self.collect([output_dir / f for f in package_files])
+        read_seconds = time.monotonic() - start
+        if failed:
+            return False
+        for filename, meta in (known or {}).items():
+            metas.setdefault(filename, meta)
+
+        entries: Dict[str, Dict[str, str]] = {}
+        names: Dict[str, str] = {}
+        for meta in metas.values():
+            if meta.name in names:
+                logger.error(f"NATIVE_DB_DUPLICATE pkg={meta.name} files={names[meta.name]},{meta.filename}")
+                return False
+            names[meta.name] = meta.filename
+            entries[meta.directory] = self._entry(meta)
+
+        write_start = time.monotonic()
+        self._write(repo_name, output_dir, entries)
+        self._log_stats(len(entries), len(metas), read_seconds, time.monotonic() - write_start, "full")
+        return True
+
+    def update(self, repo_name: str, output_dir: Path, add_files: Sequence[str], remove_names: Sequence[str],
+               known: Optional[Dict[str, PackageMetadata]] = None) -> bool:
+        """
+        Apply additions/removals to the existing <repo>.files.tar.gz (which holds
+        desc and files of every entry) and rewrite both databases.
+
+        Args:
+            repo_name: Repository name
+            output_dir: Directory with the current databases and the added packages
+            add_files: Package filenames to add (replacing entries of the same pkgname)
+            remove_names: Package names to drop
+            known: Metadata for add_files that are not on disk (e.g. sidecars of remote files)
+
+        Returns:
+            True on success
+        """
+        output_dir = Path(output_dir)
+        existing = read_db_members(output_dir / f"{repo_name}.files.tar.gz")
+        if existing is None:
+            return False
+
+        known = known or {}
+        start = time.monotonic()
+        metas, failed = self.collect([output_dir / f for f in add_files if f not in known])
+        read_seconds = time.monotonic() - start
+        if failed:
+            return False
+        metas.update({f: known[f] for f in add_files if f in known})
+
+        # pkgname -> directory of the existing entries
+        by_name: Dict[str, str] = {}
+        for directory, members in existing.items():
+            for line_block in members.get('desc', '').split('\n\n'):
+                lines = line_block.split('\n')
+                if lines[0] == '%NAME%' and len(lines) > 1:
+                    by_name[lines[1]] = directory
+                    break
+
+        drop = set(remove_names) | {meta.name for meta in metas.values()}
+        drop_dirs = {by_name[n] for n in drop if n in by_name}
+        entries = {d: m for d, m in existing.items() if d not in drop_dirs}
+        for meta in metas.values():
+            entries[meta.directory] = self._entry(meta)
+
+        write_start = time.monotonic()
+        self._write(repo_name, output_dir, entries)
+        self._log_stats(len(entries), len(metas), read_seconds, time.monotonic() - write_start, "incremental")
+        return True
+
+    def _log_stats(self, entries: int, read: int, read_seconds: float, write_seconds: float, mode: str):
+        self.last_stats = {'entries': entries, 'read': read, 'read_seconds': read_seconds, 'write_seconds': write_seconds}
+        logger.info(
+            f"NATIVE_DB_GENERATED mode={mode} entries={entries} packages={read} workers={self.workers} "
+            f"read={read_seconds:.2f}s write={write_seconds:.2f}s"
+        )
+
+
+# ----------------------------------------------------------------------
+# Benchmark against repo-add + pacman acceptance
+# ----------------------------------------------------------------------
+
+def _db_contents(path: Path) -> Dict[str, str]:
+    members = read_db_members(path) or {}
+    return {f"{d}/{name}": text for d, m in members.items() for name, text in m.items()}
+
+
+def _pacman_accepts(repo_dir: Path, repo_name: str) -> Optional[bool]:
+    import shutil
+    import subprocess
+    if shutil.which("pacman") is None:
+        return None
+    root = Path(tempfile.mkdtemp(prefix="native-db-pacman-"))
+    try:
+        (root / "db").mkdir()
+        conf = root / "pacman.conf"
+        conf.write_text(
+            f"[options]\nArchitecture = auto\nSigLevel = Never\n\n"
+            f"[{repo_name}]\nServer = file://{repo_dir}\n"
+        )
+        sync = subprocess.run(["pacman", "--config", str(conf), "--dbpath", str(root / "db"), "-Sy"],
+                              capture_output=True, text=True, check=False)
+        listing = subprocess.run(["pacman", "--config", str(conf), "--dbpath", str(root / "db"), "-Sl", repo_name],
+                                 capture_output=True, text=True, check=False)
+        return sync.returncode == 0 and listing.returncode == 0 and bool(listing.stdout.strip())
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _main(argv: List[str]) -> int:
+    import shutil
+    import subprocess
+
+    logging.basicConfig(level=logging.WARNING)
+    if not argv:
+        print("usage: python -m modules.repo.native_repo_db PKG_DIR [WORKERS]")
+        return 2
+    pkg_dir = Path(argv[0]).resolve()
+    workers = int(argv[1]) if len(argv) > 1 else None
+    packages = sorted(p.name for p in pkg_dir.glob("*.pkg.tar.*") if not p.name.endswith('.sig'))
+    repo_name = "benchrepo"
+    work = Path(tempfile.mkdtemp(prefix="native-db-bench-"))
+    try:
+        native_dir, repoadd_dir = work / "native", work / "repo-add"
+        for d in (native_dir, repoadd_dir):
+            d.mkdir()
+            for name in packages:
+                os.symlink(pkg_dir / name, d / name)
+
+        start = time.perf_counter()
+        ok = NativeRepoDbGenerator(workers=workers).generate(repo_name, native_dir, packages)
+        t_native = time.perf_counter() - start
+        print(f"native: ok={ok} packages={len(packages)} {t_native:.2f}s")
+        if not ok:
+            return 1
+
+        if shutil.which("repo-add") is None:
+            print("repo-add not found: comparison skipped")
+            return 0
+        start = time.perf_counter()
+        result = subprocess.run(["repo-add", "-q", f"{repo_name}.db.tar.gz", *packages],
+                                cwd=repoadd_dir, capture_output=True, text=True, check=False)
+        t_repoadd = time.perf_counter() - start
+        print(f"repo-add: rc={result.returncode} {t_repoadd:.2f}s (speedup x{t_repoadd / t_native if t_native else 0:.1f})")
+
+        status = 0
+        for db in (f"{repo_name}.db.tar.gz", f"{repo_name}.files.tar.gz"):
+            ours, theirs = _db_contents(native_dir / db), _db_contents(repoadd_dir / db)
+            differing = sorted(k for k in set(ours) | set(theirs) if ours.get(k) != theirs.get(k))
+            print(f"{db}: members={len(ours)} differing={len(differing)} {differing[:5]}")
+            status |= 1 if differing else 0
+        accepted = _pacman_accepts(native_dir, repo_name)
+        print(f"pacman -Sy/-Sl: {'skipped (no pacman)' if accepted is None else ('ok' if accepted else 'FAILED')}")
+        return status | (1 if accepted is False else 0)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
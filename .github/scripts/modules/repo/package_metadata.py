@@ -0,0 +1,302 @@
+"""
+Package Metadata Module - .PKGINFO, file list and checksums of a package archive
+
+One sequential read of a .pkg.tar.* file yields everything a sync database
+entry needs: the raw bytes go through MD5/SHA-256 while they are decompressed
+and walked as a tar stream (.PKGINFO is the first member of makepkg
+packages). When the file list is not needed the decompressor is abandoned
+right after .PKGINFO and the rest of the file is only hashed.
+
+Entries are formatted exactly like repo-add (field order, blank-line
+separators, "%FILES%" list sorted bytewise without the dot-files).
+
+zstd is decoded with the `zstandard` module when it is installed, otherwise
+through the `zstd` binary (a pacman dependency); xz/gz/bz2 use the stdlib.
+"""
+
+import io
+import bz2
+import base64
+import gzip
+import lzma
+import hashlib
+import tarfile
+import logging
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: fall back to the zstd binary
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1024 * 1024
+
+# .PKGINFO keys that repeat (collected as lists), as repo-add names them
+_LIST_KEYS = {
+    'group': 'GROUPS', 'license': 'LICENSE', 'replaces': 'REPLACES', 'conflict': 'CONFLICTS',
+    'provides': 'PROVIDES', 'depend': 'DEPENDS', 'optdepend': 'OPTDEPENDS',
+    'makedepend': 'MAKEDEPENDS', 'checkdepend': 'CHECKDEPENDS',
+}
+
+
+class _HashingReader(io.RawIOBase):
+    """File wrapper that feeds every byte read through MD5 and SHA-256."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        if n:
+            self.md5.update(data)
+            self.sha256.update(data)
+            self.size += n
+        return n
+
+    def read_chunk(self) -> bytes:
+        return self.read(READ_CHUNK_BYTES) or b''
+
+    def drain(self):
+        """Hash the rest of the file."""
+        while self.read_chunk():
+            pass
+
+
+@dataclass
+class PackageMetadata:
+    """Everything a sync database entry is made of"""
+    filename: str
+    csize: int
+    md5sum: str
+    sha256sum: str
+    pkginfo: List[Tuple[str, str]] = field(default_factory=list)
+    files: Optional[List[str]] = None       # None = not collected
+    pgpsig: Optional[str] = None            # base64 signature (only with include_sigs)
+
+    def _values(self, key: str) -> List[str]:
+        return [v for k, v in self.pkginfo if k == key]
+
+    def _value(self, key: str) -> str:
+        values = self._values(key)
+        return values[-1] if values else ''
+
+    @property
+    def name(self) -> str:
+        return self._value('pkgname')
+
+    @property
+    def version(self) -> str:
+        return self._value('pkgver')
+
+    @property
+    def arch(self) -> str:
+        return self._value('arch')
+
+    @property
+    def directory(self) -> str:
+        """Database directory name: <pkgname>-<pkgver>."""
+        return f"{self.name}-{self.version}"
+
+    def desc_text(self) -> str:
+        """The desc member, byte-identical to repo-add."""
+        lists = {key: self._values(key) for key in _LIST_KEYS}
+        sections = [
+            ('FILENAME', [self.filename]),
+            ('NAME', [self.name]),
+            ('BASE', [self._value('pkgbase')]),
+            ('VERSION', [self.version]),
+            ('DESC', [self._value('pkgdesc')]),
+            ('GROUPS', lists['group']),
+            ('CSIZE', [str(self.csize)]),
+            ('ISIZE', [self._value('size')]),
+            ('MD5SUM', [self.md5sum]),
+            ('SHA256SUM', [self.sha256sum]),
+            ('PGPSIG', [self.pgpsig or '']),
+            ('URL', [self._value('url')]),
+            ('LICENSE', lists['license']),
+            ('ARCH', [self._value('arch')]),
+            ('BUILDDATE', [self._value('builddate')]),
+            ('PACKAGER', [self._value('packager')]),
+            ('REPLACES', lists['replaces']),
+            ('CONFLICTS', lists['conflict']),
+            ('PROVIDES', lists['provides']),
+            ('DEPENDS', lists['depend']),
+            ('OPTDEPENDS', lists['optdepend']),
+            ('MAKEDEPENDS', lists['makedepend']),
+            ('CHECKDEPENDS', lists['checkdepend']),
+        ]
+        out = []
+        for key, values in sections:
+            # repo-add's format_entry skips a field whose first value is empty
+            if values and values[0]:
+                out.append(f"%{key}%\n" + ''.join(f"{v}\n" for v in values) + "\n")
+        return ''.join(out)
+
+    def files_text(self) -> Optional[str]:
+        """The files member ("%FILES%" + sorted list), or None if not collected."""
+        if self.files is None:
+            return None
+        return "%FILES%\n" + ''.join(f"{path}\n" for path in self.files)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'filename': self.filename, 'csize': self.csize, 'md5sum': self.md5sum,
+            'sha256sum': self.sha256sum, 'pkginfo': [list(kv) for kv in self.pkginfo],
+            'files': self.files, 'pgpsig': self.pgpsig,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'PackageMetadata':
+        return cls(
+            filename=data['filename'], csize=int(data['csize']), md5sum=data['md5sum'],
+            sha256sum=data['sha256sum'], pkginfo=[(k, v) for k, v in data.get('pkginfo', [])],
+            files=data.get('files'), pgpsig=data.get('pgpsig'),
+        )
+
+
+def parse_pkginfo(text: str) -> List[Tuple[str, str]]:
+    """.PKGINFO lines -> [(key, value)] in file order (comments skipped)."""
+    pairs = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        key, sep, value = line.partition('=')
+        if not sep:
+            continue
+        pairs.append((key.strip(), value.strip()))
+    return pairs
+
+
+class _ZstdPipe:
+    """Decompress through the zstd binary; a feeder thread pushes (and hashes) the raw bytes."""
+
+    def __init__(self, reader: _HashingReader):
+        self._reader = reader
+        self._proc = subprocess.Popen(['zstd', '-dcq'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL)
+        self._thread = threading.Thread(target=self._feed, daemon=True)
+        self._thread.start()
+
+    def _feed(self):
+        stdin = self._proc.stdin
+        try:
+            while True:
+                chunk = self._reader.read_chunk()
+                if not chunk:
+                    break
+                if stdin is not None:
+                    try:
+                        stdin.write(chunk)
+                    except (BrokenPipeError, ValueError):
+                        stdin = None  # reader stopped early: keep hashing only
+        finally:
+            if stdin is not None:
+                try:
+                    stdin.close()
+                except BrokenPipeError:
+                    pass
+
+    def read(self, n: int = -1) -> bytes:
+        return self._proc.stdout.read(n)
+
+    def finish(self):
+        """Stop decompressing and wait until the whole file was hashed."""
+        self._proc.stdout.close()
+        self._thread.join()
+        self._proc.wait()
+
+
+def _open_stream(path: Path, reader: _HashingReader):
+    """Decompressed stream over reader (and a finish() callable)."""
+    name = path.name
+    if name.endswith('.zst'):
+        if zstandard is not None:
+            stream = zstandard.ZstdDecompressor().stream_reader(reader, read_across_frames=True)
+            return stream, reader.drain
+        pipe = _ZstdPipe(reader)
+        return pipe, pipe.finish
+    if name.endswith('.xz'):
+        return lzma.LZMAFile(reader), reader.drain
+    if name.endswith('.gz'):
+        return gzip.GzipFile(fileobj=reader), reader.drain
+    if name.endswith('.bz2'):
+        return bz2.BZ2File(reader), reader.drain
+    return reader, reader.drain
+
+
+def _sort_key(path: str) -> bytes:
+    # LC_ALL=C sort: bytewise
+    return path.encode('utf-8', 'surrogateescape')
+
+
+def read_package_metadata(path: Path, with_files: bool = True, include_sig: bool = False) -> PackageMetadata:
+    """
+    Read .PKGINFO, the file list and checksums of a package in one pass.
+
+    Args:
+        path: Package archive
+        with_files: Collect the file list (walks the whole archive)
+        include_sig: Embed <path>.sig as PGPSIG (repo-add --include-sigs)
+
+    Returns:
+        PackageMetadata
+
+    Raises:
+        OSError, tarfile.TarError, ValueError: unreadable or invalid package
+    """
+    path = Path(path)
+    pkginfo_text = None
+    files: Optional[List[str]] = [] if with_files else None
+    with open(path, 'rb') as raw:
+        reader = _HashingReader(raw)
+        stream, finish = _open_stream(path, reader)
+        try:
+            with tarfile.open(fileobj=stream, mode='r|') as archive:
+                for member in archive:
+                    name = member.name
+                    if name == '.PKGINFO':
+                        handle = archive.extractfile(member)
+                        pkginfo_text = handle.read().decode('utf-8', 'replace') if handle else ''
+                        if not with_files:
+                            break
+                        continue
+                    if with_files and not name.startswith('.'):
+                        files.append(name + '/' if member.isdir() else name)
+        finally:
+            finish()
+
+    if pkginfo_text is None:
+        raise ValueError(f"{path.name}: no .PKGINFO")
+    if files is not None:
+        files = sorted(set(files), key=_sort_key)
+
+    pgpsig = None
+    if include_sig:
+        sig_path = Path(f"{path}.sig")
+        if sig_path.exists():
+            pgpsig = base64.b64encode(sig_path.read_bytes()).decode('ascii')
+
+    return PackageMetadata(
+        filename=path.name,
+        csize=reader.size,
+        md5sum=reader.md5.hexdigest(),
+        sha256sum=reader.sha256.hexdigest(),
+        pkginfo=parse_pkginfo(pkginfo_text),
+        files=files,
+        pgpsig=pgpsig,
+    )
+
@@ -0,0 +1,145 @@
+"""
+Remote Version Index Module - All package versions present on the VPS, per pkgname
+
+Built once from a remote file listing (basenames or full paths, packages and
+signatures mixed); name/version/arch come from the filename, or from the
+package's own .PKGINFO when a metadata sidecar supplies it. Every pkgname maps to its files sorted oldest -> newest with
+the in-process vercmp, so newest/oldest lookups are O(1) and the version audit,
+VPS prune and hygiene passes all group the listing the same way.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from modules.common.package_filename import parse_package_filename
+from modules.common.vercmp import vercmp_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RemotePackageFile:
+    """One package file on the VPS"""
+    path: str                 # as listed (basename or full remote path)
+    filename: str
+    name: str
+    version: str              # [epoch:]pkgver-pkgrel
+    arch: str
+    signature_path: Optional[str] = None
+    size: Optional[int] = None
+
+    @property
+    def has_signature(self) -> bool:
+        return self.signature_path is not None
+
+
+class RemoteVersionIndex:
+    """
+    pkgname -> remote package files sorted by version (oldest first).
+    """
+
+    def __init__(self, remote_files: Iterable[str] = (), sizes: Optional[Dict[str, int]] = None,
+                 identities: Optional[Dict[str, Tuple[str, str, str]]] = None):
+        """
+        Build the index.
+
+        Args:
+            remote_files: Remote file listing; '.sig' entries mark signature presence
+            sizes: Optional file sizes keyed by listed path or basename
+            identities: Optional basename -> (name, version, arch) from .PKGINFO,
+                        preferred over parsing the filename
+        """
+        self._versions: Dict[str, Tuple[RemotePackageFile, ...]] = {}
+        self._by_filename: Dict[str, RemotePackageFile] = {}
+        self.orphan_signatures: List[str] = []
+        self.other_files: List[str] = []
+        self._build(remote_files, sizes or {}, identities or {})
+
+    def _build(self, remote_files: Iterable[str], sizes: Dict[str, int],
+               identities: Dict[str, Tuple[str, str, str]]):
+        signatures: Dict[str, str] = {}
+        packages: List[Tuple[str, str]] = []
+        for path in remote_files:
+            filename = path.rsplit('/', 1)[-1]
+            if filename.endswith('.sig'):
+                signatures[filename[:-4]] = path
+            elif filename in identities or parse_package_filename(filename):
+                packages.append((path, filename))
+            else:
+                self.other_files.append(path)
+
+        grouped: Dict[str, List[RemotePackageFile]] = {}
+        for path, filename in packages:
+            if filename in identities:
+                name, version, arch = identities[filename]
+            else:
+                record = parse_package_filename(filename)
+                name, version, arch = record.name, record.version, record.arch
+            size = sizes.get(path, sizes.get(filename))
+            entry = RemotePackageFile(
+                path=path,
+                filename=filename,
+                name=name,
+                version=version,
+                arch=arch,
+                signature_path=signatures.get(filename),
+                size=size
+            )
+            grouped.setdefault(name, []).append(entry)
+            self._by_filename[filename] = entry
+
+        for name, entries in grouped.items():
+            entries.sort(key=lambda e: (vercmp_key(e.version), e.filename))
+            self._versions[name] = tuple(entries)
+
+        self.orphan_signatures = [path for base, path in signatures.items() if base not in self._by_filename]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def __contains__(self, pkg_name: str) -> bool:
+        return pkg_name in self._versions
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._versions)
+
+    def package_names(self) -> List[str]:
+        """All indexed pkgnames."""
+        return list(self._versions)
+
+    def versions(self, pkg_name: str) -> Tuple[RemotePackageFile, ...]:
+        """Files of a package sorted oldest -> newest (empty if absent)."""
+        return self._versions.get(pkg_name, ())
+
+    def newest(self, pkg_name: str) -> Optional[RemotePackageFile]:
+        """Newest file of a package, or None."""
+        entries = self._versions.get(pkg_name)
+        return entries[-1] if entries else None
+
+    def oldest(self, pkg_name: str) -> Optional[RemotePackageFile]:
+        """Oldest file of a package, or None."""
+        entries = self._versions.get(pkg_name)
+        return entries[0] if entries else None
+
+    def stale(self, pkg_name: str, keep: int = 1) -> Tuple[RemotePackageFile, ...]:
+        """Files of a package older than its newest `keep` versions."""
+        entries = self._versions.get(pkg_name, ())
+        return entries[:max(0, len(entries) - max(keep, 0))]
+
+    def get(self, filename: str) -> Optional[RemotePackageFile]:
+        """Entry for a package basename, or None."""
+        return self._by_filename.get(filename)
+
+    def files(self) -> Iterator[RemotePackageFile]:
+        """All package files, grouped by pkgname."""
+        for entries in self._versions.values():
+            yield from entries
+
+    def multi_version_packages(self) -> Dict[str, int]:
+        """pkgname -> version count for packages with more than one file."""
+        return {name: len(entries) for name, entries in self._versions.items() if len(entries) > 1}
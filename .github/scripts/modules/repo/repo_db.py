@@ -0,0 +1,219 @@
+"""
+Repo DB Module - Read pacman sync databases (<repo>.db.tar.gz) in process
+
+A sync database is a tar archive with one "<name>-<version>/desc" member per
+package; desc is a sequence of "%FIELD%" headers each followed by one value
+per line and a blank line. The archive is read in streaming mode, so only
+the small desc members are ever decoded.
+
+verify_database() checks a freshly generated database against the package
+files it describes before anything is uploaded.
+"""
+
+import time
+import tarfile
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from modules.common.hash_cache import get_hash_cache
+
+logger = logging.getLogger(__name__)
+
+
+def parse_desc(text: str) -> Dict[str, List[str]]:
+    """
+    Parse a desc (or files) member.
+
+    Returns:
+        FIELD (without %) -> list of values
+    """
+    fields: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for line in text.split('\n'):
+        if len(line) > 2 and line.startswith('%') and line.endswith('%'):
+            current = fields.setdefault(line[1:-1], [])
+        elif line == '':
+            current = None
+        elif current is not None:
+            current.append(line)
+    return fields
+
+
+@dataclass
+class DbEntry:
+    """One package entry of a sync database"""
+    directory: str                      # "<name>-<version>"
+    fields: Dict[str, List[str]] = field(default_factory=dict)
+
+    def value(self, key: str) -> Optional[str]:
+        values = self.fields.get(key)
+        return values[0] if values else None
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.value('NAME')
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.value('VERSION')
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self.value('FILENAME')
+
+    @property
+    def csize(self) -> Optional[int]:
+        value = self.value('CSIZE')
+        return int(value) if value and value.isdigit() else None
+
+    @property
+    def sha256sum(self) -> Optional[str]:
+        return self.value('SHA256SUM')
+
+
+def iter_db_entries(db_path: Path) -> Iterator[DbEntry]:
+    """
+    Stream the desc entries of a sync database (any compression tarfile detects).
+
+    Raises:
+        tarfile.TarError, OSError: unreadable archive
+    """
+    with tarfile.open(db_path, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('/desc'):
+                continue
+            handle = archive.extractfile(member)
+            if handle is None:
+                continue
+            text = handle.read().decode('utf-8', errors='replace')
+            yield DbEntry(directory=member.name.rsplit('/', 1)[0], fields=parse_desc(text))
+
+
+def read_db_entries(db_path: Path) -> Optional[Dict[str, DbEntry]]:
+    """
+    All entries of a sync database keyed by package name.
+
+    Returns:
+        pkgname -> DbEntry, or None if the database can not be read
+    """
+    try:
+        entries = {}
+        for entry in iter_db_entries(db_path):
+            if entry.name:
+                entries[entry.name] = entry
+        return entries
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.warning(f"REPO_DB_UNREADABLE file={db_path} error={e}")
+        return None
+
+
+def read_db_members(db_path: Path) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Every text member of a sync database grouped by entry directory
+    (e.g. {"foo-1.0-1": {"desc": "...", "files": "..."}}).
+
+    Returns:
+        Mapping, or None if the database can not be read
+    """
+    try:
+        members: Dict[str, Dict[str, str]] = {}
+        with tarfile.open(db_path, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile() or '/' not in member.name:
+                    continue
+                directory, name = member.name.rsplit('/', 1)
+                handle = archive.extractfile(member)
+                if handle is None:
+                    continue
+                members.setdefault(directory, {})[name] = handle.read().decode('utf-8', errors='surrogateescape')
+        return members
+    except (tarfile.TarError, OSError, EOFError) as e:
+        logger.warning(f"REPO_DB_UNREADABLE file={db_path} error={e}")
+        return None
+
+
+@dataclass
+class DbVerification:
+    """Outcome of verify_database()"""
+    entries: int = 0
+    local: int = 0                      # checked against files in package_dir
+    known: int = 0                      # checked against known (size, sha256) pairs
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.entries > 0
+
+
+def verify_database(db_path: Path, package_dir: Path,
+                    known: Optional[Dict[str, Tuple[int, str]]] = None,
+                    expected: Optional[List[str]] = None) -> DbVerification:
+    """
+    Parse every desc of a database and cross-check %FILENAME%, %CSIZE% and
+    %SHA256SUM% against the package files (digests from the shared hash cache).
+
+    Streaming stops at the first entry whose file is missing or has the wrong
+    size; digests are then computed in one parallel pass.
+
+    Args:
+        db_path: <repo>.db.tar.gz
+        package_dir: Directory with the package files
+        known: filename -> (size, sha256) for entries without a local file
+               (e.g. remote packages represented by metadata sidecars)
+        expected: Filenames that must each have an entry (None = not checked)
+
+    Returns:
+        DbVerification
+    """
+    start = time.monotonic()
+    known = known or {}
+    result = DbVerification()
+    to_hash: Dict[str, Tuple[str, str]] = {}  # local path -> (filename, expected sha256)
+    seen = set()
+    try:
+        for entry in iter_db_entries(db_path):
+            result.entries += 1
+            filename, csize, sha256 = entry.filename, entry.csize, entry.sha256sum
+            if not filename or csize is None or not sha256:
+                result.errors.append(f"{entry.directory}: incomplete desc")
+                break
+            if filename in seen:
+                result.errors.append(f"{filename}: duplicate entry")
+                break
+            seen.add(filename)
+            path = package_dir / filename
+            if path.exists():
+                size = path.stat().st_size
+                if size != csize:
+                    result.errors.append(f"{filename}: CSIZE {csize} != file size {size}")
+                    break
+                to_hash[str(path)] = (filename, sha256)
+                result.local += 1
+            elif filename in known:
+                size, digest = known[filename]
+                if size != csize or digest != sha256:
+                    result.errors.append(f"{filename}: entry does not match its known size/digest")
+                    break
+                result.known += 1
+            else:
+                result.errors.append(f"{filename}: no such package")
+                break
+    except (tarfile.TarError, OSError, EOFError) as e:
+        result.errors.append(f"unreadable database: {e}")
+
+    if not result.errors and to_hash:
+        digests = get_hash_cache().digests(list(to_hash))
+        for path, (filename, sha256) in to_hash.items():
+            if digests.get(path) != sha256:
+                result.errors.append(f"{filename}: SHA256SUM mismatch")
+
+    if not result.errors and expected is not None:
+        missing = sorted(set(expected) - seen)
+        if missing:
+            result.errors.append(f"{len(missing)} packages without entry: {missing[:5]}")
+
+    result.seconds = time.monotonic() - start
+    return result
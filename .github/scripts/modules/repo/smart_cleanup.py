@@ -8,13 +8,15 @@ Handles:
 """
 
 import os
-import subprocess
 import shutil
 import re
 import logging
 from pathlib import Path
 from typing import List, Set, Tuple, Optional, Dict
 
+from modules.common.package_filename import parse_package_filename
+from modules.common.vercmp import vercmp
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,32 +54,8 @@ class SmartCleanup:
         Returns:
             Package name or None if cannot parse
         """
-        try:
-            # Remove extensions
-            base = filename.replace('.pkg.tar.zst', '').replace('.pkg.tar.xz', '')
-            parts = base.split('-')
-            
-            # Package name is everything before version-release-arch
-            # Handle both standard and epoch formats
-            for i in range(len(parts) - 3, 0, -1):
-                potential_name = '-'.join(parts[:i])
-                
-                # Check if remaining parts look like version-release-arch
-                remaining = parts[i:]
-                if len(remaining) >= 3:
-                    # Check for epoch format (e.g., "2-26.1.9-1")
-                    if remaining[0].isdigit() and '-' in '-'.join(remaining[1:]):
-                        # Valid epoch format
-                        return potential_name
-                    # Standard format (e.g., "26.1.9-1")
-                    elif any(c.isdigit() for c in remaining[0]) and remaining[1].isdigit():
-                        # Valid standard format
-                        return potential_name
-        
-        except Exception as e:
-            logger.debug(f"Could not parse filename {filename}: {e}")
-        
-        return None
+        record = parse_package_filename(filename)
+        return record.name if record else None
     
     @staticmethod
     def extract_version_from_filename(filename: str, pkg_name: str) -> Optional[str]:
@@ -91,36 +69,14 @@ class SmartCleanup:
         Returns:
             Version string (e.g., '26.1.9-1') or None if cannot parse
         """
-        try:
-            # Remove extensions
-            base = filename.replace('.pkg.tar.zst', '').replace('.pkg.tar.xz', '')
-            parts = base.split('-')
-            
-            # Find where package name ends
-            for i in range(len(parts) - 2, 0, -1):
-                possible_name = '-'.join(parts[:i])
-                if possible_name == pkg_name or possible_name.startswith(pkg_name + '-'):
-                    # Remaining parts: version-release-architecture
-                    if len(parts) >= i + 3:
-                        version_part = parts[i]
-                        release_part = parts[i+1]
-                        
-                        # Check for epoch (e.g., "2-26.1.9-1" -> "2:26.1.9-1")
-                        if i + 2 < len(parts) and parts[i].isdigit():
-                            epoch_part = parts[i]
-                            version_part = parts[i+1]
-                            release_part = parts[i+2]
-                            return f"{epoch_part}:{version_part}-{release_part}"
-                        else:
-                            return f"{version_part}-{release_part}"
-        except Exception as e:
-            logger.debug(f"Could not extract version from {filename}: {e}")
-        
-        return None
+        record = parse_package_filename(filename)
+        if record is None or record.name != pkg_name:
+            return None
+        return record.version
     
     def _compare_versions(self, version1: str, version2: str) -> int:
         """
-        Compare two version strings using vercmp.
+        Compare two version strings using the in-process vercmp port.
         
         Args:
             version1: First version string
@@ -129,22 +85,7 @@ class SmartCleanup:
         Returns:
             -1 if version1 < version2, 0 if equal, 1 if version1 > version2
         """
-        try:
-            result = subprocess.run(
-                ['vercmp', version1, version2],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            if result.returncode == 0:
-                cmp_result = int(result.stdout.strip())
-                return cmp_result
-        except Exception as e:
-            logger.warning(f"vercmp failed, using fallback comparison: {e}")
-        
-        # Fallback: string comparison (less accurate)
-        return 1 if version1 > version2 else -1 if version1 < version2 else 0
+        return vercmp(version1, version2)
     
     def remove_old_package_versions(self):
         """
@@ -6,6 +6,10 @@ import re
 import logging
 from typing import Dict, List, Optional, Tuple, Set
 
+from modules.common.package_filename import parse_package_filename
+from modules.repo.package_metadata import PackageMetadata
+from modules.repo.remote_version_index import RemoteVersionIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,8 +43,8 @@ class VersionTracker:
         self._upload_successful = False
         self._desired_inventory: Set[str] = set()  # NEW: Desired inventory for cleanup guard
         
-        # FIX: Add persistent remote version index
-        self._remote_version_index: Dict[str, str] = {}  # {pkg_name: normalized_version}
+        # FIX: Add persistent remote version index (all versions per pkgname, vercmp-sorted)
+        self._remote_index = RemoteVersionIndex()
     
     def set_desired_inventory(self, desired_inventory: Set[str]):
         """Set the desired inventory for cleanup guard"""
@@ -50,57 +54,69 @@ class VersionTracker:
         """Set the upload success flag for safety valve"""
         self._upload_successful = successful
     
-    def build_remote_version_index(self, remote_files: List[str]):
+    def build_remote_version_index(self, remote_files: List[str], sizes: Optional[Dict[str, int]] = None,
+                                   source: str = "scan", metadata: Optional[Dict[str, PackageMetadata]] = None):
         """
         FIX: Build authoritative remote version index from VPS package files.
         This index persists across phases and is the source of truth for remote versions.
+        Every version of a package is kept (sorted with vercmp), not just the last one listed.
         
         Args:
-            remote_files: List of VPS filenames (basenames) from SSH find
+            remote_files: List of VPS filenames (basenames) from SSH find, signatures may be included
+            sizes: Optional file sizes keyed by filename
+            source: Where the listing came from ('scan' or 'manifest'), for logs
+            metadata: Optional metadata sidecars by filename (.PKGINFO name/version/arch
+                      take precedence over filename parsing)
         """
-        logger.info("Building remote version index from VPS package files...")
-        self._remote_version_index = {}
+        logger.info(f"Building remote version index from VPS package files (REMOTE_INDEX_SOURCE={source})...")
+        identities = {
+            filename: (meta.name, meta.version, meta.arch)
+            for filename, meta in (metadata or {}).items() if meta.name and meta.version
+        }
+        if identities:
+            logger.info(f"REMOTE_INDEX_SIDECARS={len(identities)}")
+        self._remote_index = RemoteVersionIndex(remote_files, sizes, identities)
         
-        processed_count = 0
-        fail_count = 0
+        logged = 0
+        for pkg_name in self._remote_index:
+            newest = self._remote_index.newest(pkg_name)
+            if logged < 5:  # Only log first 5 packages for debugging
+                logger.info(f"PARSE_VPS_PKG: file={newest.filename} pkg={pkg_name} ver={self.normalize_version_string(newest.version)}")
+                logged += 1
         
-        for filename in remote_files:
-            # Only process package files, not signatures
-            if not (filename.endswith('.pkg.tar.zst') or filename.endswith('.pkg.tar.xz')):
-                continue
-            
-            pkg_name, version = self._parse_package_filename_for_index(filename)
-            if pkg_name and version:
-                # Store the normalized version
-                self._remote_version_index[pkg_name] = version
-                processed_count += 1
-                if fail_count < 5:  # Only log first 5 successful parses for debugging
-                    logger.info(f"PARSE_VPS_PKG: file={filename} pkg={pkg_name} ver={version}")
-            else:
-                fail_count += 1
-                if fail_count <= 5:  # Only log first 5 failures to avoid spam
-                    logger.info(f"PARSE_VPS_PKG: file={filename} pkg=NONE ver=NONE")
+        unparsed = [f for f in self._remote_index.other_files if '.pkg.tar' in f]
+        if unparsed:
+            logger.info(f"PARSE_VPS_FAIL_COUNT={len(unparsed)}")
+            for filename in unparsed[:5]:  # Only log first 5 failures to avoid spam
+                logger.info(f"PARSE_VPS_PKG: file={filename} pkg=NONE ver=NONE")
         
-        if fail_count > 0:
-            logger.info(f"PARSE_VPS_FAIL_COUNT={fail_count}")
+        multi = self._remote_index.multi_version_packages()
+        if multi:
+            sample = ','.join(f"{name}={count}" for name, count in list(multi.items())[:10])
+            logger.info(f"REMOTE_INDEX_MULTI_VERSION count={len(multi)} sample={sample}")
         
-        logger.info(f"Remote version index built: {processed_count} packages indexed")
+        logger.info(f"Remote version index built: {len(self._remote_index)} packages indexed")
         
         # Log packages from packages.py that were NOT found in the remote index
         try:
             import packages
             all_expected = list(packages.LOCAL_PACKAGES) + list(packages.AUR_PACKAGES)
-            missing = [p for p in all_expected if p not in self._remote_version_index]
+            missing = [p for p in all_expected if p not in self._remote_index]
             if missing:
                 logger.warning(f"REMOTE_INDEX_MISSING_PACKAGES: {missing}")
                 logger.warning(f"These packages from packages.py were NOT found in VPS remote index")
         except ImportError:
             pass
     
+    @property
+    def remote_index(self) -> RemoteVersionIndex:
+        """Remote version index built by build_remote_version_index()"""
+        return self._remote_index
+    
     def _parse_package_filename_for_index(self, filename: str) -> Tuple[Optional[str], Optional[str]]:
         """
         Parse package name and version from package filename for indexing.
-        FIX: Robust parsing for pkgnames ending with digits and where version also starts with digits.
+        Delegates to the canonical parser in modules.common.package_filename.
         
         Args:
             filename: Package filename (e.g., 'ttf-font-awesome-5-5.15.4-1-any.pkg.tar.zst')
@@ -108,94 +124,11 @@ class VersionTracker:
         Returns:
             Tuple of (pkg_name, normalized_version) or (None, None) if cannot parse
         """
-        # Remove extensions
-        if filename.endswith('.pkg.tar.zst'):
-            base = filename[:-12]
-        elif filename.endswith('.pkg.tar.xz'):
-            base = filename[:-11]
-        else:
-            # Not a package file
-            return None, None
-        
-        # Remove known architecture suffixes from the end
-        # These are only stripped if they appear as the final token
-        arch_patterns = [r'-x86_64$', r'-any$', r'-i686$', r'-aarch64$', r'-armv7h$', r'-armv6h$']
-        for pattern in arch_patterns:
-            base = re.sub(pattern, '', base)
-        
-        # Now split by hyphens
-        parts = base.split('-')
-        
-        if len(parts) < 3:  # Need at least pkgname, version, and release
+        # Canonical parser: the last three '-' fields are pkgver, pkgrel and arch
+        record = parse_package_filename(filename)
+        if record is None:
             return None, None
-        
-        # Try to find where version starts
-        # We look for patterns that indicate version start:
-        # 1. Contains ':' (epoch:version) - e.g., "1:r1797.88f5a8a"
-        # 2. Contains a dot and digits - e.g., "5.15.4"
-        # 3. Starts with 'r' followed by digits (git revisions) - e.g., "r1797.88f5a8a"
-        # 4. All digits (could be epoch alone)
-        
-        # Start from the end and work backwards
-        for i in range(len(parts) - 2, -1, -1):
-            # Check if current part could be the start of version
-            current_part = parts[i]
-            
-            # Check for epoch:version format
-            if ':' in current_part:
-                # This is epoch:version format
-                # The next part should be the release
-                if i + 1 < len(parts) and parts[i + 1].isdigit():
-                    pkg_name = '-'.join(parts[:i])
-                    # Reconstruct version: epoch:version-release
-                    version_str = f"{current_part}-{parts[i + 1]}"
-                    normalized = self.normalize_version_string(version_str)
-                    return pkg_name, normalized
-            
-            # Check if current part looks like a version (contains digits and maybe dots/letters)
-            # and next part is a digit (the release)
-            elif i + 1 < len(parts) and parts[i + 1].isdigit():
-                # Check if current part could be a version
-                # It should contain at least one digit
-                if any(c.isdigit() for c in current_part):
-                    # Check if this is actually the package name (e.g., "ttf-font-awesome-5" where "5" is part of pkgname)
-                    # To avoid false positives, we need additional checks
-                    # 1. If current_part is all digits, it might be part of package name (e.g., "ttf-font-awesome-5")
-                    # 2. Look ahead to see if we have a valid version pattern
-                    
-                    # Check if we have a valid version pattern
-                    # A version typically contains a dot or starts with 'r' for git
-                    is_likely_version = (
-                        '.' in current_part or  # e.g., "5.15.4"
-                        current_part.startswith('r') or  # e.g., "r1797.88f5a8a"
-                        ':' in current_part or  # Already handled above
-                        (any(c.isdigit() for c in current_part) and any(c.isalpha() for c in current_part))  # Mixed alphanumeric
-                    )
-                    
-                    if is_likely_version:
-                        pkg_name = '-'.join(parts[:i])
-                        # Reconstruct version: version-release
-                        version_str = f"{current_part}-{parts[i + 1]}"
-                        normalized = self.normalize_version_string(version_str)
-                        return pkg_name, normalized
-                    else:
-                        # Check if the part before current could be the version
-                        # This handles cases like "ttf-font-awesome-5-5.15.4-1"
-                        # Where parts are: ["ttf", "font", "awesome", "5", "5.15.4", "1"]
-                        # "5" is not a version, "5.15.4" is
-                        continue
-        
-        # If we get here, try a simpler approach: assume last 2 parts are version-release
-        # This handles standard cases
-        if len(parts) >= 2:
-            # Check if second to last part could be version and last part is release
-            if parts[-1].isdigit() and any(c.isdigit() for c in parts[-2]):
-                pkg_name = '-'.join(parts[:-2])
-                version_str = f"{parts[-2]}-{parts[-1]}"
-                normalized = self.normalize_version_string(version_str)
-                return pkg_name, normalized
-        
-        return None, None
+        return record.name, self.normalize_version_string(record.version)
     
     def get_remote_version_index_stats(self) -> Tuple[int, List[str]]:
         """
@@ -204,10 +137,11 @@ class VersionTracker:
         Returns:
             Tuple of (count, first_10_package_entries) where entries are "pkgname=version"
         """
-        count = len(self._remote_version_index)
+        count = len(self._remote_index)
         sample = []
-        for i, (pkg_name, version) in enumerate(list(self._remote_version_index.items())[:10]):
-            sample.append(f"{pkg_name}={version}")
+        for pkg_name in self._remote_index.package_names()[:10]:
+            newest = self._remote_index.newest(pkg_name)
+            sample.append(f"{pkg_name}={self.normalize_version_string(newest.version)}")
         return count, sample
     
     def register_package_target_version(self, pkg_name: str, target_version: str):
@@ -279,8 +213,9 @@ class VersionTracker:
         Returns:
             Normalized version string or None if not found
         """
-        # Use the persistent index
-        version = self._remote_version_index.get(pkg_name)
+        # Use the persistent index (newest of all remote versions)
+        newest = self._remote_index.newest(pkg_name)
+        version = self.normalize_version_string(newest.version) if newest else None
         
         # Log grep-proof debug line
         found = 1 if version else 0
@@ -304,7 +239,7 @@ class VersionTracker:
     def package_exists(self, pkg_name: str, remote_files: List[str]) -> bool:
         """Check if package exists on server"""
         # Use the index for existence check
-        return pkg_name in self._remote_version_index
+        return pkg_name in self._remote_index
     
     def normalize_version_string(self, version_string: str) -> str:
         """
@@ -0,0 +1,311 @@
+"""
+AUR Mirror Cache Module - Persistent bare mirrors of AUR package repositories
+
+Instead of cloning https://aur.archlinux.org/<pkg>.git from scratch every run,
+each AUR package is kept as a bare mirror under the (CI-cached) AUR build
+directory and updated with `git fetch`. Build checkouts are git worktrees of
+that mirror. A small state file remembers the last fetched HEAD together with
+the parsed manifest, so an unchanged package can skip re-parsing entirely.
+
+Layout:
+    <cache_dir>/<pkg>.git     bare mirror
+    <cache_dir>/state.json    {"packages": {pkg: {"head": sha, "manifest": {...}}}}
+
+Self-check against local bare repositories acting as the AUR:
+    python -m modules.scm.aur_mirror_cache
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory name of the mirror cache inside the AUR build directory
+MIRROR_DIRNAME = ".mirrors"
+
+STATE_FILENAME = "state.json"
+STATE_VERSION = 1
+
+
+@dataclass
+class MirrorSyncResult:
+    """Outcome of syncing one package mirror"""
+    pkg_name: str
+    ok: bool
+    head: Optional[str] = None
+    previous_head: Optional[str] = None
+    cloned: bool = False
+    duration: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def changed(self) -> bool:
+        """True if HEAD moved since the last recorded sync (or the mirror is new)."""
+        return self.ok and (self.cloned or self.head != self.previous_head)
+
+
+class AURMirrorCache:
+    """
+    Persistent bare-mirror cache for AUR git repositories.
+    """
+
+    def __init__(self, cache_dir: Path, url_templates: Optional[List[str]] = None, timeout: int = 60):
+        """
+        Initialize AURMirrorCache.
+
+        Args:
+            cache_dir: Directory holding bare mirrors and state.json
+            url_templates: Remote URL templates with {pkg_name} (defaults to config.AUR_URLS);
+                           point these at file:// bare repos for offline testing
+            timeout: Timeout in seconds for each git network operation
+        """
+        if url_templates is None:
+            import config
+            url_templates = getattr(config, 'AUR_URLS', ["https://aur.archlinux.org/{pkg_name}.git"])
+        self.cache_dir = Path(cache_dir)
+        self.url_templates = list(url_templates)
+        self.timeout = timeout
+        self._state_lock = threading.Lock()
+        self._state: Dict[str, Any] = self._load_state()
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _state_path(self) -> Path:
+        return self.cache_dir / STATE_FILENAME
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION and isinstance(state.get("packages"), dict):
+                return state
+            logger.info("AUR_MIRROR_STATE_RESET=1 reason=version_mismatch")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"AUR_MIRROR_STATE_RESET=1 reason=unreadable error={e}")
+        return {"version": STATE_VERSION, "packages": {}}
+
+    def save_state(self):
+        """Persist state.json atomically (write temp file, then rename)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._state_lock:
+            payload = json.dumps(self._state, indent=1, sort_keys=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".state.", dir=str(self.cache_dir))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._state_path())
+        except OSError as e:
+            logger.warning(f"AUR_MIRROR_STATE_SAVE_FAIL error={e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _package_state(self, pkg_name: str) -> Dict[str, Any]:
+        with self._state_lock:
+            return dict(self._state["packages"].get(pkg_name, {}))
+
+    def _update_package_state(self, pkg_name: str, **values):
+        with self._state_lock:
+            self._state["packages"].setdefault(pkg_name, {}).update(values)
+
+    def get_cached_manifest(self, pkg_name: str, head: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Manifest stored for the given HEAD, if any.
+
+        Args:
+            pkg_name: AUR package name
+            head: Commit the caller is about to use (None = last synced HEAD, without fetching)
+
+        Returns:
+            The stored manifest dict, or None if missing or recorded for another commit
+        """
+        state = self._package_state(pkg_name)
+        if head is None:
+            head = state.get("head")
+        if head and state.get("manifest_head") == head and isinstance(state.get("manifest"), dict):
+            return state["manifest"]
+        return None
+
+    def store_manifest(self, pkg_name: str, head: str, manifest: Dict[str, Any]):
+        """Remember the parsed manifest of a package at a given HEAD."""
+        self._update_package_state(pkg_name, manifest_head=head, manifest=manifest)
+
+    # ------------------------------------------------------------------
+    # Git operations
+    # ------------------------------------------------------------------
+
+    def mirror_path(self, pkg_name: str) -> Path:
+        """Path of the bare mirror for a package."""
+        return self.cache_dir / f"{pkg_name}.git"
+
+    def _git(self, args: List[str], cwd: Optional[Path] = None, timeout: Optional[int] = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git", *args],
+            cwd=str(cwd) if cwd else None,
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=timeout or self.timeout
+        )
+
+    def _rev_parse_head(self, mirror: Path) -> Optional[str]:
+        result = self._git(["--git-dir", str(mirror), "rev-parse", "--verify", "HEAD^{commit}"])
+        if result.returncode == 0:
+            return result.stdout.strip()
+        return None
+
+    def sync(self, pkg_name: str) -> MirrorSyncResult:
+        """
+        Create or update the bare mirror of a package.
+
+        Args:
+            pkg_name: AUR package name
+
+        Returns:
+            MirrorSyncResult (changed == False means the fast path may be used)
+        """
+        start = time.monotonic()
+        mirror = self.mirror_path(pkg_name)
+        previous_head = self._package_state(pkg_name).get("head")
+        result = MirrorSyncResult(pkg_name=pkg_name, ok=False, previous_head=previous_head)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            if mirror.exists():
+                fetch = self._git(["--git-dir", str(mirror), "fetch", "--prune", "--quiet", "origin"])
+                if fetch.returncode != 0:
+                    # Corrupt mirror or changed remote: fall back to a fresh clone
+                    logger.warning(f"AUR_MIRROR_FETCH_FAIL pkg={pkg_name}: {fetch.stderr.strip()[:200]}")
+                    shutil.rmtree(mirror, ignore_errors=True)
+
+            if not mirror.exists():
+                for template in self.url_templates:
+                    url = template.format(pkg_name=pkg_name)
+                    clone = self._git(["clone", "--mirror", "--quiet", url, str(mirror)])
+                    if clone.returncode == 0:
+                        result.cloned = True
+                        break
+                    logger.warning(f"AUR_MIRROR_CLONE_FAIL pkg={pkg_name} url={url}: {clone.stderr.strip()[:200]}")
+                    shutil.rmtree(mirror, ignore_errors=True)
+                else:
+                    result.error = "clone_failed"
+                    return result
+
+            head = self._rev_parse_head(mirror)
+            if not head:
+                result.error = "no_head"
+                return result
+
+            result.head = head
+            result.ok = True
+            self._update_package_state(pkg_name, head=head, fetched_at=int(time.time()))
+            return result
+        except subprocess.TimeoutExpired:
+            result.error = "timeout"
+            return result
+        finally:
+            result.duration = time.monotonic() - start
+            logger.info(
+                f"AUR_MIRROR_SYNC pkg={pkg_name} ok={int(result.ok)} cloned={int(result.cloned)} "
+                f"changed={int(result.changed)} head={(result.head or 'NONE')[:12]} "
+                f"duration={result.duration:.2f}s{' error=' + result.error if result.error else ''}"
+            )
+
+    def checkout(self, pkg_name: str, target_dir: Path) -> bool:
+        """
+        Materialize the mirror's HEAD as a detached worktree in target_dir.
+        Any existing directory at target_dir is replaced.
+
+        Args:
+            pkg_name: AUR package name (mirror must have been synced)
+            target_dir: Worktree location
+
+        Returns:
+            True on success
+        """
+        mirror = self.mirror_path(pkg_name)
+        if not mirror.exists():
+            logger.error(f"AUR_MIRROR_MISSING pkg={pkg_name}")
+            return False
+
+        if target_dir.exists():
+            shutil.rmtree(target_dir, ignore_errors=True)
+        # Forget worktrees whose directories were removed by previous runs
+        self._git(["--git-dir", str(mirror), "worktree", "prune"])
+
+        result = self._git(["--git-dir", str(mirror), "worktree", "add", "--force", "--detach",
+                            str(target_dir), "HEAD"])
+        if result.returncode != 0:
+            logger.error(f"AUR_MIRROR_CHECKOUT_FAIL pkg={pkg_name}: {result.stderr.strip()[:200]}")
+            return False
+        return True
+
+
+def _self_check() -> int:
+    """Exercise clone, no-change fetch, changed fetch and checkout against a local bare 'AUR'."""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    work = Path(tempfile.mkdtemp(prefix="aur_mirror_check_"))
+    failures = []
+    try:
+        remote = work / "aur" / "demo.git"
+        seed = work / "seed"
+        env_args = ["-c", "user.name=check", "-c", "user.email=check@localhost"]
+        subprocess.run(["git", "init", "--quiet", "--bare", str(remote)], check=True)
+        subprocess.run(["git", "clone", "--quiet", str(remote), str(seed)], check=True, capture_output=True)
+
+        def commit(pkgver: str):
+            (seed / "PKGBUILD").write_text(f"pkgname=demo\npkgver={pkgver}\npkgrel=1\n")
+            subprocess.run(["git", "-C", str(seed), "add", "PKGBUILD"], check=True)
+            subprocess.run(["git", "-C", str(seed), *env_args, "commit", "--quiet", "-m", pkgver], check=True)
+            subprocess.run(["git", "-C", str(seed), "push", "--quiet", "origin", "HEAD"], check=True,
+                           capture_output=True)
+
+        commit("1.0")
+        cache = AURMirrorCache(work / "cache", url_templates=[f"file://{work}/aur/{{pkg_name}}.git"])
+
+        first = cache.sync("demo")
+        if not (first.ok and first.cloned and first.changed):
+            failures.append("initial clone")
+        cache.store_manifest("demo", first.head, {"pkgver": "1.0"})
+        cache.save_state()
+
+        cache = AURMirrorCache(work / "cache", url_templates=[f"file://{work}/aur/{{pkg_name}}.git"])
+        second = cache.sync("demo")
+        if not second.ok or second.changed or cache.get_cached_manifest("demo", second.head) is None:
+            failures.append("no-change fast path")
+
+        commit("2.0")
+        third = cache.sync("demo")
+        if not (third.ok and third.changed) or cache.get_cached_manifest("demo", third.head) is not None:
+            failures.append("incremental fetch")
+
+        checkout_dir = work / "build" / "demo"
+        if not cache.checkout("demo", checkout_dir) or "pkgver=2.0" not in (checkout_dir / "PKGBUILD").read_text():
+            failures.append("worktree checkout")
+        shutil.rmtree(checkout_dir)
+        if not cache.checkout("demo", checkout_dir):
+            failures.append("worktree re-checkout after removal")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    for failure in failures:
+        logger.error(f"AUR_MIRROR_SELF_CHECK_FAIL step={failure}")
+    logger.info(f"AUR_MIRROR_SELF_CHECK failures={len(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_self_check())
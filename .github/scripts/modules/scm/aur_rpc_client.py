@@ -0,0 +1,259 @@
+"""
+AUR RPC Client Module - Batched package metadata from the AUR RPC interface
+
+All AUR packages are looked up with as few multi-info requests as possible
+(`/rpc/v5/info?arg[]=a&arg[]=b...`). Results are cached on disk with a TTL so
+repeated runs within the TTL need no network round trip at all. The base URL
+is configurable, so a local stand-in HTTP server can replace the AUR.
+
+Self-check against a local stand-in server:
+    python -m modules.scm.aur_rpc_client
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import logging
+import urllib.parse
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPC_URL = "https://aur.archlinux.org/rpc/v5/info"
+CACHE_VERSION = 1
+
+# AUR naming convention for VCS packages (version tracks upstream HEAD)
+VCS_NAME_SUFFIXES = ("-git", "-svn", "-hg", "-bzr", "-fossil", "-darcs", "-cvs")
+
+
+def is_vcs_package_name(pkg_name: str) -> bool:
+    """True if the package name follows the AUR VCS naming convention."""
+    return pkg_name.endswith(VCS_NAME_SUFFIXES)
+
+
+@dataclass
+class AURPackageInfo:
+    """Subset of an AUR RPC info result"""
+    name: str
+    package_base: str
+    version: str
+    depends: List[str] = field(default_factory=list)
+    makedepends: List[str] = field(default_factory=list)
+    checkdepends: List[str] = field(default_factory=list)
+    last_modified: int = 0
+    fetched_at: float = 0.0
+
+    @classmethod
+    def from_rpc(cls, result: Dict, fetched_at: float) -> 'AURPackageInfo':
+        return cls(
+            name=result.get("Name", ""),
+            package_base=result.get("PackageBase") or result.get("Name", ""),
+            version=result.get("Version", ""),
+            depends=list(result.get("Depends") or []),
+            makedepends=list(result.get("MakeDepends") or []),
+            checkdepends=list(result.get("CheckDepends") or []),
+            last_modified=int(result.get("LastModified") or 0),
+            fetched_at=fetched_at
+        )
+
+
+class AURRPCClient:
+    """
+    Batched, TTL-cached client for the AUR RPC info endpoint.
+    """
+
+    def __init__(self, rpc_url: Optional[str] = None, cache_file: Optional[Path] = None,
+                 ttl: Optional[int] = None, batch_size: Optional[int] = None, timeout: int = 30):
+        """
+        Initialize AURRPCClient.
+
+        Args:
+            rpc_url: Info endpoint (defaults to config.AUR_RPC_URL); may point at a local server
+            cache_file: JSON file persisting results between runs (None = in-memory only)
+            ttl: Seconds a cached result stays valid (defaults to config.AUR_RPC_CACHE_TTL)
+            batch_size: Maximum arg[] values per request (defaults to config.AUR_RPC_BATCH_SIZE)
+            timeout: HTTP timeout in seconds
+        """
+        import config
+        self.rpc_url = rpc_url or getattr(config, 'AUR_RPC_URL', DEFAULT_RPC_URL)
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.ttl = int(ttl if ttl is not None else getattr(config, 'AUR_RPC_CACHE_TTL', 900))
+        self.batch_size = max(1, int(batch_size or getattr(config, 'AUR_RPC_BATCH_SIZE', 100)))
+        self.timeout = timeout
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._cache: Dict[str, AURPackageInfo] = self._load_cache()
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _load_cache(self) -> Dict[str, AURPackageInfo]:
+        if not self.cache_file or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return {}
+            return {name: AURPackageInfo(**record) for name, record in data.get("packages", {}).items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"AUR_RPC_CACHE_RESET=1 reason=unreadable error={e}")
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            payload = json.dumps({
+                "version": CACHE_VERSION,
+                "packages": {name: asdict(info) for name, info in self._cache.items()}
+            }, indent=1, sort_keys=True)
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".aur_rpc.", dir=str(self.cache_file.parent))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"AUR_RPC_CACHE_SAVE_FAIL error={e}")
+
+    def _fresh(self, info: AURPackageInfo, now: float) -> bool:
+        return now - info.fetched_at < self.ttl
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _request(self, names: List[str]) -> List[Dict]:
+        query = urllib.parse.urlencode([("arg[]", name) for name in names])
+        separator = '&' if '?' in self.rpc_url else '?'
+        url = f"{self.rpc_url}{separator}{query}"
+        self.request_count += 1
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        if data.get("type") == "error":
+            raise RuntimeError(data.get("error", "unknown RPC error"))
+        return data.get("results") or []
+
+    def info(self, names: Iterable[str]) -> Dict[str, AURPackageInfo]:
+        """
+        Look up packages, using cached results younger than the TTL.
+
+        Args:
+            names: AUR package names
+
+        Returns:
+            Dict of name -> AURPackageInfo for every name the AUR knows
+            (names missing from the AUR or lost to a failed request are absent)
+        """
+        start = time.monotonic()
+        now = time.time()
+        names = list(dict.fromkeys(names))
+        with self._lock:
+            found = {n: self._cache[n] for n in names if n in self._cache and self._fresh(self._cache[n], now)}
+        missing = [n for n in names if n not in found]
+
+        fetched = 0
+        failed_batches = 0
+        for offset in range(0, len(missing), self.batch_size):
+            batch = missing[offset:offset + self.batch_size]
+            try:
+                results = self._request(batch)
+            except Exception as e:
+                failed_batches += 1
+                logger.warning(f"AUR_RPC_REQUEST_FAIL names={len(batch)} error={e}")
+                continue
+            fetched_at = time.time()
+            with self._lock:
+                for result in results:
+                    info = AURPackageInfo.from_rpc(result, fetched_at)
+                    self._cache[info.name] = info
+                    if info.name in batch:
+                        found[info.name] = info
+                        fetched += 1
+
+        if fetched:
+            self._save_cache()
+        logger.info(
+            f"AUR_RPC_INFO requested={len(names)} cached={len(names) - len(missing)} fetched={fetched} "
+            f"unknown={len(names) - len(found)} requests={(len(missing) + self.batch_size - 1) // self.batch_size} "
+            f"failed_requests={failed_batches} elapsed={time.monotonic() - start:.2f}s"
+        )
+        return found
+
+
+def _self_check() -> int:
+    """Batching, caching and TTL behaviour against a local stand-in RPC server."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    packages = {f"pkg{i}": f"1.{i}-1" for i in range(25)}
+    packages["split-docs"] = "2:3.0-2"
+    hits: List[List[str]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            args = params.get("arg[]", [])
+            hits.append(args)
+            results = [{"Name": n, "PackageBase": "split" if n == "split-docs" else n,
+                        "Version": packages[n], "Depends": ["glibc"]} for n in args if n in packages]
+            body = json.dumps({"version": 5, "type": "multiinfo",
+                               "resultcount": len(results), "results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    failures = []
+    work = Path(tempfile.mkdtemp(prefix="aur_rpc_check_"))
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/rpc/v5/info"
+        names = list(packages) + ["not-on-aur"]
+        client = AURRPCClient(rpc_url=url, cache_file=work / "cache.json", ttl=3600, batch_size=10)
+
+        result = client.info(names)
+        if len(hits) != 3:
+            failures.append(f"batching: expected 3 requests, got {len(hits)}")
+        if set(result) != set(packages) or result["split-docs"].version != "2:3.0-2":
+            failures.append("results")
+        if result["split-docs"].package_base != "split":
+            failures.append("package base")
+
+        client = AURRPCClient(rpc_url=url, cache_file=work / "cache.json", ttl=3600, batch_size=10)
+        before = len(hits)
+        client.info(list(packages))
+        if len(hits) != before:
+            failures.append("persistent cache not used")
+
+        client = AURRPCClient(rpc_url=url, cache_file=work / "cache.json", ttl=0, batch_size=100)
+        before = len(hits)
+        client.info(list(packages))
+        if len(hits) != before + 1:
+            failures.append("TTL expiry did not refetch in one request")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+    for failure in failures:
+        logger.error(f"AUR_RPC_SELF_CHECK_FAIL {failure}")
+    logger.info(f"AUR_RPC_SELF_CHECK failures={len(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_self_check())
@@ -0,0 +1,254 @@
+"""
+Parallel Download Module - Size-balanced multi-stream rsync downloads
+
+The files to fetch are split into N streams of roughly equal total size
+(largest file first onto the lightest stream) and every stream is one rsync
+fed its file list on stdin (--files-from, no argv limits), all running
+concurrently over the shared SSH connection. Packages are already zstd/xz
+compressed, so -z is not used.
+
+Every file is checked after its stream finished (present, expected size);
+files that are missing are retried in further rounds, and each file's final
+status is reported. Per-stream and overall throughput are logged
+(MIRROR_STREAM / MIRROR_DOWNLOAD_SUMMARY).
+
+Benchmark against a local rsync stand-in (run from .github/scripts):
+    python -m modules.vps.parallel_download [STREAMS]
+"""
+
+import os
+import sys
+import time
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Partial transfers are kept here (inside the destination) instead of under the final name
+PARTIAL_DIRNAME = ".rsync-partial"
+
+
+def balance_streams(files: Sequence[str], sizes: Dict[str, int], streams: int) -> List[List[str]]:
+    """
+    Split files into at most `streams` lists of roughly equal total size
+    (greedy: largest file first onto the currently lightest list).
+
+    Args:
+        files: Basenames to distribute
+        sizes: Basename -> size (unknown sizes count as the average known size)
+        streams: Desired number of lists
+
+    Returns:
+        Non-empty lists of basenames
+    """
+    if not files:
+        return []
+    known = [sizes[f] for f in files if f in sizes]
+    default = (sum(known) // len(known)) if known else 1
+    weight = {f: sizes.get(f, default) for f in files}
+    count = max(1, min(int(streams), len(files)))
+    buckets: List[List[str]] = [[] for _ in range(count)]
+    loads = [0] * count
+    for name in sorted(files, key=lambda f: (-weight[f], f)):
+        lightest = loads.index(min(loads))
+        buckets[lightest].append(name)
+        loads[lightest] += weight[name]
+    return [b for b in buckets if b]
+
+
+@dataclass
+class StreamResult:
+    """One rsync stream"""
+    stream_id: int
+    files: List[str]
+    bytes: int
+    returncode: int
+    seconds: float
+    error: str = ""
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a parallel download"""
+    ok: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    attempts: Dict[str, int] = field(default_factory=dict)
+    streams: List[StreamResult] = field(default_factory=list)
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+
+class ParallelRsyncDownloader:
+    """
+    Downloads a file list from one remote directory with N concurrent rsync streams.
+    """
+
+    def __init__(self, source: str, dest_dir: Path, rsh: Optional[str] = None,
+                 streams: int = 4, retries: int = 2,
+                 runner: Optional[Callable[..., subprocess.CompletedProcess]] = None):
+        """
+        Initialize ParallelRsyncDownloader.
+
+        Args:
+            source: rsync source directory ('user@host:/remote/dir' or a local path)
+            dest_dir: Local destination directory
+            rsh: Value for rsync -e (None = rsync default / local copy)
+            streams: Concurrent rsync processes
+            retries: Extra rounds for files that did not arrive
+            runner: subprocess.run-compatible callable (e.g. SSHConnectionManager.run
+                    bound to kind/label) used to execute rsync
+        """
+        self.source = source.rstrip('/') + '/'
+        self.dest_dir = Path(dest_dir)
+        self.rsh = rsh
+        self.streams = max(1, int(streams))
+        self.retries = max(0, int(retries))
+        self._runner = runner or subprocess.run
+
+    def _command(self) -> List[str]:
+        cmd = ["rsync", "-a", "--files-from=-", "--from0",
+               f"--partial-dir={PARTIAL_DIRNAME}", "--out-format=%n"]
+        if self.rsh:
+            cmd += ["-e", self.rsh]
+        return cmd + [self.source, f"{self.dest_dir}/"]
+
+    def _arrived(self, name: str, sizes: Dict[str, int]) -> bool:
+        try:
+            actual = (self.dest_dir / name).stat().st_size
+        except OSError:
+            return False
+        expected = sizes.get(name)
+        return expected is None or actual == expected
+
+    def _run_stream(self, stream_id: int, files: List[str], sizes: Dict[str, int]) -> StreamResult:
+        start = time.monotonic()
+        stream_bytes = sum(sizes.get(f, 0) for f in files)
+        try:
+            result = self._runner(
+                self._command(),
+                input='\0'.join(files) + '\0',
+                capture_output=True,
+                text=True,
+                check=False
+            )
+            returncode, error = result.returncode, (result.stderr or "").strip()[-300:]
+        except Exception as e:
+            returncode, error = -1, str(e)[:300]
+        seconds = time.monotonic() - start
+        rate = stream_bytes / seconds / (1024 * 1024) if seconds > 0 else 0.0
+        logger.info(
+            f"MIRROR_STREAM id={stream_id} files={len(files)} bytes={stream_bytes} rc={returncode} "
+            f"duration={seconds:.2f}s rate={rate:.1f}MB/s"
+        )
+        if returncode != 0 and error:
+            logger.warning(f"MIRROR_STREAM_ERROR id={stream_id} error={error}")
+        return StreamResult(stream_id, files, stream_bytes, returncode, seconds, error)
+
+    def download(self, files: Sequence[str], sizes: Optional[Dict[str, int]] = None) -> DownloadResult:
+        """
+        Download files into dest_dir.
+
+        Args:
+            files: Basenames relative to the source directory
+            sizes: Expected sizes (used for balancing and to validate arrivals)
+
+        Returns:
+            DownloadResult (per-file status in ok/failed/attempts)
+        """
+        sizes = sizes or {}
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        result = DownloadResult()
+        pending = sorted(set(files))
+        start = time.monotonic()
+        stream_id = 0
+
+        for attempt in range(1, self.retries + 2):
+            if not pending:
+                break
+            groups = balance_streams(pending, sizes, self.streams)
+            if attempt > 1:
+                logger.info(f"MIRROR_RETRY round={attempt - 1} files={len(pending)} streams={len(groups)}")
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                futures = []
+                for group in groups:
+                    stream_id += 1
+                    futures.append(pool.submit(self._run_stream, stream_id, group, sizes))
+                result.streams.extend(f.result() for f in futures)
+
+            still_missing = []
+            for name in pending:
+                result.attempts[name] = attempt
+                if self._arrived(name, sizes):
+                    result.ok.append(name)
+                    status = "ok_after_retry" if attempt > 1 else "ok"
+                    logger.info(f"MIRROR_FILE status={status} attempts={attempt} file={name}")
+                else:
+                    still_missing.append(name)
+            pending = still_missing
+
+        for name in pending:
+            logger.error(f"MIRROR_FILE status=failed attempts={result.attempts.get(name, 0)} file={name}")
+        result.failed = pending
+        result.seconds = time.monotonic() - start
+        result.bytes = sum(sizes.get(f, 0) for f in result.ok)
+        rate = result.bytes / result.seconds / (1024 * 1024) if result.seconds > 0 else 0.0
+        logger.info(
+            f"MIRROR_DOWNLOAD_SUMMARY files={len(result.ok) + len(result.failed)} ok={len(result.ok)} "
+            f"failed={len(result.failed)} bytes={result.bytes} duration={result.seconds:.2f}s "
+            f"throughput={rate:.1f}MB/s streams={self.streams} rsync_calls={len(result.streams)}"
+        )
+        return result
+
+
+# ----------------------------------------------------------------------
+# Benchmark: 1 stream vs N streams from a local rsync source
+# ----------------------------------------------------------------------
+
+def _main(argv: List[str]) -> int:
+    import shutil
+    import tempfile
+
+    logging.basicConfig(level=logging.WARNING)
+    streams = int(argv[0]) if argv else 4
+    if shutil.which("rsync") is None:
+        print("rsync not found")
+        return 1
+
+    root = Path(tempfile.mkdtemp(prefix="pdl-bench-"))
+    try:
+        src = root / "src"
+        src.mkdir()
+        sizes = {}
+        block = os.urandom(1024 * 1024)
+        for i, size_mb in enumerate([64, 32, 32, 16, 16, 8, 8, 4, 4, 2, 1, 1]):
+            name = f"pkg{i}-1.0-1-x86_64.pkg.tar.zst"
+            with open(src / name, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+            sizes[name] = size_mb * 1024 * 1024
+
+        for n in (1, streams):
+            dest = root / f"dest{n}"
+            result = ParallelRsyncDownloader(str(src), dest, streams=n).download(list(sizes), sizes)
+            mb = result.bytes / (1024 * 1024)
+            per_stream = ', '.join(f"{s.seconds:.2f}s" for s in result.streams)
+            print(f"streams={n} ok={len(result.ok)} failed={len(result.failed)} "
+                  f"{mb:.0f}MB in {result.seconds:.2f}s ({mb / result.seconds if result.seconds else 0:.0f}MB/s) "
+                  f"per-stream=[{per_stream}]")
+            if result.failed:
+                return 1
+        return 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+"""
+Promote Lock Module - Lease lock serializing promotions of overlapping runs
+
+The lock is still the directory REMOTE_DIR/.staging/.promote.lock (mkdir is
+atomic, and older runners that only know the bare mkdir lock keep being
+excluded), but it now carries a "lease" file with the owner run_id and the
+epoch second the lease expires. A runner finding the lock held prints
+LOCK_HELD with the owner and the seconds left and exits LOCK_HELD_EXIT; the
+caller waits with backoff and tries again. A lock whose lease has expired
+(a crashed runner; a lock without lease file counts from its mtime) is
+stolen by renaming it away and creating a fresh one. Several stealers may
+have read the same expired lease, so a stealer checks that the directory it
+renamed is still that lock (same inode and lease); if another stealer had
+already replaced it, the renamed lock is put back and the stealer reports
+LOCK_HELD. If it cannot be put back, the stealer leaves it where it is (it
+never deletes a lock that is not its own). The stale directory is only
+removed after the new lock exists, so a replacement lock can never reuse
+its inode. The holder renews its lease while it runs, so only the lock of a
+runner that is gone ever expires.
+
+Under the lock, live_guard_command() re-validates that the live database is
+still the one the run planned against, so a promotion that waited for
+another run never overwrites that run's publish blindly.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIRNAME = ".promote.lock"
+LEASE_FILENAME = "lease"
+LOCK_HELD_EXIT = 75          # EX_TEMPFAIL: try again later
+LIVE_CHANGED_EXIT = 76
+
+
+def lock_path(remote_dir: str) -> str:
+    """Lock directory of a remote repository directory."""
+    return f"{remote_dir.rstrip('/')}/.staging/{LOCK_DIRNAME}"
+
+
+def acquire_command(lock_dir: str, owner: str, lease_seconds: int) -> str:
+    """
+    Remote shell snippet taking the lease lock (exits LOCK_HELD_EXIT when busy)
+    and releasing it on exit if it is still ours. While the script runs, a
+    background loop renews the lease every third of its length. A script
+    installing its own EXIT trap must call lock_release from it.
+    """
+    lease_seconds = max(1, int(lease_seconds))
+    return f"""lock_dir="{lock_dir}"
+lock_now=$(date +%s)
+if ! mkdir "$lock_dir" 2>/dev/null; then
+    lock_inode=$(stat -c %i "$lock_dir" 2>/dev/null || true)
+    lease=$(cat "$lock_dir/{LEASE_FILENAME}" 2>/dev/null || true)
+    holder=${{lease%% *}}
+    expires=${{lease##* }}
+    case "$expires" in
+        ''|*[!0-9]*) expires=$(( $(stat -c %Y "$lock_dir" 2>/dev/null || echo "$lock_now") + {lease_seconds} ));;
+    esac
+    if [ "$lock_now" -lt "$expires" ]; then
+        echo "LOCK_HELD owner=${{holder:-unknown}} expires_in=$((expires - lock_now))"
+        exit {LOCK_HELD_EXIT}
+    fi
+    stale="$lock_dir.stale.$$"
+    if mv -T "$lock_dir" "$stale" 2>/dev/null; then
+        # Another stealer may have replaced the expired lock since we read it
+        if [ "$(stat -c %i "$stale" 2>/dev/null)" != "$lock_inode" ] || \
+           [ "$(cat "$stale/{LEASE_FILENAME}" 2>/dev/null || true)" != "$lease" ]; then
+            taken=$(cut -d" " -f1 "$stale/{LEASE_FILENAME}" 2>/dev/null || true)
+            if [ ! -e "$lock_dir" ] && mv -nT "$stale" "$lock_dir" 2>/dev/null && [ ! -e "$stale" ]; then
+                echo "LOCK_HELD owner=${{taken:-unknown}} expires_in=0"
+            else
+                # Never delete a lock that is not ours: leave it for its owner to release
+                echo "LOCK_RESTORE_FAILED owner=${{taken:-unknown}} kept=$stale"
+                echo "LOCK_HELD owner=unknown expires_in=0"
+            fi
+            exit {LOCK_HELD_EXIT}
+        fi
+        if ! mkdir "$lock_dir" 2>/dev/null; then
+            rm -rf "$stale"
+            echo "LOCK_HELD owner=unknown expires_in=0"
+            exit {LOCK_HELD_EXIT}
+        fi
+        rm -rf "$stale"
+        echo "LOCK_STOLEN from=${{holder:-unknown}} expired_for=$((lock_now - expires))"
+    elif ! mkdir "$lock_dir" 2>/dev/null; then
+        echo "LOCK_HELD owner=unknown expires_in=0"
+        exit {LOCK_HELD_EXIT}
+    fi
+fi
+echo "{owner} $((lock_now + {lease_seconds}))" > "$lock_dir/{LEASE_FILENAME}"
+lock_owned() {{
+    [ "$(cut -d" " -f1 "$lock_dir/{LEASE_FILENAME}" 2>/dev/null)" = "{owner}" ]
+}}
+# Renew the lease while this script runs, so a slow but live promotion is never stolen
+lock_script=$$
+(
+    set +e
+    while sleep {max(1, lease_seconds // 3)}; do
+        kill -0 "$lock_script" 2>/dev/null && lock_owned || exit 0
+        echo "{owner} $(( $(date +%s) + {lease_seconds} ))" > "$lock_dir/{LEASE_FILENAME}.renew.$lock_script"
+        mv -f "$lock_dir/{LEASE_FILENAME}.renew.$lock_script" "$lock_dir/{LEASE_FILENAME}"
+    done
+) </dev/null >/dev/null 2>&1 &
+lock_renewer=$!
+lock_release() {{
+    kill "$lock_renewer" 2>/dev/null || true
+    if lock_owned; then rm -rf "$lock_dir"; fi
+}}
+trap lock_release EXIT
+"""
+
+
+def db_stamp(stat: Optional[Tuple[int, float]]) -> str:
+    """'<size> <mtime seconds>' of a database (find -printf '%s %Ts'), NONE if absent."""
+    return "NONE" if stat is None else f"{int(stat[0])} {int(stat[1])}"
+
+
+def live_guard_command(db_path: str, expected: Optional[Tuple[int, float]]) -> str:
+    """
+    Remote shell snippet (run under the lock) exiting LIVE_CHANGED_EXIT when
+    the live database is not the one the run planned against.
+    """
+    return f"""live_stamp=NONE
+if [ -f "{db_path}" ]; then live_stamp=$(find "{db_path}" -maxdepth 0 -printf '%s %Ts'); fi
+if [ "$live_stamp" != "{db_stamp(expected)}" ]; then
+    echo "LIVE_CHANGED expected={db_stamp(expected).replace(' ', ':')} live=$(echo "$live_stamp" | tr ' ' ':')"
+    exit {LIVE_CHANGED_EXIT}
+fi
+"""
+
+
+@dataclass
+class LockHolder:
+    """Owner of a busy lock as reported by acquire_command()"""
+    owner: str
+    expires_in: int
+
+
+def parse_lock_held(output: str) -> Optional[LockHolder]:
+    """LockHolder from a LOCK_HELD line, None if the lock was not busy."""
+    for line in output.splitlines():
+        if not line.startswith("LOCK_HELD"):
+            continue
+        fields = dict(part.split('=', 1) for part in line.split()[1:] if '=' in part)
+        try:
+            expires_in = int(fields.get('expires_in', '0'))
+        except ValueError:
+            expires_in = 0
+        return LockHolder(owner=fields.get('owner', 'unknown'), expires_in=max(0, expires_in))
+    return None
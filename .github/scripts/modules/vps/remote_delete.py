@@ -0,0 +1,96 @@
+"""
+Remote Delete Module - Delete any number of remote files in one SSH round trip
+
+The paths travel NUL-delimited over stdin to a single remote bash process,
+so there is no command-line length limit, no quoting of file names and no
+batching. The remote side sorts them into present and missing ones, removes
+the present ones with one `xargs -0 rm -f` and reports every path back as a
+NUL-terminated "<STATUS> <path>" record (DELETED, MISSING or FAILED).
+
+Auxiliary paths (state manifest, metadata sidecars) follow an empty record
+and are removed in the same process without being reported.
+"""
+
+import shlex
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+_SCRIPT = r"""
+list=$(mktemp) && present=$(mktemp) && aux=$(mktemp) || exit 1
+trap 'rm -f "$list" "$present" "$aux"' EXIT
+cat > "$list"
+section=main
+while IFS= read -r -d '' f; do
+    if [ -z "$f" ]; then
+        section=aux
+    elif [ "$section" = aux ]; then
+        printf '%s\0' "$f" >> "$aux"
+    elif [ -e "$f" ] || [ -L "$f" ]; then
+        printf '%s\0' "$f" >> "$present"
+    else
+        printf 'MISSING %s\0' "$f"
+    fi
+done < "$list"
+xargs -0 -r rm -f -- < "$present"
+rc=$?
+while IFS= read -r -d '' f; do
+    if [ -e "$f" ] || [ -L "$f" ]; then
+        printf 'FAILED %s\0' "$f"
+    else
+        printf 'DELETED %s\0' "$f"
+    fi
+done < "$present"
+xargs -0 -r rm -f -- < "$aux" || true
+exit $rc
+"""
+
+
+@dataclass
+class RemoteDeletionResult:
+    """Per-file outcome of one remote deletion"""
+    deleted: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)   # already gone (counts as success)
+    failed: List[str] = field(default_factory=list)
+    error: str = ''                                     # transport / remote process failure
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.error
+
+    @property
+    def removed(self) -> int:
+        """Files that are gone now (deleted or already missing)."""
+        return len(self.deleted) + len(self.missing)
+
+
+def delete_command() -> str:
+    """Remote command reading the encode_paths() stream from stdin."""
+    return f"bash -c {shlex.quote(_SCRIPT)}"
+
+
+def encode_paths(paths: Iterable[str], auxiliary: Iterable[str] = ()) -> bytes:
+    """stdin payload for delete_command()."""
+    main = [p for p in paths if p]
+    aux = [p for p in auxiliary if p]
+    records = main + ([''] + aux if aux else [])
+    return b''.join(p.encode('utf-8', errors='surrogateescape') + b'\0' for p in records)
+
+
+def parse_output(output: bytes, expected: Iterable[str]) -> RemoteDeletionResult:
+    """
+    Collect the status records of delete_command(); expected paths without a
+    record (remote process died early) count as failed.
+    """
+    result = RemoteDeletionResult()
+    buckets = {'DELETED': result.deleted, 'MISSING': result.missing, 'FAILED': result.failed}
+    seen = set()
+    for record in output.split(b'\0'):
+        status, _, path = record.decode('utf-8', errors='surrogateescape').lstrip('\n').partition(' ')
+        if status in buckets and path:
+            buckets[status].append(path)
+            seen.add(path)
+    result.failed.extend(p for p in expected if p and p not in seen)
+    return result
@@ -0,0 +1,114 @@
+"""
+Remote Inventory Module - One snapshot of a remote directory listing per run
+
+The remote repository directory is listed with a single SSH `find` that
+prints type, size and mtime for every top-level entry. The snapshot is
+shared by every consumer (phase I version index, upload verification,
+extras classification, orphan sweeps, version prune, hygiene) and only
+re-fetched after an operation that changed the directory (promotion,
+deletion).
+"""
+
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from modules.common.package_filename import parse_package_filename
+
+logger = logging.getLogger(__name__)
+
+# find -printf format: "<type> <size> <mtime> <name>\0" (names may contain spaces)
+FIND_PRINTF_FORMAT = r'%y %s %T@ %f\0'
+
+
+@dataclass(frozen=True)
+class RemoteFileInfo:
+    """One entry of a remote directory"""
+    name: str
+    size: int
+    mtime: float
+    type: str  # find %y: 'f' file, 'l' symlink, 'd' directory, ...
+
+    @property
+    def is_file(self) -> bool:
+        """Regular file or symlink (what the repository serves)."""
+        return self.type in ('f', 'l')
+
+
+class RemoteInventory:
+    """
+    Immutable snapshot of the top-level entries of one remote directory.
+    """
+
+    def __init__(self, remote_dir: str, entries: List[RemoteFileInfo], fetched_at: Optional[float] = None):
+        self.remote_dir = remote_dir.rstrip('/') or '/'
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self._entries: Dict[str, RemoteFileInfo] = {entry.name: entry for entry in entries}
+
+    @classmethod
+    def from_find_output(cls, remote_dir: str, output: str) -> 'RemoteInventory':
+        """
+        Parse the output of `find <dir> -mindepth 1 -maxdepth 1 -printf FIND_PRINTF_FORMAT`.
+
+        Args:
+            remote_dir: Directory that was listed
+            output: Raw NUL-separated find output
+
+        Returns:
+            RemoteInventory (malformed records are skipped)
+        """
+        entries = []
+        for record in output.split('\0'):
+            record = record.lstrip('\n')
+            if not record:
+                continue
+            parts = record.split(' ', 3)
+            if len(parts) != 4:
+                logger.debug(f"REMOTE_INVENTORY_SKIP record={record[:80]!r}")
+                continue
+            file_type, size, mtime, name = parts
+            try:
+                entries.append(RemoteFileInfo(name=name, size=int(size), mtime=float(mtime), type=file_type))
+            except ValueError:
+                logger.debug(f"REMOTE_INVENTORY_SKIP record={record[:80]!r}")
+        return cls(remote_dir, entries)
+
+    def __contains__(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.is_file
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+    def __iter__(self) -> Iterator[RemoteFileInfo]:
+        return iter(self._entries.values())
+
+    def get(self, name: str) -> Optional[RemoteFileInfo]:
+        """Entry for a basename (any type), or None."""
+        return self._entries.get(name)
+
+    def names(self) -> List[str]:
+        """Basenames of all files and symlinks."""
+        return [name for name, entry in self._entries.items() if entry.is_file]
+
+    def paths(self) -> List[str]:
+        """Full remote paths of all files and symlinks."""
+        return [f"{self.remote_dir}/{name}" for name in self.names()]
+
+    def packages(self) -> List[str]:
+        """Basenames of package files (regular files only, like the original phase I listing)."""
+        return [name for name, entry in self._entries.items()
+                if entry.type == 'f' and parse_package_filename(name)]
+
+    def signatures(self) -> List[str]:
+        """Basenames of .sig files and symlinks."""
+        return [name for name in self.names() if name.endswith('.sig')]
+
+    def sizes(self) -> Dict[str, int]:
+        """Basename -> size for all files and symlinks."""
+        return {name: entry.size for name, entry in self._entries.items() if entry.is_file}
+
+    def total_size(self) -> int:
+        """Sum of file sizes in bytes."""
+        return sum(self.sizes().values())
@@ -0,0 +1,285 @@
+"""
+Remote State Manifest Module - Compact description of the published repository
+
+A small JSON file next to the repository database (<repo>.state.json) lists
+every published file with its size, mtime, sha256, package version and
+signature presence. It is written atomically (temp file + rename) at the end
+of staging promotion and re-written ("sealed") after any later deletion, so
+the next run's phase I needs one small download instead of a directory scan.
+
+Freshness: every remote deletion removes the manifest in the same SSH call,
+and the manifest records size/mtime of <repo>.db.tar.gz, which is compared
+with the live database on fetch. A missing, unparsable or mismatching
+manifest makes the caller fall back to a full listing.
+"""
+
+import os
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from modules.common.hash_cache import get_hash_cache
+from modules.common.package_filename import parse_package_filename
+from modules.vps.remote_inventory import RemoteFileInfo, RemoteInventory
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+# Remote mtimes come from rsync -a (preserved); allow filesystem rounding
+DB_MTIME_TOLERANCE = 1.0
+# Separates the manifest body from the database stat in the fetch output
+FETCH_SEPARATOR = '\0'
+
+
+def state_manifest_name(repo_name: str) -> str:
+    """Basename of the state manifest for a repository."""
+    return f"{repo_name}.state.json"
+
+
+def database_name(repo_name: str) -> str:
+    """Basename of the database file whose stat stamps the manifest."""
+    return f"{repo_name}.db.tar.gz"
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """One published file"""
+    name: str
+    size: int
+    mtime: float
+    sha256: Optional[str] = None
+    version: Optional[str] = None     # [epoch:]pkgver-pkgrel for package files
+    signature: bool = False           # package has a .sig next to it
+
+    def to_dict(self) -> dict:
+        data = {'name': self.name, 'size': self.size, 'mtime': self.mtime}
+        if self.sha256:
+            data['sha256'] = self.sha256
+        if self.version:
+            data['version'] = self.version
+            data['signature'] = self.signature
+        return data
+
+
+class RemoteStateManifest:
+    """
+    Published file set of one repository directory.
+    """
+
+    def __init__(self, repo_name: str, entries: Iterable[ManifestEntry],
+                 db_stamp: Optional[Tuple[int, float]] = None,
+                 generated_at: Optional[float] = None, run_id: Optional[str] = None):
+        self.repo_name = repo_name
+        self.entries: Dict[str, ManifestEntry] = {entry.name: entry for entry in entries}
+        self.db_stamp = db_stamp
+        self.generated_at = generated_at if generated_at is not None else time.time()
+        self.run_id = run_id
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, repo_name: str, remote_files: Dict[str, Tuple[int, float]], local_dir: Optional[Path] = None,
+              previous: Optional['RemoteStateManifest'] = None, run_id: Optional[str] = None) -> 'RemoteStateManifest':
+        """
+        Describe a remote file set.
+
+        Digests are reused from `previous` when name and size match, otherwise
+        computed from the same-named local file if its size matches; files with
+        no trustworthy source are recorded without a digest.
+
+        Args:
+            repo_name: Repository name
+            remote_files: Basename -> (size, mtime) of every published file
+            local_dir: Local directory holding copies of the published files
+            previous: Previous manifest to reuse digests from
+            run_id: Run that produced this state
+
+        Returns:
+            RemoteStateManifest
+        """
+        own_name = state_manifest_name(repo_name)
+        names = set(remote_files)
+        names.discard(own_name)
+
+        # Digest sources: the previous manifest, else same-sized local copies (shared hash cache)
+        known: Dict[str, str] = {}
+        to_hash: Dict[str, str] = {}
+        for name in names:
+            size = remote_files[name][0]
+            old = previous.entries.get(name) if previous else None
+            if old is not None and old.size == size and old.sha256:
+                known[name] = old.sha256
+            elif local_dir is not None:
+                local_path = Path(local_dir) / name
+                try:
+                    if local_path.is_file() and local_path.stat().st_size == size:
+                        to_hash[name] = str(local_path)
+                except OSError as e:
+                    logger.debug(f"STATE_MANIFEST_HASH_SKIP file={name} error={e}")
+        reused = len(known)
+        if to_hash:
+            computed = get_hash_cache().digests(to_hash.values())
+            for name, local_path in to_hash.items():
+                if computed.get(local_path):
+                    known[name] = computed[local_path]
+        hashed = len(known) - reused
+
+        entries = []
+        for name in sorted(names):
+            size, mtime = remote_files[name]
+            digest = known.get(name)
+            record = parse_package_filename(name)
+            entries.append(ManifestEntry(
+                name=name,
+                size=size,
+                mtime=mtime,
+                sha256=digest,
+                version=record.version if record else None,
+                signature=bool(record) and f"{name}.sig" in names
+            ))
+
+        db_name = database_name(repo_name)
+        db_stamp = remote_files.get(db_name)
+        manifest = cls(repo_name, entries, db_stamp=db_stamp, run_id=run_id)
+        logger.info(
+            f"STATE_MANIFEST_BUILT files={len(manifest.entries)} hashed={hashed} reused={reused} "
+            f"db={'yes' if db_stamp else 'no'}"
+        )
+        return manifest
+
+    @classmethod
+    def from_json(cls, text: str) -> Optional['RemoteStateManifest']:
+        """
+        Parse a manifest document.
+
+        Returns:
+            RemoteStateManifest, or None if the document is malformed or of another format
+        """
+        try:
+            data = json.loads(text)
+            if not isinstance(data, dict) or data.get('format') != MANIFEST_FORMAT:
+                return None
+            db = data.get('db')
+            db_stamp = (int(db['size']), float(db['mtime'])) if db else None
+            entries = [
+                ManifestEntry(
+                    name=item['name'],
+                    size=int(item['size']),
+                    mtime=float(item.get('mtime', 0.0)),
+                    sha256=item.get('sha256'),
+                    version=item.get('version'),
+                    signature=bool(item.get('signature', False))
+                )
+                for item in data.get('files', [])
+            ]
+            return cls(data.get('repo', ''), entries, db_stamp=db_stamp,
+                       generated_at=data.get('generated_at'), run_id=data.get('run_id'))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.debug(f"STATE_MANIFEST_PARSE_FAIL error={e}")
+            return None
+
+    def to_json(self) -> str:
+        """Serialize (compact, one file entry per line for readable diffs)."""
+        db = {'size': self.db_stamp[0], 'mtime': self.db_stamp[1]} if self.db_stamp else None
+        header = json.dumps({
+            'format': MANIFEST_FORMAT,
+            'repo': self.repo_name,
+            'generated_at': self.generated_at,
+            'run_id': self.run_id,
+            'db': db,
+        }, separators=(',', ':'))
+        files = ',\n'.join(json.dumps(self.entries[name].to_dict(), separators=(',', ':'))
+                           for name in sorted(self.entries))
+        return f'{header[:-1]},"files":[\n{files}\n]}}\n'
+
+    # ------------------------------------------------------------------
+    # Freshness and views
+    # ------------------------------------------------------------------
+
+    def stale_reason(self, repo_name: str, db_stat: Optional[Tuple[int, float]]) -> Optional[str]:
+        """
+        Why this manifest can not stand in for a listing (None when it can).
+
+        Args:
+            repo_name: Repository the caller expects
+            db_stat: (size, mtime) of the live database, None if it does not exist
+        """
+        if self.repo_name != repo_name:
+            return 'repo_mismatch'
+        if self.db_stamp is None or db_stat is None:
+            return None if self.db_stamp == db_stat else 'db_presence'
+        if self.db_stamp[0] != db_stat[0]:
+            return 'db_size'
+        if abs(self.db_stamp[1] - db_stat[1]) > DB_MTIME_TOLERANCE:
+            return 'db_mtime'
+        return None
+
+    def names(self) -> List[str]:
+        return list(self.entries)
+
+    def to_inventory(self, remote_dir: str) -> RemoteInventory:
+        """The manifest as a listing snapshot (every entry a regular file)."""
+        return RemoteInventory(
+            remote_dir,
+            [RemoteFileInfo(name=e.name, size=e.size, mtime=e.mtime, type='f') for e in self.entries.values()],
+            fetched_at=self.generated_at
+        )
+
+    def digests(self) -> Dict[str, str]:
+        """Basename -> sha256 for entries that carry one."""
+        return {name: e.sha256 for name, e in self.entries.items() if e.sha256}
+
+
+def fetch_command(remote_dir: str, repo_name: str) -> str:
+    """
+    Remote shell snippet printing the manifest, a NUL, then "<size> <mtime>" of the database.
+    """
+    manifest_path = f"{remote_dir}/{state_manifest_name(repo_name)}"
+    db_path = f"{remote_dir}/{database_name(repo_name)}"
+    return (
+        f'if [ -f "{manifest_path}" ]; then cat "{manifest_path}"; fi; printf \'\\0\'; '
+        f'if [ -f "{db_path}" ]; then find "{db_path}" -maxdepth 0 -printf \'%s %T@\'; fi'
+    )
+
+
+def parse_fetch_output(output: str) -> Tuple[Optional[str], Optional[Tuple[int, float]]]:
+    """
+    Split fetch_command() output.
+
+    Returns:
+        (manifest text or None, (db size, db mtime) or None)
+    """
+    body, sep, stat = output.partition(FETCH_SEPARATOR)
+    if not sep:
+        return None, None
+    db_stat = None
+    parts = stat.split()
+    if len(parts) == 2:
+        try:
+            db_stat = (int(parts[0]), float(parts[1]))
+        except ValueError:
+            db_stat = None
+    return (body if body.strip() else None), db_stat
+
+
+def write_command(remote_dir: str, repo_name: str) -> str:
+    """Remote shell snippet that atomically replaces the manifest with stdin."""
+    manifest_path = f"{remote_dir}/{state_manifest_name(repo_name)}"
+    return f'cat > "{manifest_path}.tmp.$$" && mv -f "{manifest_path}.tmp.$$" "{manifest_path}"'
+
+
+def local_file_stats(paths: Iterable[Path]) -> Dict[str, Tuple[int, float]]:
+    """Basename -> (size, mtime) of local files as rsync -a publishes them (symlinks not followed)."""
+    stats = {}
+    for path in paths:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        stats[Path(path).name] = (st.st_size, st.st_mtime)
+    return stats
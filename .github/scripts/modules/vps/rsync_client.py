@@ -4,12 +4,15 @@ WITH STAGING UPLOAD SUPPORT FOR ATOMIC PUBLISH
 """
 
 import os
-import subprocess
-import shutil
 import time
 import logging
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+from modules.common.materialize import Materializer
+from modules.vps.parallel_download import ParallelRsyncDownloader
+from modules.vps.ssh_connection import SSHConnectionManager
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +31,25 @@ class RsyncClient:
                 - remote_dir: Remote directory on VPS
                 - ssh_options: SSH options list
                 - repo_name: Repository name
+                - connection: Optional shared SSHConnectionManager
         """
         self.vps_user = config['vps_user']
         self.vps_host = config['vps_host']
         self.remote_dir = config['remote_dir']
         self.ssh_options = config.get('ssh_options', [])
         self.repo_name = config.get('repo_name', '')
+        # NEW: shared multiplexed connection (plain per-call ssh when none is configured)
+        self.connection = config.get('connection') or SSHConnectionManager(
+            self.vps_user, self.vps_host, self.ssh_options, multiplex=False)
+        import config as build_config
+        # NEW: how mirrored packages are placed into output_dir (reflink -> hardlink -> copy)
+        self.materialize_mode = getattr(build_config, 'MIRROR_MATERIALIZE_MODE', 'auto')
+        # NEW: parallel mirror download
+        self.download_streams = getattr(build_config, 'MIRROR_DOWNLOAD_STREAMS', 4)
+        self.download_retries = getattr(build_config, 'MIRROR_DOWNLOAD_RETRIES', 2)
     
-    def mirror_remote_packages(self, mirror_temp_dir: Path, output_dir: Path, vps_package_files: List[str]) -> bool:
+    def mirror_remote_packages(self, mirror_temp_dir: Path, output_dir: Path, vps_package_files: List[str],
+                               sizes: Optional[Dict[str, int]] = None) -> bool:
         """
         Download ONLY remote package files (*.pkg.tar.*) to local directory.
         
@@ -47,6 +61,7 @@ class RsyncClient:
             output_dir: Output directory for built packages
             vps_package_files: List of package filenames (basenames) currently on VPS
                              MUST contain ONLY *.pkg.tar.* files (no .sig, no .db)
+            sizes: Optional remote sizes by basename (stream balancing and arrival checks)
             
         Returns:
             True if successful, False otherwise
@@ -93,63 +108,39 @@ class RsyncClient:
             if files_to_download:
                 logger.info(f"Mirror directory empty, downloading {len(files_to_download)} package files from VPS")
         
-        # If there are files to download, use rsync with specific file list
+        # If there are files to download, fetch them with parallel size-balanced rsync streams
         downloaded_count = 0
         if files_to_download:
-            # Build rsync command with specific files
             download_list = []
             for file_name in files_to_download:
                 # Ensure it's a package file (safety check)
                 if file_name.endswith(('.pkg.tar.zst', '.pkg.tar.xz')):
-                    remote_path = f"{self.remote_dir}/{file_name}"
-                    download_list.append(f"'{self.vps_user}@{self.vps_host}:{remote_path}'")
+                    download_list.append(file_name)
                 else:
                     logger.warning(f"Skipping non-package file in download list: {file_name}")
             
             if download_list:
-                files_str = ' '.join(download_list)
-                rsync_cmd = f"""
-                rsync -avz \
-                  --progress \
-                  --stats \
-                  -e "ssh -o StrictHostKeyChecking=no -o ConnectTimeout=60" \
-                  {files_str} \
-                  '{mirror_temp_dir}/' 2>/dev/null || true
-                """
-                
-                logger.info(f"RUNNING RSYNC DOWNLOAD COMMAND for {len(download_list)} package files")
-                
-                start_time = time.time()
-                
+                logger.info(f"RUNNING PARALLEL RSYNC DOWNLOAD for {len(download_list)} package files "
+                            f"(streams={self.download_streams}, retries={self.download_retries})")
+                # No -z: packages are already zstd/xz compressed
+                downloader = ParallelRsyncDownloader(
+                    source=f"{self.vps_user}@{self.vps_host}:{self.remote_dir}",
+                    dest_dir=mirror_temp_dir,
+                    rsh=self.connection.rsync_rsh(),
+                    streams=self.download_streams,
+                    retries=self.download_retries,
+                    runner=partial(self.connection.run, kind="rsync", label="mirror_download")
+                )
                 try:
-                    result = subprocess.run(
-                        rsync_cmd,
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        check=False
-                    )
-                    
-                    end_time = time.time()
-                    duration = int(end_time - start_time)
-                    
-                    logger.info(f"EXIT CODE: {result.returncode}")
-                    if result.stdout:
-                        for line in result.stdout.splitlines()[-10:]:
-                            if line.strip():
-                                logger.info(f"RSYNC: {line}")
-                    
-                    # Count actual downloaded files by checking which of the files_to_download now exist
-                    downloaded_count = 0
-                    for file_name in files_to_download:
-                        if (mirror_temp_dir / file_name).exists():
-                            downloaded_count += 1
-                    
-                    logger.info(f"Downloaded {downloaded_count} new package files ({duration} seconds)")
-                    
+                    result = downloader.download(download_list, sizes)
                 except Exception as e:
                     logger.error(f"RSYNC download execution error: {e}")
                     return False
+                
+                downloaded_count = len(result.ok)
+                logger.info(f"Downloaded {downloaded_count} new package files ({result.seconds:.0f} seconds)")
+                if result.failed:
+                    logger.error(f"MIRROR_DOWNLOAD_INCOMPLETE failed={len(result.failed)} sample={result.failed[:5]}")
             else:
                 logger.info("No files to download (empty download list after filtering)")
         else:
@@ -162,19 +153,22 @@ class RsyncClient:
         mirror_files = list(mirror_temp_dir.glob("*.pkg.tar.*"))
         output_files = set(f.name for f in output_dir.glob("*.pkg.tar.*"))
         
+        # NEW: reflink/hardlink instead of a second full copy of the repository on disk
+        materializer = Materializer(self.materialize_mode)
         copied_count = 0
         for mirror_file in mirror_files:
             dest = output_dir / mirror_file.name
             if not dest.exists():
-                try:
-                    shutil.copy2(mirror_file, dest)
+                method = materializer.materialize(mirror_file, dest)
+                if method:
                     copied_count += 1
-                    logger.debug(f"Copied to output_dir: {mirror_file.name}")
-                except Exception as e:
-                    logger.warning(f"Could not copy {mirror_file.name}: {e}")
+                    logger.debug(f"Materialized in output_dir ({method}): {mirror_file.name}")
+                else:
+                    logger.warning(f"Could not copy {mirror_file.name}")
         
         if copied_count > 0:
             logger.info(f"Copied {copied_count} mirrored packages to output directory")
+            materializer.log_summary("mirror_to_output")
         
         # CRITICAL VALIDATION: Ensure mirror matches VPS package state ONLY
         final_mirror_files = list(mirror_temp_dir.glob("*.pkg.tar.*"))
@@ -218,6 +212,85 @@ class RsyncClient:
         
         return True
     
+    def fetch_sidecars(self, sidecar_names: List[str], local_dir: Path, remote_subdir: str) -> int:
+        """
+        NEW: Download package metadata sidecars (small JSON files) in one rsync call.
+        Sidecars that do not exist remotely are skipped, not errors.
+        
+        Args:
+            sidecar_names: Sidecar basenames
+            local_dir: Local sidecar directory
+            remote_subdir: Sidecar directory relative to remote_dir
+            
+        Returns:
+            Number of requested sidecars present locally afterwards
+        """
+        if not sidecar_names:
+            return 0
+        local_dir.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "rsync", "-a", "--files-from=-", "--from0", "--ignore-missing-args",
+            "-e", self.connection.rsync_rsh(),
+            f"{self.vps_user}@{self.vps_host}:{self.remote_dir}/{remote_subdir}/",
+            f"{local_dir}/"
+        ]
+        try:
+            result = self.connection.run(
+                cmd, "rsync", "sidecar_fetch",
+                input='\0'.join(sidecar_names) + '\0',
+                capture_output=True,
+                text=True,
+                check=False
+            )
+            if result.returncode != 0:
+                logger.warning(f"SIDECAR_FETCH_FAIL rc={result.returncode} error={(result.stderr or '').strip()[:300]}")
+        except Exception as e:
+            logger.warning(f"SIDECAR_FETCH_FAIL error={e}")
+        present = sum(1 for name in sidecar_names if (local_dir / name).exists())
+        logger.info(f"SIDECAR_FETCH requested={len(sidecar_names)} present={present}")
+        return present
+    
+    def push_sidecars(self, sidecar_names: List[str], local_dir: Path, remote_subdir: str) -> bool:
+        """
+        NEW: Upload package metadata sidecars next to the live repository
+        (best effort; the directory is created on the VPS if needed).
+        
+        Args:
+            sidecar_names: Sidecar basenames in local_dir
+            local_dir: Local sidecar directory
+            remote_subdir: Sidecar directory relative to remote_dir
+            
+        Returns:
+            True if rsync succeeded
+        """
+        names = [name for name in sidecar_names if (local_dir / name).exists()]
+        if not names:
+            return True
+        remote_path = f"{self.remote_dir}/{remote_subdir}"
+        cmd = [
+            "rsync", "-a", "--files-from=-", "--from0",
+            f"--rsync-path=mkdir -p '{remote_path}' && rsync",
+            "-e", self.connection.rsync_rsh(),
+            f"{local_dir}/",
+            f"{self.vps_user}@{self.vps_host}:{remote_path}/"
+        ]
+        try:
+            result = self.connection.run(
+                cmd, "rsync", "sidecar_push",
+                input='\0'.join(names) + '\0',
+                capture_output=True,
+                text=True,
+                check=False
+            )
+        except Exception as e:
+            logger.warning(f"SIDECAR_PUSH_FAIL error={e}")
+            return False
+        if result.returncode != 0:
+            logger.warning(f"SIDECAR_PUSH_FAIL rc={result.returncode} error={(result.stderr or '').strip()[:300]}")
+            return False
+        logger.info(f"SIDECAR_PUSH files={len(names)} path={remote_path}")
+        return True
+    
     def upload_files(self, files_to_upload: List[str], output_dir: Path, cleanup_manager=None, remote_path: Optional[str] = None) -> bool:
         """
         Upload files to remote server using RSYNC.
@@ -257,13 +330,12 @@ class RsyncClient:
                 logger.info(f"  - {os.path.basename(f)} [UNKNOWN SIZE]")
         
         # Helper to run a command and return success/failure
-        def run_rsync(cmd_str: str, attempt_label: str) -> bool:
+        def run_rsync(cmd: List[str], attempt_label: str) -> bool:
             logger.info(f"RUNNING RSYNC COMMAND {attempt_label}")
             start_time = time.time()
             try:
-                result = subprocess.run(
-                    cmd_str,
-                    shell=True,
+                result = self.connection.run(
+                    cmd, "rsync", "upload",
                     capture_output=True,
                     text=True,
                     check=False
@@ -291,30 +363,29 @@ class RsyncClient:
                 logger.error(f"RSYNC execution error {attempt_label}: {e}")
                 return False
         
-        # Build base rsync command without any --link-dest
-        files_str = ' '.join(f"'{f}'" for f in files_to_upload)
-        ssh_part = f"-e \"ssh {' '.join(self.ssh_options)}\""
-        rsync_cmd = (
-            f"rsync -avz --progress --stats "
-            f"{ssh_part} "
-            f"{files_str} "
-            f"'{self.vps_user}@{self.vps_host}:{dest_path}/'"
-        )
+        # Build base rsync command without any --link-dest (argv form, no shell)
+        destination = f"{self.vps_user}@{self.vps_host}:{dest_path}/"
+        rsync_cmd = [
+            "rsync", "-avz", "--progress", "--stats",
+            "-e", self.connection.rsync_rsh(),
+            *files_to_upload,
+            destination
+        ]
         
-        # FIRST ATTEMPT (default SSH options)
+        # FIRST ATTEMPT (default SSH options over the shared connection)
         if run_rsync(rsync_cmd, "ATTEMPT 1"):
             return True
         
-        # SECOND ATTEMPT (with different SSH options)
+        # SECOND ATTEMPT (with different SSH options, on a fresh connection)
         logger.info("Retrying with different SSH options...")
         time.sleep(5)
-        alt_ssh_part = "-e \"ssh -o StrictHostKeyChecking=no -o ConnectTimeout=60 -o ServerAliveInterval=30 -o ServerAliveCountMax=3\""
-        alt_rsync_cmd = (
-            f"rsync -avz --progress --stats "
-            f"{alt_ssh_part} "
-            f"{files_str} "
-            f"'{self.vps_user}@{self.vps_host}:{dest_path}/'"
-        )
+        alt_ssh = "ssh -o StrictHostKeyChecking=no -o ConnectTimeout=60 -o ServerAliveInterval=30 -o ServerAliveCountMax=3"
+        alt_rsync_cmd = [
+            "rsync", "-avz", "--progress", "--stats",
+            "-e", alt_ssh,
+            *files_to_upload,
+            destination
+        ]
         if run_rsync(alt_rsync_cmd, "ATTEMPT 2"):
             return True
         
@@ -0,0 +1,246 @@
+"""
+Snapshot Publish Module - Versioned snapshot directories behind an atomic symlink
+
+Layout on the VPS (REMOTE_DIR=/srv/repo):
+    /srv/repo                  -> repo.snapshots/<id>   (symlink, the served path)
+    /srv/repo.snapshots/<id>/  complete repository of one publish
+    /srv/repo.snapshots/.staging/   shared staging area (every snapshot has
+                                    .staging -> ../.staging, so
+                                    REMOTE_DIR/.staging keeps working)
+    /srv/repo.snapshots/.history    snapshot ids, oldest first
+
+A publish hardlinks the live snapshot into a new directory (cp -al: no data
+is copied), moves the staged files in, writes the state manifest and then
+renames a new symlink over REMOTE_DIR. rename(2) is atomic, so clients see
+either the old or the new repository, never a mix, and going live costs the
+same for 10 or 10000 files. The newest SNAPSHOT_KEEP previous snapshots stay
+for instant rollback. A promotion that fails before the flip removes its
+build directory on exit; leftovers of crashed runs (.building.<id>) are
+removed by the next promotion.
+
+Inspect or roll back from a shell with VPS_USER, VPS_HOST and REMOTE_DIR set
+(run from .github/scripts):
+    python -m modules.vps.snapshot_publish list
+    python -m modules.vps.snapshot_publish rollback [SNAPSHOT_ID]
+"""
+
+import os
+import sys
+import logging
+from typing import List, Optional, Tuple
+
+from modules.vps.promote_lock import acquire_command, lock_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".snapshots"
+
+
+def snapshot_root(remote_dir: str) -> str:
+    """Directory holding the snapshots of remote_dir (a sibling of it)."""
+    return f"{remote_dir.rstrip('/')}{SNAPSHOT_SUFFIX}"
+
+
+def _preamble(remote_dir: str) -> str:
+    live = remote_dir.rstrip('/')
+    root = snapshot_root(live)
+    return f'live="{live}"\nroot="{root}"\nname="{os.path.basename(root)}"\n'
+
+
+def _flip(target_var: str) -> str:
+    """Atomically point $live at $root/<target> (new symlink + rename over the old one)."""
+    return f"""ln -s "$name/{target_var}" "$live.flip.$$"
+mv -T "$live.flip.$$" "$live"
+"""
+
+
+def layout_command(remote_dir: str, lease: int = 300) -> str:
+    """
+    Remote script converting a plain REMOTE_DIR into the snapshot layout
+    (idempotent; prints SNAPSHOT_LAYOUT_OK or SNAPSHOT_LAYOUT_MIGRATED). The
+    migration runs under the promotion lock, which moves along with .staging.
+    """
+    return _preamble(remote_dir) + """set -e
+if [ -L "$live" ]; then
+    echo "SNAPSHOT_LAYOUT_OK current=$(basename "$(readlink "$live")")"
+    exit 0
+fi
+mkdir -p "$live/.staging"
+""" + acquire_command(lock_path(remote_dir), "snapshot_layout_$$", lease) + """
+if [ -L "$live" ]; then
+    echo "SNAPSHOT_LAYOUT_OK current=$(basename "$(readlink "$live")")"
+    exit 0
+fi
+mkdir -p "$root/.staging"
+chmod 755 "$root/.staging"
+# Staging moves out of the directory that becomes the first snapshot
+if [ -d "$live/.staging" ] && [ ! -L "$live/.staging" ]; then
+    for d in "$live/.staging"/* "$live/.staging"/.[!.]*; do
+        [ -e "$d" ] || continue
+        mv "$d" "$root/.staging/"
+    done
+    rmdir "$live/.staging"
+fi
+ln -sfn ../.staging "$live/.staging"
+id="initial_$(date +%Y%m%d_%H%M%S)"
+mv "$live" "$root/$id"
+ln -s "$name/$id" "$live"
+echo "$id" >> "$root/.history"
+echo "SNAPSHOT_LAYOUT_MIGRATED current=$id"
+"""
+
+
+def promote_command(remote_dir: str, staging_dir: str, run_id: str, keep: int,
+                    manifest_step: str = '', lease: int = 300, guard: str = '') -> str:
+    """
+    Remote script publishing staging_dir as a new snapshot.
+
+    Args:
+        remote_dir: REMOTE_DIR (must already be a snapshot symlink)
+        staging_dir: Staging directory of the run
+        run_id: Snapshot id
+        keep: Previous snapshots to keep besides the live one
+        manifest_step: Shell snippet writing the state manifest into "$work"
+        lease: Lease of the promotion lock in seconds
+        guard: Shell snippet run under the lock before anything changes
+    """
+    return _preamble(remote_dir) + "set -e\n" + acquire_command(lock_path(remote_dir), run_id, lease) + f"""
+if [ ! -L "$live" ]; then
+    echo "SNAPSHOT_LAYOUT_MISSING"
+    exit 1
+fi
+{guard}
+staging="{staging_dir}"
+if [ ! -d "$staging" ]; then
+    echo "STAGING_MISSING"
+    exit 1
+fi
+current=$(basename "$(readlink "$live")")
+new="{run_id}"
+if [ -e "$root/$new" ]; then
+    new="{run_id}_$(date +%s)"
+fi
+# Build directories of failed or crashed promotions (only promotions, which
+# hold the lock, create them)
+for d in "$root"/.building.*; do
+    [ -e "$d" ] || continue
+    rm -rf "$d"
+    echo "SNAPSHOT_BUILD_REMOVED dir=$(basename "$d")"
+done
+work="$root/.building.$new"
+# A promotion failing before the flip must not leave its hardlinked copy behind
+trap 'if [ -n "$work" ]; then rm -rf "$work"; fi; lock_release' EXIT
+mkdir "$work"
+# Unchanged files: hard links into the live snapshot (no data copied)
+cp -al "$root/$current/." "$work/"
+for f in "$staging"/* "$staging"/.[!.]*; do
+    [ -f "$f" ] || [ -L "$f" ] || continue
+    # Unlink first: a --link-dest staging file may be the very inode linked in
+    rm -f "$work/$(basename "$f")"
+    mv "$f" "$work/"
+done
+remaining=$(ls -A "$staging" 2>/dev/null | wc -l)
+if [ "$remaining" -gt 0 ]; then
+    echo "PROMOTE_PARTIAL remaining=$remaining"
+    exit 1
+fi
+rmdir "$staging"
+{manifest_step}
+mv "$work" "$root/$new"
+work="$root/$new"
+""" + _flip("$new") + f"""work=
+echo "$new" >> "$root/.history"
+tail -n {int(keep) + 1} "$root/.history" > "$root/.history.tmp.$$"
+mv -f "$root/.history.tmp.$$" "$root/.history"
+for d in "$root"/*; do
+    [ -d "$d" ] && [ ! -L "$d" ] || continue
+    id=$(basename "$d")
+    if ! grep -qxF "$id" "$root/.history"; then
+        rm -rf "$d"
+        echo "SNAPSHOT_PRUNED id=$id"
+    fi
+done
+echo "SNAPSHOT_LIVE id=$new previous=$current"
+echo "PROMOTE_SUCCESS"
+"""
+
+
+def rollback_command(remote_dir: str, target: Optional[str] = None, lease: int = 300) -> str:
+    """
+    Remote script pointing REMOTE_DIR back at an older snapshot (default: the
+    one before the live snapshot in the history). The abandoned snapshot
+    leaves the history and is pruned by the next publish.
+    """
+    return _preamble(remote_dir) + """set -e
+if [ ! -L "$live" ]; then
+    echo "SNAPSHOT_LAYOUT_MISSING live=$live is not a snapshot symlink"
+    exit 1
+fi
+""" + acquire_command(lock_path(remote_dir), "rollback_$$", lease) + f"""
+current=$(basename "$(readlink "$live")")
+target="{target or ''}"
+if [ -z "$target" ]; then
+    target=$( (grep -vxF "$current" "$root/.history" || true) | tail -n 1)
+fi
+if [ -z "$target" ] || [ ! -d "$root/$target" ]; then
+    echo "SNAPSHOT_ROLLBACK_NO_TARGET target=$target"
+    exit 1
+fi
+""" + _flip("$target") + """(grep -vxF "$current" "$root/.history" || true) | (grep -vxF "$target" || true) > "$root/.history.tmp.$$"
+echo "$target" >> "$root/.history.tmp.$$"
+mv -f "$root/.history.tmp.$$" "$root/.history"
+echo "SNAPSHOT_ROLLBACK_OK id=$target previous=$current"
+"""
+
+
+def list_command(remote_dir: str) -> str:
+    """Remote script printing the live snapshot and the history."""
+    return _preamble(remote_dir) + """echo "LIVE $(basename "$(readlink "$live")")"
+cat "$root/.history" 2>/dev/null | sed 's/^/SNAPSHOT /'
+"""
+
+
+def parse_list_output(output: str) -> Tuple[Optional[str], List[str]]:
+    """(live snapshot id, history oldest first) from list_command() output."""
+    live, history = None, []
+    for line in output.splitlines():
+        if line.startswith("LIVE "):
+            live = line[5:].strip() or None
+        elif line.startswith("SNAPSHOT "):
+            history.append(line[9:].strip())
+    return live, history
+
+
+# ----------------------------------------------------------------------
+# Operator CLI: list / rollback
+# ----------------------------------------------------------------------
+
+def _main(argv: List[str]) -> int:
+    from modules.common.config_loader import ConfigLoader
+    from modules.vps.ssh_connection import SSHConnectionManager
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not argv or argv[0] not in ("list", "rollback"):
+        print("usage: python -m modules.vps.snapshot_publish list | rollback [SNAPSHOT_ID]")
+        return 2
+    env = ConfigLoader.load_environment_config()
+    if not (env['vps_user'] and env['vps_host'] and env['remote_dir']):
+        print("VPS_USER, VPS_HOST and REMOTE_DIR must be set")
+        return 2
+    import config
+    connection = SSHConnectionManager(env['vps_user'], env['vps_host'],
+                                      getattr(config, 'SSH_OPTIONS', []), multiplex=False)
+    if argv[0] == "list":
+        result = connection.run_ssh(list_command(env['remote_dir']), "snapshot_list", timeout=30)
+        live, history = parse_list_output(result.stdout)
+        for snapshot_id in history:
+            print(f"{'*' if snapshot_id == live else ' '} {snapshot_id}")
+        return 0 if live else 1
+    target = argv[1] if len(argv) > 1 else None
+    result = connection.run_ssh(rollback_command(env['remote_dir'], target, getattr(config, 'PROMOTE_LOCK_LEASE', 300)), "snapshot_rollback", timeout=60)
+    print((result.stdout + result.stderr).strip())
+    return 0 if result.returncode == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -8,13 +8,27 @@ import subprocess
 import shutil
 import logging
 import random
+import shlex
 import string
+import time
 import datetime
 from pathlib import Path
-from typing import List, Tuple, Optional, Set
+from typing import Dict, List, Tuple, Optional, Set
+
+from modules.vps.remote_inventory import FIND_PRINTF_FORMAT, RemoteInventory
+from modules.vps.remote_state_manifest import (
+    RemoteStateManifest, database_name, fetch_command, parse_fetch_output, write_command
+)
+from modules.vps import snapshot_publish
+from modules.vps.promote_lock import (
+    acquire_command, db_stamp, live_guard_command, lock_path, parse_lock_held
+)
+from modules.vps.ssh_connection import SSHConnectionManager
 
 logger = logging.getLogger(__name__)
 
+PROMOTE_LOCK_MAX_BACKOFF = 120  # seconds between lock attempts at most
+
 
 class SSHClient:
     """Handles SSH connections and remote VPS operations"""
@@ -30,12 +44,30 @@ class SSHClient:
                 - remote_dir: Remote directory on VPS
                 - ssh_options: SSH options list
                 - repo_name: Repository name
+                - connection: Optional shared SSHConnectionManager
         """
         self.vps_user = config['vps_user']
         self.vps_host = config['vps_host']
         self.remote_dir = config['remote_dir']
         self.ssh_options = config.get('ssh_options', [])
         self.repo_name = config.get('repo_name', '')
+        # NEW: shared multiplexed connection (plain per-call ssh when none is configured)
+        self.connection = config.get('connection') or SSHConnectionManager(
+            self.vps_user, self.vps_host, self.ssh_options, multiplex=False)
+        self._inventories: Dict[str, RemoteInventory] = {}  # NEW: remote path -> listing snapshot
+        self.inventory_fetch_count = 0
+        # NEW: publish into versioned snapshot directories behind an atomic symlink
+        import config as build_config
+        self.snapshot_publish = getattr(build_config, 'ENABLE_SNAPSHOT_PUBLISH', False)
+        self.snapshot_keep = max(0, int(getattr(build_config, 'SNAPSHOT_KEEP', 3)))
+        self.snapshot_layout_ready = False
+        # NEW: lease lock shared by overlapping runs; the live database this run planned against
+        self.promote_lock_lease = max(60, int(getattr(build_config, 'PROMOTE_LOCK_LEASE', 300)))
+        self.promote_lock_wait = max(0, int(getattr(build_config, 'PROMOTE_LOCK_WAIT', 1800)))
+        self.promote_lock_backoff = max(1, int(getattr(build_config, 'PROMOTE_LOCK_BACKOFF', 15)))
+        self.planned_db_stamp: Optional[Tuple[int, float]] = None
+        self.planned_db_stamp_known = False
+        self.last_promote_status: Optional[str] = None
 
     def generate_run_id(self) -> str:
         """
@@ -78,11 +110,11 @@ class SSHClient:
         chmod 755 "{staging_dir}"
         """
 
-        ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "ensure_staging_dir",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -98,34 +130,80 @@ class SSHClient:
             logger.error(f"STAGING_DIR_CREATE_EXCEPTION path={staging_dir} error={str(e)[:200]}")
             return False
 
-    def promote_staging(self, run_id: str) -> bool:
+    def remove_staged_files(self, run_id: str, basenames: List[str]) -> bool:
+        """
+        NEW: Remove files from a staging directory before promotion (files that
+        were streamed during the build but are not part of the final publish).
+
+        Args:
+            run_id: Unique run identifier (staging dir name)
+            basenames: Files to remove
+
+        Returns:
+            True on success
+        """
+        if not basenames:
+            return True
+        staging_dir = f"{self.remote_dir}/.staging/{run_id}"
+        quoted = ' '.join(shlex.quote(name) for name in basenames)
+        result = self.connection.run_ssh(f"cd {shlex.quote(staging_dir)} && rm -f -- {quoted}",
+                                         "remove_staged_files", timeout=60)
+        if result.returncode != 0:
+            logger.error(f"STAGING_REMOVE_FAIL run_id={run_id} files={len(basenames)} error={result.stderr[:200]}")
+            return False
+        logger.info(f"STAGING_REMOVE_OK run_id={run_id} files={len(basenames)} sample={basenames[:5]}")
+        return True
+
+    def promote_staging(self, run_id: str, state_manifest: Optional[RemoteStateManifest] = None) -> bool:
         """
         Atomically promote staging directory to live REMOTE_DIR.
-        Acquires a remote lock before moving files to prevent concurrent promotions.
+        Acquires a remote lease lock before moving files to prevent concurrent promotions.
         Moves all files from staging dir to remote_dir, then removes staging dir.
 
         If mv fails with "are the same file" (due to --link-dest hardlinks),
         the file is skipped, the staging copy is removed, and promotion continues.
 
+        With the snapshot layout (ENABLE_SNAPSHOT_PUBLISH) the live snapshot is
+        hardlinked into a new one, the staged files are moved there and
+        REMOTE_DIR is switched over with a single symlink rename instead.
+
+        A lock held by another run is waited for (with backoff, at most
+        PROMOTE_LOCK_WAIT seconds); an expired lease is stolen. Under the lock
+        the live database must still be the one observed in phase I, otherwise
+        nothing is moved and last_promote_status is 'live_changed'.
+
         Args:
             run_id: Unique run identifier (staging dir name)
+            state_manifest: Manifest of the promoted state, written (via stdin,
+                temp file + rename) under the lock after every file was moved
 
         Returns:
             True if promotion succeeded, False otherwise.
             On failure, staging dir is left intact for debugging.
         """
         staging_dir = f"{self.remote_dir}/.staging/{run_id}"
-        lock_dir = f"{self.remote_dir}/.staging/.promote.lock"
-
-        remote_cmd = f"""
+        lock_step = acquire_command(lock_path(self.remote_dir), run_id, self.promote_lock_lease)
+        # NEW: a run that waited for another promotion must not overwrite it blindly
+        guard_step = ''
+        if self.planned_db_stamp_known:
+            guard_step = live_guard_command(f"{self.remote_dir}/{database_name(self.repo_name)}",
+                                            self.planned_db_stamp)
+
+        # NEW: the state manifest replaces the old one last, so it never names a file that is not live yet
+        manifest_payload = state_manifest.to_json() if state_manifest is not None else ''
+        manifest_step = write_command(self.remote_dir, self.repo_name) if state_manifest is not None else ''
+
+        if self.snapshot_layout_ready:
+            # NEW: assemble a complete snapshot next to the live one, then go live with one rename
+            manifest_step = write_command('$work', self.repo_name) if state_manifest is not None else ''
+            remote_cmd = snapshot_publish.promote_command(
+                self.remote_dir, staging_dir, run_id, self.snapshot_keep, manifest_step,
+                lease=self.promote_lock_lease, guard=guard_step)
+        else:
+            remote_cmd = f"""
 set -e
-lock_dir="{lock_dir}"
-if ! mkdir "$lock_dir" 2>/dev/null; then
-    echo "LOCK_ACQUIRE_FAIL"
-    exit 1
-fi
-trap 'rmdir "$lock_dir" 2>/dev/null || true' EXIT
-
+{lock_step}
+{guard_step}
 if [ ! -d "{staging_dir}" ]; then
     echo "STAGING_MISSING"
     exit 1
@@ -155,35 +233,177 @@ fi
 rmdir "{staging_dir}" 2>/dev/null
 # Remove parent .staging if empty (best effort)
 rmdir "{self.remote_dir}/.staging" 2>/dev/null || true
+{manifest_step}
 echo "PROMOTE_SUCCESS"
 """
 
-        ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
+        self.last_promote_status = 'failed'
+        deadline = time.monotonic() + self.promote_lock_wait
+        delay = self.promote_lock_backoff
+        attempt = 0
+
+        while True:
+            attempt += 1
+            # Promotion moves files into remote_dir (even a failed one may have moved some)
+            self.invalidate_inventory()
+            try:
+                result = self.connection.run(
+                    ssh_cmd, "ssh", "promote_staging",
+                    input=manifest_payload,
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                    timeout=60
+                )
+            except Exception as e:
+                logger.error(f"STAGING_PROMOTE_EXCEPTION run_id={run_id} error={str(e)[:200]}")
+                return False
 
+            for line in result.stdout.splitlines():
+                if line.startswith("LOCK_STOLEN"):
+                    logger.warning(f"STAGING_PROMOTE_{line.strip()} run_id={run_id}")
+
+            holder = parse_lock_held(result.stdout)
+            if holder is None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(
+                    f"STAGING_PROMOTE_LOCK_TIMEOUT run_id={run_id} owner={holder.owner} "
+                    f"attempts={attempt} waited={self.promote_lock_wait}s"
+                )
+                self.last_promote_status = 'lock_timeout'
+                return False
+            # Wake up when the holder's lease runs out at the latest (it can be stolen then)
+            sleep_for = min(delay, remaining, max(1, holder.expires_in + 1))
+            # Jitter: waiters of the same holder must not all wake at its expiry together
+            sleep_for += random.uniform(0, min(5.0, sleep_for / 2))
+            logger.info(
+                f"STAGING_PROMOTE_LOCK_WAIT run_id={run_id} owner={holder.owner} "
+                f"expires_in={holder.expires_in}s attempt={attempt} sleep={sleep_for:.0f}s"
+            )
+            time.sleep(sleep_for)
+            delay = min(delay * 2, PROMOTE_LOCK_MAX_BACKOFF)
+
+        if result.returncode == 0 and "PROMOTE_SUCCESS" in result.stdout:
+            logger.info(f"STAGING_PROMOTE_OK run_id={run_id} attempts={attempt}")
+            for line in result.stdout.splitlines():
+                if line.startswith(("SNAPSHOT_LIVE", "SNAPSHOT_PRUNED")):
+                    logger.info(line.strip())
+            if state_manifest is not None:
+                logger.info(f"STATE_MANIFEST_WRITTEN=1 files={len(state_manifest.entries)} via=promote_staging")
+            self.last_promote_status = 'success'
+            return True
+
+        changed = next((line.strip() for line in result.stdout.splitlines() if line.startswith("LIVE_CHANGED")), None)
+        if changed:
+            logger.warning(f"STAGING_PROMOTE_{changed} run_id={run_id} (another run published meanwhile)")
+            self.last_promote_status = 'live_changed'
+        else:
+            error_snip = result.stderr[:200] if result.stderr else "unknown"
+            logger.error(f"STAGING_PROMOTE_FAIL run_id={run_id} error={error_snip}")
+        return False
+
+    def observe_live_db(self, db_stat: Optional[Tuple[int, float]], force: bool = False):
+        """
+        Remember (size, mtime) of the live database the publish is planned
+        against (the first observation of the run wins unless force).
+        """
+        if self.planned_db_stamp_known and not force:
+            return
+        self.planned_db_stamp = db_stat
+        self.planned_db_stamp_known = True
+        logger.debug(f"LIVE_DB_STAMP={db_stamp(db_stat)}")
+
+    def observe_live_inventory(self, inventory: RemoteInventory, force: bool = False):
+        """observe_live_db() from a listing of REMOTE_DIR."""
+        db_entry = inventory.get(database_name(self.repo_name))
+        self.observe_live_db((db_entry.size, db_entry.mtime) if db_entry is not None else None, force)
+
+    def ensure_snapshot_layout(self) -> bool:
+        """
+        Convert REMOTE_DIR into the snapshot layout (REMOTE_DIR becomes a symlink
+        into REMOTE_DIR.snapshots/). Idempotent; a no-op unless
+        ENABLE_SNAPSHOT_PUBLISH is set.
+
+        Returns:
+            True if publishes will use snapshots, False otherwise (the plain
+            per-file promotion is used then)
+        """
+        if not self.snapshot_publish:
+            return False
+
+        ssh_cmd = self.connection.ssh_command(
+            snapshot_publish.layout_command(self.remote_dir, self.promote_lock_lease))
+        self.invalidate_inventory()
+        # The migration takes the promotion lock; wait for a running promotion like promote_staging
+        deadline = time.monotonic() + self.promote_lock_wait
+        delay = self.promote_lock_backoff
+        while True:
+            try:
+                result = self.connection.run(
+                    ssh_cmd, "ssh", "snapshot_layout",
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                    timeout=120
+                )
+            except Exception as e:
+                logger.error(f"SNAPSHOT_LAYOUT_EXCEPTION error={str(e)[:200]}")
+                return False
+            holder = parse_lock_held(result.stdout)
+            remaining = deadline - time.monotonic()
+            if holder is None or remaining <= 0:
+                break
+            sleep_for = min(delay, remaining, max(1, holder.expires_in + 1))
+            sleep_for += random.uniform(0, min(5.0, sleep_for / 2))
+            logger.info(f"SNAPSHOT_LAYOUT_LOCK_WAIT owner={holder.owner} sleep={sleep_for:.0f}s")
+            time.sleep(sleep_for)
+            delay = min(delay * 2, PROMOTE_LOCK_MAX_BACKOFF)
+
+        status = next((line.strip() for line in result.stdout.splitlines()
+                       if line.startswith("SNAPSHOT_LAYOUT_")), "")
+        if result.returncode == 0 and status:
+            self.snapshot_layout_ready = True
+            logger.info(f"{status} keep={self.snapshot_keep}")
+            return True
+        error_snip = (result.stderr or result.stdout or "unknown").strip()[:200]
+        logger.error(f"SNAPSHOT_LAYOUT_FAIL error={error_snip} (falling back to per-file promotion)")
+        return False
+
+    def rollback_snapshot(self, snapshot_id: Optional[str] = None) -> bool:
+        """
+        Point REMOTE_DIR back at an older snapshot (one rename, under the promotion lock).
+
+        Args:
+            snapshot_id: Snapshot to restore (None = the one before the live snapshot)
+
+        Returns:
+            True if the rollback succeeded
+        """
+        ssh_cmd = self.connection.ssh_command(snapshot_publish.rollback_command(self.remote_dir, snapshot_id, self.promote_lock_lease))
+        self.invalidate_inventory()
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "snapshot_rollback",
                 capture_output=True,
                 text=True,
                 check=False,
                 timeout=60
             )
-
-            if result.returncode == 0 and "PROMOTE_SUCCESS" in result.stdout:
-                logger.info(f"STAGING_PROMOTE_OK run_id={run_id}")
-                return True
-            else:
-                error_snip = result.stderr[:200] if result.stderr else "unknown"
-                if "LOCK_ACQUIRE_FAIL" in result.stdout:
-                    logger.error(f"STAGING_PROMOTE_LOCK_BUSY run_id={run_id}")
-                else:
-                    logger.error(f"STAGING_PROMOTE_FAIL run_id={run_id} error={error_snip}")
-                return False
-
         except Exception as e:
-            logger.error(f"STAGING_PROMOTE_EXCEPTION run_id={run_id} error={str(e)[:200]}")
+            logger.error(f"SNAPSHOT_ROLLBACK_EXCEPTION error={str(e)[:200]}")
             return False
 
+        status = next((line.strip() for line in result.stdout.splitlines()
+                       if line.startswith(("SNAPSHOT_ROLLBACK_", "LOCK_HELD"))), "unknown")
+        if result.returncode == 0:
+            logger.info(status)
+            return True
+        logger.error(f"SNAPSHOT_ROLLBACK_FAIL status={status}")
+        return False
+
     def cleanup_old_staging(self, max_age_hours: int = 24) -> bool:
         """
         Delete staging directories older than max_age_hours under REMOTE_DIR/.staging/.
@@ -203,14 +423,14 @@ echo "PROMOTE_SUCCESS"
 
         remote_cmd = f"""
 mkdir -p "{staging_parent}" || echo "MKDIR_FAIL"
-find "{staging_parent}" -maxdepth 1 -type d -name 'run_*' -mmin +{minutes} -exec rm -rf {{}} \\; -print 2>&1 || echo "FIND_FAIL"
+find "{staging_parent}/" -maxdepth 1 -type d -name 'run_*' -mmin +{minutes} -exec rm -rf {{}} \\; -print 2>&1 || echo "FIND_FAIL"
 echo "CLEANUP_OK"
 """
-        ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "cleanup_old_staging",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -231,48 +451,182 @@ echo "CLEANUP_OK"
             logger.error(f"STALE_STAGING_CLEANUP_EXCEPTION: {e}")
             return False
 
-    def list_remote_files(self, remote_path: Optional[str] = None) -> List[str]:
+    def fetch_inventory(self, remote_path: Optional[str] = None) -> Optional[RemoteInventory]:
         """
-        List all files (regular files and symlinks) in remote_path.
-        Returns basenames only.
+        List remote_path with one SSH call (type, size and mtime of every top-level entry).
+        Always hits the server; use get_inventory() for the shared snapshot.
 
         Args:
             remote_path: Remote directory to list (defaults to self.remote_dir)
 
         Returns:
-            List of filenames (basenames) or empty list on failure
+            RemoteInventory, or None if the listing failed
         """
         target = remote_path if remote_path is not None else self.remote_dir
 
-        ssh_cmd = [
-            "ssh",
-            *self.ssh_options,
-            f"{self.vps_user}@{self.vps_host}",
-            rf'find "{target}" -maxdepth 1 \( -type f -o -type l \) -printf "%f\\n" 2>/dev/null || echo "NO_FILES"'
-        ]
+        ssh_cmd = self.connection.ssh_command(
+            f'if [ -d "{target}" ]; then find "{target}/" -mindepth 1 -maxdepth 1 -printf \'{FIND_PRINTF_FORMAT}\'; fi'
+        )
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            self.inventory_fetch_count += 1
+            result = self.connection.run(
+                ssh_cmd, "ssh", "fetch_inventory",
                 capture_output=True,
                 text=True,
                 check=False,
-                timeout=30
+                timeout=60
             )
 
-            if result.returncode == 0:
-                files = [f.strip() for f in result.stdout.split('\n')
-                         if f.strip() and f.strip() != 'NO_FILES']
-                logger.info(f"REMOTE_FILE_LIST path={target} count={len(files)}")
-                return files
-            else:
-                logger.warning(f"REMOTE_FILE_LIST_FAIL path={target}")
-                return []
+            if result.returncode != 0:
+                logger.warning(f"REMOTE_INVENTORY_FAIL path={target} rc={result.returncode} error={result.stderr[:200]}")
+                return None
+
+            inventory = RemoteInventory.from_find_output(target, result.stdout)
+            if target == self.remote_dir:
+                self.observe_live_inventory(inventory)
+            logger.info(
+                f"REMOTE_INVENTORY path={target} files={len(inventory)} bytes={inventory.total_size()} "
+                f"fetch={self.inventory_fetch_count}"
+            )
+            return inventory
+
+        except Exception as e:
+            logger.warning(f"REMOTE_INVENTORY_EXCEPTION path={target} error={str(e)[:200]}")
+            return None
+
+    def get_inventory(self, remote_path: Optional[str] = None, refresh: bool = False) -> Optional[RemoteInventory]:
+        """
+        Shared inventory snapshot of remote_path, fetched on first use and after invalidation.
+
+        Args:
+            remote_path: Remote directory (defaults to self.remote_dir)
+            refresh: Force a new listing
+
+        Returns:
+            RemoteInventory, or None if the listing failed
+        """
+        target = (remote_path if remote_path is not None else self.remote_dir).rstrip('/') or '/'
+        if refresh or target not in self._inventories:
+            inventory = self.fetch_inventory(target)
+            if inventory is None:
+                return None
+            self._inventories[target] = inventory
+        return self._inventories[target]
+
+    def invalidate_inventory(self, remote_path: Optional[str] = None):
+        """
+        Drop cached snapshots after a remote mutation (promotion, deletion).
+
+        Args:
+            remote_path: Directory that changed (None = all snapshots)
+        """
+        if remote_path is None:
+            self._inventories.clear()
+        else:
+            self._inventories.pop(remote_path.rstrip('/') or '/', None)
+
+    def fetch_state_manifest(self) -> Optional[RemoteStateManifest]:
+        """
+        Download the state manifest and check it against the live database (one SSH call).
+
+        Returns:
+            RemoteStateManifest, or None when it is missing, unreadable or stale
+            (the caller then falls back to a listing)
+        """
+        ssh_cmd = self.connection.ssh_command(fetch_command(self.remote_dir, self.repo_name))
 
+        try:
+            result = self.connection.run(
+                ssh_cmd, "ssh", "fetch_state_manifest",
+                capture_output=True,
+                text=True,
+                check=False,
+                timeout=60
+            )
         except Exception as e:
-            logger.warning(f"REMOTE_FILE_LIST_EXCEPTION path={target} error={str(e)[:200]}")
+            logger.warning(f"STATE_MANIFEST_FETCH_EXCEPTION error={str(e)[:200]}")
+            return None
+
+        if result.returncode != 0:
+            logger.warning(f"STATE_MANIFEST_FETCH_FAIL rc={result.returncode} error={result.stderr[:200]}")
+            return None
+
+        text, db_stat = parse_fetch_output(result.stdout)
+        self.observe_live_db(db_stat)
+        if text is None:
+            logger.info("STATE_MANIFEST_MISSING=1 fallback=scan")
+            return None
+
+        manifest = RemoteStateManifest.from_json(text)
+        if manifest is None:
+            logger.warning("STATE_MANIFEST_INVALID=1 fallback=scan")
+            return None
+
+        reason = manifest.stale_reason(self.repo_name, db_stat)
+        if reason:
+            logger.info(f"STATE_MANIFEST_STALE=1 reason={reason} fallback=scan")
+            return None
+
+        logger.info(
+            f"STATE_MANIFEST_OK files={len(manifest.entries)} bytes={len(text)} "
+            f"run_id={manifest.run_id or 'NONE'}"
+        )
+        return manifest
+
+    def write_state_manifest(self, state_manifest: RemoteStateManifest) -> bool:
+        """
+        Atomically replace the state manifest (temp file + rename, content via stdin).
+
+        Args:
+            state_manifest: Manifest describing the current remote state
+
+        Returns:
+            True if the manifest was written
+        """
+        ssh_cmd = self.connection.ssh_command(write_command(self.remote_dir, self.repo_name))
+
+        try:
+            result = self.connection.run(
+                ssh_cmd, "ssh", "write_state_manifest",
+                input=state_manifest.to_json(),
+                capture_output=True,
+                text=True,
+                check=False,
+                timeout=60
+            )
+        except Exception as e:
+            logger.warning(f"STATE_MANIFEST_WRITE_EXCEPTION error={str(e)[:200]}")
+            return False
+
+        if result.returncode != 0:
+            logger.warning(f"STATE_MANIFEST_WRITE_FAIL rc={result.returncode} error={result.stderr[:200]}")
+            return False
+
+        logger.info(f"STATE_MANIFEST_WRITTEN=1 files={len(state_manifest.entries)} via=seal")
+        return True
+
+    def list_remote_files(self, remote_path: Optional[str] = None) -> List[str]:
+        """
+        List all files (regular files and symlinks) in remote_path.
+        Returns basenames only, from the shared inventory snapshot.
+
+        Args:
+            remote_path: Remote directory to list (defaults to self.remote_dir)
+
+        Returns:
+            List of filenames (basenames) or empty list on failure
+        """
+        target = remote_path if remote_path is not None else self.remote_dir
+        inventory = self.get_inventory(target)
+        if inventory is None:
+            logger.warning(f"REMOTE_FILE_LIST_FAIL path={target}")
             return []
 
+        files = inventory.names()
+        logger.info(f"REMOTE_FILE_LIST path={target} count={len(files)}")
+        return files
+
     def verify_upload(self, expected_basenames: Set[str], remote_path: Optional[str] = None) -> Tuple[bool, List[str]]:
         """
         Verify that all expected files exist on remote server.
@@ -340,14 +694,10 @@ echo "CLEANUP_OK"
         """Test SSH connection to VPS"""
         logger.info("Testing SSH connection to VPS...")
 
-        ssh_test_cmd = [
-            "ssh",
-            *self.ssh_options,
-            f"{self.vps_user}@{self.vps_host}",
-            "echo SSH_TEST_SUCCESS"
-        ]
+        ssh_test_cmd = self.connection.ssh_command("echo SSH_TEST_SUCCESS")
 
-        result = subprocess.run(ssh_test_cmd, capture_output=True, text=True, check=False)
+        result = self.connection.run(ssh_test_cmd, "ssh", "test_ssh_connection",
+                                     capture_output=True, text=True, check=False)
         if result and result.returncode == 0 and "SSH_TEST_SUCCESS" in result.stdout:
             logger.info("SSH connection successful")
             return True
@@ -417,11 +767,11 @@ fi
 echo "ALL_CHECKS_PASSED"
 """
 
-        ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "ensure_remote_directory",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -496,15 +846,15 @@ echo "ALL_CHECKS_PASSED"
         logger.info(f"VPS_PERMS_NORMALIZE_START dir={target_dir}")
 
         remote_cmd = f"""
-find "{target_dir}" -type d -exec chmod 755 {{}} \\;
-find "{target_dir}" -type f -exec chmod 644 {{}} \\;
+find "{target_dir}/" -type d -exec chmod 755 {{}} \\;
+find "{target_dir}/" -type f -exec chmod 644 {{}} \\;
 """
 
-        ssh_cmd = ["ssh", *self.ssh_options, f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "normalize_permissions",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -550,7 +900,7 @@ find "{target_dir}" -type f -exec chmod 644 {{}} \\;
 
         remote_cmd = f"""
         # Check for package files
-        if find "{self.remote_dir}" -name "*.pkg.tar.*" -type f 2>/dev/null | head -1 >/dev/null; then
+        if find "{self.remote_dir}/" -name "*.pkg.tar.*" -type f 2>/dev/null | head -1 >/dev/null; then
             echo "REPO_EXISTS_WITH_PACKAGES"
         # Check for database files
         elif [ -f "{self.remote_dir}/{self.repo_name}.db.tar.gz" ] || [ -f "{self.remote_dir}/{self.repo_name}.db" ]; then
@@ -560,11 +910,11 @@ find "{target_dir}" -type f -exec chmod 644 {{}} \\;
         fi
         """
 
-        ssh_cmd = ["ssh", f"{self.vps_user}@{self.vps_host}", remote_cmd]
+        ssh_cmd = self.connection.ssh_command(remote_cmd)
 
         try:
-            result = subprocess.run(
-                ssh_cmd,
+            result = self.connection.run(
+                ssh_cmd, "ssh", "check_repository_exists_on_vps",
                 capture_output=True,
                 text=True,
                 check=False,
@@ -593,36 +943,12 @@ find "{target_dir}" -type f -exec chmod 644 {{}} \\;
             return False, False
 
     def list_remote_packages(self) -> List[str]:
-        """List all *.pkg.tar.zst and *.pkg.tar.xz files in the remote repository directory (basenames only)"""
-        logger.info("Listing remote repository packages (SSH find)...")
-
-        ssh_key_path = "/home/builder/.ssh/id_ed25519"
-        if not os.path.exists(ssh_key_path):
-            logger.error(f"SSH key not found")
+        """List all package files in the remote repository directory (basenames only)"""
+        inventory = self.get_inventory()
+        if inventory is None:
+            logger.warning("SSH find returned error")
             return []
 
-        ssh_cmd = [
-            "ssh",
-            f"{self.vps_user}@{self.vps_host}",
-            rf'find "{self.remote_dir}" -maxdepth 1 -type f \( -name "*.pkg.tar.zst" -o -name "*.pkg.tar.xz" \) -printf "%f\\n" 2>/dev/null || echo "NO_FILES"'
-        ]
-
-        try:
-            result = subprocess.run(
-                ssh_cmd,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-
-            if result.returncode == 0:
-                files = [f.strip() for f in result.stdout.split('\n') if f.strip() and f.strip() != 'NO_FILES']
-                logger.info(f"Found {len(files)} package files on remote server")
-                return files
-            else:
-                logger.warning(f"SSH find returned error")
-                return []
-
-        except Exception as e:
-            logger.error(f"SSH command failed: {e}")
-            return []
+        files = inventory.packages()
+        logger.info(f"Found {len(files)} package files on remote server")
+        return files
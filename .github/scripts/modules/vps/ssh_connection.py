@@ -0,0 +1,220 @@
+"""
+SSH Connection Module - Shared multiplexed connection for all VPS operations
+
+One OpenSSH ControlMaster socket is opened per run and every ssh, rsync and
+scp invocation is routed through it, so only the first remote operation pays
+for the TCP/SSH handshake. Every remote call is counted and timed; the
+summary is logged at the end of the run (SSH_POOL_STATS).
+
+The master is started explicitly in the background (`ssh -M -N -f`) with its
+output detached: a master spawned implicitly by a captured subprocess would
+keep the pipes open and block the caller. Clients use ControlMaster=no, so a
+lost socket silently falls back to a direct connection.
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RemoteCallStats:
+    """Aggregated counters for one kind of remote call"""
+    calls: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+    slowest: float = 0.0
+    slowest_label: str = ""
+
+
+class SSHConnectionManager:
+    """
+    Builds ssh/rsync/scp command lines that share one ControlMaster connection
+    and runs them with per-call accounting.
+    """
+
+    def __init__(self, vps_user: str, vps_host: str, ssh_options: Optional[List[str]] = None,
+                 multiplex: Optional[bool] = None, control_persist: Optional[int] = None):
+        """
+        Initialize SSHConnectionManager.
+
+        Args:
+            vps_user: VPS username
+            vps_host: VPS hostname
+            ssh_options: Base SSH options applied to every call (config.SSH_OPTIONS)
+            multiplex: Use a ControlMaster socket (defaults to config.ENABLE_SSH_MULTIPLEXING)
+            control_persist: Seconds the master outlives its last client (defaults to config.SSH_CONTROL_PERSIST)
+        """
+        import config
+        self.vps_user = vps_user
+        self.vps_host = vps_host
+        self.ssh_options = list(ssh_options or [])
+        self.multiplex = getattr(config, 'ENABLE_SSH_MULTIPLEXING', True) if multiplex is None else multiplex
+        self.control_persist = int(control_persist if control_persist is not None
+                                   else getattr(config, 'SSH_CONTROL_PERSIST', 600))
+        self._control_dir: Optional[str] = None
+        self._master_started = False
+        self._master_failed = False
+        self.multiplexed = False  # True once a master connection has been opened
+        self._lock = threading.RLock()
+        self._stats: Dict[str, RemoteCallStats] = {}
+
+    @property
+    def target(self) -> str:
+        return f"{self.vps_user}@{self.vps_host}"
+
+    @property
+    def control_path(self) -> Optional[str]:
+        """ControlPath of the master socket (None when not multiplexing)."""
+        if not self._control_dir:
+            return None
+        # %C is a hash of host/port/user: short enough for the sun_path limit
+        return os.path.join(self._control_dir, "%C")
+
+    # ------------------------------------------------------------------
+    # Master connection
+    # ------------------------------------------------------------------
+
+    def _ensure_master(self) -> bool:
+        if not self.multiplex or self._master_failed:
+            return False
+        if self._master_started:
+            return True
+        with self._lock:
+            if self._master_started or self._master_failed:
+                return self._master_started
+            self._control_dir = tempfile.mkdtemp(prefix="sshcm-")
+            cmd = ["ssh", *self.ssh_options,
+                   "-o", "ControlMaster=yes",
+                   "-o", f"ControlPath={self.control_path}",
+                   "-o", f"ControlPersist={self.control_persist}",
+                   "-M", "-N", "-f", self.target]
+            # stderr goes to a file: the backgrounded master inherits it and would hold a pipe open
+            log_path = os.path.join(self._control_dir, "master.log")
+            start = time.monotonic()
+            try:
+                with open(log_path, 'w') as log_file:
+                    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=log_file, timeout=60, check=False)
+                ok = result.returncode == 0
+                with open(log_path, 'r', errors='replace') as log_file:
+                    error = log_file.read().strip()[:200]
+            except (OSError, subprocess.TimeoutExpired) as e:
+                ok = False
+                error = str(e)[:200]
+            duration = time.monotonic() - start
+            self._record("ssh_master", "open", ok, duration)
+            if ok:
+                self._master_started = True
+                self.multiplexed = True
+                logger.info(f"SSH_POOL_MASTER_OPEN=1 host={self.vps_host} duration={duration:.2f}s")
+            else:
+                self._master_failed = True
+                shutil.rmtree(self._control_dir, ignore_errors=True)
+                self._control_dir = None
+                logger.warning(f"SSH_POOL_MASTER_OPEN=0 host={self.vps_host} fallback=direct error={error}")
+            return self._master_started
+
+    def ssh_options_for_call(self) -> List[str]:
+        """SSH options for one client call (base options plus the shared socket if available)."""
+        if self._ensure_master():
+            return [*self.ssh_options, "-o", "ControlMaster=no", "-o", f"ControlPath={self.control_path}"]
+        return list(self.ssh_options)
+
+    def close(self):
+        """Stop the master connection and remove its socket directory."""
+        with self._lock:
+            if self._master_started and self._control_dir:
+                try:
+                    subprocess.run(["ssh", "-o", f"ControlPath={self.control_path}", "-O", "exit", self.target],
+                                   stdin=subprocess.DEVNULL, capture_output=True, timeout=15, check=False)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+                logger.info(f"SSH_POOL_MASTER_CLOSED=1 host={self.vps_host}")
+            if self._control_dir:
+                shutil.rmtree(self._control_dir, ignore_errors=True)
+            self._control_dir = None
+            self._master_started = False
+
+    # ------------------------------------------------------------------
+    # Command builders
+    # ------------------------------------------------------------------
+
+    def ssh_command(self, remote_cmd: str) -> List[str]:
+        """argv for running remote_cmd on the VPS."""
+        return ["ssh", *self.ssh_options_for_call(), self.target, remote_cmd]
+
+    def rsync_rsh(self) -> str:
+        """Value for rsync -e (shell-quoted ssh command line)."""
+        return shlex.join(["ssh", *self.ssh_options_for_call()])
+
+    def scp_command(self, remote_path: str, local_path: str) -> List[str]:
+        """argv for copying remote_path from the VPS to local_path."""
+        return ["scp", *self.ssh_options_for_call(), f"{self.target}:{remote_path}", local_path]
+
+    # ------------------------------------------------------------------
+    # Execution and accounting
+    # ------------------------------------------------------------------
+
+    def _record(self, kind: str, label: str, ok: bool, duration: float):
+        with self._lock:
+            stats = self._stats.setdefault(kind, RemoteCallStats())
+            stats.calls += 1
+            stats.seconds += duration
+            if not ok:
+                stats.failures += 1
+            if duration > stats.slowest:
+                stats.slowest = duration
+                stats.slowest_label = label
+
+    def run(self, cmd: Union[Sequence[str], str], kind: str, label: str, **kwargs) -> subprocess.CompletedProcess:
+        """
+        subprocess.run() with accounting. Exceptions (timeouts, ...) propagate after being counted.
+
+        Args:
+            cmd: argv list, or a string when shell=True is passed
+            kind: 'ssh', 'rsync' or 'scp'
+            label: Operation name for logs (e.g. 'promote_staging')
+            **kwargs: Passed to subprocess.run
+
+        Returns:
+            CompletedProcess
+        """
+        start = time.monotonic()
+        ok = False
+        try:
+            result = subprocess.run(cmd, **kwargs)
+            ok = result.returncode == 0
+            return result
+        finally:
+            duration = time.monotonic() - start
+            self._record(kind, label, ok, duration)
+            logger.debug(f"REMOTE_CALL kind={kind} label={label} ok={int(ok)} duration={duration:.2f}s")
+
+    def run_ssh(self, remote_cmd: str, label: str, timeout: Optional[int] = None) -> subprocess.CompletedProcess:
+        """Run remote_cmd over the shared connection (text output captured, never raises on rc != 0)."""
+        return self.run(self.ssh_command(remote_cmd), "ssh", label,
+                        capture_output=True, text=True, check=False, timeout=timeout)
+
+    def stats(self) -> Dict[str, RemoteCallStats]:
+        """Snapshot of per-kind counters."""
+        with self._lock:
+            return {kind: RemoteCallStats(**vars(s)) for kind, s in self._stats.items()}
+
+    def log_stats(self):
+        """Log one SSH_POOL_STATS line per call kind."""
+        for kind, s in sorted(self.stats().items()):
+            logger.info(
+                f"SSH_POOL_STATS kind={kind} calls={s.calls} failures={s.failures} total={s.seconds:.2f}s "
+                f"avg={(s.seconds / s.calls if s.calls else 0):.2f}s slowest={s.slowest:.2f}s "
+                f"slowest_label={s.slowest_label or 'NONE'} multiplexed={int(self.multiplexed)}"
+            )
@@ -0,0 +1,156 @@
+"""
+Streaming Uploader Module - Background upload of finished packages to staging
+
+Build workers hand every built (and signed) package to submit() and go on
+building; one background thread pushes the files into the run's staging
+directory meanwhile. Files queued while an upload is running are sent
+together in the next call. A failed batch is retried with backoff on the
+uploader thread, so a slow or flaky network never blocks a build worker.
+
+Phase V asks finish() which files are already staged - and unchanged since
+(same size/mtime/inode) - and only uploads the database and whatever else
+is left.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from modules.common.hash_cache import FileKey, file_key
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class StreamingUploadResult:
+    """Files pushed to staging by the background uploader"""
+    staged: Dict[str, FileKey] = field(default_factory=dict)   # basename -> file_key at upload time
+    failed: List[str] = field(default_factory=list)
+    batches: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def is_current(self, path) -> bool:
+        """True if path was staged and has not changed since."""
+        key = self.staged.get(os.path.basename(str(path)))
+        return key is not None and file_key(path) == key
+
+
+class StreamingUploader:
+    """
+    Single background thread uploading submitted files in coalesced batches.
+    """
+
+    def __init__(self, upload: Callable[[List[str]], bool], retries: int = 3, backoff: float = 10.0):
+        """
+        Initialize StreamingUploader.
+
+        Args:
+            upload: Callable uploading a list of local paths to staging, True on success
+            retries: Extra attempts for a failed batch
+            backoff: Seconds before the first retry (doubles per attempt)
+        """
+        self._upload = upload
+        self.retries = max(0, int(retries))
+        self.backoff = max(0.0, float(backoff))
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._aborted = threading.Event()
+        self._result = StreamingUploadResult()
+        self._started_at = 0.0
+
+    def start(self):
+        """Start the uploader thread."""
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="streaming-upload", daemon=True)
+        self._thread.start()
+        logger.info(f"STREAMING_PUBLISH=1 retries={self.retries} backoff={self.backoff:.0f}s")
+
+    def submit(self, paths: Sequence[str]):
+        """Queue local files for upload (never blocks)."""
+        paths = [str(p) for p in paths if os.path.exists(p)]
+        if paths and self._thread is not None and not self._aborted.is_set():
+            self._queue.put(paths)
+            logger.info(f"STREAMING_QUEUE files={len(paths)} sample={[os.path.basename(p) for p in paths[:3]]}")
+
+    def finish(self, abort: bool = False, timeout: Optional[float] = None) -> StreamingUploadResult:
+        """
+        Stop accepting files and wait for the queue to drain.
+
+        Args:
+            abort: Drop batches that have not started yet
+            timeout: Maximum seconds to wait for the thread
+
+        Returns:
+            StreamingUploadResult
+        """
+        if self._thread is None:
+            return self._result
+        if abort:
+            self._aborted.set()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._result.seconds = time.monotonic() - self._started_at
+        r = self._result
+        logger.info(
+            f"STREAMING_PUBLISH_SUMMARY staged={len(r.staged)} failed={len(r.failed)} batches={r.batches} "
+            f"bytes={r.bytes} duration={r.seconds:.0f}s aborted={int(self._aborted.is_set())}"
+        )
+        return r
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = list(item)
+            stop = False
+            # Coalesce everything queued meanwhile into one call
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is _STOP:
+                    stop = True
+                    break
+                batch.extend(more)
+            if not self._aborted.is_set():
+                self._upload_batch(list(dict.fromkeys(batch)))
+            if stop:
+                return
+
+    def _upload_batch(self, paths: List[str]):
+        keys = {p: file_key(p) for p in paths}
+        size = sum(key[0] for key in keys.values() if key)
+        for attempt in range(1, self.retries + 2):
+            start = time.monotonic()
+            try:
+                ok = self._upload(paths)
+            except Exception as e:
+                logger.warning(f"STREAMING_UPLOAD_ERROR attempt={attempt} error={str(e)[:200]}")
+                ok = False
+            if ok:
+                self._result.batches += 1
+                self._result.bytes += size
+                for path, key in keys.items():
+                    if key is not None:
+                        self._result.staged[os.path.basename(path)] = key
+                logger.info(
+                    f"STREAMING_UPLOAD_OK files={len(paths)} bytes={size} attempt={attempt} "
+                    f"duration={time.monotonic() - start:.1f}s"
+                )
+                return
+            if attempt <= self.retries and not self._aborted.is_set():
+                delay = self.backoff * (2 ** (attempt - 1))
+                logger.warning(f"STREAMING_UPLOAD_RETRY files={len(paths)} attempt={attempt} in={delay:.0f}s")
+                if self._aborted.wait(delay):
+                    break
+        self._result.failed.extend(os.path.basename(p) for p in paths)
+        logger.error(f"STREAMING_UPLOAD_FAIL files={len(paths)} (phase V uploads them)")